@@ -1,3 +1,40 @@
 from django.contrib import admin
+from .models import Account, JournalEntry, JournalLine
 
-# Register your models here.
+
+@admin.register(Account)
+class AccountAdmin(admin.ModelAdmin):
+    list_display = ('code', 'name_ar', 'account_type', 'role', 'company', 'is_active')
+    list_filter = ('account_type', 'is_active')
+    search_fields = ('code', 'name', 'name_ar')
+
+
+class JournalLineInline(admin.TabularInline):
+    model = JournalLine
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(JournalEntry)
+class JournalEntryAdmin(admin.ModelAdmin):
+    list_display = ('entry_date', 'reference', 'source_type', 'company', 'branch')
+    list_filter = ('source_type',)
+    search_fields = ('reference', 'description')
+    date_hierarchy = 'entry_date'
+    inlines = [JournalLineInline]
+
+    # القيود تُنشأ بالترحيل أو ledger.post_entry فقط حتى تبقى أرصدة الحسابات مطابقة لها
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
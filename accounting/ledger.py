@@ -0,0 +1,516 @@
+import logging
+import threading
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+from core.models import Customer, Supplier
+from manufacturing.models import ProductionOrder, ProductionOrderLine
+from inventory.models import InventoryMovement
+from pos.models import SalesInvoice
+from .models import (
+    Account, AccountBalance, GoodsReceipt, GoodsReceiptLine, JournalEntry, JournalLine, PostingLock, PurchaseInvoice,
+)
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# دفتر الأستاذ العام: ترحيل المستندات وأرصدة الحسابات
+# ============================================
+
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+AMOUNT = DecimalField(max_digits=15, decimal_places=2)
+
+# الحسابات التي تنشأ تلقائياً لكل شركة: الدور -> (الرقم، الاسم، الاسم بالعربية، النوع)
+DEFAULT_ACCOUNTS = {
+    'cash': ('1100', 'Cash', 'النقدية', 'asset'),
+    'receivable': ('1200', 'Accounts Receivable', 'العملاء', 'asset'),
+    'inventory': ('1300', 'Inventory', 'المخزون', 'asset'),
+    'finished_goods': ('1320', 'Finished Goods', 'مخزون الإنتاج التام', 'asset'),
+    'tax_receivable': ('1400', 'Input Tax', 'ضريبة المدخلات', 'asset'),
+    'payable': ('2100', 'Accounts Payable', 'الموردون', 'liability'),
+    'goods_received': ('2150', 'Goods Received Not Invoiced', 'بضائع مستلمة غير مفوترة', 'liability'),
+    'tax_payable': ('2200', 'Output Tax', 'ضريبة المخرجات', 'liability'),
+    'equity': ('3100', 'Capital', 'رأس المال', 'equity'),
+    'sales': ('4100', 'Sales', 'المبيعات', 'revenue'),
+    'sales_discount': ('4200', 'Sales Discounts', 'خصم المبيعات', 'revenue'),
+    'cogs': ('5100', 'Cost of Goods Sold', 'تكلفة المبيعات', 'expense'),
+}
+
+# حالات المستندات التي تُرحَّل؛ غيرها (مسودة، ملغاة) يُرحَّل بقيمة صفر فيُعكس ما سبق ترحيله
+POSTED_SALES_STATUSES = ('submitted', 'paid', 'partial')
+POSTED_PURCHASE_STATUSES = ('approved', 'paid')
+
+
+class LedgerError(Exception):
+    """قيد غير صالح"""
+
+
+# يُرسل داخل معاملة الترحيل: dates = {company_id: (أقدم تاريخ قيد، أحدث تاريخ قيد)}
+entries_posted = Signal()
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def ensure_accounts(company_ids):
+    """حسابات الأدوار لكل شركة {(company_id, role): Account}، وإنشاء الناقص منها"""
+    def load():
+        return {
+            (account.company_id, account.role): account
+            for account in Account.objects.filter(company_id__in=company_ids, role__in=DEFAULT_ACCOUNTS)
+        }
+
+    accounts = load()
+    missing = [
+        Account(company_id=company_id, role=role, code=code, name=name, name_ar=name_ar, account_type=account_type)
+        for company_id in company_ids
+        for role, (code, name, name_ar, account_type) in DEFAULT_ACCOUNTS.items()
+        if (company_id, role) not in accounts
+    ]
+    if missing:
+        # ignore_conflicts: أنشأها ترحيل متزامن
+        Account.objects.bulk_create(missing, ignore_conflicts=True)
+        accounts = load()
+        for account in missing:
+            if (account.company_id, account.role) not in accounts:
+                raise LedgerError(f"رقم الحساب {account.code} مستخدم لحساب آخر؛ حدد دور {account.role} لحساب في الدليل")
+    return accounts
+
+
+# ------------------------------------------------------------
+# قواعد الترحيل: كل مستند -> مبالغ (الدور، العميل، المورد) موجبة للمدين وسالبة للدائن
+# ------------------------------------------------------------
+
+def _sales_invoice_targets(ids):
+    invoices = SalesInvoice.objects.filter(pk__in=ids, status__in=POSTED_SALES_STATUSES).values(
+        'id', 'company_id', 'branch_id', 'invoice_number', 'invoice_date', 'customer_id',
+        'total_amount', 'tax_amount', 'discount_amount', 'paid_amount',
+    )
+    # تكلفة المبيعات من حركات الصرف بتكلفتها المحسوبة (inventory/costing.py)، أو سعر التكلفة للحركات القديمة
+    costs = dict(
+        InventoryMovement.objects.filter(
+            reference_type='sales_invoice', reference_id__in=[str(pk) for pk in ids],
+            direction=InventoryMovement.DIRECTION_OUT,
+        )
+        .order_by().values('reference_id')
+        .annotate(cost=Sum(ExpressionWrapper(
+            F('quantity') * Coalesce('unit_cost', 'product__cost_price'), output_field=AMOUNT
+        )))
+        .values_list('reference_id', 'cost')
+    )
+    for invoice in invoices:
+        customer = invoice['customer_id']
+        cost = costs.get(str(invoice['id'])) or ZERO
+        header = (invoice['company_id'], invoice['branch_id'], invoice['invoice_date'], invoice['invoice_number'])
+        yield invoice['id'], header, [
+            ('receivable', invoice['total_amount'], customer, None),
+            ('sales', invoice['tax_amount'] - invoice['total_amount'] - invoice['discount_amount'], None, None),
+            ('tax_payable', -invoice['tax_amount'], None, None),
+            ('sales_discount', invoice['discount_amount'], None, None),
+            ('cash', invoice['paid_amount'], None, None),
+            ('receivable', -invoice['paid_amount'], customer, None),
+            ('cogs', cost, None, None),
+            ('inventory', -cost, None, None),
+        ]
+
+
+def _purchase_invoice_targets(ids):
+    invoices = PurchaseInvoice.objects.filter(pk__in=ids, status__in=POSTED_PURCHASE_STATUSES).values(
+        'id', 'company_id', 'branch_id', 'invoice_number', 'invoice_date', 'supplier_id',
+        'total_amount', 'tax_amount', 'paid_amount',
+    )
+    for invoice in invoices:
+        supplier = invoice['supplier_id']
+        header = (invoice['company_id'], invoice['branch_id'], invoice['invoice_date'], invoice['invoice_number'])
+        yield invoice['id'], header, [
+            ('goods_received', invoice['total_amount'] - invoice['tax_amount'], None, None),
+            ('tax_receivable', invoice['tax_amount'], None, None),
+            ('payable', -invoice['total_amount'], None, supplier),
+            ('payable', invoice['paid_amount'], None, supplier),
+            ('cash', -invoice['paid_amount'], None, None),
+        ]
+
+
+def _goods_receipt_targets(ids):
+    receipts = GoodsReceipt.objects.filter(pk__in=ids, is_approved=True).values(
+        'id', 'company_id', 'branch_id', 'receipt_number', 'receipt_date',
+    )
+    values = dict(
+        GoodsReceiptLine.objects.filter(goods_receipt_id__in=ids)
+        .order_by().values('goods_receipt_id')
+        .annotate(value=Sum(ExpressionWrapper(
+            F('quantity_accepted') * F('purchase_order_line__unit_price'), output_field=AMOUNT
+        )))
+        .values_list('goods_receipt_id', 'value')
+    )
+    for receipt in receipts:
+        value = values.get(receipt['id']) or ZERO
+        header = (receipt['company_id'], receipt['branch_id'], receipt['receipt_date'], receipt['receipt_number'])
+        yield receipt['id'], header, [
+            ('inventory', value, None, None),
+            ('goods_received', -value, None, None),
+        ]
+
+
+def _production_order_targets(ids):
+    orders = ProductionOrder.objects.filter(pk__in=ids, status='completed').values(
+        'id', 'company_id', 'branch_id', 'order_number', 'actual_end_date', 'updated_at',
+    )
+    # تكلفة المكونات من حركات الاستهلاك بتكلفتها المحسوبة، أو من الأسطر بسعر التكلفة للأوامر بلا حركات
+    costs = dict(
+        InventoryMovement.objects.filter(
+            reference_type='production_order', reference_id__in=[str(pk) for pk in ids],
+            direction=InventoryMovement.DIRECTION_OUT,
+        )
+        .order_by().values('reference_id')
+        .annotate(cost=Sum(ExpressionWrapper(
+            F('quantity') * Coalesce('unit_cost', 'product__cost_price'), output_field=AMOUNT
+        )))
+        .values_list('reference_id', 'cost')
+    )
+    costs.update(
+        (str(order_id), cost)
+        for order_id, cost in ProductionOrderLine.objects.filter(production_order_id__in=ids)
+        .exclude(production_order_id__in=[pk for pk in ids if str(pk) in costs])
+        .order_by().values('production_order_id')
+        .annotate(cost=Sum(ExpressionWrapper(
+            F('consumed_quantity') * F('ingredient__product__cost_price'), output_field=AMOUNT
+        )))
+        .values_list('production_order_id', 'cost')
+    )
+    for order in orders:
+        cost = costs.get(str(order['id'])) or ZERO
+        finished = order['actual_end_date'] or order['updated_at']
+        header = (order['company_id'], order['branch_id'], timezone.localdate(finished), order['order_number'])
+        yield order['id'], header, [
+            ('finished_goods', cost, None, None),
+            ('inventory', -cost, None, None),
+        ]
+
+
+POSTING_RULES = {
+    'sales_invoice': _sales_invoice_targets,
+    'purchase_invoice': _purchase_invoice_targets,
+    'goods_receipt': _goods_receipt_targets,
+    'production_order': _production_order_targets,
+}
+
+
+# ------------------------------------------------------------
+# محرك الترحيل
+# ------------------------------------------------------------
+
+@transaction.atomic
+def post_documents(sources):
+    """
+    ترحيل مستندات إلى دفتر الأستاذ؛ sources: قائمة (source_type, source_id)
+
+    يُحسب ما يجب أن يكون مرحَّلاً لكل مستند بحالته الحالية ويُقارن بما رُحِّل سابقاً،
+    ويُقيد الفرق فقط، فإعادة الترحيل آمنة، وتعديل المستند أو إلغاؤه أو حذفه ينتج قيد
+    تسوية أو عكس. القيود والأسطر تُكتب بإدخال جماعي لكل الدفعة، ثم تُحدَّث أرصدة
+    الحسابات الشهرية وأرصدة العملاء والموردين بتحديث واحد لكل صف متأثر.
+    يعيد عدد القيود المنشأة.
+    """
+    by_type = defaultdict(set)
+    for source_type, source_id in sources:
+        by_type[source_type].add(source_id)
+    if not by_type:
+        return 0
+    _lock_documents(by_type)
+
+    targets = {}
+    for source_type, ids in by_type.items():
+        for source_id, header, amounts in POSTING_RULES[source_type](ids):
+            targets[(source_type, source_id)] = (*header, amounts)
+
+    company_ids = {target[0] for target in targets.values()}
+    accounts = ensure_accounts(company_ids) if company_ids else {}
+
+    # المطلوب: {المستند: {(التاريخ، الحساب، العميل، المورد): المبلغ}}
+    wanted = defaultdict(lambda: defaultdict(Decimal))
+    headers = {}
+    for key, (company_id, branch_id, entry_date, reference, amounts) in targets.items():
+        headers[key] = (company_id, branch_id, reference)
+        for role, amount, customer_id, supplier_id in amounts:
+            # بدقة أسطر القيود، وإلا ظهر فرق كسور عند كل إعادة ترحيل
+            amount = amount.quantize(CENT)
+            if amount:
+                wanted[key][(entry_date, accounts[(company_id, role)].pk, customer_id, supplier_id)] += amount
+
+    # المرحَّل سابقاً، باستعلام تجميع واحد لكل نوع مستند
+    for source_type, ids in by_type.items():
+        posted = (
+            JournalLine.objects.filter(entry__source_type=source_type, entry__source_id__in=ids)
+            .order_by()
+            .values('entry__source_id', 'entry__entry_date', 'entry__company_id', 'entry__branch_id',
+                    'account_id', 'customer_id', 'supplier_id')
+            .annotate(net=Sum(ExpressionWrapper(F('debit') - F('credit'), output_field=AMOUNT)))
+        )
+        for row in posted:
+            key = (source_type, row['entry__source_id'])
+            headers.setdefault(key, (row['entry__company_id'], row['entry__branch_id'], ''))
+            wanted[key][(row['entry__entry_date'], row['account_id'], row['customer_id'], row['supplier_id'])] -= row['net']
+
+    entries, lines = [], []
+    for (source_type, source_id), amounts in wanted.items():
+        company_id, branch_id, reference = headers[(source_type, source_id)]
+        by_date = defaultdict(list)
+        for (entry_date, account_id, customer_id, supplier_id), amount in amounts.items():
+            if amount:
+                by_date[entry_date].append((account_id, customer_id, supplier_id, amount))
+        for entry_date, items in sorted(by_date.items()):
+            entry = JournalEntry(
+                company_id=company_id,
+                branch_id=branch_id,
+                entry_date=entry_date,
+                source_type=source_type,
+                source_id=source_id,
+                reference=reference,
+            )
+            entries.append(entry)
+            lines.extend(
+                JournalLine(
+                    entry=entry,
+                    account_id=account_id,
+                    customer_id=customer_id,
+                    supplier_id=supplier_id,
+                    debit=max(amount, ZERO),
+                    credit=max(-amount, ZERO),
+                )
+                for account_id, customer_id, supplier_id, amount in items
+            )
+
+    _write(entries, lines)
+    return len(entries)
+
+
+def _lock_documents(by_type):
+    """
+    قفل صف PostingLock لكل مستند قبل قراءة حالته وما رُحِّل منه
+
+    يُقفل صف مستقل لا المستند نفسه لأن المستند المحذوف يُرحَّل عكسه أيضاً. الصفوف
+    تُنشأ وتُقفل بترتيب ثابت فلا يتبادل ترحيلان الانتظار.
+    """
+    PostingLock.objects.bulk_create(
+        sorted(
+            (PostingLock(source_type=source_type, source_id=source_id)
+             for source_type, ids in by_type.items() for source_id in ids),
+            key=lambda lock: (lock.source_type, str(lock.source_id)),
+        ),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    documents = Q()
+    for source_type, ids in by_type.items():
+        documents |= Q(source_type=source_type, source_id__in=ids)
+    list(
+        PostingLock.objects.select_for_update().filter(documents)
+        .order_by('source_type', 'source_id').values_list('pk', flat=True)
+    )
+
+
+def post_entry(company, entry_date, lines, description='', branch=None, created_by=None):
+    """
+    قيد يدوي؛ lines: قائمة {'account': Account, 'debit': Decimal, 'credit': Decimal}
+
+    يُرفض القيد غير المتوازن أو الذي يستخدم حسابات شركة أخرى.
+    """
+    debit = sum((Decimal(line.get('debit') or 0) for line in lines), ZERO)
+    credit = sum((Decimal(line.get('credit') or 0) for line in lines), ZERO)
+    if not lines or debit != credit:
+        raise LedgerError(f"القيد غير متوازن: مدين {debit} دائن {credit}")
+    if any(line['account'].company_id != company.pk for line in lines):
+        raise LedgerError("الحساب لا يتبع الشركة")
+
+    entry = JournalEntry(
+        company=company, branch=branch, entry_date=entry_date, source_type='manual',
+        description=description, created_by=created_by,
+    )
+    with transaction.atomic():
+        _write([entry], [
+            JournalLine(
+                entry=entry,
+                account=line['account'],
+                debit=Decimal(line.get('debit') or 0),
+                credit=Decimal(line.get('credit') or 0),
+                customer=line.get('customer'),
+                supplier=line.get('supplier'),
+            )
+            for line in lines
+        ])
+    return entry
+
+
+def _write(entries, lines):
+    """حفظ القيود وتحديث الأرصدة المجمعة"""
+    if not entries:
+        return
+    JournalEntry.objects.bulk_create(entries)
+    JournalLine.objects.bulk_create(lines, batch_size=1000)
+
+    dates = {entry.pk: (entry.company_id, entry.entry_date) for entry in entries}
+    balances = defaultdict(lambda: [ZERO, ZERO])
+    customers, suppliers = defaultdict(Decimal), defaultdict(Decimal)
+    receivable, payable = _partner_accounts({company_id for company_id, _ in dates.values()})
+    for line in lines:
+        company_id, entry_date = dates[line.entry_id]
+        totals = balances[(company_id, line.account_id, month_start(entry_date))]
+        totals[0] += line.debit
+        totals[1] += line.credit
+        if line.customer_id and line.account_id in receivable:
+            customers[line.customer_id] += line.debit - line.credit
+        if line.supplier_id and line.account_id in payable:
+            suppliers[line.supplier_id] += line.credit - line.debit
+
+    for (company_id, account_id, period), (debit, credit) in balances.items():
+        _add_to_balance(company_id, account_id, period, debit, credit)
+    for customer_id, amount in customers.items():
+        if amount:
+            Customer.objects.filter(pk=customer_id).update(balance=F('balance') + amount)
+    for supplier_id, amount in suppliers.items():
+        if amount:
+            Supplier.objects.filter(pk=supplier_id).update(balance=F('balance') + amount)
+
+    posted = {}
+    for entry in entries:
+        first, last = posted.get(entry.company_id, (entry.entry_date, entry.entry_date))
+        posted[entry.company_id] = (min(first, entry.entry_date), max(last, entry.entry_date))
+    entries_posted.send(sender=JournalEntry, dates=posted)
+
+
+def _partner_accounts(company_ids):
+    rows = Account.objects.filter(company_id__in=company_ids, role__in=('receivable', 'payable')).values_list('pk', 'role')
+    return {pk for pk, role in rows if role == 'receivable'}, {pk for pk, role in rows if role == 'payable'}
+
+
+def _add_to_balance(company_id, account_id, period, debit, credit):
+    updates = {'debit': F('debit') + debit, 'credit': F('credit') + credit}
+    if AccountBalance.objects.filter(account_id=account_id, period=period).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            AccountBalance.objects.create(
+                company_id=company_id, account_id=account_id, period=period, debit=debit, credit=credit
+            )
+    except IntegrityError:
+        AccountBalance.objects.filter(account_id=account_id, period=period).update(**updates)
+
+
+@transaction.atomic
+def rebuild_balances(company):
+    """إعادة حساب أرصدة الحسابات الشهرية من أسطر القيود (بعد تعديل يدوي في قاعدة البيانات)"""
+    AccountBalance.objects.filter(company=company).delete()
+    rows = (
+        JournalLine.objects.filter(entry__company=company)
+        .order_by()
+        .values('account_id', 'entry__entry_date__year', 'entry__entry_date__month')
+        .annotate(debit=Sum('debit'), credit=Sum('credit'))
+    )
+    AccountBalance.objects.bulk_create([
+        AccountBalance(
+            company=company,
+            account_id=row['account_id'],
+            period=date(row['entry__entry_date__year'], row['entry__entry_date__month'], 1),
+            debit=row['debit'],
+            credit=row['credit'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+# ------------------------------------------------------------
+# الترحيل بعد حفظ المستند
+# ------------------------------------------------------------
+
+class PostingQueue:
+    """
+    تجميع المستندات المعدلة في المعاملة وترحيلها دفعة واحدة بعد حفظها
+
+    المستندات التي تبقى في الطابور بعد التراجع عن معاملتها تُرحَّل مع الدفعة التالية
+    دون أثر، لأن الترحيل يقارن بحالة المستند الفعلية. إذا فشل الترحيل يُسجل الخطأ ولا
+    يصل للطلب الذي حفظ المستند (فقد تأكدت معاملته)، ويبقى المستند محفوظاً ويعاد ترحيله
+    بأمر post_ledger.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def pending(self):
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = set()
+        return self._local.pending
+
+    def add(self, source_type, source_id):
+        self.pending.add((source_type, source_id))
+        transaction.on_commit(self.flush)
+
+    def flush(self):
+        if not self.pending:
+            return 0
+        sources, self._local.pending = self.pending, set()
+        try:
+            return post_documents(sources)
+        except Exception:
+            logger.exception("تعذر ترحيل %s مستند إلى دفتر الأستاذ؛ أعد الترحيل بأمر post_ledger", len(sources))
+            return 0
+
+
+posting_queue = PostingQueue()
+
+
+# ------------------------------------------------------------
+# القراءة
+# ------------------------------------------------------------
+
+def trial_balance(company, as_of=None):
+    """
+    ميزان المراجعة حتى نهاية شهر as_of من الأرصدة الشهرية
+
+    صف لكل حساب له حركة: الرقم والاسم والنوع ومجموع المدين والدائن والرصيد
+    (موجب بطبيعة الحساب).
+    """
+    rows = AccountBalance.objects.filter(company=company)
+    if as_of is not None:
+        rows = rows.filter(period__lte=month_start(as_of))
+    rows = (
+        rows.order_by('account__code')
+        .values('account_id', 'account__code', 'account__name_ar', 'account__account_type')
+        .annotate(debit=Sum('debit'), credit=Sum('credit'))
+    )
+    result = []
+    for row in rows:
+        balance = row['debit'] - row['credit']
+        if row['account__account_type'] not in ('asset', 'expense'):
+            balance = -balance
+        result.append({
+            'account_id': row['account_id'],
+            'code': row['account__code'],
+            'name': row['account__name_ar'],
+            'account_type': row['account__account_type'],
+            'debit': row['debit'],
+            'credit': row['credit'],
+            'balance': balance,
+        })
+    return result
+
+
+def balance_sheet(company, as_of=None):
+    """الميزانية العمومية: مجموع كل نوع من ميزان المراجعة، وصافي الربح ضمن حقوق الملكية"""
+    totals = defaultdict(Decimal)
+    for row in trial_balance(company, as_of):
+        totals[row['account_type']] += row['balance']
+    earnings = totals['revenue'] - totals['expense']
+    return {
+        'assets': totals['asset'],
+        'liabilities': totals['liability'],
+        'equity': totals['equity'] + earnings,
+        'net_income': earnings,
+    }
@@ -0,0 +1,55 @@
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Company
+from manufacturing.models import ProductionOrder
+from pos.models import SalesInvoice
+from accounting.ledger import post_documents, rebuild_balances
+from accounting.models import GoodsReceipt, PurchaseInvoice
+
+# نوع المستند -> (النموذج، حقل التاريخ)
+DOCUMENTS = {
+    'sales_invoice': (SalesInvoice, 'invoice_date'),
+    'purchase_invoice': (PurchaseInvoice, 'invoice_date'),
+    'goods_receipt': (GoodsReceipt, 'receipt_date'),
+    'production_order': (ProductionOrder, 'updated_at__date'),
+}
+
+
+class Command(BaseCommand):
+    help = 'ترحيل المستندات إلى دفتر الأستاذ العام (آمن للتكرار: يُقيد الفرق فقط)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help='معرف الشركة (الافتراضي: جميع الشركات)')
+        parser.add_argument('--from', dest='start', help='المستندات ابتداءً من تاريخ YYYY-MM-DD')
+        parser.add_argument('--rebuild-balances', action='store_true', help='إعادة حساب أرصدة الحسابات من القيود')
+
+    def handle(self, *args, **options):
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+            if not companies.exists():
+                raise CommandError(f"الشركة غير موجودة: {options['company']}")
+
+        start = None
+        if options['start']:
+            try:
+                start = date.fromisoformat(options['start'])
+            except ValueError:
+                raise CommandError(f"تاريخ غير صالح: {options['start']}")
+
+        batch_size = settings.LEDGER_POST_BATCH_SIZE
+        created = 0
+        for source_type, (model, date_field) in DOCUMENTS.items():
+            ids = model.objects.filter(company__in=companies)
+            if start is not None:
+                ids = ids.filter(**{f'{date_field}__gte': start})
+            ids = list(ids.values_list('pk', flat=True))
+            for offset in range(0, len(ids), batch_size):
+                created += post_documents([(source_type, pk) for pk in ids[offset:offset + batch_size]])
+
+        if options['rebuild_balances']:
+            for company in companies:
+                rebuild_balances(company)
+
+        self.stdout.write(self.style.SUCCESS(f'تم إنشاء {created} قيد'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='purchaseorder',
+            name='order_number',
+            field=models.CharField(blank=True, max_length=50, unique=True, verbose_name='رقم الأمر'),
+        ),
+    ]
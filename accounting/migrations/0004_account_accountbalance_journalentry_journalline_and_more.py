@@ -0,0 +1,113 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:34
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0003_alter_purchaseorder_order_number'),
+        ('core', '0003_unit_updated_at_sync_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Account',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('code', models.CharField(max_length=20, verbose_name='رقم الحساب')),
+                ('name', models.CharField(max_length=255)),
+                ('name_ar', models.CharField(max_length=255, verbose_name='الاسم بالعربية')),
+                ('account_type', models.CharField(choices=[('asset', 'أصول'), ('liability', 'خصوم'), ('equity', 'حقوق ملكية'), ('revenue', 'إيرادات'), ('expense', 'مصروفات')], max_length=20, verbose_name='نوع الحساب')),
+                ('role', models.CharField(blank=True, max_length=30, verbose_name='دور الحساب')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accounts', to='core.company')),
+            ],
+            options={
+                'verbose_name': 'حساب',
+                'verbose_name_plural': 'دليل الحسابات',
+                'ordering': ['code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AccountBalance',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('period', models.DateField(verbose_name='الفترة')),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='مدين')),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='دائن')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='accounting.account')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='account_balances', to='core.company')),
+            ],
+            options={
+                'verbose_name': 'رصيد حساب',
+                'verbose_name_plural': 'أرصدة الحسابات',
+                'ordering': ['period'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JournalEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('entry_date', models.DateField(verbose_name='تاريخ القيد')),
+                ('source_type', models.CharField(choices=[('sales_invoice', 'فاتورة بيع'), ('purchase_invoice', 'فاتورة شراء'), ('goods_receipt', 'إيصال استقبال'), ('production_order', 'أمر إنتاج'), ('manual', 'قيد يدوي')], default='manual', max_length=30)),
+                ('source_id', models.UUIDField(blank=True, null=True)),
+                ('reference', models.CharField(blank=True, max_length=50, verbose_name='المرجع')),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='journal_entries', to='core.branch')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='journal_entries', to='core.company')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='journal_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'قيد يومية',
+                'verbose_name_plural': 'قيود اليومية',
+                'ordering': ['-entry_date', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JournalLine',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='مدين')),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='دائن')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='journal_lines', to='accounting.account')),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='journal_lines', to='core.customer')),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='accounting.journalentry')),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='journal_lines', to='core.supplier')),
+            ],
+            options={
+                'verbose_name': 'سطر قيد',
+                'verbose_name_plural': 'أسطر القيود',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='account',
+            constraint=models.UniqueConstraint(condition=models.Q(('role', ''), _negated=True), fields=('company', 'role'), name='unique_account_role'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='account',
+            unique_together={('company', 'code')},
+        ),
+        migrations.AddIndex(
+            model_name='accountbalance',
+            index=models.Index(fields=['company', 'period'], name='accounting__company_59520f_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='accountbalance',
+            unique_together={('account', 'period')},
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['source_type', 'source_id'], name='accounting__source__3d844c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['company', '-entry_date'], name='accounting__company_32fdb1_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:46
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_account_accountbalance_journalentry_journalline_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostingLock',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('source_type', models.CharField(choices=[('sales_invoice', 'فاتورة بيع'), ('purchase_invoice', 'فاتورة شراء'), ('goods_receipt', 'إيصال استقبال'), ('production_order', 'أمر إنتاج'), ('manual', 'قيد يدوي')], max_length=30)),
+                ('source_id', models.UUIDField()),
+            ],
+            options={
+                'verbose_name': 'قفل ترحيل',
+                'verbose_name_plural': 'أقفال الترحيل',
+                'unique_together': {('source_type', 'source_id')},
+            },
+        ),
+    ]
@@ -24,7 +24,7 @@ class PurchaseOrder(models.Model):
     company = models.ForeignKey('core.Company', on_delete=models.CASCADE, related_name='purchase_orders')
     branch = models.ForeignKey('core.Branch', on_delete=models.CASCADE, related_name='purchase_orders')
     
-    order_number = models.CharField(max_length=50, unique=True, verbose_name=_('رقم الأمر'))
+    order_number = models.CharField(max_length=50, unique=True, blank=True, verbose_name=_('رقم الأمر'))
     supplier = models.ForeignKey('core.Supplier', on_delete=models.PROTECT, related_name='purchase_orders')
     
     # التواريخ
@@ -266,3 +266,150 @@ class PurchaseInvoice(models.Model):
     
     def __str__(self):
         return self.invoice_number
+
+
+# ============================================
+# دفتر الأستاذ العام
+# ============================================
+
+class Account(models.Model):
+    """نموذج حساب في دليل الحسابات"""
+    
+    TYPE_CHOICES = [
+        ('asset', _('أصول')),
+        ('liability', _('خصوم')),
+        ('equity', _('حقوق ملكية')),
+        ('revenue', _('إيرادات')),
+        ('expense', _('مصروفات')),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey('core.Company', on_delete=models.CASCADE, related_name='accounts')
+    
+    code = models.CharField(max_length=20, verbose_name=_('رقم الحساب'))
+    name = models.CharField(max_length=255)
+    name_ar = models.CharField(max_length=255, verbose_name=_('الاسم بالعربية'))
+    account_type = models.CharField(max_length=20, choices=TYPE_CHOICES, verbose_name=_('نوع الحساب'))
+    # دور الحساب في القيود التلقائية (accounting/ledger.py)، فارغ للحسابات اليدوية
+    role = models.CharField(max_length=30, blank=True, verbose_name=_('دور الحساب'))
+    
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('حساب')
+        verbose_name_plural = _('دليل الحسابات')
+        ordering = ['code']
+        unique_together = ['company', 'code']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'role'], condition=~models.Q(role=''), name='unique_account_role'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.code} - {self.name_ar}"
+    
+    @property
+    def is_debit_normal(self):
+        return self.account_type in ('asset', 'expense')
+
+
+class JournalEntry(models.Model):
+    """نموذج قيد اليومية"""
+    
+    SOURCE_CHOICES = [
+        ('sales_invoice', _('فاتورة بيع')),
+        ('purchase_invoice', _('فاتورة شراء')),
+        ('goods_receipt', _('إيصال استقبال')),
+        ('production_order', _('أمر إنتاج')),
+        ('manual', _('قيد يدوي')),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey('core.Company', on_delete=models.CASCADE, related_name='journal_entries')
+    branch = models.ForeignKey('core.Branch', on_delete=models.SET_NULL, null=True, blank=True, related_name='journal_entries')
+    
+    entry_date = models.DateField(verbose_name=_('تاريخ القيد'))
+    source_type = models.CharField(max_length=30, choices=SOURCE_CHOICES, default='manual')
+    source_id = models.UUIDField(null=True, blank=True)
+    reference = models.CharField(max_length=50, blank=True, verbose_name=_('المرجع'))
+    description = models.CharField(max_length=255, blank=True)
+    
+    created_by = models.ForeignKey('core.CustomUser', on_delete=models.SET_NULL, null=True, blank=True, related_name='journal_entries')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('قيد يومية')
+        verbose_name_plural = _('قيود اليومية')
+        ordering = ['-entry_date', '-created_at']
+        indexes = [
+            models.Index(fields=['source_type', 'source_id']),
+            models.Index(fields=['company', '-entry_date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.entry_date} - {self.reference or self.get_source_type_display()}"
+
+
+class PostingLock(models.Model):
+    """صف لكل مستند يُرحَّل، يُقفل أثناء ترحيله حتى لا يقيد ترحيلان متزامنان الفرق نفسه"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    source_type = models.CharField(max_length=30, choices=JournalEntry.SOURCE_CHOICES)
+    source_id = models.UUIDField()
+    
+    class Meta:
+        verbose_name = _('قفل ترحيل')
+        verbose_name_plural = _('أقفال الترحيل')
+        unique_together = ['source_type', 'source_id']
+    
+    def __str__(self):
+        return f"{self.source_type}:{self.source_id}"
+
+
+class JournalLine(models.Model):
+    """نموذج سطر قيد اليومية (مدين أو دائن)"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    entry = models.ForeignKey(JournalEntry, on_delete=models.CASCADE, related_name='lines')
+    account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name='journal_lines')
+    
+    debit = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name=_('مدين'))
+    credit = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name=_('دائن'))
+    
+    # الحساب الفرعي للعملاء والموردين
+    customer = models.ForeignKey('core.Customer', on_delete=models.PROTECT, null=True, blank=True, related_name='journal_lines')
+    supplier = models.ForeignKey('core.Supplier', on_delete=models.PROTECT, null=True, blank=True, related_name='journal_lines')
+    
+    class Meta:
+        verbose_name = _('سطر قيد')
+        verbose_name_plural = _('أسطر القيود')
+    
+    def __str__(self):
+        return f"{self.account.code}: {self.debit} / {self.credit}"
+
+
+class AccountBalance(models.Model):
+    """مجموع حركة الحساب في شهر، يُحدَّث مع كل ترحيل لقراءة ميزان المراجعة دون جمع القيود"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey('core.Company', on_delete=models.CASCADE, related_name='account_balances')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='balances')
+    
+    # أول يوم في الشهر
+    period = models.DateField(verbose_name=_('الفترة'))
+    debit = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name=_('مدين'))
+    credit = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name=_('دائن'))
+    
+    class Meta:
+        verbose_name = _('رصيد حساب')
+        verbose_name_plural = _('أرصدة الحسابات')
+        ordering = ['period']
+        unique_together = ['account', 'period']
+        indexes = [
+            models.Index(fields=['company', 'period']),
+        ]
+    
+    def __str__(self):
+        return f"{self.account} - {self.period:%Y-%m}"
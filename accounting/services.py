@@ -0,0 +1,195 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Subquery, Value
+from django.utils import timezone
+from core.services import next_numbers
+from inventory.models import InventoryMovement
+from inventory.services import below_reorder_levels, increase_stock, post_movements
+from .models import GoodsReceipt, GoodsReceiptLine, PurchaseOrder, PurchaseOrderLine
+
+OPEN_PURCHASE_ORDER_STATUSES = ('draft', 'submitted', 'confirmed', 'partial')
+RECEIVABLE_PURCHASE_ORDER_STATUSES = ('submitted', 'confirmed', 'partial')
+
+# حجم دفعة تحديث المخزون وأسطر أمر الشراء (عدد عبارات CASE في الاستعلام الواحد)
+RECEIPT_BATCH_SIZE = 500
+
+
+class GoodsReceiptError(Exception):
+    """خطأ في اعتماد إيصال الاستقبال"""
+
+
+@transaction.atomic
+def create_reorder_purchase_orders(branch, created_by=None):
+    """
+    إنشاء أوامر شراء مسودة للمنتجات التي نزلت عن حد إعادة الطلب في الفرع
+
+    الكمية المقترحة هي reorder_quantity للمنتج (أو النقص عن الحد إذا كانت صفراً)،
+    والمورد هو آخر مورد اشتُري منه المنتج. يُنشأ أمر واحد لكل مورد بإدخال جماعي،
+    وتُستثنى المنتجات الموجودة في أمر شراء مفتوح للفرع.
+    يعيد (أوامر الشراء المنشأة، معرفات المنتجات التي ليس لها مورد سابق).
+    """
+    history = PurchaseOrderLine.objects.filter(
+        product_id=OuterRef('product_id'),
+        purchase_order__company_id=branch.company_id,
+    ).order_by('-purchase_order__order_date', '-purchase_order__created_at')
+    open_lines = PurchaseOrderLine.objects.filter(
+        product_id=OuterRef('product_id'),
+        purchase_order__branch=branch,
+        purchase_order__status__in=OPEN_PURCHASE_ORDER_STATUSES,
+    )
+    levels = (
+        below_reorder_levels(branch)
+        .filter(product__is_active=True)
+        .exclude(Exists(open_lines))
+        .select_related('product')
+        .annotate(
+            last_supplier_id=Subquery(history.values('purchase_order__supplier_id')[:1]),
+            last_unit_price=Subquery(history.values('unit_price')[:1]),
+        )
+    )
+
+    by_supplier = {}
+    without_supplier = []
+    for level in levels:
+        if level.last_supplier_id is None:
+            without_supplier.append(level.product_id)
+            continue
+        product = level.product
+        quantity = product.reorder_quantity or level.reorder_level - level.quantity
+        unit_price = product.cost_price if level.last_unit_price is None else level.last_unit_price
+        by_supplier.setdefault(level.last_supplier_id, []).append((product, quantity, unit_price))
+
+    if not by_supplier:
+        return [], without_supplier
+
+    today = timezone.localdate()
+    numbers = next_numbers(branch, 'purchase_order', len(by_supplier))
+    orders, lines = [], []
+    for order_number, (supplier_id, items) in zip(numbers, by_supplier.items()):
+        subtotal = sum((quantity * unit_price for _, quantity, unit_price in items), Decimal('0'))
+        order = PurchaseOrder(
+            company_id=branch.company_id,
+            branch=branch,
+            order_number=order_number,
+            supplier_id=supplier_id,
+            order_date=today,
+            expected_delivery_date=today,
+            status='draft',
+            subtotal=subtotal,
+            total_amount=subtotal,
+            created_by=created_by,
+            notes='أمر مقترح لإعادة الطلب',
+        )
+        orders.append(order)
+        lines.extend(
+            PurchaseOrderLine(
+                purchase_order=order,
+                product=product,
+                quantity=quantity,
+                unit_price=unit_price,
+                line_total=quantity * unit_price,
+            )
+            for product, quantity, unit_price in items
+        )
+
+    PurchaseOrder.objects.bulk_create(orders)
+    PurchaseOrderLine.objects.bulk_create(lines)
+    return orders, without_supplier
+
+
+def approve_goods_receipt(receipt, approved_by=None):
+    """
+    اعتماد إيصال استقبال وترحيله إلى المخزون وأمر الشراء في معاملة واحدة
+
+    يُقفل الإيصال ثم أمر الشراء قبل قراءة الكميات المتبقية، فتنتظر الإيصالات الأخرى لنفس
+    الأمر حتى تنتهي هذه المعاملة ولا يتجاوز إيصالان متزامنان كمية السطر. تُقرأ الأسطر
+    باستعلام واحد، ثم تُضاف الكميات المقبولة إلى مخزون الفرع (increase_stock على دفعات)
+    وتُسجل حركات الشراء بإدخال جماعي بسعر سطر الأمر، وتُزاد الكميات المستقبلة في أسطر
+    الأمر بـ bulk_update بتعبيرات F(). تصبح حالة الأمر 'received' إذا اكتملت كل أسطره
+    وإلا 'partial'. يُرحَّل الإيصال إلى دفتر الأستاذ عند حفظه (accounting/signals.py).
+    يرفض الإيصال كله إذا تجاوز أي سطر الكمية المتبقية في الأمر.
+    """
+    with transaction.atomic():
+        receipt = GoodsReceipt.objects.select_for_update().select_related('branch').get(pk=receipt.pk)
+        if receipt.is_approved:
+            raise GoodsReceiptError("الإيصال معتمد مسبقاً")
+        order = PurchaseOrder.objects.select_for_update().get(pk=receipt.purchase_order_id)
+        if order.status not in RECEIVABLE_PURCHASE_ORDER_STATUSES:
+            raise GoodsReceiptError(f"لا يمكن الاستقبال على أمر شراء بحالة {order.status}")
+
+        lines = list(
+            GoodsReceiptLine.objects.filter(goods_receipt=receipt).values(
+                'quantity_received', 'quantity_accepted', 'quantity_rejected',
+                'purchase_order_line_id', 'purchase_order_line__purchase_order_id',
+                'purchase_order_line__product_id', 'purchase_order_line__product__track_quantity',
+                'purchase_order_line__quantity', 'purchase_order_line__received_quantity',
+                'purchase_order_line__unit_price',
+            )
+        )
+        if not lines:
+            raise GoodsReceiptError("الإيصال لا يحتوي على أسطر")
+
+        accepted = {}
+        for line in lines:
+            if line['purchase_order_line__purchase_order_id'] != order.pk:
+                raise GoodsReceiptError("سطر الإيصال لا يتبع أمر الشراء")
+            if line['quantity_accepted'] + line['quantity_rejected'] > line['quantity_received']:
+                raise GoodsReceiptError("الكمية المقبولة والمرفوضة أكبر من المستقبلة")
+            order_line = line['purchase_order_line_id']
+            accepted[order_line] = accepted.get(order_line, Decimal('0')) + line['quantity_accepted']
+        remaining = {
+            line['purchase_order_line_id']: line['purchase_order_line__quantity'] - line['purchase_order_line__received_quantity']
+            for line in lines
+        }
+        over = [order_line for order_line, quantity in accepted.items() if quantity > remaining[order_line]]
+        if over:
+            raise GoodsReceiptError(f"الكمية المقبولة تتجاوز المتبقي في أمر الشراء لعدد {len(over)} سطر")
+
+        stock_quantities = {}
+        for line in lines:
+            if line['purchase_order_line__product__track_quantity'] and line['quantity_accepted']:
+                product_id = line['purchase_order_line__product_id']
+                stock_quantities[product_id] = stock_quantities.get(product_id, Decimal('0')) + line['quantity_accepted']
+        products = list(stock_quantities)
+        for start in range(0, len(products), RECEIPT_BATCH_SIZE):
+            increase_stock(receipt.branch, {pid: stock_quantities[pid] for pid in products[start:start + RECEIPT_BATCH_SIZE]})
+
+        post_movements([
+            InventoryMovement(
+                product_id=line['purchase_order_line__product_id'],
+                branch_id=receipt.branch_id,
+                movement_type='purchase',
+                direction=InventoryMovement.DIRECTION_IN,
+                quantity=line['quantity_accepted'],
+                unit_price=line['purchase_order_line__unit_price'],
+                reference_type='goods_receipt',
+                reference_id=str(receipt.pk),
+                created_by=approved_by,
+            )
+            for line in lines
+            if line['purchase_order_line__product__track_quantity'] and line['quantity_accepted']
+        ])
+
+        PurchaseOrderLine.objects.bulk_update(
+            [
+                PurchaseOrderLine(pk=order_line, received_quantity=F('received_quantity') + Value(quantity))
+                for order_line, quantity in accepted.items() if quantity
+            ],
+            ['received_quantity'],
+            batch_size=RECEIPT_BATCH_SIZE,
+        )
+
+        complete = not PurchaseOrderLine.objects.filter(
+            purchase_order=order, received_quantity__lt=F('quantity')
+        ).exists()
+        order.status = 'received' if complete else 'partial'
+        if complete:
+            order.actual_delivery_date = receipt.receipt_date
+        order.save(update_fields=['status', 'actual_delivery_date', 'updated_at'])
+
+        receipt.is_approved = True
+        receipt.approved_by = approved_by
+        receipt.approved_at = timezone.now()
+        receipt.save(update_fields=['is_approved', 'approved_by', 'approved_at', 'updated_at'])
+
+    return receipt
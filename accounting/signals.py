@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from inventory.costing import costs_changed
+from inventory.models import InventoryMovement
+from manufacturing.models import ProductionOrder
+from pos.models import SalesInvoice
+from .ledger import posting_queue
+from .models import GoodsReceipt, PurchaseInvoice
+
+# المستندات المرحَّلة إلى دفتر الأستاذ: النموذج -> source_type في JournalEntry
+POSTED_MODELS = {
+    SalesInvoice: 'sales_invoice',
+    PurchaseInvoice: 'purchase_invoice',
+    GoodsReceipt: 'goods_receipt',
+    ProductionOrder: 'production_order',
+}
+
+
+@receiver(post_save, sender=SalesInvoice)
+@receiver(post_save, sender=PurchaseInvoice)
+@receiver(post_save, sender=GoodsReceipt)
+@receiver(post_save, sender=ProductionOrder)
+@receiver(post_delete, sender=SalesInvoice)
+@receiver(post_delete, sender=PurchaseInvoice)
+@receiver(post_delete, sender=GoodsReceipt)
+@receiver(post_delete, sender=ProductionOrder)
+def queue_document_posting(sender, instance, raw=False, **kwargs):
+    """ترحيل المستند بعد حفظ معاملته (الحذف يعكس قيوده)"""
+    if raw or not settings.LEDGER_POST_ON_SAVE:
+        return
+    posting_queue.add(POSTED_MODELS[sender], instance.pk)
+
+
+@receiver(costs_changed, sender=InventoryMovement)
+def repost_recosted_documents(sender, references, **kwargs):
+    """إعادة ترحيل تكلفة المبيعات والإنتاج للمستندات التي تغيرت تكلفة حركاتها بعد إعادة حساب التكلفة"""
+    if not settings.LEDGER_POST_ON_SAVE:
+        return
+    for source_type in ('sales_invoice', 'production_order'):
+        for reference_id in references.get(source_type, ()):
+            posting_queue.add(source_type, reference_id)
@@ -1,3 +1,223 @@
+from decimal import Decimal
+from unittest import mock
+from django.db import DatabaseError
 from django.test import TestCase
+from django.utils import timezone
+from core.models import Company, Branch, Customer, CustomUser, Supplier, Unit
+from inventory.models import InventoryMovement, Product, StockLevel
+from inventory.services import below_reorder_levels, increase_stock
+from pos.models import POSSession, SalesInvoice
+from pos.services import checkout
+from .ledger import LedgerError, balance_sheet, ensure_accounts, post_documents, post_entry, trial_balance
+from .models import (
+    GoodsReceipt, GoodsReceiptLine, JournalEntry, JournalLine, PostingLock, PurchaseOrder, PurchaseOrderLine,
+)
+from .services import GoodsReceiptError, approve_goods_receipt, create_reorder_purchase_orders
 
-# Create your tests here.
+
+class LedgerTests(TestCase):
+    """ترحيل المستندات إلى دفتر الأستاذ والأرصدة الشهرية"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='GL Co', name_ar='شركة', tax_id='GL-1', commercial_register='GL-1')
+        self.branch = Branch.objects.create(company=self.company, name='Main', name_ar='الرئيسي', code='GL')
+        self.user = CustomUser.objects.create_user(username='accountant', password='x', branch=self.branch)
+        self.customer = Customer.objects.create(company=self.company, name='Customer', phone='1')
+        unit = Unit.objects.create(company=self.company, name='Piece', name_ar='قطعة', code='PC-GL')
+        self.product = Product.objects.create(
+            company=self.company, name='P', name_ar='منتج', code='GL-P', barcode='GL-B', unit=unit,
+            selling_price=Decimal('10'), cost_price=Decimal('6'),
+        )
+        increase_stock(self.branch, {self.product.pk: Decimal('10')})
+        self.session = POSSession.objects.create(branch=self.branch, cashier=self.user)
+
+    def sell(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice, _ = checkout(
+                session=self.session, customer=self.customer,
+                items=[{'product': self.product, 'quantity': Decimal('3')}], **kwargs
+            )
+        return invoice
+
+    def balances(self):
+        return {row['code']: row['balance'] for row in trial_balance(self.company)}
+
+    def test_credit_sale_is_posted_and_reversed_on_cancel(self):
+        invoice = self.sell(payment_method='credit', tax_amount=Decimal('4.5'))
+        self.assertEqual(self.balances(), {
+            '1200': Decimal('34.5'), '1300': Decimal('-18'), '2200': Decimal('4.5'),
+            '4100': Decimal('30'), '5100': Decimal('18'),
+        })
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.balance, Decimal('34.5'))
+        self.assertEqual(balance_sheet(self.company)['net_income'], Decimal('12'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice.status = 'cancelled'
+            invoice.save()
+        self.assertEqual(set(self.balances().values()), {Decimal('0')})
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.balance, Decimal('0'))
+        self.assertEqual(JournalEntry.objects.filter(source_id=invoice.pk).count(), 2)
+
+    def test_failed_posting_does_not_break_the_request(self):
+        self.client.force_login(self.user)
+        with mock.patch('accounting.ledger.post_documents', side_effect=DatabaseError('locked')), \
+                self.assertLogs('accounting.ledger', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/pos-transactions/checkout/', {
+                'session_id': str(self.session.pk), 'customer_id': str(self.customer.pk),
+                'items': [{'product_id': str(self.product.pk), 'quantity': '3'}],
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertFalse(JournalEntry.objects.exists())
+
+        # الترحيل التالي يلتقط المستند
+        post_documents([('sales_invoice', SalesInvoice.objects.get(branch=self.branch).pk)])
+        self.assertEqual(self.balances()['4100'], Decimal('30'))
+
+    def test_reposting_is_idempotent(self):
+        invoice = self.sell()
+        lines = JournalLine.objects.count()
+        self.assertEqual(post_documents([('sales_invoice', invoice.pk)]), 0)
+        self.assertEqual(JournalLine.objects.count(), lines)
+        # صف قفل واحد للمستند يُعاد استخدامه في كل ترحيل
+        self.assertEqual(PostingLock.objects.filter(source_type='sales_invoice', source_id=invoice.pk).count(), 1)
+        rows = trial_balance(self.company)
+        self.assertEqual(sum(r['debit'] for r in rows), sum(r['credit'] for r in rows))
+
+    def test_manual_entry_must_balance(self):
+        accounts = ensure_accounts({self.company.pk})
+        cash, equity = accounts[(self.company.pk, 'cash')], accounts[(self.company.pk, 'equity')]
+        with self.assertRaises(LedgerError):
+            post_entry(self.company, timezone.localdate(), [{'account': cash, 'debit': Decimal('5')}])
+        post_entry(self.company, timezone.localdate(), [
+            {'account': cash, 'debit': Decimal('100')},
+            {'account': equity, 'credit': Decimal('100')},
+        ])
+        self.assertEqual(self.balances(), {'1100': Decimal('100'), '3100': Decimal('100')})
+
+
+class GoodsReceiptApprovalTests(TestCase):
+    """اعتماد إيصال الاستقبال: المخزون وحركات الشراء وأمر الشراء في معاملة واحدة"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='GR Co', name_ar='شركة', tax_id='GR-1', commercial_register='GR-1')
+        self.branch = Branch.objects.create(company=self.company, name='Main', name_ar='الرئيسي', code='GR')
+        self.user = CustomUser.objects.create_user(username='storekeeper', password='x', branch=self.branch)
+        supplier = Supplier.objects.create(company=self.company, name='Supplier', name_ar='مورد', code='SUP-GR', phone='1')
+        unit = Unit.objects.create(company=self.company, name='Piece', name_ar='قطعة', code='PC-GR')
+        self.order = PurchaseOrder.objects.create(
+            company=self.company, branch=self.branch, order_number='PO-GR-1', supplier=supplier,
+            order_date=timezone.localdate(), expected_delivery_date=timezone.localdate(), status='confirmed',
+        )
+        self.order_lines = []
+        for index in range(3):
+            product = Product.objects.create(
+                company=self.company, name=f'P{index}', name_ar='منتج', code=f'GR-P{index}', barcode=f'GR-B{index}',
+                unit=unit,
+            )
+            self.order_lines.append(PurchaseOrderLine.objects.create(
+                purchase_order=self.order, product=product, quantity=Decimal('10'), unit_price=Decimal(index + 1),
+            ))
+
+    def receipt(self, number, accepted):
+        receipt = GoodsReceipt.objects.create(
+            company=self.company, branch=self.branch, receipt_number=number, purchase_order=self.order,
+            receipt_date=timezone.localdate(),
+        )
+        GoodsReceiptLine.objects.bulk_create([
+            GoodsReceiptLine(
+                goods_receipt=receipt, purchase_order_line=line,
+                quantity_received=quantity, quantity_accepted=quantity,
+            )
+            for line, quantity in zip(self.order_lines, accepted)
+        ])
+        return receipt
+
+    def test_partial_then_complete_receipt(self):
+        first = self.receipt('GR-1', [Decimal('10'), Decimal('4'), Decimal('0')])
+        with self.captureOnCommitCallbacks(execute=True):
+            approve_goods_receipt(first, approved_by=self.user)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'partial')
+        self.assertEqual(
+            dict(StockLevel.objects.filter(branch=self.branch).values_list('product__code', 'quantity')),
+            {'GR-P0': Decimal('10'), 'GR-P1': Decimal('4')},
+        )
+        self.assertEqual(
+            InventoryMovement.objects.filter(reference_type='goods_receipt', reference_id=str(first.pk)).count(), 2
+        )
+        self.assertEqual(JournalEntry.objects.filter(source_id=first.pk).count(), 1)
+
+        second = self.receipt('GR-2', [Decimal('0'), Decimal('6'), Decimal('10')])
+        approve_goods_receipt(second)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'received')
+        self.assertEqual(
+            [line.received_quantity for line in PurchaseOrderLine.objects.filter(purchase_order=self.order).order_by('unit_price')],
+            [Decimal('10')] * 3,
+        )
+
+        with self.assertRaises(GoodsReceiptError):
+            approve_goods_receipt(second)
+
+    def test_over_receipt_is_rejected_without_changes(self):
+        receipt = self.receipt('GR-3', [Decimal('5'), Decimal('11'), Decimal('1')])
+        with self.assertRaises(GoodsReceiptError):
+            approve_goods_receipt(receipt)
+        receipt.refresh_from_db()
+        self.assertFalse(receipt.is_approved)
+        self.assertFalse(StockLevel.objects.filter(branch=self.branch).exists())
+
+
+class ReorderTests(TestCase):
+    """أوامر الشراء المقترحة للمنتجات التي نزلت عن حد إعادة الطلب"""
+
+    def setUp(self):
+        company = Company.objects.create(name='RO Co', name_ar='شركة', tax_id='RO-1', commercial_register='RO-1')
+        self.branch = Branch.objects.create(company=company, name='Main', name_ar='الرئيسي', code='RO')
+        self.supplier = Supplier.objects.create(company=company, name='Supplier', name_ar='مورد', code='SUP-RO', phone='1')
+        unit = Unit.objects.create(company=company, name='Piece', name_ar='قطعة', code='PC-RO')
+        self.products = {
+            code: Product.objects.create(
+                company=company, name=code, name_ar='منتج', code=f'RO-{code}', barcode=f'RO-{code}', unit=unit,
+                cost_price=Decimal('3'), reorder_level=Decimal('10'), reorder_quantity=Decimal('25'),
+            )
+            for code in ('low', 'orphan', 'ordered', 'healthy')
+        }
+        increase_stock(self.branch, {
+            self.products['low'].pk: Decimal('2'),
+            self.products['orphan'].pk: Decimal('2'),
+            self.products['ordered'].pk: Decimal('2'),
+            self.products['healthy'].pk: Decimal('50'),
+        })
+        today = timezone.localdate()
+        for number, status, code in (('PO-RO-1', 'received', 'low'), ('PO-RO-2', 'draft', 'ordered')):
+            order = PurchaseOrder.objects.create(
+                company=company, branch=self.branch, order_number=number, supplier=self.supplier,
+                order_date=today, expected_delivery_date=today, status=status,
+            )
+            PurchaseOrderLine.objects.create(
+                purchase_order=order, product=self.products[code], quantity=Decimal('5'), unit_price=Decimal('4'),
+            )
+
+    def test_below_reorder_levels(self):
+        self.assertEqual(
+            set(below_reorder_levels(self.branch).values_list('product__code', flat=True)),
+            {'RO-low', 'RO-orphan', 'RO-ordered'},
+        )
+
+    def test_creates_one_draft_order_per_supplier(self):
+        orders, without_supplier = create_reorder_purchase_orders(self.branch)
+        self.assertEqual(without_supplier, [self.products['orphan'].pk])
+        self.assertEqual(len(orders), 1)
+        order = PurchaseOrder.objects.get(pk=orders[0].pk)
+        self.assertEqual((order.status, order.supplier_id, order.total_amount), ('draft', self.supplier.pk, Decimal('100')))
+        self.assertEqual(
+            list(order.lines.values_list('product__code', 'quantity', 'unit_price')),
+            [('RO-low', Decimal('25'), Decimal('4'))],
+        )
+
+        # المنتج صار في أمر مفتوح، فلا يُطلب مرة ثانية
+        orders, _ = create_reorder_purchase_orders(self.branch)
+        self.assertEqual(orders, [])
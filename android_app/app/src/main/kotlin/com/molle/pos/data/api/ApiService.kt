@@ -35,6 +35,25 @@ interface ApiService {
     // POS Transactions
     @POST("pos-transactions/")
     suspend fun createTransaction(@Body transaction: TransactionRequest): Response<TransactionResponse>
+    
+    @POST("pos-transactions/checkout/")
+    suspend fun checkout(@Body request: CheckoutRequest): Response<CheckoutResponse>
+    
+    // Offline sync
+    // cursor فارغ في أول مزامنة؛ يُحفظ cursor المستلم ويُعاد الطلب فوراً ما دام has_more = true
+    @GET("sync/pull/")
+    suspend fun syncPull(
+        @Query("cursor") cursor: String? = null,
+        @Query("limit") limit: Int? = null
+    ): Response<SyncPullResponse>
+    
+    // إعادة رفع نفس الفاتورة (نفس id) آمنة: تعود بحالة duplicate
+    @POST("sync/push/")
+    suspend fun syncPush(@Body request: SyncPushRequest): Response<SyncPushResponse>
+    
+    // حجز أرقام فواتير تُستخدم دون اتصال
+    @POST("branches/reserve-numbers/")
+    suspend fun reserveNumbers(@Body request: ReserveNumbersRequest): Response<ReserveNumbersResponse>
 }
 
 // Response Models
@@ -42,7 +61,7 @@ data class ProductResponse(
     val id: String,
     val code: String,
     val name_ar: String,
-    val name_en: String,
+    val name: String,
     val barcode: String,
     val cost_price: Double,
     val selling_price: Double,
@@ -118,3 +137,155 @@ data class TransactionResponse(
     val payment_method: String,
     val created_at: String
 )
+
+data class CheckoutRequest(
+    val session_id: String,
+    val customer_id: String,
+    val invoice_number: String? = null,
+    val items: List<CheckoutItemRequest>,
+    val payment_method: String = "cash",
+    val tax_amount: Double = 0.0,
+    val discount_amount: Double = 0.0,
+    val notes: String = ""
+)
+
+data class CheckoutItemRequest(
+    val product_id: String,
+    val quantity: Double,
+    val unit_price: Double? = null
+)
+
+data class CheckoutResponse(
+    val id: String,
+    val invoice_number: String,
+    val customer: CustomerResponse,
+    val invoice_date: String,
+    val status: String,
+    val total_amount: Double,
+    val transactions: List<CheckoutTransactionResponse>
+)
+
+data class CheckoutTransactionResponse(
+    val id: String,
+    val product: String,
+    val quantity: Double,
+    val unit_price: Double,
+    val total_amount: Double
+)
+
+// Sync Models
+data class SyncPullResponse(
+    val changes: SyncChanges,
+    val deleted: SyncDeleted,
+    val cursor: String,
+    val has_more: Boolean
+)
+
+data class SyncChanges(
+    val categories: List<SyncCategory>,
+    val units: List<SyncUnit>,
+    val products: List<SyncProduct>,
+    val customers: List<SyncCustomer>,
+    val stock: List<SyncStockLevel>
+)
+
+data class SyncDeleted(
+    val categories: List<String>,
+    val units: List<String>,
+    val products: List<String>,
+    val customers: List<String>
+)
+
+data class SyncCategory(
+    val id: String,
+    val name_ar: String,
+    val name: String,
+    val code: String,
+    val description: String,
+    val is_active: Boolean,
+    val updated_at: String
+)
+
+data class SyncUnit(
+    val id: String,
+    val name_ar: String,
+    val name: String,
+    val code: String,
+    val is_active: Boolean,
+    val updated_at: String
+)
+
+data class SyncProduct(
+    val id: String,
+    val code: String,
+    val name_ar: String,
+    val name: String,
+    val barcode: String,
+    val category: String?,
+    val unit: String,
+    val cost_price: Double,
+    val selling_price: Double,
+    val is_active: Boolean,
+    val updated_at: String
+)
+
+data class SyncCustomer(
+    val id: String,
+    val name: String,
+    val email: String,
+    val phone: String,
+    val address: String,
+    val balance: Double,
+    val is_active: Boolean,
+    val updated_at: String
+)
+
+data class SyncStockLevel(
+    val product: String,
+    val quantity: Double,
+    val updated_at: String
+)
+
+data class SyncPushRequest(
+    val invoices: List<OfflineInvoiceRequest>
+)
+
+data class OfflineInvoiceRequest(
+    val id: String,                      // UUID يُنشأ على الجهاز عند البيع
+    val session_id: String,
+    val customer_id: String,
+    val invoice_number: String? = null,  // من الأرقام المحجوزة، أو يُصرف على الخادم
+    val invoice_date: String,
+    val items: List<CheckoutItemRequest>,
+    val payment_method: String = "cash",
+    val tax_amount: Double = 0.0,
+    val discount_amount: Double = 0.0,
+    val notes: String = ""
+)
+
+data class SyncPushResponse(
+    val results: List<SyncPushResult>
+)
+
+data class SyncPushResult(
+    val id: String?,
+    val status: String,                  // created, duplicate, conflict, not_found, invalid
+    val invoice_number: String? = null,
+    val reason: String? = null,
+    val error: String? = null
+)
+
+data class ReserveNumbersRequest(
+    val document_type: String = "sales_invoice",
+    val size: Int? = null
+)
+
+data class ReserveNumbersResponse(
+    val document_type: String,
+    val prefix: String,
+    val padding: Int,
+    val start: Long,
+    val end: Long,
+    val first_number: String,
+    val last_number: String
+)
@@ -0,0 +1,272 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from core.models import Company
+from inventory.models import Product
+from .serializers import ProductSerializer, eager_loading_plan
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'api:barcode_index:version:{company_id}'
+# سجل تعديلات المنتجات: عداد لكل شركة، وقائمة معرفات المنتجات لكل رقم تعديل
+CHANGES_KEY = 'api:barcode_index:changes:{company_id}'
+CHANGE_KEY = 'api:barcode_index:change:{company_id}:{number}'
+# العملية التي تأخرت عن السجل أكثر من ذلك (أو انتهت مدة بعض مدخلاته) تعيد التحميل كاملاً
+CHANGE_LOG_TIMEOUT = 24 * 3600
+MAX_PENDING_CHANGES = 100
+
+
+def _current_version(company_id):
+    """(رقم إصدار فهرس الشركة، رقم آخر تعديل منتج) المشتركان بين العمليات عند استخدام cache مشترك"""
+    keys = VERSION_KEY.format(company_id=company_id), CHANGES_KEY.format(company_id=company_id)
+    values = cache.get_many(keys)
+    return values.get(keys[0], 0), values.get(keys[1], 0)
+
+
+def _incr(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def bump_version(company_id):
+    """زيادة رقم الإصدار لإبطال فهرس الشركة في جميع العمليات"""
+    _incr(VERSION_KEY.format(company_id=company_id))
+
+
+def record_change(company_id, product_ids):
+    """تسجيل منتجات تغيرت لتُحدَّث مدخلاتها وحدها في فهارس جميع العمليات"""
+    number = _incr(CHANGES_KEY.format(company_id=company_id))
+    cache.set(
+        CHANGE_KEY.format(company_id=company_id, number=number),
+        sorted(str(pk) for pk in product_ids),
+        timeout=CHANGE_LOG_TIMEOUT,
+    )
+    return number
+
+
+class _CompanyIndex:
+    """فهرس باركود شركة واحدة"""
+
+    def __init__(self, version, change=0):
+        self.version = version
+        self.change = change  # آخر تعديل منتج مطبق على الفهرس
+        self.loaded_at = time.monotonic()
+        self.complete = False
+        self.entries = OrderedDict()
+        self.barcodes = {}  # معرف المنتج -> الباركود، لحذف المدخل القديم عند تغير الباركود
+
+
+class BarcodeIndex:
+    """
+    فهرس الباركود في ذاكرة العملية
+
+    يحتفظ لكل شركة ببيانات المنتجات المحوّلة مسبقاً (barcode -> بيانات ProductSerializer)
+    ضمن حد أقصى للعناصر بنظام LRU. يُحمّل الفهرس كاملاً عند بدء التشغيل. حفظ منتج أو حذفه
+    يُسجل معرفه في سجل التعديلات، فتُعيد كل عملية قراءة هذه المنتجات وحدها عند البحث التالي.
+    تغيير فئة أو وحدة (يمس بيانات منتجات كثيرة) يزيد رقم الإصدار، وعندها أو بعد انتهاء
+    BARCODE_INDEX_TTL يُعاد التحميل كاملاً (في خيط خلفي مع BARCODE_INDEX_BACKGROUND_REBUILD)،
+    وحتى يكتمل يُجاب ما لم يُحمّل بعد من قاعدة البيانات. قد تتأخر الكمية المتاحة في النتيجة
+    حتى مدة TTL. رقم الإصدار والسجل في الـ cache، فلا يصلان إلى العمليات الأخرى إلا مع cache
+    مشترك (CACHE_BACKEND).
+    """
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries or settings.BARCODE_INDEX_MAX_ENTRIES
+        self.ttl = settings.BARCODE_INDEX_TTL if ttl is None else ttl
+        self._companies = {}
+        self._size = 0
+        self._lru = OrderedDict()  # (company_id, barcode) بترتيب آخر استخدام
+        self._lock = threading.RLock()
+
+    def lookup(self, company_id, barcode):
+        """إرجاع بيانات المنتج المحوّلة أو None إذا لم يوجد"""
+        index = self._get_index(company_id)
+        with self._lock:
+            data = index.entries.get(barcode)
+            if data is not None:
+                self._lru.move_to_end((company_id, barcode))
+                return data
+            if index.complete:
+                return None
+
+        # الفهرس غير مكتمل (لم يُحمّل بعد أو تجاوز الحد الأقصى)، نرجع لقاعدة البيانات
+        product = (
+            Product.objects.select_related(*eager_loading_plan(ProductSerializer)[0])
+            .filter(company_id=company_id, barcode=barcode)
+            .first()
+        )
+        if product is None:
+            return None
+        data = dict(ProductSerializer(product).data)
+        with self._lock:
+            if self._companies.get(company_id) is index:
+                self._put(company_id, index, barcode, data)
+        return data
+
+    def warm(self, company_id):
+        """تحميل باركود جميع منتجات الشركة في الفهرس"""
+        index = _CompanyIndex(*_current_version(company_id))
+        products = (
+            Product.objects.select_related(*eager_loading_plan(ProductSerializer)[0])
+            .filter(company_id=company_id)
+            .exclude(barcode='')
+            .order_by()
+        )
+        loaded = 0
+        with self._lock:
+            self._drop(company_id)
+            self._companies[company_id] = index
+        for product in products.iterator(chunk_size=2000):
+            data = dict(ProductSerializer(product).data)
+            with self._lock:
+                if self._companies.get(company_id) is not index:
+                    return index
+                self._put(company_id, index, product.barcode, data)
+            loaded += 1
+        with self._lock:
+            index.complete = len(index.entries) == loaded
+        return index
+
+    def warm_all(self):
+        """تحميل فهارس جميع الشركات النشطة عند بدء التشغيل"""
+        for company_id in Company.objects.filter(is_active=True).values_list('id', flat=True):
+            self.warm(company_id)
+
+    def invalidate(self, company_id):
+        """إبطال فهرس الشركة في هذه العملية والعمليات الأخرى"""
+        bump_version(company_id)
+        with self._lock:
+            self._drop(company_id)
+
+    def refresh_products(self, company_id, product_ids):
+        """تحديث مدخلات منتجات تغيرت في هذه العملية والعمليات الأخرى دون إعادة تحميل الشركة"""
+        record_change(company_id, product_ids)
+        with self._lock:
+            loaded = company_id in self._companies
+        if loaded:
+            self._get_index(company_id)
+
+    def clear(self):
+        with self._lock:
+            self._companies.clear()
+            self._lru.clear()
+            self._size = 0
+
+    def _get_index(self, company_id):
+        version, change = _current_version(company_id)
+        with self._lock:
+            index = self._companies.get(company_id)
+            if (
+                index is not None
+                and index.version == version
+                and not (self.ttl and time.monotonic() - index.loaded_at > self.ttl)
+            ):
+                if index.change >= change:
+                    return index
+                start = index.change
+            else:
+                start = None
+        if start is not None and self._apply_changes(company_id, index, start, change):
+            return index
+        with self._lock:
+            # فهرس فارغ بالإصدار الحالي يخدم حتى يكتمل التحميل، فلا يبدأ مسح آخر تحميلاً ثانياً
+            self._drop(company_id)
+            index = self._companies[company_id] = _CompanyIndex(version, change)
+        if not settings.BARCODE_INDEX_BACKGROUND_REBUILD:
+            return self.warm(company_id)
+        threading.Thread(target=self._warm_in_background, args=(company_id,), daemon=True).start()
+        return index
+
+    def _apply_changes(self, company_id, index, start, end):
+        """
+        إعادة قراءة المنتجات المسجلة في التعديلات start+1..end وحدها
+
+        يعيد False إذا تأخر الفهرس كثيراً أو انتهت مدة بعض التعديلات، فيُعاد تحميله كاملاً.
+        """
+        if end - start > MAX_PENDING_CHANGES:
+            return False
+        keys = [CHANGE_KEY.format(company_id=company_id, number=number) for number in range(start + 1, end + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return False
+        product_ids = {pk for ids in changes.values() for pk in ids}
+        products = (
+            Product.objects.select_related(*eager_loading_plan(ProductSerializer)[0])
+            .filter(company_id=company_id, pk__in=product_ids)
+            .exclude(barcode='')
+        )
+        fresh = [(product.barcode, dict(ProductSerializer(product).data)) for product in products]
+        with self._lock:
+            if self._companies.get(company_id) is not index:
+                return True
+            for pk in product_ids:
+                self._remove(company_id, index, index.barcodes.get(pk))
+            for barcode, data in fresh:
+                # باركود انتقل من منتج لم يتغير؟ نحذف المدخل القديم قبل الإضافة
+                self._remove(company_id, index, barcode)
+                self._put(company_id, index, barcode, data)
+            index.change = max(index.change, end)
+        return True
+
+    def _warm_in_background(self, company_id):
+        try:
+            self.warm(company_id)
+        except DatabaseError:
+            logger.warning("تعذر إعادة تحميل فهرس الباركود للشركة %s", company_id, exc_info=True)
+        finally:
+            # اتصالات قاعدة البيانات خاصة بالخيط
+            connections.close_all()
+
+    def _put(self, company_id, index, barcode, data):
+        if barcode not in index.entries:
+            self._size += 1
+        index.entries[barcode] = data
+        index.barcodes[str(data['id'])] = barcode
+        self._lru[(company_id, barcode)] = None
+        self._lru.move_to_end((company_id, barcode))
+        while self._size > self.max_entries:
+            (evicted_company, evicted_barcode), _ = self._lru.popitem(last=False)
+            evicted_index = self._companies.get(evicted_company)
+            if evicted_index is not None:
+                evicted = evicted_index.entries.pop(evicted_barcode, None)
+                if evicted is not None:
+                    evicted_index.barcodes.pop(str(evicted['id']), None)
+                    evicted_index.complete = False
+                    self._size -= 1
+
+    def _remove(self, company_id, index, barcode):
+        data = index.entries.pop(barcode, None) if barcode is not None else None
+        if data is None:
+            return
+        index.barcodes.pop(str(data['id']), None)
+        self._lru.pop((company_id, barcode), None)
+        self._size -= 1
+
+    def _drop(self, company_id):
+        index = self._companies.pop(company_id, None)
+        if index is None:
+            return
+        for barcode in index.entries:
+            self._lru.pop((company_id, barcode), None)
+        self._size -= len(index.entries)
+
+
+barcode_index = BarcodeIndex()
+
+
+def warm_on_startup():
+    """تحميل الفهرس مسبقاً عند بدء تشغيل الخادم"""
+    if not settings.BARCODE_INDEX_WARM_ON_STARTUP:
+        return
+    try:
+        barcode_index.warm_all()
+    except DatabaseError:
+        logger.warning("تعذر تحميل فهرس الباركود عند بدء التشغيل", exc_info=True)
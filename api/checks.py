@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """فهرس الباركود ومنع تكرار الـ webhooks يعتمدان على cache مشترك بين عمليات الخادم"""
+    if settings.CACHES['default']['BACKEND'] not in LOCAL_CACHES:
+        return []
+    return [Warning(
+        "الـ cache الافتراضي خاص بكل عملية",
+        hint="اضبط CACHE_BACKEND و CACHE_LOCATION على cache مشترك (Redis أو قاعدة البيانات) عند تشغيل أكثر من "
+             "عملية، وإلا لا يصل إبطال فهرس الباركود إلى العمليات الأخرى وقد تُعالج أحداث الـ webhooks المكررة مرتين.",
+        id='api.W001',
+    )]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:26
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('company_id', models.UUIDField()),
+                ('entity', models.CharField(max_length=30)),
+                ('object_id', models.UUIDField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'سجل حذف للمزامنة',
+                'verbose_name_plural': 'سجلات الحذف للمزامنة',
+                'indexes': [models.Index(fields=['company_id', 'deleted_at', 'id'], name='api_synctom_company_56192a_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,28 @@
 from django.db import models
+from django.utils.translation import gettext_lazy as _
+from uuid import uuid4
 
-# Create your models here.
+
+class SyncTombstone(models.Model):
+    """
+    سجل حذف لمزامنة تطبيق نقطة البيع
+
+    يُنشأ عند حذف سجل من البيانات المتزامنة (api/signals.py) ليعرف التطبيق ما يحذفه
+    من نسخته المحلية في السحب التالي (api/sync.py).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    # بدون مفتاح خارجي: قد يُنشأ أثناء حذف الشركة نفسها بالتتابع
+    company_id = models.UUIDField()
+    entity = models.CharField(max_length=30)
+    object_id = models.UUIDField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('سجل حذف للمزامنة')
+        verbose_name_plural = _('سجلات الحذف للمزامنة')
+        indexes = [
+            models.Index(fields=['company_id', 'deleted_at', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.entity} {self.object_id}"
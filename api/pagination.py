@@ -0,0 +1,99 @@
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    ترقيم صفحات بالمؤشر على المفتاح المركب (الحقل الزمني، id)
+
+    الصفحة التالية تُقرأ بشرط (field, id) < آخر صف بدل OFFSET، فيبقى زمن الصفحة
+    ثابتاً مهما تعمقت، ويحتاج فهرساً على نفس المفتاح. لا يُحسب العدد الكلي إلا إذا
+    طلبه العميل بـ ?count=true. الحقل يُحدد بـ keyset_ordering في الـ view.
+    """
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 500
+    ordering = '-created_at'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = getattr(view, 'keyset_ordering', self.ordering)
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count = queryset.count()
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            lookup = 'lt' if self.descending else 'gt'
+            try:
+                queryset = queryset.filter(
+                    Q(**{f'{self.field}__{lookup}': value}) | Q(**{self.field: value, f'pk__{lookup}': pk})
+                )
+            except ValidationError:
+                raise NotFound('Invalid cursor')
+        direction = '-' if self.descending else ''
+        queryset = queryset.order_by(f'{direction}{self.field}', f'{direction}pk')
+
+        page_size = self.get_page_size(request)
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, row):
+        value = getattr(row, self.field)
+        value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        return base64.urlsafe_b64encode(json.dumps([value, str(row.pk)]).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, UnicodeError, ValueError, TypeError):
+            raise NotFound('Invalid cursor')
+        return value, pk
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link()}
+        if self.count is not None:
+            body['count'] = self.count
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
@@ -1,42 +1,73 @@
+from decimal import Decimal
 from rest_framework import serializers
 from core.models import Company, Branch, Customer, Supplier, Category, Unit
-from inventory.models import Product, InventoryMovement
-from accounting.models import PurchaseOrder, PurchaseInvoice, PurchaseOrderLine
+from inventory.models import Product, InventoryMovement, InventoryAdjustment
+from accounting.models import GoodsReceipt, PurchaseOrder, PurchaseInvoice, PurchaseOrderLine
 from pos.models import SalesOrder, SalesInvoice, POSTransaction
 from manufacturing.models import Recipe, ProductionOrder
 
+_eager_loading_plans = {}
+
+def eager_loading_plan(serializer_class):
+    """
+    استنتاج مسارات select_related/prefetch_related من الحقول المتداخلة في الـ serializer
+
+    الحقول المتداخلة المفردة (ForeignKey) تصبح select_related، والقوائم (many=True) تصبح
+    prefetch_related مع كل ما يتداخل تحتها.
+    """
+    if serializer_class in _eager_loading_plans:
+        return _eager_loading_plans[serializer_class]
+    
+    select_related, prefetch_related = [], []
+    
+    def walk(serializer, prefix, prefetched):
+        for field in serializer.fields.values():
+            if field.source == '*' or field.write_only:
+                continue
+            path = prefix + field.source.replace('.', '__')
+            if isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.ModelSerializer):
+                prefetch_related.append(path)
+                walk(field.child, path + '__', True)
+            elif isinstance(field, serializers.ModelSerializer):
+                (prefetch_related if prefetched else select_related).append(path)
+                walk(field, path + '__', prefetched)
+    
+    walk(serializer_class(), '', False)
+    plan = _eager_loading_plans[serializer_class] = (tuple(select_related), tuple(prefetch_related))
+    return plan
+
 # Core Serializers
 class CompanySerializer(serializers.ModelSerializer):
     class Meta:
         model = Company
-        fields = ['id', 'name_ar', 'name_en', 'tax_id', 'phone', 'email']
+        fields = ['id', 'name_ar', 'name', 'tax_id', 'phone', 'email']
 
 class BranchSerializer(serializers.ModelSerializer):
     company = CompanySerializer(read_only=True)
     
     class Meta:
         model = Branch
-        fields = ['id', 'company', 'name_ar', 'name_en', 'address', 'phone', 'email']
+        fields = ['id', 'company', 'name_ar', 'name', 'code', 'address', 'phone']
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name_ar', 'name_en', 'code', 'description']
+        fields = ['id', 'name_ar', 'name', 'code', 'description']
 
 class UnitSerializer(serializers.ModelSerializer):
     class Meta:
         model = Unit
-        fields = ['id', 'name_ar', 'name_en', 'code']
+        fields = ['id', 'name_ar', 'name', 'code']
 
 class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
-        fields = ['id', 'name', 'email', 'phone', 'address', 'city', 'balance']
+        fields = ['id', 'name', 'email', 'phone', 'address', 'balance']
 
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
         model = Supplier
-        fields = ['id', 'name_ar', 'name_en', 'email', 'phone', 'address', 'city', 'balance']
+        fields = ['id', 'name_ar', 'name', 'code', 'email', 'phone', 'address', 'balance']
 
 # Inventory Serializers
 class ProductSerializer(serializers.ModelSerializer):
@@ -45,7 +76,7 @@ class ProductSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Product
-        fields = ['id', 'code', 'name_ar', 'name_en', 'barcode', 'category', 'unit', 
+        fields = ['id', 'code', 'name_ar', 'name', 'barcode', 'category', 'unit', 
                   'cost_price', 'selling_price', 'quantity_on_hand', 'is_active']
 
 class InventoryMovementSerializer(serializers.ModelSerializer):
@@ -53,7 +84,34 @@ class InventoryMovementSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = InventoryMovement
-        fields = ['id', 'product', 'movement_type', 'quantity', 'reference_number', 'notes', 'created_at']
+        fields = ['id', 'product', 'branch', 'movement_type', 'direction', 'quantity', 'unit_price',
+                  'reference_type', 'reference_id', 'notes', 'created_at']
+
+class StockCountSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = InventoryAdjustment
+        fields = ['id', 'branch', 'adjustment_date', 'is_approved', 'approved_at', 'notes', 'created_at']
+
+class StockCountStartSerializer(serializers.Serializer):
+    # بدون product_ids: جرد كامل لكل منتجات الفرع
+    product_ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+class CountScanSerializer(serializers.Serializer):
+    product = serializers.UUIDField(required=False)
+    barcode = serializers.CharField(max_length=100, required=False)
+    quantity = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0.01'), default=Decimal('1'))
+    
+    def validate(self, data):
+        if not data.get('product') and not data.get('barcode'):
+            raise serializers.ValidationError('product or barcode is required')
+        return data
+
+class CountBatchSerializer(serializers.Serializer):
+    """دفعة قراءات من جهاز الجرد؛ batch_id من الجهاز يجعل إعادة الإرسال آمنة"""
+    batch_id = serializers.UUIDField()
+    device = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    scans = CountScanSerializer(many=True, allow_empty=False)
 
 # Accounting Serializers
 class PurchaseOrderLineSerializer(serializers.ModelSerializer):
@@ -71,6 +129,11 @@ class PurchaseInvoiceSerializer(serializers.ModelSerializer):
         fields = ['id', 'invoice_number', 'supplier', 'invoice_date', 'due_date', 
                   'status', 'total_amount', 'notes']
 
+class GoodsReceiptSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GoodsReceipt
+        fields = ['id', 'receipt_number', 'purchase_order', 'receipt_date', 'is_approved', 'approved_at', 'notes']
+
 # POS Serializers
 class SalesInvoiceSerializer(serializers.ModelSerializer):
     customer = CustomerSerializer(read_only=True)
@@ -83,7 +146,62 @@ class SalesInvoiceSerializer(serializers.ModelSerializer):
 class POSTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = POSTransaction
-        fields = ['id', 'transaction_type', 'amount', 'payment_method', 'reference_number', 'created_at']
+        fields = ['id', 'session', 'invoice', 'product', 'quantity', 'unit_price', 'total_amount', 'transaction_date']
+
+class CheckoutItemSerializer(serializers.Serializer):
+    product_id = serializers.UUIDField()
+    quantity = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0.01'))
+    unit_price = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0'), required=False)
+
+class CheckoutSerializer(serializers.Serializer):
+    """سلة البيع الكاملة لعملية الدفع"""
+    session_id = serializers.UUIDField()
+    customer_id = serializers.UUIDField()
+    # اختياري: يُصرف من تسلسل الفرع إذا لم يُرسل
+    invoice_number = serializers.CharField(max_length=50, required=False, allow_blank=True, default='')
+    payment_method = serializers.ChoiceField(choices=SalesInvoice.PAYMENT_METHOD_CHOICES, default='cash')
+    tax_amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0'), default=Decimal('0'))
+    discount_amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0'), default=Decimal('0'))
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    items = CheckoutItemSerializer(many=True, allow_empty=False)
+    
+    def validate_invoice_number(self, value):
+        if value and SalesInvoice.objects.filter(invoice_number=value).exists():
+            raise serializers.ValidationError('Invoice number already exists')
+        return value
+
+# Sync Serializers
+class SyncCategorySerializer(CategorySerializer):
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + ['is_active', 'updated_at']
+
+class SyncUnitSerializer(UnitSerializer):
+    class Meta(UnitSerializer.Meta):
+        fields = UnitSerializer.Meta.fields + ['is_active', 'updated_at']
+
+class SyncProductSerializer(ProductSerializer):
+    # category و unit تصل في تياراتها الخاصة؛ هنا المعرفات فقط
+    category = serializers.PrimaryKeyRelatedField(read_only=True)
+    unit = serializers.PrimaryKeyRelatedField(read_only=True)
+    
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ['updated_at']
+
+class SyncCustomerSerializer(CustomerSerializer):
+    class Meta(CustomerSerializer.Meta):
+        fields = CustomerSerializer.Meta.fields + ['is_active', 'updated_at']
+
+class SyncInvoiceSerializer(CheckoutSerializer):
+    """فاتورة أُنشئت على التطبيق دون اتصال؛ id من التطبيق يجعل الرفع قابلاً للتكرار"""
+    id = serializers.UUIDField()
+    invoice_date = serializers.DateField(required=False)
+    
+    def validate_invoice_number(self, value):
+        # تعارض الرقم يُبلّغ لكل فاتورة على حدة في api/sync.py
+        return value
+
+class SyncPushSerializer(serializers.Serializer):
+    invoices = serializers.ListField(child=serializers.DictField(), allow_empty=False)
 
 # Manufacturing Serializers
 class RecipeSerializer(serializers.ModelSerializer):
@@ -91,11 +209,17 @@ class RecipeSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Recipe
-        fields = ['id', 'product', 'name_ar', 'name_en', 'description', 'yield_quantity']
+        fields = ['id', 'product', 'code', 'name_ar', 'name', 'description', 'output_quantity',
+                  'production_time_minutes', 'standard_cost', 'unit_cost']
 
 class ProductionOrderSerializer(serializers.ModelSerializer):
     recipe = RecipeSerializer(read_only=True)
     
     class Meta:
         model = ProductionOrder
-        fields = ['id', 'recipe', 'quantity', 'status', 'scheduled_date', 'completed_date']
+        fields = ['id', 'order_number', 'recipe', 'planned_quantity', 'produced_quantity', 'status',
+                  'planned_start_date', 'planned_end_date', 'due_date', 'actual_end_date']
+
+class ProductionCompleteSerializer(serializers.Serializer):
+    # أوامر الوردية المكتملة؛ الأمر الذي لا يكفيه المخزون يُرفض وحده
+    orders = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=1000)
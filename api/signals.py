@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.models import Category, Unit
+from inventory.models import Product
+from .barcode_index import barcode_index
+from .models import SyncTombstone
+from .sync import SYNC_ENTITIES
+
+
+@receiver([post_save, post_delete], sender=Product)
+def refresh_barcode_index(sender, instance, **kwargs):
+    """تحديث مدخل المنتج وحده في فهرس الباركود بعد تأكيد المعاملة"""
+    company_id, product_id = instance.company_id, instance.pk
+    transaction.on_commit(lambda: barcode_index.refresh_products(company_id, [product_id]))
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Unit)
+def invalidate_barcode_index(sender, instance, **kwargs):
+    """الفئة والوحدة تظهران في بيانات منتجات كثيرة، فيُبطل فهرس الشركة كاملاً"""
+    company_id = instance.company_id
+    transaction.on_commit(lambda: barcode_index.invalidate(company_id))
+
+
+SYNC_MODELS = {model: entity for entity, (model, _) in SYNC_ENTITIES.items()}
+
+
+def record_sync_tombstone(sender, instance, **kwargs):
+    """تسجيل حذف البيانات المتزامنة ليحذفها التطبيق في السحب التالي"""
+    SyncTombstone.objects.create(company_id=instance.company_id, entity=SYNC_MODELS[sender], object_id=instance.pk)
+
+
+# مربوطة بالنماذج المتزامنة فقط، لا بكل حذف في المشروع
+for model in SYNC_MODELS:
+    post_delete.connect(record_sync_tombstone, sender=model, dispatch_uid=f'record_sync_tombstone:{model._meta.label}')
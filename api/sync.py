@@ -0,0 +1,207 @@
+import base64
+import binascii
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core.models import Category, Customer, Unit
+from inventory.models import Product, StockLevel
+from inventory.services import InsufficientStockError
+from pos.models import POSSession, SalesInvoice
+from pos.services import CheckoutError, DuplicateInvoiceError, checkout, session_open_on
+from .models import SyncTombstone
+from .serializers import (
+    SyncCategorySerializer, SyncUnitSerializer, SyncProductSerializer, SyncCustomerSerializer,
+    SyncInvoiceSerializer, eager_loading_plan,
+)
+
+# ============================================
+# مزامنة تطبيق نقطة البيع (سحب التغييرات ورفع فواتير العمل دون اتصال)
+# ============================================
+
+# البيانات المتزامنة على مستوى الشركة: (النموذج، الـ serializer)
+SYNC_ENTITIES = {
+    'categories': (Category, SyncCategorySerializer),
+    'units': (Unit, SyncUnitSerializer),
+    'products': (Product, SyncProductSerializer),
+    'customers': (Customer, SyncCustomerSerializer),
+}
+
+
+class SyncError(Exception):
+    """طلب مزامنة غير صالح"""
+
+
+def encode_cursor(positions):
+    """{التيار: (الوقت، المعرف)} -> نص معتم"""
+    data = {stream: [moment.isoformat(), str(pk)] for stream, (moment, pk) in positions.items()}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return {}
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        positions = {stream: (parse_datetime(moment), pk) for stream, (moment, pk) in data.items()}
+    except (binascii.Error, UnicodeError, ValueError, TypeError, AttributeError):
+        raise SyncError("المؤشر غير صالح")
+    if any(moment is None for moment, _ in positions.values()):
+        raise SyncError("المؤشر غير صالح")
+    return positions
+
+
+def _page(queryset, time_field, position, limit):
+    """
+    الصفحة التالية من تيار مرتب بـ (time_field, id) بعد position
+
+    تُستبعد التعديلات الأحدث من SYNC_PULL_LAG ثانية حتى لا تُتجاوز تعديلات معاملات
+    لم تُحفظ بعد وقتها أقدم من آخر ما أُرسل.
+    """
+    queryset = queryset.filter(**{f'{time_field}__lt': timezone.now() - timedelta(seconds=settings.SYNC_PULL_LAG)})
+    if position is not None:
+        moment, pk = position
+        queryset = queryset.filter(Q(**{f'{time_field}__gt': moment}) | Q(**{time_field: moment, 'pk__gt': pk}))
+    rows = list(queryset.order_by(time_field, 'pk')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def pull_changes(branch, cursor=None, limit=None):
+    """
+    التغييرات منذ cursor: السجلات المعدلة لكل نوع، أرصدة مخزون الفرع، والمحذوفات
+
+    كل تيار يُقرأ باستعلام واحد على الفهرس (company, updated_at, id) بحد limit،
+    ويعيد مؤشراً جديداً؛ has_more يعني أن على التطبيق السحب مرة أخرى فوراً.
+    """
+    limit = min(limit or settings.SYNC_PULL_LIMIT, settings.SYNC_PULL_MAX_LIMIT)
+    positions = decode_cursor(cursor)
+    company = branch.company
+    changes, has_more = {}, False
+
+    for stream, (model, serializer_class) in SYNC_ENTITIES.items():
+        queryset = model.objects.filter(company=company)
+        select_related, _ = eager_loading_plan(serializer_class)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        rows, more = _page(queryset, 'updated_at', positions.get(stream), limit)
+        changes[stream] = serializer_class(rows, many=True).data
+        if rows:
+            positions[stream] = (rows[-1].updated_at, rows[-1].pk)
+        has_more = has_more or more
+
+    rows, more = _page(StockLevel.objects.filter(branch=branch), 'updated_at', positions.get('stock'), limit)
+    changes['stock'] = [
+        {'product': str(level.product_id), 'quantity': str(level.quantity), 'updated_at': level.updated_at.isoformat()}
+        for level in rows
+    ]
+    if rows:
+        positions['stock'] = (rows[-1].updated_at, rows[-1].pk)
+    has_more = has_more or more
+
+    rows, more = _page(SyncTombstone.objects.filter(company_id=company.pk), 'deleted_at', positions.get('deleted'), limit)
+    deleted = {stream: [] for stream in SYNC_ENTITIES}
+    for tombstone in rows:
+        deleted[tombstone.entity].append(str(tombstone.object_id))
+    if rows:
+        positions['deleted'] = (rows[-1].deleted_at, rows[-1].pk)
+    has_more = has_more or more
+
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'cursor': encode_cursor(positions),
+        'has_more': has_more,
+    }
+
+
+def push_invoices(branch, user, invoices):
+    """
+    رفع فواتير أُنشئت دون اتصال؛ نتيجة لكل فاتورة بنفس الترتيب
+
+    الحالة created أو duplicate (سبق رفعها بنفس id) أو conflict (مخزون غير كافٍ،
+    رقم مستخدم، جلسة أُغلقت قبل تاريخ الفاتورة) أو invalid أو not_found. الفاتورة
+    المرفوعة بعد إغلاق جلستها تُقبل إذا كان تاريخها ضمن فترة الجلسة. كل فاتورة في
+    معاملة مستقلة، فتعارض واحدة لا يمنع حفظ البقية.
+    """
+    if len(invoices) > settings.SYNC_PUSH_MAX_INVOICES:
+        raise SyncError(f"الحد الأقصى {settings.SYNC_PUSH_MAX_INVOICES} فاتورة في الطلب")
+
+    results = [None] * len(invoices)
+    valid = []
+    for index, data in enumerate(invoices):
+        serializer = SyncInvoiceSerializer(data=data)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {'id': data.get('id'), 'status': 'invalid', 'errors': serializer.errors}
+
+    # قراءة كل ما تحتاجه الدفعة مقدماً بدل استعلامات لكل فاتورة
+    company = branch.company
+    existing = dict(
+        SalesInvoice.objects.filter(pk__in=[data['id'] for _, data in valid]).values_list('pk', 'invoice_number')
+    )
+    sessions = POSSession.objects.select_related('branch__company').filter(branch=branch).in_bulk(
+        {data['session_id'] for _, data in valid}
+    )
+    customers = Customer.objects.filter(company=company).in_bulk({data['customer_id'] for _, data in valid})
+    products = Product.objects.filter(company=company).in_bulk(
+        {item['product_id'] for _, data in valid for item in data['items']}
+    )
+
+    for index, data in valid:
+        result = results[index] = {'id': str(data['id'])}
+        if data['id'] in existing:
+            result.update(status='duplicate', invoice_number=existing[data['id']])
+            continue
+        session = sessions.get(data['session_id'])
+        customer = customers.get(data['customer_id'])
+        missing = sorted(str(item['product_id']) for item in data['items'] if item['product_id'] not in products)
+        if session is None or customer is None or missing:
+            result.update(status='not_found', product_ids=missing,
+                          session=session is not None, customer=customer is not None)
+            continue
+        if not session_open_on(session, data.get('invoice_date')):
+            result.update(
+                status='conflict', reason='session_closed', session_id=str(session.pk),
+                closed_at=session.closed_at and session.closed_at.isoformat(),
+            )
+            continue
+        try:
+            invoice, _ = checkout(
+                session=session,
+                customer=customer,
+                items=[
+                    {'product': products[item['product_id']], 'quantity': item['quantity'],
+                     'unit_price': item.get('unit_price')}
+                    for item in data['items']
+                ],
+                created_by=user,
+                invoice_number=data['invoice_number'],
+                payment_method=data['payment_method'],
+                tax_amount=data['tax_amount'],
+                discount_amount=data['discount_amount'],
+                notes=data['notes'],
+                invoice_id=data['id'],
+                invoice_date=data.get('invoice_date'),
+            )
+        except InsufficientStockError as e:
+            result.update(status='conflict', reason='insufficient_stock', shortages=[
+                {'product_id': str(pid), 'requested': str(s['requested']), 'available': str(s['available'])}
+                for pid, s in e.shortages.items()
+            ])
+        except DuplicateInvoiceError:
+            # رفع متزامن لنفس الفاتورة، أو رقم فاتورة مستخدم
+            number = SalesInvoice.objects.filter(pk=data['id']).values_list('invoice_number', flat=True).first()
+            if number is not None:
+                result.update(status='duplicate', invoice_number=number)
+            else:
+                result.update(status='conflict', reason='invoice_number', invoice_number=data['invoice_number'])
+        except CheckoutError as e:
+            result.update(status='conflict', reason='checkout', error=str(e))
+        else:
+            existing[invoice.pk] = invoice.invoice_number
+            result.update(status='created', invoice_number=invoice.invoice_number)
+
+    return results
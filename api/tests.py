@@ -1,3 +1,420 @@
-from django.test import TestCase
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from core.models import Company, Branch, Customer, Supplier, Category, Unit, CustomUser
+from inventory.models import Product, InventoryMovement, StockLevel
+from inventory.services import increase_stock
+from pos.models import SalesInvoice, POSSession, POSTransaction
+from manufacturing.models import Recipe, ProductionOrder
+from .barcode_index import BarcodeIndex, bump_version
+from .models import SyncTombstone
+
+
+class ListQueryCountTests(APITestCase):
+    """عدد استعلامات قوائم الـ API يجب ألا يزيد مع عدد العناصر في الصفحة"""
+
+    def setUp(self):
+        self.company = Company.objects.create(
+            name='Test Co', name_ar='شركة', email='co@example.com', phone='1', address='-',
+            city='-', country='-', tax_id='T-1', commercial_register='CR-1'
+        )
+        self.branch = Branch.objects.create(
+            company=self.company, name='Main', name_ar='الرئيسي', code='BR-T', address='-', city='-', phone='1'
+        )
+        self.user = CustomUser.objects.create_user(username='tester', password='x', branch=self.branch)
+        self.category = Category.objects.create(company=self.company, name='Cat', name_ar='فئة', code='CAT-T')
+        self.unit = Unit.objects.create(company=self.company, name='Piece', name_ar='قطعة', code='PC-T')
+        self.session = POSSession.objects.create(branch=self.branch, cashier=self.user)
+        self.client.force_login(self.user)
+        self.counter = 0
+
+    def _next(self):
+        self.counter += 1
+        return self.counter
+
+    def make_product(self):
+        n = self._next()
+        return Product.objects.create(
+            company=self.company, name=f'P{n}', name_ar=f'منتج {n}', code=f'P-{n}', barcode=f'B-{n}',
+            category=self.category, unit=self.unit, selling_price=Decimal('10')
+        )
+
+    def make_branch(self):
+        n = self._next()
+        return Branch.objects.create(
+            company=self.company, name=f'B{n}', name_ar=f'فرع {n}', code=f'BR-{n}', address='-', city='-', phone='1'
+        )
+
+    def make_customer(self):
+        return Customer.objects.create(company=self.company, name=f'C{self._next()}', phone='1')
+
+    def make_supplier(self):
+        n = self._next()
+        return Supplier.objects.create(
+            company=self.company, name=f'S{n}', name_ar=f'مورد {n}', code=f'S-{n}', phone='1', address='-'
+        )
+
+    def make_sales_invoice(self):
+        today = timezone.localdate()
+        return SalesInvoice.objects.create(
+            company=self.company, branch=self.branch, invoice_number=f'INV-{self._next()}',
+            customer=self.make_customer(), invoice_date=today, due_date=today
+        )
+
+    def make_pos_transaction(self):
+        return POSTransaction.objects.create(
+            session=self.session, invoice=self.make_sales_invoice(), product=self.make_product(),
+            quantity=Decimal('1'), unit_price=Decimal('10'), total_amount=Decimal('10')
+        )
+
+    def make_inventory_movement(self):
+        return InventoryMovement.objects.create(
+            product=self.make_product(), branch=self.branch, movement_type='purchase', quantity=Decimal('5')
+        )
+
+    def make_recipe(self):
+        n = self._next()
+        return Recipe.objects.create(
+            company=self.company, name=f'R{n}', name_ar=f'وصفة {n}', code=f'R-{n}', product=self.make_product()
+        )
+
+    def make_production_order(self):
+        now = timezone.now()
+        return ProductionOrder.objects.create(
+            company=self.company, branch=self.branch, order_number=f'PO-{self._next()}', recipe=self.make_recipe(),
+            planned_quantity=Decimal('1'), planned_start_date=now, planned_end_date=now
+        )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context.captured_queries)
+
+    def assertQueryCountConstant(self, url, factory):
+        """عدد الاستعلامات لصفحة بعنصرين يساوي عددها لصفحة بعشرة عناصر"""
+        for _ in range(2):
+            factory()
+        small = self.count_queries(url)
+        for _ in range(8):
+            factory()
+        large = self.count_queries(url)
+        self.assertEqual(small, large, f'{url}: {small} queries for 2 rows, {large} for 10 rows')
+
+    def test_branches(self):
+        self.assertQueryCountConstant('/api/v1/branches/', self.make_branch)
+
+    def test_products(self):
+        self.assertQueryCountConstant('/api/v1/products/', self.make_product)
+
+    def test_customers(self):
+        self.assertQueryCountConstant('/api/v1/customers/', self.make_customer)
+
+    def test_suppliers(self):
+        self.assertQueryCountConstant('/api/v1/suppliers/', self.make_supplier)
+
+    def test_sales_invoices(self):
+        self.assertQueryCountConstant('/api/v1/sales-invoices/', self.make_sales_invoice)
+
+    def test_sales_invoices_today(self):
+        self.assertQueryCountConstant('/api/v1/sales-invoices/today/', self.make_sales_invoice)
+
+    def test_pos_transactions(self):
+        self.assertQueryCountConstant('/api/v1/pos-transactions/', self.make_pos_transaction)
+
+    def test_inventory_movements(self):
+        self.assertQueryCountConstant('/api/v1/inventory-movements/', self.make_inventory_movement)
+
+    def test_recipes(self):
+        self.assertQueryCountConstant('/api/v1/recipes/', self.make_recipe)
+
+    def test_production_orders(self):
+        self.assertQueryCountConstant('/api/v1/production-orders/', self.make_production_order)
+
+
+class CheckoutTests(APITestCase):
+    """نقطة البيع: 201 للبيع الكامل، 409 لنقص المخزون، 404 لمنتج من شركة أخرى، ولا أثر عند الرفض"""
+
+    def setUp(self):
+        self.company = Company.objects.create(
+            name='Till Co', name_ar='شركة الصندوق', tax_id='TILL-1', commercial_register='TILL-1'
+        )
+        self.branch = Branch.objects.create(
+            company=self.company, name='Main', name_ar='الرئيسي', code='BR-C', address='-', city='-', phone='1'
+        )
+        self.user = CustomUser.objects.create_user(username='till', password='x', branch=self.branch)
+        unit = Unit.objects.create(company=self.company, name='Piece', name_ar='قطعة', code='PC-C')
+        self.customer = Customer.objects.create(company=self.company, name='Customer', phone='1')
+        self.session = POSSession.objects.create(branch=self.branch, cashier=self.user)
+        self.products = [
+            Product.objects.create(
+                company=self.company, name=f'P{n}', name_ar=f'منتج {n}', code=f'CP-{n}', barcode=f'CB-{n}',
+                unit=unit, selling_price=Decimal('10')
+            )
+            for n in range(2)
+        ]
+        increase_stock(self.branch, {self.products[0].pk: Decimal('5'), self.products[1].pk: Decimal('1')})
+        self.client.force_login(self.user)
+
+    def checkout(self, *items):
+        return self.client.post('/api/v1/pos-transactions/checkout/', {
+            'session_id': str(self.session.pk), 'customer_id': str(self.customer.pk),
+            'items': [{'product_id': str(product.pk), 'quantity': quantity} for product, quantity in items],
+        }, format='json')
+
+    def levels(self):
+        return list(StockLevel.objects.filter(branch=self.branch).order_by('product__code').values_list('quantity', flat=True))
+
+    def test_checkout_creates_sale(self):
+        response = self.checkout((self.products[0], '2'), (self.products[1], '1'))
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        self.assertEqual(Decimal(body['total_amount']), Decimal('30'))
+        self.assertEqual(len(body['transactions']), 2)
+        self.assertEqual(self.levels(), [Decimal('3'), Decimal('0')])
+        self.assertEqual(InventoryMovement.objects.filter(reference_id=body['id']).count(), 2)
+
+    def test_shortage_returns_409_and_changes_nothing(self):
+        response = self.checkout((self.products[0], '2'), (self.products[1], '3'))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([s['product_id'] for s in response.json()['shortages']], [str(self.products[1].pk)])
+        self.assertEqual(self.levels(), [Decimal('5'), Decimal('1')])
+        self.assertFalse(SalesInvoice.objects.exists())
+        self.assertFalse(POSTransaction.objects.exists())
+
+    def test_product_from_another_company_is_not_found(self):
+        other = Company.objects.create(name='Other', name_ar='أخرى', tax_id='TILL-2', commercial_register='TILL-2')
+        foreign = Product.objects.create(
+            company=other, name='x', name_ar='x', code='CP-x', barcode='CB-x',
+            unit=Unit.objects.create(company=other, name='Piece', name_ar='قطعة', code='PC-C2'),
+        )
+        response = self.checkout((self.products[0], '1'), (foreign, '1'))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['product_ids'], [str(foreign.pk)])
+        self.assertFalse(SalesInvoice.objects.exists())
+        self.assertEqual(self.levels(), [Decimal('5'), Decimal('1')])
+
+    def test_concurrent_duplicate_number_is_a_validation_error(self):
+        first = self.client.post('/api/v1/pos-transactions/checkout/', {
+            'session_id': str(self.session.pk), 'customer_id': str(self.customer.pk), 'invoice_number': 'INV-RACE',
+            'items': [{'product_id': str(self.products[0].pk), 'quantity': '1'}],
+        }, format='json')
+        self.assertEqual(first.status_code, 201, first.content)
+        # طلب متزامن اجتاز التحقق قبل حفظ الأول
+        with mock.patch('api.serializers.CheckoutSerializer.validate_invoice_number', side_effect=lambda value: value):
+            response = self.client.post('/api/v1/pos-transactions/checkout/', {
+                'session_id': str(self.session.pk), 'customer_id': str(self.customer.pk), 'invoice_number': 'INV-RACE',
+                'items': [{'product_id': str(self.products[0].pk), 'quantity': '1'}],
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'invoice_number': ['Invoice number already exists']})
+        self.assertEqual(SalesInvoice.objects.count(), 1)
+        self.assertEqual(self.levels(), [Decimal('4'), Decimal('1')])
+
+
+@override_settings(SYNC_PULL_LAG=0)
+class SyncTests(APITestCase):
+    """مزامنة التطبيق: السحب بالمؤشر والمحذوفات ورفع الفواتير"""
+
+    def setUp(self):
+        self.company = Company.objects.create(
+            name='Sync Co', name_ar='شركة المزامنة', tax_id='SYNC-1', commercial_register='SYNC-1'
+        )
+        self.branch = Branch.objects.create(
+            company=self.company, name='Main', name_ar='الرئيسي', code='BR-S', address='-', city='-', phone='1'
+        )
+        self.user = CustomUser.objects.create_user(username='syncer', password='x', branch=self.branch)
+        self.unit = Unit.objects.create(company=self.company, name='Piece', name_ar='قطعة', code='PC-S')
+        self.customer = Customer.objects.create(company=self.company, name='Customer', phone='1')
+        self.session = POSSession.objects.create(branch=self.branch, cashier=self.user)
+        self.products = [
+            Product.objects.create(
+                company=self.company, name=f'P{n}', name_ar=f'منتج {n}', code=f'SP-{n}', barcode=f'SB-{n}',
+                unit=self.unit, selling_price=Decimal('10')
+            )
+            for n in range(3)
+        ]
+        increase_stock(self.branch, {self.products[0].pk: Decimal('5')})
+        self.client.force_login(self.user)
+
+    def pull(self, cursor='', limit=''):
+        response = self.client.get('/api/v1/sync/pull/', {'cursor': cursor, 'limit': limit})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_pull_returns_only_changes_since_cursor(self):
+        first = self.pull(limit=2)
+        self.assertTrue(first['has_more'])
+        self.assertEqual(len(first['changes']['products']), 2)
+        second = self.pull(first['cursor'], limit=2)
+        self.assertEqual(len(second['changes']['products']), 1)
+        self.assertFalse(second['has_more'])
+
+        self.assertEqual(self.pull(second['cursor'])['changes']['products'], [])
+
+        self.products[1].selling_price = Decimal('12')
+        self.products[1].save()
+        deleted_id = str(self.products[2].pk)
+        self.products[2].delete()
+        delta = self.pull(second['cursor'])
+        self.assertEqual([p['id'] for p in delta['changes']['products']], [str(self.products[1].pk)])
+        self.assertEqual(delta['deleted']['products'], [deleted_id])
+        self.assertEqual(delta['changes']['stock'], [])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/sync/pull/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_push_is_idempotent_and_reports_conflicts(self):
+        invoice = {
+            'id': str(uuid.uuid4()), 'session_id': str(self.session.pk), 'customer_id': str(self.customer.pk),
+            'invoice_date': '2026-01-15', 'items': [{'product_id': str(self.products[0].pk), 'quantity': '2'}],
+        }
+        short = dict(invoice, id=str(uuid.uuid4()), items=[{'product_id': str(self.products[0].pk), 'quantity': '9'}])
+        response = self.client.post('/api/v1/sync/push/', {'invoices': [invoice, short, {'id': 'x'}]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'conflict', 'invalid'])
+        self.assertEqual(results[1]['reason'], 'insufficient_stock')
+
+        response = self.client.post('/api/v1/sync/push/', {'invoices': [invoice]}, format='json')
+        self.assertEqual(response.json()['results'][0]['status'], 'duplicate')
+        created = SalesInvoice.objects.get(pk=invoice['id'])
+        self.assertEqual(str(created.invoice_date), '2026-01-15')
+        self.assertEqual(created.pos_transactions.count(), 1)
+
+    def test_late_upload_to_closed_session(self):
+        POSSession.objects.filter(pk=self.session.pk).update(
+            status='closed',
+            opened_at=timezone.make_aware(datetime(2026, 1, 10, 9)),
+            closed_at=timezone.make_aware(datetime(2026, 1, 20, 22)),
+        )
+        invoice = {
+            'session_id': str(self.session.pk), 'customer_id': str(self.customer.pk),
+            'items': [{'product_id': str(self.products[0].pk), 'quantity': '1'}],
+        }
+        response = self.client.post('/api/v1/sync/push/', {'invoices': [
+            dict(invoice, id=str(uuid.uuid4()), invoice_date='2026-01-20'),
+            dict(invoice, id=str(uuid.uuid4()), invoice_date='2026-01-21'),
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        created, late = response.json()['results']
+        self.assertEqual(created['status'], 'created')
+        self.assertEqual((late['status'], late['reason']), ('conflict', 'session_closed'))
+        self.assertTrue(late['closed_at'].startswith('2026-01-20'))
+        self.assertFalse(SalesInvoice.objects.filter(pk=late['id']).exists())
+
+    def test_tombstones_only_for_synced_models(self):
+        self.customer.delete()
+        SalesInvoice.objects.filter(company=self.company).delete()
+        self.session.delete()
+        self.assertEqual(list(SyncTombstone.objects.values_list('entity', flat=True)), ['customers'])
+
+
+class KeysetPaginationTests(APITestCase):
+    """ترقيم الصفحات بالمؤشر: لا تكرار ولا فقد بين الصفحات، والعدد عند الطلب فقط"""
+
+    def setUp(self):
+        self.company = Company.objects.create(
+            name='Page Co', name_ar='شركة الصفحات', tax_id='PAGE-1', commercial_register='PAGE-1'
+        )
+        self.branch = Branch.objects.create(
+            company=self.company, name='Main', name_ar='الرئيسي', code='BR-P', address='-', city='-', phone='1'
+        )
+        self.user = CustomUser.objects.create_user(username='pager', password='x', branch=self.branch)
+        customer = Customer.objects.create(company=self.company, name='Customer', phone='1')
+        today = timezone.localdate()
+        # نفس التاريخ لكل الفواتير، فالترتيب بين الصفحات يعتمد على id
+        self.invoices = SalesInvoice.objects.bulk_create([
+            SalesInvoice(
+                company=self.company, branch=self.branch, invoice_number=f'INV-P{n}',
+                customer=customer, invoice_date=today, due_date=today
+            )
+            for n in range(7)
+        ])
+        self.client.force_login(self.user)
+
+    def test_pages_cover_all_rows_once(self):
+        seen, url = [], '/api/v1/sales-invoices/?page_size=3&count=true'
+        first = self.client.get(url).json()
+        self.assertEqual(first['count'], 7)
+        while url:
+            body = self.client.get(url).json()
+            seen.extend(row['id'] for row in body['results'])
+            url = body['next']
+            if url:
+                self.assertNotIn('count=', url)
+        self.assertEqual(sorted(seen), sorted(str(invoice.pk) for invoice in self.invoices))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_count_is_opt_in_and_bad_cursor_is_rejected(self):
+        self.assertNotIn('count', self.client.get('/api/v1/sales-invoices/').json())
+        response = self.client.get('/api/v1/sales-invoices/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(BARCODE_INDEX_BACKGROUND_REBUILD=False)
+class BarcodeIndexTests(APITestCase):
+    """فهرس الباركود: الإصابة والفقد من الذاكرة، وإعادة التحميل الكامل بعد الإبطال وانتهاء المدة"""
+
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(
+            name='Scan Co', name_ar='شركة المسح', tax_id='SCAN-1', commercial_register='SCAN-1'
+        )
+        unit = Unit.objects.create(company=self.company, name='Piece', name_ar='قطعة', code='PC-SCAN')
+        self.product = Product.objects.create(
+            company=self.company, name='Tea', name_ar='شاي', code='SCAN-P', barcode='SCAN-1', unit=unit,
+        )
+        self.index = BarcodeIndex(ttl=60)
+        self.index.warm(self.company.pk)
+
+    def test_hits_and_misses_are_answered_from_memory(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.index.lookup(self.company.pk, 'SCAN-1')['name'], 'Tea')
+            self.assertIsNone(self.index.lookup(self.company.pk, 'NOPE'))
+
+    def test_version_bump_rebuilds_complete_index(self):
+        # تعديل من عملية أخرى: لا إشارات هنا، فقط رقم الإصدار المشترك
+        Product.objects.filter(pk=self.product.pk).update(name='Green tea')
+        bump_version(self.company.pk)
+        self.assertEqual(self.index.lookup(self.company.pk, 'SCAN-1')['name'], 'Green tea')
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.index.lookup(self.company.pk, 'NOPE'))
+
+    def test_product_save_patches_only_that_product(self):
+        other = Product.objects.create(
+            company=self.company, name='Coffee', name_ar='قهوة', code='SCAN-C', barcode='SCAN-3', unit=self.product.unit,
+        )
+        self.index.warm(self.company.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Green tea'
+            self.product.barcode = 'SCAN-2'
+            self.product.save()
+
+        # عملية أخرى: تقرأ المنتج المعدل وحده في استعلام واحد، والفهرس يبقى مكتملاً
+        with self.assertNumQueries(1):
+            self.assertEqual(self.index.lookup(self.company.pk, 'SCAN-2')['name'], 'Green tea')
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.index.lookup(self.company.pk, 'SCAN-1'))
+            self.assertEqual(self.index.lookup(self.company.pk, 'SCAN-3')['name'], 'Coffee')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertIsNone(self.index.lookup(self.company.pk, 'SCAN-3'))
+        self.assertTrue(self.index._companies[self.company.pk].complete)
+
+    def test_expired_index_is_rebuilt_not_emptied(self):
+        self.index._companies[self.company.pk].loaded_at -= 61
+        Product.objects.filter(pk=self.product.pk).update(barcode='SCAN-2')
+        self.assertEqual(self.index.lookup(self.company.pk, 'SCAN-2')['name'], 'Tea')
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.index.lookup(self.company.pk, 'SCAN-1'))
@@ -11,8 +11,12 @@ router.register(r'suppliers', views.SupplierViewSet, basename='supplier')
 router.register(r'sales-invoices', views.SalesInvoiceViewSet, basename='sales-invoice')
 router.register(r'pos-transactions', views.POSTransactionViewSet, basename='pos-transaction')
 router.register(r'inventory-movements', views.InventoryMovementViewSet, basename='inventory-movement')
+router.register(r'stock-counts', views.StockCountViewSet, basename='stock-count')
+router.register(r'goods-receipts', views.GoodsReceiptViewSet, basename='goods-receipt')
 router.register(r'recipes', views.RecipeViewSet, basename='recipe')
 router.register(r'production-orders', views.ProductionOrderViewSet, basename='production-order')
+router.register(r'sync', views.SyncViewSet, basename='sync')
+router.register(r'ledger', views.LedgerViewSet, basename='ledger')
 
 app_name = 'api'
 
@@ -4,22 +4,55 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
+from datetime import date
 from decimal import Decimal
 
 from core.models import Company, Branch, Customer, Supplier, Category, Unit
-from inventory.models import Product, InventoryMovement
-from accounting.models import PurchaseInvoice, PurchaseOrderLine
-from pos.models import SalesInvoice, POSTransaction
+from core.services import SequenceError, reserve_block
+from inventory.models import Product, InventoryMovement, InventoryAdjustment
+from accounting.models import GoodsReceipt, PurchaseInvoice, PurchaseOrderLine
+from pos.models import SalesInvoice, POSSession, POSTransaction
+from pos.services import checkout, CheckoutError, DuplicateInvoiceError
+from inventory.counting import StockCountError, approve_count, record_scans, start_count
+from inventory.services import InsufficientStockError, below_reorder_levels
+from accounting import ledger
+from accounting.services import GoodsReceiptError, approve_goods_receipt, create_reorder_purchase_orders
 from manufacturing.models import Recipe, ProductionOrder
+from manufacturing.production import ProductionError, complete_orders
+from manufacturing.scheduling import schedule_branch
+from reports.services import financial_report, sales_summary
 
+from .barcode_index import barcode_index
+from .pagination import KeysetPagination
+from .sync import SyncError, pull_changes, push_invoices
 from .serializers import (
     CompanySerializer, BranchSerializer, CategorySerializer, UnitSerializer,
     CustomerSerializer, SupplierSerializer, ProductSerializer, InventoryMovementSerializer,
-    PurchaseInvoiceSerializer, SalesInvoiceSerializer, POSTransactionSerializer,
-    RecipeSerializer, ProductionOrderSerializer
+    PurchaseInvoiceSerializer, GoodsReceiptSerializer, SalesInvoiceSerializer, POSTransactionSerializer,
+    RecipeSerializer, ProductionOrderSerializer, CheckoutSerializer, SyncPushSerializer,
+    StockCountSerializer, StockCountStartSerializer, CountBatchSerializer, ProductionCompleteSerializer,
+    eager_loading_plan
 )
 
-class CompanyViewSet(viewsets.ReadOnlyModelViewSet):
+def shortage_list(shortages):
+    """نقص المخزون {product_id: {'requested', 'available'}} بصيغة الاستجابة"""
+    return [
+        {'product_id': str(pid), 'requested': str(s['requested']), 'available': str(s['available'])}
+        for pid, s in shortages.items()
+    ]
+
+class EagerLoadingMixin:
+    """تحميل العلاقات المتداخلة مسبقاً حسب خطة الـ serializer لتجنب استعلامات N+1"""
+    
+    def eager_load(self, queryset):
+        select_related, prefetch_related = eager_loading_plan(self.get_serializer_class())
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+class CompanyViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """API للشركات"""
     serializer_class = CompanySerializer
     permission_classes = [IsAuthenticated]
@@ -27,10 +60,10 @@ class CompanyViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.branch:
-            return Company.objects.filter(id=user.branch.company.id)
+            return self.eager_load(Company.objects.filter(id=user.branch.company_id))
         return Company.objects.none()
 
-class BranchViewSet(viewsets.ReadOnlyModelViewSet):
+class BranchViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """API للفروع"""
     serializer_class = BranchSerializer
     permission_classes = [IsAuthenticated]
@@ -38,10 +71,34 @@ class BranchViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.branch:
-            return Branch.objects.filter(company=user.branch.company)
+            return self.eager_load(Branch.objects.filter(company=user.branch.company))
         return Branch.objects.none()
+    
+    @action(detail=False, methods=['post'], url_path='reserve-numbers')
+    def reserve_numbers(self, request):
+        """حجز دفعة أرقام مستندات لنقطة بيع تصرفها بنفسها"""
+        user = request.user
+        if not user.branch:
+            return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            size = int(request.data.get('size') or 0) or None
+            sequence, start, end = reserve_block(
+                user.branch, request.data.get('document_type', 'sales_invoice'), size
+            )
+        except (TypeError, ValueError, SequenceError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'document_type': sequence.document_type,
+            'prefix': sequence.prefix,
+            'padding': sequence.padding,
+            'start': start,
+            'end': end,
+            'first_number': sequence.format(start),
+            'last_number': sequence.format(end),
+        }, status=status.HTTP_201_CREATED)
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """API للمنتجات"""
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
@@ -49,7 +106,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.branch:
-            return Product.objects.filter(company=user.branch.company)
+            return self.eager_load(Product.objects.filter(company=user.branch.company))
         return Product.objects.none()
     
     @action(detail=False, methods=['get'])
@@ -59,12 +116,34 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         if not user.branch:
             return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
         
-        products = Product.objects.filter(
-            company=user.branch.company,
-            quantity_on_hand__lt=50
-        )
-        serializer = self.get_serializer(products, many=True)
-        return Response(serializer.data)
+        # المنتجات التي نزل رصيدها في فرع المستخدم عن حد إعادة الطلب
+        products = self.eager_load(Product.objects.filter(
+            stock_levels__in=below_reorder_levels(user.branch)
+        ))
+        page = self.paginate_queryset(products)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    def reorder(self, request):
+        """إنشاء أوامر شراء مسودة للمنتجات منخفضة المخزون في الفرع"""
+        user = request.user
+        if not user.branch:
+            return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        orders, without_supplier = create_reorder_purchase_orders(user.branch, created_by=user)
+        return Response({
+            'orders': [
+                {
+                    'id': order.id,
+                    'order_number': order.order_number,
+                    'supplier': order.supplier_id,
+                    'total_amount': order.total_amount,
+                }
+                for order in orders
+            ],
+            'without_supplier': without_supplier,
+        }, status=status.HTTP_201_CREATED if orders else status.HTTP_200_OK)
     
     @action(detail=False, methods=['get'])
     def by_barcode(self, request):
@@ -77,17 +156,12 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         if not user.branch:
             return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            product = Product.objects.get(
-                company=user.branch.company,
-                barcode=barcode
-            )
-            serializer = self.get_serializer(product)
-            return Response(serializer.data)
-        except Product.DoesNotExist:
+        data = barcode_index.lookup(user.branch.company_id, barcode)
+        if data is None:
             return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data)
 
-class CustomerViewSet(viewsets.ReadOnlyModelViewSet):
+class CustomerViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """API للعملاء"""
     serializer_class = CustomerSerializer
     permission_classes = [IsAuthenticated]
@@ -95,10 +169,10 @@ class CustomerViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.branch:
-            return Customer.objects.filter(company=user.branch.company)
+            return self.eager_load(Customer.objects.filter(company=user.branch.company))
         return Customer.objects.none()
 
-class SupplierViewSet(viewsets.ReadOnlyModelViewSet):
+class SupplierViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """API للموردين"""
     serializer_class = SupplierSerializer
     permission_classes = [IsAuthenticated]
@@ -106,18 +180,20 @@ class SupplierViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.branch:
-            return Supplier.objects.filter(company=user.branch.company)
+            return self.eager_load(Supplier.objects.filter(company=user.branch.company))
         return Supplier.objects.none()
 
-class SalesInvoiceViewSet(viewsets.ModelViewSet):
+class SalesInvoiceViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """API لفواتير المبيعات"""
     serializer_class = SalesInvoiceSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = '-invoice_date'
     
     def get_queryset(self):
         user = self.request.user
         if user.branch:
-            return SalesInvoice.objects.filter(branch=user.branch)
+            return self.eager_load(SalesInvoice.objects.filter(branch=user.branch))
         return SalesInvoice.objects.none()
     
     @action(detail=False, methods=['get'])
@@ -128,10 +204,10 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
             return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
         
         today = timezone.now().date()
-        invoices = SalesInvoice.objects.filter(
+        invoices = self.eager_load(SalesInvoice.objects.filter(
             branch=user.branch,
             invoice_date=today
-        )
+        ))
         serializer = self.get_serializer(invoices, many=True)
         return Response(serializer.data)
     
@@ -145,50 +221,168 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
         today = timezone.now().date()
         month_start = today.replace(day=1)
         
-        today_stats = SalesInvoice.objects.filter(
-            branch=user.branch,
-            invoice_date=today
-        ).aggregate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        )
-        
-        month_stats = SalesInvoice.objects.filter(
-            branch=user.branch,
-            invoice_date__gte=month_start
-        ).aggregate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        )
-        
         return Response({
-            'today': today_stats,
-            'month': month_stats
+            'today': sales_summary(user.branch, today, today),
+            'month': sales_summary(user.branch, month_start)
         })
 
-class POSTransactionViewSet(viewsets.ModelViewSet):
+class POSTransactionViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """API لمعاملات نقطة البيع"""
     serializer_class = POSTransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = '-transaction_date'
     
     def get_queryset(self):
         user = self.request.user
         if user.branch:
-            return POSTransaction.objects.filter(branch=user.branch)
+            return self.eager_load(POSTransaction.objects.filter(session__branch=user.branch))
         return POSTransaction.objects.none()
+    
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        """إتمام عملية بيع كاملة (فاتورة + معاملات + مخزون) في طلب واحد"""
+        user = request.user
+        if not user.branch:
+            return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = CheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        try:
+            session = POSSession.objects.select_related('branch__company').get(
+                id=data['session_id'], branch=user.branch
+            )
+            customer = Customer.objects.get(id=data['customer_id'], company=user.branch.company)
+        except (POSSession.DoesNotExist, Customer.DoesNotExist):
+            return Response({'error': 'Session or customer not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        product_ids = {item['product_id'] for item in data['items']}
+        products = Product.objects.filter(company=user.branch.company, is_active=True).in_bulk(product_ids)
+        missing = product_ids - set(products)
+        if missing:
+            return Response(
+                {'error': 'Product not found', 'product_ids': sorted(str(pid) for pid in missing)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        items = [
+            {'product': products[item['product_id']], 'quantity': item['quantity'], 'unit_price': item.get('unit_price')}
+            for item in data['items']
+        ]
+        
+        try:
+            invoice, transactions = checkout(
+                session=session,
+                customer=customer,
+                items=items,
+                created_by=user,
+                invoice_number=data['invoice_number'],
+                payment_method=data['payment_method'],
+                tax_amount=data['tax_amount'],
+                discount_amount=data['discount_amount'],
+                notes=data['notes'],
+            )
+        except InsufficientStockError as e:
+            return Response(
+                {'error': 'Insufficient stock', 'shortages': shortage_list(e.shortages)},
+                status=status.HTTP_409_CONFLICT
+            )
+        except DuplicateInvoiceError:
+            # نفس رد CheckoutSerializer.validate_invoice_number عند سباق على الرقم
+            return Response({'invoice_number': ['Invoice number already exists']}, status=status.HTTP_400_BAD_REQUEST)
+        except CheckoutError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        invoice.customer = customer
+        response = SalesInvoiceSerializer(invoice).data
+        response['transactions'] = POSTransactionSerializer(transactions, many=True).data
+        return Response(response, status=status.HTTP_201_CREATED)
 
-class InventoryMovementViewSet(viewsets.ReadOnlyModelViewSet):
+class InventoryMovementViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """API لحركات المخزون"""
     serializer_class = InventoryMovementSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = '-created_at'
     
     def get_queryset(self):
         user = self.request.user
         if user.branch:
-            return InventoryMovement.objects.filter(product__company=user.branch.company)
+            return self.eager_load(InventoryMovement.objects.filter(product__company=user.branch.company))
         return InventoryMovement.objects.none()
 
-class RecipeViewSet(viewsets.ReadOnlyModelViewSet):
+class StockCountViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
+    """API لجلسات الجرد: البدء بلقطة من الأرصدة، رفع قراءات الأجهزة، الاعتماد"""
+    serializer_class = StockCountSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        user = self.request.user
+        if user.branch:
+            return self.eager_load(InventoryAdjustment.objects.filter(branch=user.branch))
+        return InventoryAdjustment.objects.none()
+    
+    @action(detail=False, methods=['post'])
+    def start(self, request):
+        """بدء جلسة جرد كاملة أو لمنتجات محددة"""
+        user = request.user
+        if not user.branch:
+            return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = StockCountStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        adjustment = start_count(
+            user.branch, created_by=user, product_ids=serializer.validated_data.get('product_ids'),
+            notes=serializer.validated_data['notes'],
+        )
+        return Response(self.get_serializer(adjustment).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def scans(self, request, pk=None):
+        """رفع دفعة قراءات {batch_id, device, scans: [{barcode أو product, quantity}]}"""
+        serializer = CountBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            result = record_scans(
+                self.get_object(), data['batch_id'], data['scans'], device=data['device'], counted_by=request.user,
+            )
+        except StockCountError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(result)
+    
+    @action(detail=True, methods=['post'])
+    def approve(self, request, pk=None):
+        """اعتماد الجرد وترحيل الفروقات إلى المخزون"""
+        try:
+            variances = approve_count(self.get_object(), approved_by=request.user)
+        except StockCountError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({'variances': variances})
+
+class GoodsReceiptViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
+    """API لإيصالات استقبال البضائع"""
+    serializer_class = GoodsReceiptSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        user = self.request.user
+        if user.branch:
+            return self.eager_load(GoodsReceipt.objects.filter(branch=user.branch))
+        return GoodsReceipt.objects.none()
+    
+    @action(detail=True, methods=['post'])
+    def approve(self, request, pk=None):
+        """اعتماد الإيصال: إضافة المقبول إلى المخزون وتحديث أمر الشراء"""
+        try:
+            receipt = approve_goods_receipt(self.get_object(), approved_by=request.user)
+        except GoodsReceiptError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(receipt).data)
+
+class RecipeViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """API للوصفات"""
     serializer_class = RecipeSerializer
     permission_classes = [IsAuthenticated]
@@ -196,10 +390,10 @@ class RecipeViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.branch:
-            return Recipe.objects.filter(product__company=user.branch.company)
+            return self.eager_load(Recipe.objects.filter(product__company=user.branch.company))
         return Recipe.objects.none()
 
-class ProductionOrderViewSet(viewsets.ModelViewSet):
+class ProductionOrderViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """API لأوامر الإنتاج"""
     serializer_class = ProductionOrderSerializer
     permission_classes = [IsAuthenticated]
@@ -207,5 +401,154 @@ class ProductionOrderViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.branch:
-            return ProductionOrder.objects.filter(branch=user.branch)
+            return self.eager_load(ProductionOrder.objects.filter(branch=user.branch))
         return ProductionOrder.objects.none()
+    
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """إكمال الأمر: استهلاك المكونات من المخزون وإضافة المنتج"""
+        order = self.get_object()
+        try:
+            _, rejected = complete_orders([order.pk], completed_by=request.user)
+        except ProductionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except InsufficientStockError as e:
+            return Response(
+                {'error': 'Insufficient stock', 'shortages': shortage_list(e.shortages)},
+                status=status.HTTP_409_CONFLICT
+            )
+        if rejected:
+            return Response(
+                {'error': 'Insufficient stock', 'shortages': shortage_list(rejected[order.pk])},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(self.get_serializer(self.get_object()).data)
+    
+    @action(detail=False, methods=['post'], url_path='complete')
+    def complete_batch(self, request):
+        """إكمال دفعة أوامر {orders: [id]}؛ يعيد المكتملة والمرفوضة لنقص المخزون"""
+        serializer = ProductionCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = set(serializer.validated_data['orders'])
+        found = set(self.get_queryset().filter(pk__in=order_ids).values_list('pk', flat=True))
+        if found != order_ids:
+            return Response(
+                {'error': 'Production order not found', 'order_ids': sorted(str(pk) for pk in order_ids - found)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        try:
+            completed, rejected = complete_orders(order_ids, completed_by=request.user)
+        except ProductionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except InsufficientStockError as e:
+            return Response(
+                {'error': 'Insufficient stock', 'shortages': shortage_list(e.shortages)},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({
+            'completed': [str(pk) for pk in completed],
+            'rejected': [{'id': str(pk), 'shortages': shortage_list(s)} for pk, s in rejected.items()],
+        })
+    
+    @action(detail=False, methods=['post'])
+    def schedule(self, request):
+        """إعادة جدولة أوامر الفرع المفتوحة على خطوط الإنتاج والعمال"""
+        user = request.user
+        if not user.branch:
+            return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'updated': schedule_branch(user.branch)})
+
+class SyncViewSet(viewsets.ViewSet):
+    """مزامنة تطبيق نقطة البيع: سحب التغييرات بمؤشر ورفع فواتير العمل دون اتصال"""
+    permission_classes = [IsAuthenticated]
+    
+    @action(detail=False, methods=['get'])
+    def pull(self, request):
+        """التغييرات منذ ?cursor= (فارغ في أول مزامنة)"""
+        user = request.user
+        if not user.branch:
+            return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            limit = int(request.query_params.get('limit') or 0) or None
+            data = pull_changes(user.branch, request.query_params.get('cursor'), limit)
+        except (ValueError, SyncError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+    
+    @action(detail=False, methods=['post'])
+    def push(self, request):
+        """رفع دفعة فواتير؛ إعادة رفع نفس الفاتورة (نفس id) آمنة"""
+        user = request.user
+        if not user.branch:
+            return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = SyncPushSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            results = push_invoices(user.branch, user, serializer.validated_data['invoices'])
+        except SyncError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results})
+
+class LedgerViewSet(viewsets.ViewSet):
+    """دفتر الأستاذ العام لشركة المستخدم: ميزان المراجعة والميزانية العمومية"""
+    permission_classes = [IsAuthenticated]
+    
+    def _as_of(self, request):
+        value = request.query_params.get('as_of')
+        return date.fromisoformat(value) if value else None
+    
+    @action(detail=False, methods=['get'], url_path='trial-balance')
+    def trial_balance(self, request):
+        """ميزان المراجعة حتى نهاية شهر ?as_of=YYYY-MM-DD (الافتراضي: كل الفترات)"""
+        user = request.user
+        if not user.branch:
+            return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            as_of = self._as_of(request)
+        except ValueError:
+            return Response({'error': 'Invalid as_of'}, status=status.HTTP_400_BAD_REQUEST)
+        rows = ledger.trial_balance(user.branch.company, as_of)
+        return Response({
+            'accounts': rows,
+            'total_debit': sum((row['debit'] for row in rows), Decimal('0')),
+            'total_credit': sum((row['credit'] for row in rows), Decimal('0')),
+        })
+    
+    @action(detail=False, methods=['get'], url_path='balance-sheet')
+    def balance_sheet(self, request):
+        """الميزانية العمومية حتى نهاية شهر ?as_of="""
+        user = request.user
+        if not user.branch:
+            return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            as_of = self._as_of(request)
+        except ValueError:
+            return Response({'error': 'Invalid as_of'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ledger.balance_sheet(user.branch.company, as_of))
+    
+    @action(detail=False, methods=['get'], url_path='profit-and-loss')
+    def profit_and_loss(self, request):
+        """قائمة الدخل بين ?start= و ?end= (الافتراضي: من أول الشهر حتى اليوم)"""
+        user = request.user
+        if not user.branch:
+            return Response({'error': 'No branch assigned'}, status=status.HTTP_400_BAD_REQUEST)
+        today = timezone.localdate()
+        try:
+            start = date.fromisoformat(request.query_params.get('start') or today.replace(day=1).isoformat())
+            end = date.fromisoformat(request.query_params.get('end') or today.isoformat())
+        except ValueError:
+            return Response({'error': 'Invalid date'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({'error': 'start is after end'}, status=status.HTTP_400_BAD_REQUEST)
+        report = financial_report(user.branch.company, start, end)
+        return Response({
+            'start': report.start_date,
+            'end': report.end_date,
+            'total_revenue': report.total_revenue,
+            'total_expenses': report.total_expenses,
+            'gross_profit': report.gross_profit,
+            'net_profit': report.net_profit,
+            **report.data,
+        })
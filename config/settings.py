@@ -105,17 +105,6 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.CustomUser'
 
-REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.SessionAuthentication',
-    ],
-    'DEFAULT_PERMISSION_CLASSES': [
-        'rest_framework.permissions.IsAuthenticated',
-    ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 20,
-}
-
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='http://localhost:3000,http://localhost:8000').split(',')
 
 LOGGING = {
@@ -153,7 +142,18 @@ if 'web' not in INSTALLED_APPS:
 if 'api' not in INSTALLED_APPS:
     INSTALLED_APPS.append('api')
 
+# الـ cache المشترك بين العمليات: إصدارات فهرس الباركود، منع تكرار أحداث الـ webhooks، آخر مواقع
+# السائقين. LocMemCache (الافتراضي للتطوير) خاص بكل عملية، فمع أكثر من عملية يجب cache مشترك
+# مثل django.core.cache.backends.redis.RedisCache أو db.DatabaseCache (انظر api/checks.py)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
 # إعدادات Django REST Framework
+# القوائم الكبيرة (الفواتير، المعاملات، حركات المخزون) تستخدم api.pagination.KeysetPagination
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
@@ -165,6 +165,71 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 100,
 }
 
+# فهرس الباركود في ذاكرة كل عملية (ProductViewSet.by_barcode)
+BARCODE_INDEX_MAX_ENTRIES = config('BARCODE_INDEX_MAX_ENTRIES', default=50000, cast=int)
+BARCODE_INDEX_TTL = config('BARCODE_INDEX_TTL', default=300, cast=int)
+BARCODE_INDEX_WARM_ON_STARTUP = config('BARCODE_INDEX_WARM_ON_STARTUP', default=True, cast=bool)
+# إعادة التحميل بعد الإبطال أو انتهاء المدة في خيط خلفي (False: داخل الطلب الذي اكتشفه)
+BARCODE_INDEX_BACKGROUND_REBUILD = config('BARCODE_INDEX_BACKGROUND_REBUILD', default=True, cast=bool)
+
 # إضافة تطبيق delivery
 if 'delivery' not in INSTALLED_APPS:
     INSTALLED_APPS.append('delivery')
+
+# عميل منصات التوصيل (delivery/client.py)
+DELIVERY_HTTP_TIMEOUT = config('DELIVERY_HTTP_TIMEOUT', default=10, cast=float)
+DELIVERY_MAX_CONNECTIONS = config('DELIVERY_MAX_CONNECTIONS', default=20, cast=int)
+DELIVERY_MAX_CONCURRENCY = config('DELIVERY_MAX_CONCURRENCY', default=10, cast=int)
+DELIVERY_MAX_RETRIES = config('DELIVERY_MAX_RETRIES', default=3, cast=int)
+DELIVERY_RETRY_BACKOFF = config('DELIVERY_RETRY_BACKOFF', default=0.5, cast=float)
+DELIVERY_BREAKER_THRESHOLD = config('DELIVERY_BREAKER_THRESHOLD', default=5, cast=int)
+DELIVERY_BREAKER_RESET = config('DELIVERY_BREAKER_RESET', default=30, cast=float)
+# استبدال عناوين المنصات (مثلاً خادم تجريبي محلي): {'hanger': 'http://127.0.0.1:8001/v1'}
+DELIVERY_PLATFORM_URLS = {}
+DELIVERY_OUTBOX_MAX_ATTEMPTS = config('DELIVERY_OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+DELIVERY_OUTBOX_LEASE = config('DELIVERY_OUTBOX_LEASE', default=60, cast=int)
+# إرسال الطابور من الموزع الخلفي مباشرة بعد الحفظ (process_delivery_outbox يبقى المرجع عند التعطل)
+DELIVERY_OUTBOX_DISPATCH_ON_COMMIT = config('DELIVERY_OUTBOX_DISPATCH_ON_COMMIT', default=True, cast=bool)
+
+# سجل التكامل مع منصات التوصيل (delivery/log_sink.py)
+DELIVERY_LOG_BATCH_SIZE = config('DELIVERY_LOG_BATCH_SIZE', default=200, cast=int)
+DELIVERY_LOG_FLUSH_INTERVAL = config('DELIVERY_LOG_FLUSH_INTERVAL', default=2.0, cast=float)
+DELIVERY_LOG_MAX_PAYLOAD = config('DELIVERY_LOG_MAX_PAYLOAD', default=16384, cast=int)
+DELIVERY_LOG_RETENTION_DAYS = config('DELIVERY_LOG_RETENTION_DAYS', default=90, cast=int)
+DELIVERY_LOG_ARCHIVE_DIR = BASE_DIR / 'logs' / 'delivery_archive'
+# إشعارات المنصات الواردة (delivery/webhooks.py)
+DELIVERY_WEBHOOK_DEDUP_SIZE = config('DELIVERY_WEBHOOK_DEDUP_SIZE', default=100000, cast=int)
+DELIVERY_WEBHOOK_DEDUP_TTL = config('DELIVERY_WEBHOOK_DEDUP_TTL', default=86400, cast=int)
+DELIVERY_WEBHOOK_MAX_EVENTS = config('DELIVERY_WEBHOOK_MAX_EVENTS', default=1000, cast=int)
+# مسار السائق (delivery/tracking.py): compact = مقاطع مضغوطة، rows = صف DeliveryTracking لكل نقطة
+DELIVERY_TRACK_STORAGE = config('DELIVERY_TRACK_STORAGE', default='compact')
+DELIVERY_TRACK_BATCH_SIZE = config('DELIVERY_TRACK_BATCH_SIZE', default=5000, cast=int)
+DELIVERY_TRACK_FLUSH_INTERVAL = config('DELIVERY_TRACK_FLUSH_INTERVAL', default=10.0, cast=float)
+DELIVERY_TRACK_SEGMENT_POINTS = config('DELIVERY_TRACK_SEGMENT_POINTS', default=500, cast=int)
+DELIVERY_TRACK_POSITION_TTL = config('DELIVERY_TRACK_POSITION_TTL', default=21600, cast=int)
+
+# ترقيم المستندات (core/services.py): عدد الأرقام المحجوزة في كل دفعة لكل عملية أو نقطة بيع
+DOCUMENT_SEQUENCE_BLOCK_SIZE = config('DOCUMENT_SEQUENCE_BLOCK_SIZE', default=50, cast=int)
+DOCUMENT_SEQUENCE_MAX_BLOCK_SIZE = config('DOCUMENT_SEQUENCE_MAX_BLOCK_SIZE', default=1000, cast=int)
+
+# مزامنة تطبيق نقطة البيع (api/sync.py)
+SYNC_PULL_LIMIT = config('SYNC_PULL_LIMIT', default=500, cast=int)
+SYNC_PULL_MAX_LIMIT = config('SYNC_PULL_MAX_LIMIT', default=2000, cast=int)
+# لا تُرسل التعديلات الأحدث من هذه المدة (ثوانٍ) حتى تكتمل المعاملات المتزامنة معها
+SYNC_PULL_LAG = config('SYNC_PULL_LAG', default=2, cast=int)
+SYNC_PUSH_MAX_INVOICES = config('SYNC_PUSH_MAX_INVOICES', default=200, cast=int)
+
+# دفتر الأستاذ العام (accounting/ledger.py)
+# ترحيل الفواتير والإيصالات وأوامر الإنتاج بعد حفظها؛ post_ledger يرحّل ما فات
+LEDGER_POST_ON_SAVE = config('LEDGER_POST_ON_SAVE', default=True, cast=bool)
+LEDGER_POST_BATCH_SIZE = config('LEDGER_POST_BATCH_SIZE', default=500, cast=int)
+
+# تكلفة المخزون (inventory/costing.py): عدد الأزواج (منتج، فرع) والحركات في كل دفعة عند إعادة الحساب
+INVENTORY_COST_REBUILD_BATCH_SIZE = config('INVENTORY_COST_REBUILD_BATCH_SIZE', default=2000, cast=int)
+
+# جدولة الإنتاج (manufacturing/scheduling.py): ساعات الوردية اليومية وعدد خطوط الإنتاج في الفرع
+# للأوامر غير المسندة لعامل؛ إدراج أمر أو إلغاؤه يعيد جدولة ما بعده تلقائياً
+PRODUCTION_SHIFT_START_HOUR = config('PRODUCTION_SHIFT_START_HOUR', default=6, cast=int)
+PRODUCTION_SHIFT_END_HOUR = config('PRODUCTION_SHIFT_END_HOUR', default=22, cast=int)
+PRODUCTION_BRANCH_LINES = config('PRODUCTION_BRANCH_LINES', default=1, cast=int)
+PRODUCTION_SCHEDULE_ON_SAVE = config('PRODUCTION_SCHEDULE_ON_SAVE', default=True, cast=bool)
@@ -10,6 +10,7 @@ urlpatterns = [
     path('api/v1/', include('api.urls')),
     path('api-auth/', include('rest_framework.urls')),
     path('web/', include('web.urls')),
+    path('delivery/', include('delivery.urls')),
 ]
 
 if settings.DEBUG:
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import DocumentSequence
 
-# Register your models here.
+
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ('branch', 'document_type', 'prefix', 'next_value', 'gapless')
+    list_filter = ('document_type', 'gapless')
+    readonly_fields = ('next_value',)
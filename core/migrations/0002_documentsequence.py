@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:22
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('document_type', models.CharField(choices=[('sales_invoice', 'فاتورة مبيعات'), ('sales_order', 'أمر بيع'), ('purchase_order', 'أمر شراء'), ('production_order', 'أمر إنتاج')], max_length=30)),
+                ('prefix', models.CharField(max_length=20, verbose_name='البادئة')),
+                ('padding', models.PositiveSmallIntegerField(default=6, verbose_name='عدد الخانات')),
+                ('next_value', models.BigIntegerField(default=1, verbose_name='الرقم التالي')),
+                ('gapless', models.BooleanField(default=False, verbose_name='ترقيم متصل بدون فجوات')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_sequences', to='core.branch')),
+            ],
+            options={
+                'verbose_name': 'تسلسل مستندات',
+                'verbose_name_plural': 'تسلسلات المستندات',
+                'unique_together': {('branch', 'document_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_documentsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unit',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='core_catego_company_76b128_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='core_custom_company_e3f3ff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unit',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='core_unit_company_81912d_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_unit_updated_at_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentsequence',
+            name='prefix',
+            field=models.CharField(max_length=50, verbose_name='البادئة'),
+        ),
+    ]
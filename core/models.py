@@ -187,6 +187,9 @@ class Customer(models.Model):
         verbose_name = _('عميل')
         verbose_name_plural = _('العملاء')
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['company', 'updated_at', 'id']),
+        ]
     
     def __str__(self):
         return self.name
@@ -211,6 +214,9 @@ class Category(models.Model):
         verbose_name = _('فئة')
         verbose_name_plural = _('الفئات')
         ordering = ['name_ar']
+        indexes = [
+            models.Index(fields=['company', 'updated_at', 'id']),
+        ]
     
     def __str__(self):
         return self.name_ar
@@ -231,15 +237,62 @@ class Unit(models.Model):
     
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = _('وحدة قياس')
         verbose_name_plural = _('وحدات القياس')
+        indexes = [
+            models.Index(fields=['company', 'updated_at', 'id']),
+        ]
     
     def __str__(self):
         return self.name_ar
 
 
+# ============================================
+# ترقيم المستندات
+# ============================================
+
+class DocumentSequence(models.Model):
+    """
+    عداد أرقام المستندات لكل فرع ونوع مستند
+
+    next_value هو أول رقم لم يُصرف بعد. في الوضع العادي تُحجز الأرقام على دفعات
+    (core/services.py) فقد تظهر فجوات؛ في الوضع المتصل (gapless) يُصرف كل رقم
+    داخل معاملة المستند نفسها.
+    """
+    
+    DOCUMENT_TYPE_CHOICES = [
+        ('sales_invoice', _('فاتورة مبيعات')),
+        ('sales_order', _('أمر بيع')),
+        ('purchase_order', _('أمر شراء')),
+        ('production_order', _('أمر إنتاج')),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='document_sequences')
+    document_type = models.CharField(max_length=30, choices=DOCUMENT_TYPE_CHOICES)
+    prefix = models.CharField(max_length=50, verbose_name=_('البادئة'))
+    padding = models.PositiveSmallIntegerField(default=6, verbose_name=_('عدد الخانات'))
+    next_value = models.BigIntegerField(default=1, verbose_name=_('الرقم التالي'))
+    gapless = models.BooleanField(default=False, verbose_name=_('ترقيم متصل بدون فجوات'))
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('تسلسل مستندات')
+        verbose_name_plural = _('تسلسلات المستندات')
+        unique_together = ('branch', 'document_type')
+    
+    def __str__(self):
+        return f"{self.branch.code} - {self.get_document_type_display()}"
+    
+    def format(self, value):
+        return f"{self.prefix}{value:0{self.padding}d}"
+
+
 # ============================================
 # نماذج التدقيق والسجلات
 # ============================================
@@ -0,0 +1,128 @@
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import DocumentSequence
+
+# ============================================
+# ترقيم المستندات
+# ============================================
+
+DEFAULT_PREFIXES = {
+    'sales_invoice': 'INV',
+    'sales_order': 'SO',
+    'purchase_order': 'PO',
+    'production_order': 'MO',
+}
+
+# طول حقول أرقام المستندات (invoice_number, order_number)
+DOCUMENT_NUMBER_MAX_LENGTH = 50
+
+
+class SequenceError(Exception):
+    """خطأ في ترقيم المستندات"""
+
+
+def get_sequence(branch, document_type):
+    """
+    تسلسل الفرع لنوع المستند، يُنشأ عند أول استخدام
+
+    البادئة الافتراضية تتضمن رمز الفرع، فيُرفض إنشاؤها إذا كان الرقم الناتج لا يتسع
+    في حقول أرقام المستندات؛ يمكن عندها إنشاء التسلسل يدوياً ببادئة أقصر.
+    """
+    if document_type not in DEFAULT_PREFIXES:
+        raise SequenceError(f"نوع مستند غير معروف: {document_type}")
+    sequence = DocumentSequence.objects.filter(branch=branch, document_type=document_type).first()
+    if sequence is not None:
+        return sequence
+    prefix = f"{DEFAULT_PREFIXES[document_type]}-{branch.code}-"
+    if len(prefix) + DocumentSequence._meta.get_field('padding').default > DOCUMENT_NUMBER_MAX_LENGTH:
+        raise SequenceError(f"رمز الفرع {branch.code} أطول من أن يدخل في أرقام المستندات")
+    sequence, _ = DocumentSequence.objects.get_or_create(
+        branch=branch, document_type=document_type, defaults={'prefix': prefix},
+    )
+    return sequence
+
+
+def _allocate(sequence, size):
+    """صرف size رقماً متتالياً بتحديث واحد ثم قراءة؛ يعيد (أول رقم، آخر رقم)"""
+    with transaction.atomic():
+        DocumentSequence.objects.filter(pk=sequence.pk).update(next_value=F('next_value') + size)
+        end = DocumentSequence.objects.values_list('next_value', flat=True).get(pk=sequence.pk)
+    return end - size, end - 1
+
+
+def reserve_block(branch, document_type, size=None):
+    """
+    حجز دفعة أرقام لنقطة بيع أو عامل يصرفها دون الرجوع لقاعدة البيانات
+
+    يعيد (التسلسل، أول رقم، آخر رقم). غير متاح للتسلسلات المتصلة.
+    """
+    size = size or settings.DOCUMENT_SEQUENCE_BLOCK_SIZE
+    if size < 1 or size > settings.DOCUMENT_SEQUENCE_MAX_BLOCK_SIZE:
+        raise SequenceError(f"حجم الدفعة يجب أن يكون بين 1 و {settings.DOCUMENT_SEQUENCE_MAX_BLOCK_SIZE}")
+    sequence = get_sequence(branch, document_type)
+    if sequence.gapless:
+        raise SequenceError("لا يمكن حجز دفعة من تسلسل متصل")
+    start, end = _allocate(sequence, size)
+    return sequence, start, end
+
+
+class NumberAllocator:
+    """
+    صرف أرقام المستندات من دفعات محجوزة في ذاكرة العملية
+
+    يُحجز DOCUMENT_SEQUENCE_BLOCK_SIZE رقماً بتحديث واحد ثم تُصرف من الذاكرة، فلا
+    يُقفل صف التسلسل إلا مرة لكل دفعة. الأرقام غير المصروفة عند توقف العملية تصبح
+    فجوات. الدفعة المحجوزة داخل معاملة لا تُستخدم إلا بعد حفظها، لذا تُطلب أرقام
+    المستندات المتعددة في معاملة واحدة بـ next_numbers. التسلسل المتصل يُصرف داخل
+    معاملة المستند، فيُقفل صفه حتى انتهائها ويعود الرقم مع التراجع عنها.
+    """
+
+    def __init__(self):
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def next_numbers(self, branch, document_type, count=1):
+        """count رقماً متتالياً للفرع"""
+        key = (branch.pk, document_type)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None and block[2] - block[1] + 1 >= count:
+                start = block[1]
+                block[1] += count
+                return [block[0].format(value) for value in range(start, start + count)]
+
+        sequence = get_sequence(branch, document_type)
+        if sequence.gapless:
+            if not transaction.get_connection().in_atomic_block:
+                raise SequenceError("الترقيم المتصل يجب أن يتم داخل معاملة المستند")
+            start, end = _allocate(sequence, count)
+            return [sequence.format(value) for value in range(start, end + 1)]
+
+        start, end = _allocate(sequence, max(count, settings.DOCUMENT_SEQUENCE_BLOCK_SIZE))
+        if start + count <= end:
+            # لا تُحفظ الدفعة إلا بعد الحفظ، فالتراجع عن المعاملة يعيد أرقامها للتسلسل
+            transaction.on_commit(lambda: self._store(key, sequence, start + count, end))
+        return [sequence.format(value) for value in range(start, start + count)]
+
+    def _store(self, key, sequence, start, end):
+        with self._lock:
+            self._blocks[key] = [sequence, start, end]
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+
+
+allocator = NumberAllocator()
+
+
+def next_number(branch, document_type):
+    """رقم المستند التالي للفرع"""
+    return allocator.next_numbers(branch, document_type)[0]
+
+
+def next_numbers(branch, document_type, count):
+    """أرقام متتالية لعدة مستندات تُنشأ في معاملة واحدة"""
+    return allocator.next_numbers(branch, document_type, count)
@@ -0,0 +1,24 @@
+from django.apps import apps
+from django.db.models.signals import pre_save
+from .services import next_number
+
+# النماذج المرقمة تلقائياً: (حقل الرقم، نوع المستند في DocumentSequence)
+NUMBERED_MODELS = {
+    'pos.SalesInvoice': ('invoice_number', 'sales_invoice'),
+    'pos.SalesOrder': ('order_number', 'sales_order'),
+    'accounting.PurchaseOrder': ('order_number', 'purchase_order'),
+    'manufacturing.ProductionOrder': ('order_number', 'production_order'),
+}
+
+
+def assign_document_number(sender, instance, raw=False, **kwargs):
+    """إعطاء المستند الجديد رقماً من تسلسل فرعه إذا حُفظ بدون رقم"""
+    field, document_type = NUMBERED_MODELS[sender._meta.label]
+    if raw or getattr(instance, field):
+        return
+    setattr(instance, field, next_number(instance.branch, document_type))
+
+
+def connect():
+    for label in NUMBERED_MODELS:
+        pre_save.connect(assign_document_number, sender=apps.get_model(label), dispatch_uid=f'document_number:{label}')
@@ -1,3 +1,78 @@
-from django.test import TestCase
+from decimal import Decimal
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from pos.models import SalesInvoice
+from .models import Company, Branch, Customer, DocumentSequence
+from .services import SequenceError, allocator, next_number, next_numbers, reserve_block
 
-# Create your tests here.
+
+@override_settings(DOCUMENT_SEQUENCE_BLOCK_SIZE=3)
+class DocumentSequenceTests(TestCase):
+    """ترقيم المستندات: الدفعات والوضع المتصل والترقيم التلقائي"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name_ar='شركة', name='Company', tax_id='SEQ-1', commercial_register='SEQ-1')
+        self.branch = Branch.objects.create(company=self.company, name_ar='فرع', name='Branch', code='B1')
+        allocator.clear()
+
+    def issue(self, count, document_type='purchase_order'):
+        numbers = []
+        for _ in range(count):
+            with self.captureOnCommitCallbacks(execute=True):
+                numbers.append(next_number(self.branch, document_type))
+        return numbers
+
+    def test_numbers_are_served_from_reserved_blocks(self):
+        self.assertEqual(self.issue(1), ['PO-B1-000001'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.issue(2), ['PO-B1-000002', 'PO-B1-000003'])
+        self.assertEqual(next_numbers(self.branch, 'purchase_order', 4), ['PO-B1-00000%s' % n for n in range(4, 8)])
+        sequence, start, end = reserve_block(self.branch, 'purchase_order', 10)
+        self.assertEqual((start, end), (8, 17))
+
+    def test_long_branch_code(self):
+        self.branch.code = 'WAREHOUSE-' + 'X' * 30
+        self.branch.save()
+        number, = self.issue(1)
+        self.assertEqual(number, f'PO-{self.branch.code}-000001')
+        self.assertEqual(DocumentSequence.objects.get(branch=self.branch).prefix, f'PO-{self.branch.code}-')
+
+        # رمز بالطول الأقصى (50) لا يترك مكاناً للرقم في حقل المستند
+        self.branch.code = 'Y' * 50
+        self.branch.save()
+        with self.assertRaises(SequenceError):
+            next_number(self.branch, 'sales_invoice')
+        self.assertFalse(DocumentSequence.objects.filter(document_type='sales_invoice').exists())
+
+    def test_rolled_back_block_is_reissued(self):
+        try:
+            with transaction.atomic():
+                next_number(self.branch, 'purchase_order')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self.issue(2), ['PO-B1-000001', 'PO-B1-000002'])
+
+    def test_gapless_sequence_issues_numbers_inside_transaction(self):
+        DocumentSequence.objects.create(branch=self.branch, document_type='purchase_order', prefix='F-', gapless=True)
+        with self.assertRaises(SequenceError):
+            reserve_block(self.branch, 'purchase_order')
+        try:
+            with transaction.atomic():
+                self.assertEqual(next_number(self.branch, 'purchase_order'), 'F-000001')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with transaction.atomic():
+            self.assertEqual(next_number(self.branch, 'purchase_order'), 'F-000001')
+
+    def test_documents_saved_without_number_are_numbered(self):
+        customer = Customer.objects.create(company=self.company, name='Customer', phone='1')
+        today = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice = SalesInvoice.objects.create(
+                company=self.company, branch=self.branch, customer=customer,
+                invoice_date=today, due_date=today, total_amount=Decimal('10'),
+            )
+        self.assertEqual(invoice.invoice_number, 'INV-B1-000001')
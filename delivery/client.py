@@ -0,0 +1,201 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+import httpx
+from django.conf import settings
+
+# ============================================
+# عميل HTTP غير متزامن لمنصات التوصيل
+# ============================================
+
+# إعدادات كل منصة: العنوان الأساسي، الحقل المستخدم للمصادقة، حقول إضافية في طلب الإنشاء،
+# وترويسة توقيع الإشعارات الواردة (HMAC-SHA256 بـ api_secret)
+PLATFORMS = {
+    'hanger': {
+        'base_url': 'https://api.hanger.sa/v1',
+        'auth_field': 'api_key',
+        'order_fields': {},
+        'signature_header': 'X-Signature',
+    },
+    'kita': {
+        'base_url': 'https://api.kita.sa/v1',
+        'auth_field': 'api_secret',
+        'order_fields': {'merchant_id': 'api_key'},
+        'signature_header': 'X-Signature',
+    },
+}
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class DeliveryPlatformError(Exception):
+    """خطأ في الاتصال بمنصة التوصيل"""
+
+    def __init__(self, message, status_code=None, retryable=False, data=None):
+        self.status_code = status_code
+        self.retryable = retryable
+        self.data = data or {}
+        super().__init__(message)
+
+
+class CircuitOpenError(DeliveryPlatformError):
+    """الدائرة مفتوحة بعد أخطاء متتالية، لا تُرسل الطلبات حتى انتهاء مهلة الإعادة"""
+
+    def __init__(self, platform_name):
+        super().__init__(f"المنصة {platform_name} غير متاحة مؤقتاً", retryable=True)
+
+
+@dataclass
+class PlatformResponse:
+    status_code: int
+    data: dict
+
+
+class CircuitBreaker:
+    """قاطع دائرة بسيط: يفتح بعد threshold أخطاء متتالية ويسمح بمحاولة واحدة بعد reset_timeout"""
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if self._probing or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        # نصف مفتوحة: نسمح بطلب تجريبي واحد
+        self._probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+def platform_config(platform_name):
+    if platform_name not in PLATFORMS:
+        raise ValueError(f"منصة غير مدعومة: {platform_name}")
+    return PLATFORMS[platform_name]
+
+
+class PlatformClient:
+    """
+    عميل منصة واحدة: اتصالات keep-alive مشتركة، حد للطلبات المتزامنة،
+    إعادة المحاولة مع تأخير أسي، وقاطع دائرة.
+    """
+
+    def __init__(self, platform_name, transport=None):
+        config = platform_config(platform_name)
+        self.platform_name = platform_name
+        self.max_retries = settings.DELIVERY_MAX_RETRIES
+        self.backoff = settings.DELIVERY_RETRY_BACKOFF
+        self.breaker = CircuitBreaker(settings.DELIVERY_BREAKER_THRESHOLD, settings.DELIVERY_BREAKER_RESET)
+        self._semaphore = asyncio.Semaphore(settings.DELIVERY_MAX_CONCURRENCY)
+        self._http = httpx.AsyncClient(
+            base_url=settings.DELIVERY_PLATFORM_URLS.get(platform_name, config['base_url']),
+            timeout=settings.DELIVERY_HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.DELIVERY_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.DELIVERY_MAX_CONNECTIONS,
+            ),
+            transport=transport,
+        )
+
+    async def request(self, method, path, token, json=None, headers=None):
+        """إرسال طلب مع إعادة المحاولة للأخطاء المؤقتة؛ يرفع DeliveryPlatformError عند الفشل"""
+        headers = {'Authorization': f'Bearer {token}', **(headers or {})}
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(self.platform_name)
+            try:
+                async with self._semaphore:
+                    response = await self._http.request(method, path, json=json, headers=headers)
+            except httpx.TransportError as exc:
+                error = DeliveryPlatformError(str(exc) or exc.__class__.__name__, retryable=True)
+            else:
+                data = _json(response)
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return PlatformResponse(response.status_code, data)
+                error = DeliveryPlatformError(
+                    f"HTTP {response.status_code}",
+                    status_code=response.status_code,
+                    retryable=response.status_code in RETRYABLE_STATUS_CODES,
+                    data=data,
+                )
+
+            if not error.retryable:
+                # خطأ من جهة الطلب (4xx) لا يدل على تعطل المنصة
+                self.breaker.record_success()
+                raise error
+            self.breaker.record_failure()
+            if attempt >= self.max_retries or self.breaker.is_open:
+                raise error
+            attempt += 1
+            await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * (1 + random.random()))
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+def _json(response):
+    try:
+        data = response.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {'data': data}
+
+
+class DeliveryClient:
+    """
+    عملاء المنصات مع العمليات الثلاث (إنشاء، تحديث حالة، إلغاء)
+
+    يُنشأ عميل واحد لكل منصة داخل حلقة الأحداث التي تستخدمه ويُعاد استخدامه.
+    لا يصل إلى قاعدة البيانات؛ البيانات تُجهز مسبقاً في delivery.services.
+    """
+
+    def __init__(self, transport=None):
+        self._transport = transport
+        self._clients = {}
+
+    def client(self, platform_name):
+        if platform_name not in self._clients:
+            self._clients[platform_name] = PlatformClient(platform_name, transport=self._transport)
+        return self._clients[platform_name]
+
+    async def create_order(self, platform_name, token, payload, idempotency_key=None):
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else None
+        return await self.client(platform_name).request('POST', '/orders', token, json=payload, headers=headers)
+
+    async def update_status(self, platform_name, token, platform_order_id, status, idempotency_key=None):
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else None
+        return await self.client(platform_name).request(
+            'PATCH', f'/orders/{platform_order_id}', token, json={'status': status}, headers=headers
+        )
+
+    async def cancel_order(self, platform_name, token, platform_order_id, idempotency_key=None):
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else None
+        return await self.client(platform_name).request(
+            'POST', f'/orders/{platform_order_id}/cancel', token, headers=headers
+        )
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
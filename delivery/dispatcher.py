@@ -0,0 +1,48 @@
+import asyncio
+import atexit
+import threading
+from .client import DeliveryClient
+
+
+class BackgroundDispatcher:
+    """
+    حلقة أحداث في خيط خلفي تُنفذ طلبات المنصات خارج دورة طلب الويب
+
+    submit() يعيد concurrent.futures.Future فوراً؛ ويشترك كل العمل في عميل
+    واحد لكل منصة فتبقى الاتصالات مفتوحة بين الطلبات.
+    """
+
+    def __init__(self, transport=None):
+        self._transport = transport
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._client = DeliveryClient(transport=self._transport)
+            self._thread = threading.Thread(target=self._loop.run_forever, name='delivery-dispatcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, job):
+        """تشغيل job(client) في الخلفية، حيث job دالة async تستقبل DeliveryClient"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(job(self._client), self._loop)
+
+    def stop(self, timeout=5):
+        with self._lock:
+            if self._thread is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._loop.close()
+            self._thread = self._loop = self._client = None
+
+
+dispatcher = BackgroundDispatcher()
+atexit.register(dispatcher.stop)
@@ -0,0 +1,78 @@
+import atexit
+import json
+import logging
+import threading
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from .models import DeliveryIntegrationLog
+
+logger = logging.getLogger(__name__)
+
+
+def _bounded(data):
+    """استبدال البيانات الكبيرة بملخص حتى لا يتضخم الجدول"""
+    size = len(json.dumps(data, ensure_ascii=False, default=str))
+    if size <= settings.DELIVERY_LOG_MAX_PAYLOAD:
+        return data
+    return {'truncated': True, 'size': size}
+
+
+class IntegrationLogSink:
+    """
+    كاتب سجل التكامل المؤقت
+
+    تُجمع السجلات في الذاكرة وتُكتب بإدخال جماعي عند بلوغ DELIVERY_LOG_BATCH_SIZE
+    أو كل DELIVERY_LOG_FLUSH_INTERVAL ثانية من خيط خلفي. قد تُفقد سجلات آخر دفعة
+    عند توقف العملية فجأة، وهذا مقبول لسجلات التشخيص.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, platform_id, action, request_data, response_data, status_code=None, error_message=''):
+        entry = DeliveryIntegrationLog(
+            platform_id=platform_id,
+            action=action,
+            request_data=_bounded(request_data),
+            response_data=_bounded(response_data),
+            status_code=status_code,
+            error_message=error_message,
+            is_success=not error_message,
+        )
+        with self._lock:
+            self._buffer.append(entry)
+            full = len(self._buffer) >= settings.DELIVERY_LOG_BATCH_SIZE
+            if not full and self._timer is None:
+                self._timer = threading.Timer(settings.DELIVERY_LOG_FLUSH_INTERVAL, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """كتابة كل السجلات المعلقة دفعة واحدة"""
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not entries:
+            return 0
+        try:
+            DeliveryIntegrationLog.objects.bulk_create(entries, batch_size=500)
+        except DatabaseError:
+            logger.exception("تعذر حفظ %s من سجلات التكامل", len(entries))
+            return 0
+        return len(entries)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+
+log_sink = IntegrationLogSink()
+atexit.register(log_sink.flush)
@@ -0,0 +1,77 @@
+import gzip
+import json
+import os
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from delivery.models import DeliveryIntegrationLog
+
+ARCHIVE_FIELDS = (
+    'id', 'platform_id', 'action', 'request_data', 'response_data',
+    'status_code', 'error_message', 'is_success', 'created_at',
+)
+
+
+class Command(BaseCommand):
+    help = 'أرشفة سجلات التكامل الأقدم من مدة الاحتفاظ في ملفات JSONL مضغوطة ثم حذفها'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.DELIVERY_LOG_RETENTION_DAYS, help='مدة الاحتفاظ بالأيام')
+        parser.add_argument('--output-dir', default=str(settings.DELIVERY_LOG_ARCHIVE_DIR), help='مجلد ملفات الأرشيف')
+        parser.add_argument('--no-archive', action='store_true', help='الحذف دون أرشفة')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.localdate() - timedelta(days=options['days'])
+        output_dir = Path(options['output_dir'])
+        if not options['no_archive']:
+            output_dir.mkdir(parents=True, exist_ok=True)
+
+        first = DeliveryIntegrationLog.objects.filter(
+            created_at__lt=self.day_start(cutoff)
+        ).order_by('created_at').values_list('created_at', flat=True).first()
+        if first is None:
+            self.stdout.write('لا توجد سجلات للأرشفة')
+            return
+
+        # كل يوم في ملف مستقل ثم حذف نطاق اليوم باستعلام واحد على فهرس created_at
+        day = timezone.localtime(first).date()
+        total = 0
+        while day < cutoff:
+            rows = DeliveryIntegrationLog.objects.filter(
+                created_at__gte=self.day_start(day), created_at__lt=self.day_start(day + timedelta(days=1))
+            )
+            path = output_dir / f'delivery_logs_{day.isoformat()}.jsonl.gz'
+            # وجود ملف اليوم يعني أن تشغيلاً سابقاً أرشفه وتوقف قبل الحذف،
+            # والأيام الأقدم من مدة الاحتفاظ لا تُضاف إليها سجلات جديدة
+            if not options['no_archive'] and not path.exists():
+                self.archive(rows, path)
+            deleted, _ = rows.delete()
+            if deleted:
+                self.stdout.write(f'{day}: {deleted} سجل')
+            total += deleted
+            day += timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'تمت أرشفة وحذف {total} سجل'))
+
+    @staticmethod
+    def day_start(day):
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    @staticmethod
+    def archive(rows, path):
+        # الكتابة إلى ملف مؤقت ثم إعادة تسميته، فلا يظهر ملف اليوم إلا كاملاً
+        # ولا يُنشأ ملف للأيام الخالية
+        temp_path = path.with_name(path.name + '.tmp')
+        archive = None
+        try:
+            for row in rows.order_by().values(*ARCHIVE_FIELDS).iterator(chunk_size=2000):
+                if archive is None:
+                    archive = gzip.open(temp_path, 'wt', encoding='utf-8')
+                archive.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+        finally:
+            if archive is not None:
+                archive.close()
+        if archive is not None:
+            os.replace(temp_path, path)
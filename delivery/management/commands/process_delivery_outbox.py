@@ -0,0 +1,38 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from delivery.client import DeliveryClient
+from delivery.log_sink import log_sink
+from delivery.outbox import drain
+
+
+class Command(BaseCommand):
+    help = 'إرسال الطلبات المعلقة في طابور منصات التوصيل'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='عدد الطلبات المحجوزة في كل دفعة')
+        parser.add_argument('--interval', type=float, default=2.0, help='ثوانٍ بين الدورات عند فراغ الطابور')
+        parser.add_argument('--once', action='store_true', help='تفريغ الطابور مرة واحدة ثم الخروج')
+
+    def handle(self, *args, **options):
+        try:
+            processed = asyncio.run(self.run(options))
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(f'تمت معالجة {processed} طلب'))
+
+    async def run(self, options):
+        client = DeliveryClient()
+        total = 0
+        try:
+            while True:
+                processed = await drain(client, batch_size=options['batch_size'])
+                total += processed
+                if processed:
+                    self.stdout.write(f'أُرسل {processed} طلب')
+                if options['once']:
+                    return total
+                await asyncio.sleep(options['interval'])
+        finally:
+            await client.aclose()
+            await sync_to_async(log_sink.flush)()
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:13
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryOutbox',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('action', models.CharField(choices=[('create_order', 'إنشاء طلب'), ('update_status', 'تحديث الحالة'), ('cancel_order', 'إلغاء طلب')], max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('idempotency_key', models.CharField(max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'في الانتظار'), ('processing', 'قيد الإرسال'), ('done', 'تم'), ('failed', 'فشل')], default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('available_at', models.DateTimeField(verbose_name='موعد المحاولة التالية')),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('claim_token', models.UUIDField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('delivery_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_entries', to='delivery.deliveryorder')),
+                ('platform', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_entries', to='delivery.deliveryplatform')),
+            ],
+            options={
+                'verbose_name': 'طلب صادر لمنصة توصيل',
+                'verbose_name_plural': 'الطلبات الصادرة لمنصات التوصيل',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='delivery_de_status_a4ade9_idx'), models.Index(fields=['delivery_order', 'created_at'], name='delivery_de_deliver_0f251b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0002_deliveryoutbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deliveryintegrationlog',
+            index=models.Index(fields=['platform', 'action', '-created_at'], name='delivery_de_platfor_573208_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryintegrationlog',
+            index=models.Index(fields=['created_at'], name='delivery_de_created_88f7ac_idx'),
+        ),
+    ]
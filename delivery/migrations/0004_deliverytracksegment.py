@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:19
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0003_deliveryintegrationlog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryTrackSegment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('point_count', models.PositiveIntegerField()),
+                ('points', models.JSONField()),
+                ('last_latitude', models.FloatField()),
+                ('last_longitude', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'مقطع مسار',
+                'verbose_name_plural': 'مقاطع المسار',
+                'ordering': ['started_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='deliverytracking',
+            index=models.Index(fields=['delivery_order', '-created_at'], name='delivery_de_deliver_320e40_idx'),
+        ),
+        migrations.AddField(
+            model_name='deliverytracksegment',
+            name='delivery_order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_segments', to='delivery.deliveryorder'),
+        ),
+        migrations.AddIndex(
+            model_name='deliverytracksegment',
+            index=models.Index(fields=['delivery_order', '-ended_at'], name='delivery_de_deliver_57074d_idx'),
+        ),
+    ]
@@ -41,6 +41,8 @@ class DeliveryOrder(models.Model):
         ('delivered', _('تم التسليم')),
         ('cancelled', _('ملغى')),
     ]
+    # الحالات النهائية لا يُنتقل منها، ولا يُنتقل إلى حالة سابقة في الترتيب
+    FINAL_STATUSES = ('delivered', 'cancelled')
     
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     sales_invoice = models.OneToOneField(SalesInvoice, on_delete=models.CASCADE, related_name='delivery_order')
@@ -67,6 +69,14 @@ class DeliveryOrder(models.Model):
     
     def __str__(self):
         return f"طلب توصيل #{self.platform_order_id}"
+    
+    @classmethod
+    def previous_statuses(cls, status):
+        """الحالات التي يُسمح بالانتقال منها إلى status"""
+        order = [value for value, _ in cls.STATUS_CHOICES if value != 'cancelled']
+        if status == 'cancelled':
+            return [value for value in order if value not in cls.FINAL_STATUSES]
+        return order[:order.index(status)]
 
 class DeliveryTracking(models.Model):
     """تتبع حالة التوصيل"""
@@ -83,10 +93,43 @@ class DeliveryTracking(models.Model):
         verbose_name = _('تتبع التوصيل')
         verbose_name_plural = _('تتبع التوصيل')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['delivery_order', '-created_at']),
+        ]
     
     def __str__(self):
         return f"تتبع #{self.delivery_order.platform_order_id}"
 
+class DeliveryTrackSegment(models.Model):
+    """
+    مقطع من مسار السائق: مجموعة نقاط GPS مرمزة بالفروق في صف واحد
+
+    points = {'t': [...], 'lat': [...], 'lon': [...]}؛ أول قيمة مطلقة والباقي فروق عن
+    السابقة. الوقت بالثواني من started_at والإحداثيات بوحدة 1e-6 درجة. المقاطع
+    تُضاف ولا تُعدل (delivery/tracking.py).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    delivery_order = models.ForeignKey(DeliveryOrder, on_delete=models.CASCADE, related_name='track_segments')
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    point_count = models.PositiveIntegerField()
+    points = models.JSONField()
+    # آخر نقطة في المقطع، لقراءة الموقع الحالي دون فك الترميز
+    last_latitude = models.FloatField()
+    last_longitude = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('مقطع مسار')
+        verbose_name_plural = _('مقاطع المسار')
+        ordering = ['started_at']
+        indexes = [
+            models.Index(fields=['delivery_order', '-ended_at']),
+        ]
+    
+    def __str__(self):
+        return f"مسار #{self.delivery_order.platform_order_id} ({self.point_count})"
+
 class DeliveryIntegrationLog(models.Model):
     """سجل التكامل مع منصات التوصيل"""
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
@@ -103,6 +146,55 @@ class DeliveryIntegrationLog(models.Model):
         verbose_name = _('سجل التكامل')
         verbose_name_plural = _('سجلات التكامل')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['platform', 'action', '-created_at']),
+            models.Index(fields=['created_at']),
+        ]
     
     def __str__(self):
         return f"{self.platform.get_platform_name_display()} - {self.action}"
+
+class DeliveryOutbox(models.Model):
+    """
+    طابور الطلبات الصادرة لمنصات التوصيل
+
+    يُكتب في نفس معاملة تعديل DeliveryOrder، ويُرسل لاحقاً بواسطة process_delivery_outbox.
+    """
+    ACTION_CHOICES = [
+        ('create_order', _('إنشاء طلب')),
+        ('update_status', _('تحديث الحالة')),
+        ('cancel_order', _('إلغاء طلب')),
+    ]
+    STATUS_CHOICES = [
+        ('pending', _('في الانتظار')),
+        ('processing', _('قيد الإرسال')),
+        ('done', _('تم')),
+        ('failed', _('فشل')),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    delivery_order = models.ForeignKey(DeliveryOrder, on_delete=models.CASCADE, related_name='outbox_entries')
+    platform = models.ForeignKey(DeliveryPlatform, on_delete=models.CASCADE, related_name='outbox_entries')
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    payload = models.JSONField(default=dict)
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(verbose_name=_('موعد المحاولة التالية'))
+    locked_until = models.DateTimeField(null=True, blank=True)
+    claim_token = models.UUIDField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('طلب صادر لمنصة توصيل')
+        verbose_name_plural = _('الطلبات الصادرة لمنصات التوصيل')
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+            models.Index(fields=['delivery_order', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_action_display()} - {self.idempotency_key}"
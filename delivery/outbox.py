@@ -0,0 +1,184 @@
+import asyncio
+import uuid
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, F
+from django.utils import timezone
+from .client import DeliveryPlatformError, platform_config
+from .dispatcher import dispatcher
+from .log_sink import log_sink
+from .models import DeliveryOrder, DeliveryOutbox, DeliveryTracking
+
+# ============================================
+# طابور الطلبات الصادرة (Outbox)
+# ============================================
+
+MAX_RETRY_DELAY = 300
+
+
+def transition_status(delivery_order_id, status, **fields):
+    """
+    نقل حالة طلب التوصيل بتحديث شرطي، ويُسجل تتبع عند نجاح الانتقال فقط
+
+    يعيد False إذا كان الطلب في حالة لا يُسمح بالانتقال منها، فلا يتكرر الانتقال
+    نفسه مهما تكررت الرسائل.
+    """
+    updated = DeliveryOrder.objects.filter(
+        pk=delivery_order_id, status__in=DeliveryOrder.previous_statuses(status)
+    ).update(status=status, updated_at=timezone.now(), **fields)
+    if updated:
+        DeliveryTracking.objects.create(delivery_order_id=delivery_order_id, status=status)
+    return bool(updated)
+
+
+def enqueue(delivery_order, action, payload=None, key=None):
+    """
+    إضافة طلب للطابور داخل المعاملة الحالية
+
+    مفتاح عدم التكرار ثابت لنفس الطلب والعملية، فإعادة الإضافة لا تُنشئ صفاً جديداً.
+    """
+    key = key or f"{delivery_order.pk}:{action}"
+    DeliveryOutbox.objects.bulk_create([
+        DeliveryOutbox(
+            delivery_order=delivery_order,
+            platform_id=delivery_order.platform_id,
+            action=action,
+            payload=payload or {},
+            idempotency_key=key,
+            available_at=timezone.now(),
+        )
+    ], ignore_conflicts=True)
+    if settings.DELIVERY_OUTBOX_DISPATCH_ON_COMMIT:
+        transaction.on_commit(schedule_drain)
+    return key
+
+
+def claim_batch(limit):
+    """
+    حجز دفعة من الطلبات الجاهزة لهذا العامل
+
+    تُقفل الصفوف بـ select_for_update(skip_locked) ثم يُكتب رمز الحجز بتحديث شرطي،
+    فلا يحجز عاملان الصف نفسه. تُستثنى الطلبات التي لها طلب سابق لم يكتمل لنفس طلب التوصيل،
+    وطلبات الطلب الذي فشل إنشاؤه على المنصة (لا رقم منصة لها حتى يُعاد الإنشاء).
+    """
+    now = timezone.now()
+    token = uuid.uuid4()
+    earlier = DeliveryOutbox.objects.filter(
+        delivery_order=OuterRef('delivery_order'),
+        created_at__lt=OuterRef('created_at'),
+        status__in=['pending', 'processing'],
+    )
+    not_created = DeliveryOutbox.objects.filter(
+        delivery_order=OuterRef('delivery_order'), action='create_order', status='failed',
+    )
+    ready = Q(status='pending', available_at__lte=now) | Q(status='processing', locked_until__lt=now)
+    with transaction.atomic():
+        ids = list(
+            DeliveryOutbox.objects.select_for_update(skip_locked=True)
+            .filter(ready)
+            .exclude(Exists(earlier))
+            .exclude(Exists(not_created))
+            .order_by('available_at')
+            .values_list('pk', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        DeliveryOutbox.objects.filter(ready, pk__in=ids).update(
+            status='processing',
+            claim_token=token,
+            locked_until=now + timedelta(seconds=settings.DELIVERY_OUTBOX_LEASE),
+            attempts=F('attempts') + 1,
+        )
+    return list(
+        DeliveryOutbox.objects.filter(claim_token=token, status='processing')
+        .select_related('platform', 'delivery_order')
+    )
+
+
+@transaction.atomic
+def complete(entry, response):
+    """تطبيق نتيجة ناجحة مرة واحدة فقط ما دام الحجز لهذا العامل"""
+    done = DeliveryOutbox.objects.filter(pk=entry.pk, claim_token=entry.claim_token, status='processing').update(
+        status='done', processed_at=timezone.now(), locked_until=None, last_error=''
+    )
+    if not done:
+        return False
+    if entry.action == 'create_order':
+        # رقم المنصة يُحفظ حتى لو تقدمت الحالة محلياً قبل وصول الرد
+        DeliveryOrder.objects.filter(pk=entry.delivery_order_id).update(
+            platform_order_id=response.data.get('order_id')
+        )
+        transition_status(entry.delivery_order_id, 'confirmed')
+    log_sink.add(entry.platform_id, entry.action, entry.payload, response.data, response.status_code)
+    return True
+
+
+@transaction.atomic
+def fail(entry, error):
+    """
+    إعادة جدولة الطلب بتأخير أسي للأخطاء المؤقتة، أو إيقافه نهائياً
+
+    فشل إنشاء الطلب نهائياً يوقف معه طلبات التحديث والإلغاء المنتظرة لنفس طلب التوصيل،
+    فلا تُرسل للمنصة دون رقم طلب.
+    """
+    final = not error.retryable or entry.attempts >= settings.DELIVERY_OUTBOX_MAX_ATTEMPTS
+    delay = min(2 ** entry.attempts * 5, MAX_RETRY_DELAY)
+    updated = DeliveryOutbox.objects.filter(pk=entry.pk, claim_token=entry.claim_token, status='processing').update(
+        status='failed' if final else 'pending',
+        available_at=timezone.now() + timedelta(seconds=delay),
+        locked_until=None,
+        last_error=str(error),
+    )
+    if updated and final and entry.action == 'create_order':
+        DeliveryOutbox.objects.filter(delivery_order_id=entry.delivery_order_id, status='pending').update(
+            status='failed', last_error=f"فشل إنشاء الطلب على المنصة: {error}",
+        )
+    log_sink.add(entry.platform_id, entry.action, entry.payload, error.data, error.status_code, str(error))
+
+
+async def send(client, entry):
+    """إرسال طلب واحد للمنصة مع مفتاح عدم التكرار"""
+    platform = entry.platform
+    token = getattr(platform, platform_config(platform.platform_name)['auth_field'])
+    key = entry.idempotency_key
+    if entry.action == 'create_order':
+        return await client.create_order(platform.platform_name, token, entry.payload, idempotency_key=key)
+    if entry.action == 'update_status':
+        return await client.update_status(
+            platform.platform_name, token, entry.delivery_order.platform_order_id, entry.payload['status'],
+            idempotency_key=key,
+        )
+    return await client.cancel_order(
+        platform.platform_name, token, entry.delivery_order.platform_order_id, idempotency_key=key
+    )
+
+
+async def process(client, entry):
+    try:
+        response = await send(client, entry)
+    except DeliveryPlatformError as e:
+        await sync_to_async(fail)(entry, e)
+        return False
+    except ValueError as e:
+        # منصة غير مدعومة: لا فائدة من إعادة المحاولة
+        await sync_to_async(fail)(entry, DeliveryPlatformError(str(e)))
+        return False
+    return await sync_to_async(complete)(entry, response)
+
+
+async def drain(client, batch_size=100):
+    """إرسال كل الطلبات الجاهزة على دفعات متزامنة؛ يعيد عدد الطلبات المعالجة"""
+    processed = 0
+    while True:
+        entries = await sync_to_async(claim_batch)(batch_size)
+        if not entries:
+            return processed
+        await asyncio.gather(*(process(client, entry) for entry in entries))
+        processed += len(entries)
+
+
+def schedule_drain():
+    """تشغيل drain في الموزع الخلفي (بعد تأكيد المعاملة)"""
+    dispatcher.submit(drain)
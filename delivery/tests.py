@@ -1,3 +1,316 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import timedelta
+from pathlib import Path
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from core.models import Company, Branch, Customer
+from pos.models import SalesInvoice
+from .client import DeliveryClient, DeliveryPlatformError, CircuitOpenError
+from .models import DeliveryIntegrationLog, DeliveryPlatform, DeliveryOrder, DeliveryOutbox, DeliveryTracking, DeliveryTrackSegment
+from .log_sink import log_sink
+from .outbox import claim_batch, enqueue, fail
+from .tracking import latest_positions, track_buffer, track_points
+from .webhooks import DEDUP_KEY, EventDeduplicator, deduplicator
+from .services import DeliveryPlatformService
 
-# Create your tests here.
+
+class StubPlatformHandler(BaseHTTPRequestHandler):
+    """منصة تجريبية: تعيد الرموز المحددة في server.responses بالترتيب ثم 200"""
+
+    def do_POST(self):
+        self.server.requests.append((self.command, self.path, dict(self.headers)))
+        status = self.server.responses.pop(0) if self.server.responses else 200
+        body = json.dumps({'order_id': 'P-1'} if status == 200 else {'error': 'stub'}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_PATCH = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+class DeliveryClientTests(SimpleTestCase):
+    """عميل المنصات مقابل خادم HTTP محلي"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubPlatformHandler)
+        self.server.requests = []
+        self.server.responses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        url = f'http://127.0.0.1:{self.server.server_address[1]}/v1'
+        overrides = override_settings(
+            DELIVERY_PLATFORM_URLS={'hanger': url},
+            DELIVERY_RETRY_BACKOFF=0,
+            DELIVERY_MAX_RETRIES=2,
+            DELIVERY_BREAKER_THRESHOLD=3,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def run_client(self, call):
+        async def main():
+            client = DeliveryClient()
+            try:
+                return await call(client)
+            finally:
+                await client.aclose()
+        return asyncio.run(main())
+
+    def test_retries_transient_errors(self):
+        self.server.responses = [503, 502]
+        response = self.run_client(lambda client: client.create_order('hanger', 'token', {}, idempotency_key='k1'))
+        self.assertEqual(response.data['order_id'], 'P-1')
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.requests[-1][2]['Authorization'], 'Bearer token')
+        self.assertEqual(self.server.requests[-1][2]['Idempotency-Key'], 'k1')
+
+    def test_client_errors_are_not_retried(self):
+        self.server.responses = [422]
+        with self.assertRaises(DeliveryPlatformError) as ctx:
+            self.run_client(lambda client: client.update_status('hanger', 'token', 'P-1', 'ready'))
+        self.assertEqual(ctx.exception.status_code, 422)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        self.server.responses = [503] * 10
+
+        async def call(client):
+            with self.assertRaises(DeliveryPlatformError):
+                await client.cancel_order('hanger', 'token', 'P-1')
+            with self.assertRaises(CircuitOpenError):
+                await client.cancel_order('hanger', 'token', 'P-1')
+
+        self.run_client(call)
+        self.assertEqual(len(self.server.requests), 3)
+
+
+@override_settings(DELIVERY_OUTBOX_DISPATCH_ON_COMMIT=False)
+class DeliveryOutboxTests(TestCase):
+    """طابور الطلبات الصادرة: عدم التكرار والانتقالات والترتيب"""
+
+    def setUp(self):
+        company = Company.objects.create(name_ar='شركة', name='Company', tax_id='OUTBOX-1', commercial_register='OUTBOX-1')
+        branch = Branch.objects.create(company=company, name_ar='فرع', name='Branch', code='OUTBOX-B')
+        customer = Customer.objects.create(company=company, name='Customer', phone='1')
+        today = timezone.localdate()
+        invoice = SalesInvoice.objects.create(
+            company=company, branch=branch, invoice_number='OUTBOX-INV', customer=customer,
+            invoice_date=today, due_date=today, total_amount=Decimal('10'),
+        )
+        platform = DeliveryPlatform.objects.create(company=company, platform_name='hanger', api_key='key')
+        self.order = DeliveryOrder.objects.create(
+            sales_invoice=invoice, platform=platform, platform_order_id='OUTBOX-1', customer=customer,
+            delivery_address='address', delivery_phone='1',
+        )
+        self.service = DeliveryPlatformService(platform)
+
+    def test_enqueue_is_idempotent(self):
+        self.service.create_order(self.order)
+        self.service.create_order(self.order)
+        self.assertEqual(DeliveryOutbox.objects.filter(action='create_order').count(), 1)
+
+    def test_status_transitions_apply_once(self):
+        self.assertIsNotNone(self.service.update_order_status(self.order, 'ready'))
+        self.assertIsNone(self.service.update_order_status(self.order, 'ready'))
+        self.assertIsNone(self.service.update_order_status(self.order, 'preparing'))
+        self.assertEqual(DeliveryTracking.objects.filter(delivery_order=self.order).count(), 1)
+        self.assertEqual(DeliveryOutbox.objects.filter(action='update_status').count(), 1)
+
+    def test_claim_waits_for_earlier_entries_of_the_same_order(self):
+        self.service.create_order(self.order)
+        self.service.cancel_order(self.order)
+        claimed = claim_batch(10)
+        self.assertEqual([entry.action for entry in claimed], ['create_order'])
+        self.assertEqual(claim_batch(10), [])
+
+    def test_failed_create_fails_dependent_entries(self):
+        # سجل التكامل يُكتب داخل معاملة الاختبار، لا من مؤقت الخيط الخلفي بعدها
+        self.addCleanup(log_sink.flush)
+        self.service.create_order(self.order)
+        self.service.cancel_order(self.order)
+        create, = claim_batch(10)
+        fail(create, DeliveryPlatformError("بيانات غير صالحة", status_code=422))
+        self.assertEqual(
+            dict(DeliveryOutbox.objects.values_list('action', 'status')),
+            {'create_order': 'failed', 'cancel_order': 'failed'},
+        )
+
+        # ما يُضاف بعد الفشل يبقى معلقاً حتى يُعاد الإنشاء
+        enqueue(self.order, 'update_status', {'status': 'ready'})
+        self.assertEqual(claim_batch(10), [])
+
+
+class DeliveryWebhookTests(TestCase):
+    """إشعارات المنصات: التوقيع وتطبيق الدفعة وإهمال المكرر"""
+
+    def setUp(self):
+        company = Company.objects.create(name_ar='شركة', name='Company', tax_id='HOOK-1', commercial_register='HOOK-1')
+        branch = Branch.objects.create(company=company, name_ar='فرع', name='Branch', code='HOOK-B')
+        customer = Customer.objects.create(company=company, name='Customer', phone='1')
+        today = timezone.localdate()
+        self.platform = DeliveryPlatform.objects.create(
+            company=company, platform_name='hanger', api_key='key', api_secret='secret'
+        )
+        self.orders = []
+        for n in range(2):
+            invoice = SalesInvoice.objects.create(
+                company=company, branch=branch, invoice_number=f'HOOK-INV-{n}', customer=customer,
+                invoice_date=today, due_date=today, total_amount=Decimal('10'),
+            )
+            self.orders.append(DeliveryOrder.objects.create(
+                sales_invoice=invoice, platform=self.platform, platform_order_id=f'HOOK-{n}',
+                customer=customer, delivery_address='address', delivery_phone='1', status='ready',
+            ))
+        self.url = f'/delivery/webhooks/{self.platform.pk}/'
+        cache.clear()
+        deduplicator._seen.clear()
+
+    def post(self, data, secret='secret'):
+        body = json.dumps(data).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(self.url, body, content_type='application/json', HTTP_X_SIGNATURE=signature)
+
+    def test_rejects_invalid_signature(self):
+        response = self.post({'id': 'e1', 'order_id': 'HOOK-0', 'status': 'on_the_way'}, secret='wrong')
+        self.assertEqual(response.status_code, 401)
+        self.orders[0].refresh_from_db()
+        self.assertEqual(self.orders[0].status, 'ready')
+
+    def test_applies_batch_and_ignores_duplicates(self):
+        events = [
+            {'id': 'e1', 'order_id': 'HOOK-0', 'status': 'on_the_way'},
+            {'id': 'e2', 'order_id': 'HOOK-1', 'status': 'delivered'},
+            {'id': 'e3', 'order_id': 'HOOK-0', 'latitude': 24.7, 'longitude': 46.7, 'location': 'Riyadh'},
+            {'id': 'e4', 'order_id': 'MISSING', 'status': 'delivered'},
+        ]
+        response = self.post({'events': events})
+        self.assertEqual(response.status_code, 200, response.content)
+        result = response.json()
+        self.assertEqual((result['applied'], result['tracking'], result['positions'], result['duplicates']), (2, 2, 1, 0))
+        self.assertEqual(result['unknown_orders'], ['MISSING'])
+
+        result = self.post({'events': events[:2] + [{'id': 'e5', 'order_id': 'HOOK-0', 'status': 'ready'}]}).json()
+        self.assertEqual((result['applied'], result['tracking'], result['duplicates']), (0, 0, 2))
+
+        self.orders[0].refresh_from_db()
+        self.orders[1].refresh_from_db()
+        self.assertEqual((self.orders[0].status, self.orders[0].driver_location), ('on_the_way', 'Riyadh'))
+        self.assertEqual(self.orders[1].status, 'delivered')
+        self.assertIsNotNone(self.orders[1].actual_delivery_time)
+        self.assertEqual(DeliveryTracking.objects.filter(delivery_order__in=self.orders).count(), 2)
+
+    def test_unknown_order_event_is_accepted_when_resent(self):
+        event = {'id': 'e1', 'order_id': 'HOOK-LATE', 'status': 'on_the_way'}
+        self.assertEqual(self.post(event).json()['unknown_orders'], ['HOOK-LATE'])
+
+        DeliveryOrder.objects.filter(pk=self.orders[0].pk).update(platform_order_id='HOOK-LATE')
+        result = self.post(event).json()
+        self.assertEqual((result['applied'], result['duplicates']), (1, 0))
+        self.orders[0].refresh_from_db()
+        self.assertEqual(self.orders[0].status, 'on_the_way')
+
+    def test_shared_cache_rejects_events_seen_by_another_process(self):
+        # عملية أخرى (ذاكرة LRU مستقلة) سجلت e1 في الـ cache المشترك
+        other = EventDeduplicator()
+        self.assertEqual(other.filter_new(self.platform.pk, ['e1']), {'e1'})
+        self.assertEqual(deduplicator.filter_new(self.platform.pk, ['e1', 'e2']), {'e2'})
+        self.assertEqual(other.filter_new(self.platform.pk, ['e2']), set())
+
+        deduplicator.forget(self.platform.pk, ['e2'])
+        self.assertIsNone(cache.get(DEDUP_KEY.format(platform_id=self.platform.pk, event_id='e2')))
+        self.assertEqual(deduplicator.filter_new(self.platform.pk, ['e2']), {'e2'})
+
+    def test_positions_are_stored_compactly(self):
+        start = timezone.now().replace(microsecond=0)
+        events = [
+            {'id': f'p{n}', 'order_id': 'HOOK-0', 'latitude': latitude, 'longitude': 46.7,
+             'recorded_at': (start + timedelta(seconds=5 * n)).isoformat()}
+            for n, latitude in enumerate([24.7, 24.701, 24.702])
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post({'events': events[::-1]})
+        self.assertEqual(latest_positions([self.orders[0].pk])[self.orders[0].pk][1], 24.702)
+
+        self.assertEqual(track_buffer.flush(), 1)
+        segment = DeliveryTrackSegment.objects.get(delivery_order=self.orders[0])
+        self.assertEqual(segment.points['t'], [0, 5, 5])
+        self.assertEqual([point[1] for point in track_points(self.orders[0].pk)], [24.7, 24.701, 24.702])
+        cache.clear()
+        self.assertEqual(latest_positions([self.orders[0].pk])[self.orders[0].pk][1:], (24.702, 46.7))
+
+
+class DeliveryIntegrationLogTests(TestCase):
+    """سجل التكامل: الكتابة الجماعية من الذاكرة وأرشفة السجلات القديمة"""
+
+    def setUp(self):
+        company = Company.objects.create(name_ar='شركة', name='Company', tax_id='LOG-1', commercial_register='LOG-1')
+        self.platform = DeliveryPlatform.objects.create(company=company, platform_name='hanger', api_key='key')
+        self.addCleanup(log_sink.flush)
+
+    @override_settings(DELIVERY_LOG_BATCH_SIZE=3, DELIVERY_LOG_MAX_PAYLOAD=50)
+    def test_full_buffer_is_written_in_one_batch(self):
+        log_sink.add(self.platform.pk, 'create_order', {'items': 'x' * 100}, {'order_id': '1'}, 201)
+        log_sink.add(self.platform.pk, 'update_status', {'status': 'ready'}, {}, 200)
+        self.assertFalse(DeliveryIntegrationLog.objects.exists())
+
+        with self.assertNumQueries(1):
+            log_sink.add(self.platform.pk, 'cancel_order', {}, {'error': 'gone'}, 410, 'الطلب غير موجود')
+        logs = {log.action: log for log in DeliveryIntegrationLog.objects.all()}
+        self.assertEqual(set(logs), {'create_order', 'update_status', 'cancel_order'})
+        self.assertEqual(logs['create_order'].request_data, {'truncated': True, 'size': 113})
+        self.assertEqual(logs['update_status'].request_data, {'status': 'ready'})
+        self.assertTrue(logs['update_status'].is_success)
+        self.assertEqual((logs['cancel_order'].status_code, logs['cancel_order'].is_success), (410, False))
+        self.assertEqual(log_sink.flush(), 0)
+
+    def test_archive_moves_old_rows_to_daily_files(self):
+        log_sink.add(self.platform.pk, 'create_order', {'n': 1}, {}, 201)
+        log_sink.add(self.platform.pk, 'create_order', {'n': 2}, {}, 201)
+        log_sink.add(self.platform.pk, 'create_order', {'n': 3}, {}, 201)
+        log_sink.flush()
+        old, older, recent = DeliveryIntegrationLog.objects.order_by('request_data__n')
+        now = timezone.now()
+        DeliveryIntegrationLog.objects.filter(pk=old.pk).update(created_at=now - timedelta(days=100))
+        DeliveryIntegrationLog.objects.filter(pk=older.pk).update(created_at=now - timedelta(days=120))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('archive_delivery_logs', days=90, output_dir=output_dir, stdout=io.StringIO())
+            files = sorted(Path(output_dir).iterdir())
+            self.assertEqual(len(files), 2)
+            archived = [json.loads(line) for path in files for line in gzip.open(path, 'rt', encoding='utf-8')]
+        self.assertEqual([row['request_data'] for row in archived], [{'n': 2}, {'n': 1}])
+        self.assertEqual(list(DeliveryIntegrationLog.objects.values_list('pk', flat=True)), [recent.pk])
+
+    def test_archive_rerun_skips_days_already_archived(self):
+        log_sink.add(self.platform.pk, 'create_order', {'n': 1}, {}, 201)
+        log_sink.flush()
+        created_at = timezone.now() - timedelta(days=100)
+        DeliveryIntegrationLog.objects.update(created_at=created_at)
+        name = f'delivery_logs_{timezone.localtime(created_at).date().isoformat()}.jsonl.gz'
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            # تشغيل سابق أعاد تسمية ملف اليوم ثم توقف قبل حذف السجلات
+            with gzip.open(Path(output_dir) / name, 'wt', encoding='utf-8') as archive:
+                archive.write('{"request_data": {"n": 1}}\n')
+
+            call_command('archive_delivery_logs', days=90, output_dir=output_dir, stdout=io.StringIO())
+            lines = list(gzip.open(Path(output_dir) / name, 'rt', encoding='utf-8'))
+        self.assertEqual(len(lines), 1)
+        self.assertFalse(DeliveryIntegrationLog.objects.exists())
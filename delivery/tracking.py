@@ -0,0 +1,170 @@
+import atexit
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from .models import DeliveryTrackSegment
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# مسار السائق: نقاط GPS مضغوطة في مقاطع
+# ============================================
+
+POSITION_KEY = 'delivery:position:{order_id}'
+# الإحداثيات تُخزن أعداداً صحيحة بوحدة 1e-6 درجة (حوالي 10 سم)
+COORDINATE_SCALE = 1_000_000
+
+
+def encode_points(points):
+    """ترميز [(recorded_at, latitude, longitude)] مرتبة زمنياً بالفروق"""
+    started_at = points[0][0]
+    encoded = {'t': [], 'lat': [], 'lon': []}
+    previous = (0, 0, 0)
+    for recorded_at, latitude, longitude in points:
+        current = (
+            round((recorded_at - started_at).total_seconds()),
+            round(latitude * COORDINATE_SCALE),
+            round(longitude * COORDINATE_SCALE),
+        )
+        encoded['t'].append(current[0] - previous[0])
+        encoded['lat'].append(current[1] - previous[1])
+        encoded['lon'].append(current[2] - previous[2])
+        previous = current
+    return encoded
+
+
+def decode_points(segment):
+    """فك ترميز مقطع إلى [(recorded_at, latitude, longitude)]"""
+    points = []
+    seconds = latitude = longitude = 0
+    for dt, dlat, dlon in zip(segment.points['t'], segment.points['lat'], segment.points['lon']):
+        seconds += dt
+        latitude += dlat
+        longitude += dlon
+        points.append((
+            segment.started_at + timedelta(seconds=seconds),
+            latitude / COORDINATE_SCALE,
+            longitude / COORDINATE_SCALE,
+        ))
+    return points
+
+
+class TrackBuffer:
+    """
+    مُجمّع نقاط المسار
+
+    آخر موقع لكل طلب يُكتب في الـ cache فوراً، والنقاط تُجمع في الذاكرة وتُكتب
+    مقاطعَ بإدخال جماعي عند بلوغ DELIVERY_TRACK_BATCH_SIZE أو كل
+    DELIVERY_TRACK_FLUSH_INTERVAL ثانية. قد تُفقد نقاط آخر دفعة عند توقف العملية فجأة.
+    """
+
+    def __init__(self):
+        self._points = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, order_id, latitude, longitude, recorded_at=None):
+        self.extend([(order_id, latitude, longitude, recorded_at)])
+
+    def extend(self, pings):
+        """pings: [(order_id, latitude, longitude, recorded_at أو None)]"""
+        now = timezone.now()
+        latest = {}
+        with self._lock:
+            for order_id, latitude, longitude, recorded_at in pings:
+                point = (recorded_at or now, float(latitude), float(longitude))
+                self._points.setdefault(order_id, []).append(point)
+                if order_id not in latest or point[0] >= latest[order_id][0]:
+                    latest[order_id] = point
+            self._pending += len(pings)
+            full = self._pending >= settings.DELIVERY_TRACK_BATCH_SIZE
+            if not full and self._pending and self._timer is None:
+                self._timer = threading.Timer(settings.DELIVERY_TRACK_FLUSH_INTERVAL, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        cache.set_many(
+            {POSITION_KEY.format(order_id=order_id): point for order_id, point in latest.items()},
+            timeout=settings.DELIVERY_TRACK_POSITION_TTL,
+        )
+        if full:
+            self.flush()
+
+    def flush(self):
+        """كتابة النقاط المعلقة مقاطعَ؛ يعيد عدد المقاطع"""
+        with self._lock:
+            pending, self._points, self._pending = self._points, {}, 0
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        segments = []
+        size = settings.DELIVERY_TRACK_SEGMENT_POINTS
+        for order_id, points in pending.items():
+            points.sort(key=lambda point: point[0])
+            for start in range(0, len(points), size):
+                chunk = points[start:start + size]
+                segments.append(DeliveryTrackSegment(
+                    delivery_order_id=order_id,
+                    started_at=chunk[0][0],
+                    ended_at=chunk[-1][0],
+                    point_count=len(chunk),
+                    points=encode_points(chunk),
+                    last_latitude=chunk[-1][1],
+                    last_longitude=chunk[-1][2],
+                ))
+        if not segments:
+            return 0
+        try:
+            DeliveryTrackSegment.objects.bulk_create(segments, batch_size=500)
+        except DatabaseError:
+            logger.exception("تعذر حفظ %s من مقاطع المسار", len(segments))
+            return 0
+        return len(segments)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+
+track_buffer = TrackBuffer()
+atexit.register(track_buffer.flush)
+
+
+def latest_positions(order_ids):
+    """
+    آخر موقع معروف لكل طلب: {order_id: (recorded_at, latitude, longitude)}
+
+    من الـ cache أولاً، وللباقي استعلام واحد على آخر مقطع لكل طلب.
+    """
+    keys = {POSITION_KEY.format(order_id=order_id): order_id for order_id in order_ids}
+    positions = {keys[key]: point for key, point in cache.get_many(keys).items()}
+    missing = {str(order_id): order_id for order_id in order_ids if order_id not in positions}
+    if missing:
+        last_segment = DeliveryTrackSegment.objects.filter(
+            delivery_order=OuterRef('delivery_order')
+        ).order_by('-ended_at').values('pk')[:1]
+        rows = DeliveryTrackSegment.objects.filter(
+            delivery_order_id__in=missing.values(), pk=Subquery(last_segment)
+        ).values_list('delivery_order_id', 'ended_at', 'last_latitude', 'last_longitude')
+        for order_id, ended_at, latitude, longitude in rows:
+            positions[missing[str(order_id)]] = (ended_at, latitude, longitude)
+    return positions
+
+
+def track_points(order_id, since=None):
+    """نقاط مسار طلب مرتبة زمنياً، اختيارياً من since"""
+    segments = DeliveryTrackSegment.objects.filter(delivery_order_id=order_id).order_by('started_at')
+    if since is not None:
+        segments = segments.filter(ended_at__gte=since)
+    points = [point for segment in segments for point in decode_points(segment)]
+    if since is not None:
+        points = [point for point in points if point[0] >= since]
+    points.sort(key=lambda point: point[0])
+    return points
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'delivery'
+
+urlpatterns = [
+    path('webhooks/<uuid:platform_id>/', views.webhook, name='webhook'),
+    path('positions/', views.positions, name='positions'),
+    path('orders/<uuid:order_id>/track/', views.track, name='track'),
+]
@@ -1,3 +1,70 @@
-from django.shortcuts import render
+import json
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET, require_POST
+from .client import platform_config
+from .models import DeliveryOrder, DeliveryPlatform
+from .tracking import latest_positions, track_points
+from .webhooks import WebhookError, verify_signature, parse_events, receive
 
-# Create your views here.
+
+@csrf_exempt
+@require_POST
+def webhook(request, platform_id):
+    """استقبال إشعارات حالة الطلبات من منصة التوصيل"""
+    platform = get_object_or_404(DeliveryPlatform, pk=platform_id, is_active=True)
+    try:
+        header = platform_config(platform.platform_name)['signature_header']
+    except ValueError:
+        return JsonResponse({'error': 'Unsupported platform'}, status=404)
+
+    if not verify_signature(platform, request.body, request.headers.get(header)):
+        return JsonResponse({'error': 'Invalid signature'}, status=401)
+
+    try:
+        events = parse_events(json.loads(request.body))
+    except (ValueError, WebhookError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(receive(platform, events))
+
+
+def _point(point):
+    recorded_at, latitude, longitude = point
+    return {'recorded_at': recorded_at.isoformat(), 'latitude': latitude, 'longitude': longitude}
+
+
+@login_required
+@require_GET
+def positions(request):
+    """آخر موقع لكل طلب في الطريق لشركة المستخدم (للخريطة الحية)"""
+    if not request.user.branch:
+        return JsonResponse({'error': 'No branch assigned'}, status=403)
+    orders = dict(DeliveryOrder.objects.filter(
+        platform__company=request.user.branch.company, status__in=('ready', 'on_the_way')
+    ).values_list('id', 'platform_order_id'))
+    return JsonResponse({'results': [
+        {'order_id': str(order_id), 'platform_order_id': orders[order_id], **_point(point)}
+        for order_id, point in latest_positions(list(orders)).items()
+    ]})
+
+
+@login_required
+@require_GET
+def track(request, order_id):
+    """نقاط مسار طلب، اختيارياً من ?since="""
+    if not request.user.branch:
+        return JsonResponse({'error': 'No branch assigned'}, status=403)
+    order = get_object_or_404(DeliveryOrder, pk=order_id, platform__company=request.user.branch.company)
+    since = request.GET.get('since')
+    if since:
+        since = parse_datetime(since)
+        if since is None:
+            return JsonResponse({'error': 'Invalid since'}, status=400)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+    return JsonResponse({'order_id': str(order.pk), 'points': [_point(point) for point in track_points(order.pk, since)]})
@@ -0,0 +1,197 @@
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import DeliveryOrder, DeliveryTracking
+from .tracking import track_buffer
+
+# ============================================
+# الإشعارات الواردة من منصات التوصيل
+# ============================================
+
+DEDUP_KEY = 'delivery:webhook:{platform_id}:{event_id}'
+
+
+class WebhookError(Exception):
+    """إشعار غير صالح"""
+
+
+def verify_signature(platform, body, signature):
+    """التحقق من توقيع HMAC-SHA256 لجسم الطلب بمفتاح api_secret للمنصة"""
+    if not platform.api_secret or not signature:
+        return False
+    expected = hmac.new(platform.api_secret.encode(), body, hashlib.sha256).hexdigest()
+    if signature.startswith('sha256='):
+        signature = signature[len('sha256='):]
+    return hmac.compare_digest(expected, signature)
+
+
+class EventDeduplicator:
+    """
+    ذاكرة محدودة بمعرفات الأحداث المستلمة
+
+    LRU محلي بحد أقصى DELIVERY_WEBHOOK_DEDUP_SIZE يمنع التكرار دون الرجوع لأي مخزن،
+    والـ cache المشترك يمنعه بين العمليات بـ cache.add الذرية: من ينجح في إضافة المفتاح أولاً
+    يطبق الحدث. يتطلب ذلك cache مشتركاً (CACHE_BACKEND، انظر api.W001)، وإلا فالحماية داخل
+    العملية فقط. الانتقالات الشرطية تبقى خط الحماية الأخير.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or settings.DELIVERY_WEBHOOK_DEDUP_SIZE
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter_new(self, platform_id, event_ids):
+        """إرجاع المعرفات التي لم تُستلم من قبل وتسجيلها"""
+        keys = {DEDUP_KEY.format(platform_id=platform_id, event_id=event_id): event_id for event_id in event_ids}
+        with self._lock:
+            candidates = [key for key in keys if key not in self._seen]
+        if not candidates:
+            return set()
+        # add لا يكتب فوق مفتاح موجود، فلا يقبل طلبان متزامنان الحدث نفسه
+        new = [key for key in candidates if cache.add(key, 1, timeout=settings.DELIVERY_WEBHOOK_DEDUP_TTL)]
+        with self._lock:
+            for key in candidates:
+                self._seen[key] = None
+                self._seen.move_to_end(key)
+            while len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+        return {keys[key] for key in new}
+
+    def forget(self, platform_id, event_ids):
+        """إلغاء تسجيل أحداث لم تُطبق حتى تُقبل عند إعادة إرسالها"""
+        keys = [DEDUP_KEY.format(platform_id=platform_id, event_id=event_id) for event_id in event_ids]
+        cache.delete_many(keys)
+        with self._lock:
+            for key in keys:
+                self._seen.pop(key, None)
+
+
+deduplicator = EventDeduplicator()
+
+
+def parse_events(data):
+    """الإشعار حدث واحد أو {'events': [...]}؛ لكل حدث id و order_id على الأقل"""
+    events = data.get('events', [data]) if isinstance(data, dict) else None
+    if not isinstance(events, list) or len(events) > settings.DELIVERY_WEBHOOK_MAX_EVENTS:
+        raise WebhookError("صيغة الإشعار غير صالحة")
+    valid_statuses = {value for value, _ in DeliveryOrder.STATUS_CHOICES}
+    parsed = []
+    for event in events:
+        if not isinstance(event, dict) or not event.get('id') or not event.get('order_id'):
+            raise WebhookError("كل حدث يجب أن يحتوي id و order_id")
+        status = event.get('status')
+        if status is not None and status not in valid_statuses:
+            raise WebhookError(f"حالة غير معروفة: {status}")
+        coordinates = (event.get('latitude'), event.get('longitude'))
+        if coordinates != (None, None) and not all(
+            isinstance(value, (int, float)) and not isinstance(value, bool) for value in coordinates
+        ):
+            raise WebhookError("latitude و longitude يجب أن يكونا رقمين")
+        recorded_at = event.get('recorded_at')
+        if recorded_at is not None:
+            recorded_at = parse_datetime(recorded_at) if isinstance(recorded_at, str) else None
+            if recorded_at is None:
+                raise WebhookError("recorded_at يجب أن يكون تاريخاً بصيغة ISO 8601")
+            if timezone.is_naive(recorded_at):
+                recorded_at = timezone.make_aware(recorded_at)
+            event['recorded_at'] = recorded_at
+        parsed.append(event)
+    return parsed
+
+
+@transaction.atomic
+def apply_events(platform, events):
+    """
+    تطبيق دفعة أحداث باستعلامات ثابتة العدد
+
+    قراءة الطلبات باستعلام واحد، ثم تحديث شرطي واحد لكل حالة مستهدفة، وتحديث
+    موقع السائق بـ bulk_update، وإدخال التتبع بـ bulk_create. نقاط GPS تذهب إلى
+    مسار السائق المضغوط بعد الحفظ، إلا إذا كان DELIVERY_TRACK_STORAGE = 'rows'.
+    """
+    compact = settings.DELIVERY_TRACK_STORAGE == 'compact'
+    orders = {
+        order.platform_order_id: order
+        for order in DeliveryOrder.objects.filter(
+            platform=platform, platform_order_id__in={event['order_id'] for event in events}
+        ).only('id', 'platform_order_id', 'status', 'driver_location')
+    }
+
+    tracking = []
+    pings = []
+    transitions = {}
+    located = {}
+    unknown = []
+    for event in events:
+        order = orders.get(event['order_id'])
+        if order is None:
+            unknown.append(event['order_id'])
+            continue
+        status = event.get('status')
+        moved = status is not None and order.status in DeliveryOrder.previous_statuses(status)
+        if moved:
+            order.status = status
+            transitions.setdefault(status, []).append(order.pk)
+        latitude, longitude = event.get('latitude'), event.get('longitude')
+        if compact and latitude is not None:
+            pings.append((order.pk, latitude, longitude, event.get('recorded_at')))
+        if moved or (latitude is not None and not compact):
+            tracking.append(DeliveryTracking(
+                delivery_order_id=order.pk,
+                status=order.status,
+                location=(event.get('location') or '')[:255],
+                latitude=latitude,
+                longitude=longitude,
+                notes=event.get('notes') or '',
+            ))
+        if event.get('location'):
+            order.driver_location = event['location'][:255]
+            located[order.pk] = order
+
+    now = timezone.now()
+    for status, order_ids in transitions.items():
+        fields = {'actual_delivery_time': now} if status == 'delivered' else {}
+        DeliveryOrder.objects.filter(
+            pk__in=order_ids, status__in=DeliveryOrder.previous_statuses(status)
+        ).update(status=status, updated_at=now, **fields)
+    if located:
+        DeliveryOrder.objects.bulk_update(located.values(), ['driver_location'], batch_size=500)
+    DeliveryTracking.objects.bulk_create(tracking, batch_size=500)
+    if pings:
+        transaction.on_commit(lambda: track_buffer.extend(pings))
+
+    return {
+        'applied': sum(len(ids) for ids in transitions.values()),
+        'tracking': len(tracking),
+        'positions': len(pings),
+        'unknown_orders': unknown,
+    }
+
+
+def receive(platform, events):
+    """إزالة الأحداث المكررة ثم تطبيق الباقي"""
+    new_ids = deduplicator.filter_new(platform.pk, [str(event['id']) for event in events])
+    fresh = {}
+    for event in events:
+        if str(event['id']) in new_ids:
+            fresh.setdefault(str(event['id']), event)
+    result = {'applied': 0, 'tracking': 0, 'positions': 0, 'unknown_orders': []}
+    if fresh:
+        try:
+            result = apply_events(platform, list(fresh.values()))
+        except Exception:
+            deduplicator.forget(platform.pk, fresh.keys())
+            raise
+        # أحداث طلبات لم تُنشأ بعد لم تُطبق، فتُقبل عند إعادة إرسالها
+        unknown = set(result['unknown_orders'])
+        if unknown:
+            deduplicator.forget(platform.pk, [
+                event_id for event_id, event in fresh.items() if event['order_id'] in unknown
+            ])
+    result.update(received=len(events), duplicates=len(events) - len(fresh))
+    return result
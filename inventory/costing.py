@@ -0,0 +1,297 @@
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+from .models import CostCheckpoint, CostLayer, CostState, InventoryMovement, Product
+
+# ============================================
+# تكلفة المخزون المستمرة (FIFO والمتوسط المرجح) لكل (منتج، فرع)
+# ============================================
+
+ZERO = Decimal('0')
+COST_PLACES = Decimal('0.0001')
+
+# الحركات الواردة التي يمثل سعرها تكلفة الشراء؛ غيرها يدخل بالتكلفة الحالية
+PRICED_INCOMING = ('purchase', 'production')
+
+# يُرسل داخل معاملة إعادة الحساب: references = {reference_type: {reference_id, ...}}
+# للمستندات التي تغيرت تكلفة حركاتها (مثل فواتير البيع لإعادة ترحيل تكلفة المبيعات)
+costs_changed = Signal()
+
+
+def _month(moment):
+    return timezone.localdate(moment).replace(day=1)
+
+
+class CostTracker:
+    """
+    تكلفة منتج في فرع أثناء المرور على حركاته بالترتيب
+
+    quantity قد تصبح سالبة إذا صُرف أكثر من الرصيد، وتُسعَّر الكمية الناقصة
+    بآخر تكلفة معروفة.
+    """
+
+    def __init__(self, method, fallback_cost, quantity=ZERO, value=ZERO, average_cost=ZERO, layers=None):
+        self.method = method
+        self.quantity = quantity
+        self.value = value
+        self.average_cost = average_cost or fallback_cost
+        self.layers = [list(layer) for layer in layers or []]
+
+    @classmethod
+    def from_checkpoint(cls, method, fallback_cost, checkpoint):
+        return cls(method, fallback_cost, checkpoint.quantity, checkpoint.value, checkpoint.average_cost,
+                   [[Decimal(q), Decimal(c)] for q, c in checkpoint.layers])
+
+    def receive(self, quantity, unit_cost):
+        unit_cost = unit_cost.quantize(COST_PLACES)
+        if self.method == 'fifo':
+            # الوارد يغطي العجز أولاً، والباقي طبقة جديدة
+            deficit = max(-self.quantity, ZERO)
+            remaining = quantity - min(quantity, deficit)
+            if remaining:
+                self.layers.append([remaining, unit_cost])
+            self.quantity += quantity
+            self.value = sum((q * c for q, c in self.layers), ZERO) - max(-self.quantity, ZERO) * unit_cost
+        else:
+            self.quantity += quantity
+            self.value += quantity * unit_cost
+        self.average_cost = (self.value / self.quantity).quantize(COST_PLACES) if self.quantity > 0 else unit_cost
+        return unit_cost
+
+    def issue(self, quantity):
+        if not quantity:
+            return self.average_cost
+        if self.method == 'fifo':
+            remaining, cost = quantity, ZERO
+            while remaining and self.layers:
+                layer = self.layers[0]
+                taken = min(layer[0], remaining)
+                cost += taken * layer[1]
+                remaining -= taken
+                layer[0] -= taken
+                self.average_cost = layer[1]
+                if not layer[0]:
+                    self.layers.pop(0)
+            cost += remaining * self.average_cost
+            unit_cost = (cost / quantity).quantize(COST_PLACES)
+            self.quantity -= quantity
+            self.value -= cost
+            if self.quantity > 0:
+                self.average_cost = (self.value / self.quantity).quantize(COST_PLACES)
+            return unit_cost
+        unit_cost = self.average_cost
+        self.quantity -= quantity
+        self.value = self.quantity * unit_cost if self.quantity else ZERO
+        return unit_cost
+
+    def apply(self, movement):
+        """تكلفة وحدة الحركة بعد تطبيقها على الحالة"""
+        if movement.direction == InventoryMovement.DIRECTION_IN:
+            price = movement.unit_price if movement.movement_type in PRICED_INCOMING and movement.unit_price else None
+            return self.receive(movement.quantity, self.average_cost if price is None else Decimal(price))
+        return self.issue(movement.quantity)
+
+    def checkpoint(self, product_id, branch_id, period):
+        return CostCheckpoint(
+            product_id=product_id, branch_id=branch_id, period=period,
+            quantity=self.quantity, value=self.value.quantize(COST_PLACES), average_cost=self.average_cost,
+            layers=[[str(q), str(c)] for q, c in self.layers],
+        )
+
+    def state(self, product_id, branch_id, last_movement_at, last_movement_id):
+        return CostState(
+            product_id=product_id, branch_id=branch_id,
+            quantity=self.quantity, value=self.value.quantize(COST_PLACES), average_cost=self.average_cost,
+            last_movement_at=last_movement_at, last_movement_id=last_movement_id,
+        )
+
+
+def _pairs_filter(pairs):
+    """شرط (منتج، فرع) لمجموعة أزواج، مجمعاً حسب الفرع حتى لا يطول الاستعلام"""
+    by_branch = defaultdict(list)
+    for product_id, branch_id in pairs:
+        by_branch[branch_id].append(product_id)
+    condition = Q(pk__in=[])
+    for branch_id, product_ids in by_branch.items():
+        condition |= Q(branch_id=branch_id, product_id__in=product_ids)
+    return condition
+
+
+def _save(pairs, trackers, positions, checkpoints, methods):
+    """حفظ حالات التكلفة وطبقات FIFO ونقاط الشهور لمجموعة أزواج بعدد ثابت من الاستعلامات"""
+    CostState.objects.bulk_create(
+        [trackers[pair].state(*pair, *positions[pair]) for pair in pairs],
+        update_conflicts=True,
+        unique_fields=['product', 'branch'],
+        update_fields=['quantity', 'value', 'average_cost', 'last_movement_at', 'last_movement_id'],
+    )
+    fifo = [pair for pair in pairs if methods[pair[0]] == 'fifo']
+    if fifo:
+        CostLayer.objects.filter(_pairs_filter(fifo)).delete()
+        CostLayer.objects.bulk_create([
+            CostLayer(product_id=pair[0], branch_id=pair[1], sequence=index, quantity=quantity, unit_cost=unit_cost)
+            for pair in fifo
+            for index, (quantity, unit_cost) in enumerate(trackers[pair].layers)
+        ], batch_size=1000)
+    if checkpoints:
+        CostCheckpoint.objects.bulk_create(checkpoints, ignore_conflicts=True, batch_size=1000)
+
+
+def _products(product_ids):
+    return {
+        pk: (method, cost_price)
+        for pk, method, cost_price in Product.objects.filter(pk__in=product_ids).values_list(
+            'pk', 'costing_method', 'cost_price'
+        )
+    }
+
+
+def apply_movements(movements):
+    """
+    حساب unit_cost لحركات جديدة قبل حفظها وتحديث حالة التكلفة
+
+    تُقرأ حالة كل (منتج، فرع) وطبقاته مرة واحدة للدفعة ثم تُكتب بإدخال جماعي،
+    وتُحفظ نقطة بداية الشهر عند أول حركة في شهر جديد. يُنفذ داخل معاملة الحركات.
+    """
+    movements = [m for m in movements if m.unit_cost is None]
+    if not movements:
+        return
+    now = timezone.now()
+    month = _month(now)
+    pairs = list(dict.fromkeys((m.product_id, m.branch_id) for m in movements))
+    products = _products({product_id for product_id, _ in pairs})
+    methods = {pk: method for pk, (method, _) in products.items()}
+
+    states = {
+        (state.product_id, state.branch_id): state
+        for state in CostState.objects.select_for_update().filter(_pairs_filter(pairs))
+    }
+    layers = defaultdict(list)
+    fifo = [pair for pair in pairs if methods[pair[0]] == 'fifo']
+    if fifo:
+        for layer in CostLayer.objects.filter(_pairs_filter(fifo)).order_by('sequence'):
+            layers[(layer.product_id, layer.branch_id)].append([layer.quantity, layer.unit_cost])
+
+    trackers, checkpoints = {}, []
+    for pair in pairs:
+        method, cost_price = products[pair[0]]
+        state = states.get(pair)
+        if state is None:
+            trackers[pair] = CostTracker(method, cost_price)
+            continue
+        trackers[pair] = CostTracker(method, cost_price, state.quantity, state.value, state.average_cost, layers[pair])
+        if state.last_movement_at and _month(state.last_movement_at) < month:
+            checkpoints.append(trackers[pair].checkpoint(*pair, month))
+
+    positions = {}
+    for movement in movements:
+        pair = (movement.product_id, movement.branch_id)
+        movement.unit_cost = trackers[pair].apply(movement)
+        positions[pair] = (now, movement.pk)
+
+    _save(pairs, trackers, positions, checkpoints, methods)
+
+
+def rebuild_costs(since, company=None, branch=None, product_ids=None):
+    """
+    إعادة حساب التكلفة ابتداءً من تاريخ بعد تصحيح بتاريخ سابق
+
+    لكل (منتج، فرع) له حركات منذ since تُستعاد آخر نقطة شهرية قبلها، ثم تُعاد
+    الحركات بعدها فقط مرتبة بـ (created_at, id) على الفهرس، على دفعات من الأزواج،
+    وتُحدَّث unit_cost للحركات التي تغيرت بتحديث جماعي. لا يُقرأ ما قبل النقطة.
+    يعيد عدد الحركات التي تغيرت تكلفتها.
+    """
+    movements = InventoryMovement.objects.filter(created_at__gte=timezone.make_aware(datetime.combine(since, time.min)))
+    if company is not None:
+        movements = movements.filter(branch__company=company)
+    if branch is not None:
+        movements = movements.filter(branch=branch)
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    pairs = list(movements.order_by().values_list('product_id', 'branch_id').distinct())
+
+    batch_size = settings.INVENTORY_COST_REBUILD_BATCH_SIZE
+    changed = 0
+    for offset in range(0, len(pairs), batch_size):
+        changed += _rebuild_pairs(pairs[offset:offset + batch_size], since.replace(day=1))
+    return changed
+
+
+def _replay_movements(begin):
+    """
+    حركات الأزواج {(منتج، فرع): بداية أو None} مرتبة للإعادة
+
+    كل زوج يُقرأ من نقطته الشهرية والأزواج بلا نقطة من أول حركاتها، في استعلام واحد
+    مجمع حسب لحظة البداية، فلا يُسقط زوج بلا نقطة حد التاريخ عن بقية الدفعة.
+    """
+    by_begin = defaultdict(list)
+    for pair, moment in begin.items():
+        by_begin[moment].append(pair)
+    condition = Q(pk__in=[])
+    for moment, group in by_begin.items():
+        condition |= _pairs_filter(group) if moment is None else _pairs_filter(group) & Q(created_at__gte=moment)
+    return InventoryMovement.objects.filter(condition).order_by('product_id', 'branch_id', 'created_at', 'id')
+
+
+@transaction.atomic
+def _rebuild_pairs(pairs, period):
+    products = _products({product_id for product_id, _ in pairs})
+    methods = {pk: method for pk, (method, _) in products.items()}
+
+    starts = {}
+    for checkpoint in CostCheckpoint.objects.filter(_pairs_filter(pairs), period__lte=period).order_by('period'):
+        starts[(checkpoint.product_id, checkpoint.branch_id)] = checkpoint
+    trackers, months, begin = {}, {}, {}
+    for pair in pairs:
+        method, cost_price = products[pair[0]]
+        checkpoint = starts.get(pair)
+        if checkpoint is None:
+            trackers[pair] = CostTracker(method, cost_price)
+            months[pair] = begin[pair] = None
+        else:
+            trackers[pair] = CostTracker.from_checkpoint(method, cost_price, checkpoint)
+            months[pair] = checkpoint.period
+            begin[pair] = timezone.make_aware(datetime.combine(checkpoint.period, time.min))
+    # النقاط بعد نقطة البدء تُعاد كتابتها أثناء المرور
+    CostCheckpoint.objects.filter(_pairs_filter(pairs), period__gt=period).delete()
+
+    movements = _replay_movements(begin)
+
+    batch_size = settings.INVENTORY_COST_REBUILD_BATCH_SIZE
+    updates, checkpoints, positions = [], [], {}
+    references = defaultdict(set)
+    changed = 0
+    for movement in movements.only(
+        'id', 'product_id', 'branch_id', 'movement_type', 'direction', 'quantity', 'unit_price', 'unit_cost',
+        'reference_type', 'reference_id', 'created_at',
+    ).iterator(chunk_size=batch_size):
+        pair = (movement.product_id, movement.branch_id)
+        month = _month(movement.created_at)
+        if months[pair] is not None and month > months[pair]:
+            checkpoints.append(trackers[pair].checkpoint(*pair, month))
+        months[pair] = month
+        unit_cost = trackers[pair].apply(movement)
+        positions[pair] = (movement.created_at, movement.pk)
+        if movement.unit_cost != unit_cost:
+            movement.unit_cost = unit_cost
+            updates.append(movement)
+            if movement.reference_type:
+                references[movement.reference_type].add(movement.reference_id)
+        if len(updates) >= batch_size:
+            changed += len(updates)
+            InventoryMovement.objects.bulk_update(updates, ['unit_cost'])
+            updates = []
+    if updates:
+        changed += len(updates)
+        InventoryMovement.objects.bulk_update(updates, ['unit_cost'])
+
+    pairs = [pair for pair in pairs if pair in positions]
+    _save(pairs, trackers, positions, checkpoints, methods)
+    if references:
+        costs_changed.send(sender=InventoryMovement, references=dict(references))
+    return changed
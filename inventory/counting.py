@@ -0,0 +1,225 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import (
+    AdjustmentLine, CountBatch, CountBatchLine, InventoryAdjustment, InventoryMovement, Product, StockLevel,
+)
+from .services import post_movements
+
+# ============================================
+# جلسات الجرد الفعلي: لقطة من StockLevel، قراءات الأجهزة، ترحيل الفروقات
+# ============================================
+
+ZERO = Decimal('0')
+AMOUNT = DecimalField(max_digits=15, decimal_places=2)
+
+# حجم دفعات الإدخال الجماعي لأسطر الجرد
+COUNT_BATCH_SIZE = 1000
+
+
+class StockCountError(Exception):
+    """خطأ في جلسة الجرد"""
+
+
+def start_count(branch, created_by=None, product_ids=None, notes=''):
+    """
+    بدء جلسة جرد بلقطة من أرصدة الفرع الحالية
+
+    يُنشأ سطر لكل منتج متتبَّع له رصيد في الفرع (أو لـ product_ids فقط في الجرد الجزئي)
+    بإدخال جماعي، بالكمية بالنظام = الرصيد والكمية الفعلية = صفر حتى تصل القراءات.
+    """
+    with transaction.atomic():
+        adjustment = InventoryAdjustment.objects.create(
+            branch=branch, adjustment_date=timezone.localdate(), created_by=created_by, notes=notes,
+        )
+        levels = StockLevel.objects.filter(branch=branch, product__track_quantity=True)
+        if product_ids is not None:
+            levels = levels.filter(product_id__in=product_ids)
+        AdjustmentLine.objects.bulk_create(
+            [
+                AdjustmentLine(
+                    adjustment=adjustment, product_id=product_id,
+                    system_quantity=quantity, actual_quantity=ZERO, difference=-quantity,
+                )
+                for product_id, quantity in levels.values_list('product_id', 'quantity').iterator(chunk_size=2000)
+            ],
+            batch_size=COUNT_BATCH_SIZE,
+        )
+    return adjustment
+
+
+def record_scans(adjustment, batch_id, scans, device='', counted_by=None):
+    """
+    إضافة دفعة قراءات من جهاز جرد إلى الجلسة
+
+    scans: قائمة من {'product': id أو 'barcode': باركود، 'quantity': الكمية}. تُجمع القراءات
+    لكل منتج في الذاكرة وتُحفظ الدفعة بإدخال جماعي فقط، فلا تتنافس الأجهزة على تحديث
+    نفس الأسطر. batch_id يُنشأ على الجهاز، فإعادة إرسال الدفعة بعد انقطاع لا تُحتسب مرتين.
+    يعيد {'status': 'created' أو 'duplicate', 'products': عدد المنتجات, 'unknown': [...]}.
+    """
+    product_ids = {scan['product'] for scan in scans if scan.get('product')}
+    barcodes = {scan['barcode'] for scan in scans if scan.get('barcode') and not scan.get('product')}
+    known = (
+        Product.objects.filter(company_id=adjustment.branch.company_id, track_quantity=True)
+        .filter(Q(pk__in=product_ids) | Q(barcode__in=barcodes))
+        .values_list('pk', 'barcode')
+    )
+    by_barcode = {}
+    by_id = set()
+    for product_id, barcode in known:
+        by_id.add(product_id)
+        by_barcode[barcode] = product_id
+
+    counts = defaultdict(Decimal)
+    unknown = []
+    for scan in scans:
+        product_id = scan.get('product') or by_barcode.get(scan.get('barcode'))
+        if product_id not in by_id:
+            unknown.append(str(scan.get('product') or scan.get('barcode')))
+            continue
+        counts[product_id] += Decimal(scan.get('quantity', 1))
+
+    with transaction.atomic():
+        if InventoryAdjustment.objects.select_for_update().filter(pk=adjustment.pk, is_approved=True).exists():
+            raise StockCountError("جلسة الجرد معتمدة ومغلقة")
+        try:
+            with transaction.atomic():
+                batch = CountBatch.objects.create(
+                    id=batch_id, adjustment=adjustment, device=device, scans=len(scans), counted_by=counted_by,
+                )
+        except IntegrityError:
+            return {'status': 'duplicate', 'products': 0, 'unknown': []}
+        CountBatchLine.objects.bulk_create(
+            [
+                CountBatchLine(adjustment=adjustment, batch=batch, product_id=product_id, quantity=quantity)
+                for product_id, quantity in counts.items()
+            ],
+            batch_size=COUNT_BATCH_SIZE,
+        )
+
+    return {'status': 'created', 'products': len(counts), 'unknown': unknown}
+
+
+def _collect_counts(adjustment):
+    """
+    نقل مجموع القراءات إلى أسطر الجلسة بتحديث واحد
+
+    المنتجات المقروءة خارج اللقطة تُضاف أولاً برصيدها الحالي في الفرع.
+    """
+    lines = AdjustmentLine.objects.filter(adjustment=adjustment)
+    extra = list(
+        CountBatchLine.objects.filter(adjustment=adjustment)
+        .exclude(product_id__in=lines.values('product_id'))
+        .values_list('product_id', flat=True).distinct()
+    )
+    if extra:
+        system = dict(
+            StockLevel.objects.filter(branch_id=adjustment.branch_id, product_id__in=extra)
+            .values_list('product_id', 'quantity')
+        )
+        AdjustmentLine.objects.bulk_create(
+            [
+                AdjustmentLine(
+                    adjustment=adjustment, product_id=product_id,
+                    system_quantity=system.get(product_id, ZERO), actual_quantity=ZERO,
+                )
+                for product_id in extra
+            ],
+            batch_size=COUNT_BATCH_SIZE,
+        )
+
+    counted = Coalesce(
+        Subquery(
+            CountBatchLine.objects.filter(adjustment=adjustment, product_id=OuterRef('product_id'))
+            .order_by().values('product_id').annotate(total=Sum('quantity')).values('total')
+        ),
+        Value(ZERO),
+        output_field=AMOUNT,
+    )
+    lines.update(actual_quantity=counted, difference=counted - F('system_quantity'))
+
+
+def _add_difference(field, lines, product_ref):
+    """field + فرق المنتج في الجلسة، بحد أدنى صفر"""
+    difference = Subquery(lines.filter(product_id=OuterRef(product_ref)).values('difference'))
+    return Greatest(F(field) + difference, Value(ZERO), output_field=AMOUNT)
+
+
+def approve_count(adjustment, approved_by=None):
+    """
+    اعتماد جلسة الجرد وترحيل الفروقات
+
+    الفرق (الفعلي - اللقطة) يُضاف إلى الرصيد الحالي لا يحل محله، فلا تضيع المبيعات التي
+    تمت أثناء الجرد، ولا ينزل الرصيد عن الصفر. تُحدَّث الأرصدة بتحديثات مرتبطة بأسطر الجلسة
+    (عدد ثابت من الاستعلامات مهما كان عدد المنتجات)، وتُسجل حركات تعديل بإدخال جماعي
+    بالكمية المطبقة فعلاً على الرصيد (أقل من الفرق إذا أوقفه الصفر).
+    يعيد عدد المنتجات التي لها فرق.
+    """
+    with transaction.atomic():
+        adjustment = InventoryAdjustment.objects.select_for_update().select_related('branch').get(pk=adjustment.pk)
+        if adjustment.is_approved:
+            raise StockCountError("جلسة الجرد معتمدة مسبقاً")
+        branch = adjustment.branch
+        _collect_counts(adjustment)
+
+        lines = AdjustmentLine.objects.filter(adjustment=adjustment)
+        changed = lines.exclude(difference=0)
+        variances = dict(changed.values_list('product_id', 'difference'))
+        # الأرصدة تُقفل قبل قراءتها، فلا يتغير بين القراءة والتحديث ما طُبق فعلاً من الفرق
+        current = dict(
+            StockLevel.objects.select_for_update().filter(branch=branch, product_id__in=list(variances))
+            .values_list('product_id', 'quantity')
+        )
+        applied = {
+            product_id: max(current.get(product_id, ZERO) + value, ZERO) - current.get(product_id, ZERO)
+            for product_id, value in variances.items()
+        }
+        now = timezone.now()
+        StockLevel.objects.filter(branch=branch, product_id__in=changed.values('product_id')).update(
+            quantity=_add_difference('quantity', lines, 'product_id'),
+            updated_at=now,
+        )
+        StockLevel.objects.filter(branch=branch, product_id__in=lines.values('product_id')).update(
+            last_counted_at=now, last_counted_by=approved_by,
+        )
+        Product.objects.filter(pk__in=changed.values('product_id')).update(
+            quantity_on_hand=_add_difference('quantity_on_hand', lines, 'pk'),
+        )
+
+        missing = {product_id for product_id, value in variances.items() if value > 0} - set(current)
+        if missing:
+            # الإدخال الجماعي لا يطلق pre_save، فننسخ حد إعادة الطلب هنا
+            reorder_levels = dict(Product.objects.filter(pk__in=missing).values_list('pk', 'reorder_level'))
+            StockLevel.objects.bulk_create([
+                StockLevel(
+                    branch=branch, product_id=product_id, quantity=variances[product_id],
+                    reorder_level=reorder_levels.get(product_id, ZERO),
+                    last_counted_at=now, last_counted_by=approved_by,
+                )
+                for product_id in missing
+            ], batch_size=COUNT_BATCH_SIZE)
+
+        post_movements([
+            InventoryMovement(
+                product_id=product_id,
+                branch=branch,
+                movement_type='adjustment',
+                direction=InventoryMovement.DIRECTION_IN if value > 0 else InventoryMovement.DIRECTION_OUT,
+                quantity=abs(value),
+                reference_type='inventory_adjustment',
+                reference_id=str(adjustment.pk),
+                created_by=approved_by,
+            )
+            for product_id, value in applied.items()
+            if value
+        ])
+
+        adjustment.is_approved = True
+        adjustment.approved_by = approved_by
+        adjustment.approved_at = now
+        adjustment.save(update_fields=['is_approved', 'approved_by', 'approved_at'])
+
+    return len(variances)
@@ -0,0 +1,26 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Company
+from inventory.costing import rebuild_costs
+
+
+class Command(BaseCommand):
+    help = 'إعادة حساب تكلفة حركات المخزون ابتداءً من تاريخ (بعد تصحيح حركات بتاريخ سابق)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', required=True, help='التاريخ YYYY-MM-DD')
+        parser.add_argument('--company', help='معرف الشركة (الافتراضي: جميع الشركات)')
+
+    def handle(self, *args, **options):
+        company = None
+        if options['company']:
+            company = Company.objects.filter(pk=options['company']).first()
+            if company is None:
+                raise CommandError(f"الشركة غير موجودة: {options['company']}")
+        try:
+            start = date.fromisoformat(options['start'])
+        except ValueError:
+            raise CommandError(f"تاريخ غير صالح: {options['start']}")
+
+        changed = rebuild_costs(start, company=company)
+        self.stdout.write(self.style.SUCCESS(f'تغيرت تكلفة {changed} حركة'))
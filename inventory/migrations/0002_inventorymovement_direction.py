@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:53
+
+from django.db import migrations, models
+
+
+def set_outbound_direction(apps, schema_editor):
+    """حركات البيع والتلف تُخرج الكمية من المخزون"""
+    InventoryMovement = apps.get_model('inventory', 'InventoryMovement')
+    InventoryMovement.objects.filter(movement_type__in=['sale', 'damage']).update(direction=-1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorymovement',
+            name='direction',
+            field=models.SmallIntegerField(choices=[(1, 'وارد'), (-1, 'صادر')], default=1, verbose_name='اتجاه الحركة'),
+        ),
+        migrations.RunPython(set_outbound_direction, migrations.RunPython.noop),
+    ]
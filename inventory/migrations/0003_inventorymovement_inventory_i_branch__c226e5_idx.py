@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('inventory', '0002_inventorymovement_direction'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['branch', 'created_at'], name='inventory_i_branch__c226e5_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:09
+
+import django.core.validators
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_reorder_level(apps, schema_editor):
+    """نسخ حد إعادة الطلب من المنتج إلى مستويات المخزون"""
+    StockLevel = apps.get_model('inventory', 'StockLevel')
+    Product = apps.get_model('inventory', 'Product')
+    StockLevel.objects.update(
+        reorder_level=models.Subquery(Product.objects.filter(pk=models.OuterRef('product_id')).values('reorder_level')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('inventory', '0003_inventorymovement_inventory_i_branch__c226e5_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocklevel',
+            name='reorder_level',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal('0'))], verbose_name='حد إعادة الطلب'),
+        ),
+        migrations.RunPython(copy_reorder_level, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='stocklevel',
+            index=models.Index(condition=models.Q(('quantity__lt', models.F('reorder_level'))), fields=['branch', 'product'], name='stocklevel_below_reorder_idx'),
+        ),
+    ]
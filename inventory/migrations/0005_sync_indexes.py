@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_unit_updated_at_sync_indexes'),
+        ('inventory', '0004_stocklevel_reorder_level'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='inventory_p_company_07aa5f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocklevel',
+            index=models.Index(fields=['branch', 'updated_at', 'id'], name='inventory_s_branch__872acc_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_unit_updated_at_sync_indexes'),
+        ('inventory', '0005_sync_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['-created_at', '-id'], name='inventory_i_created_b1a085_idx'),
+        ),
+    ]
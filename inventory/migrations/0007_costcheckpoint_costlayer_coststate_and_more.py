@@ -0,0 +1,122 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:48
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_unit_updated_at_sync_indexes'),
+        ('inventory', '0006_inventorymovement_inventory_i_created_b1a085_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostCheckpoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('period', models.DateField()),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('value', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('average_cost', models.DecimalField(decimal_places=4, default=0, max_digits=15)),
+                ('layers', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'verbose_name': 'نقطة تكلفة',
+                'verbose_name_plural': 'نقاط التكلفة',
+            },
+        ),
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sequence', models.PositiveIntegerField(default=0)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='الكمية المتبقية')),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=15, verbose_name='تكلفة الوحدة')),
+            ],
+            options={
+                'verbose_name': 'طبقة تكلفة',
+                'verbose_name_plural': 'طبقات التكلفة',
+                'ordering': ['sequence'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CostState',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='الكمية')),
+                ('value', models.DecimalField(decimal_places=4, default=0, max_digits=18, verbose_name='قيمة المخزون')),
+                ('average_cost', models.DecimalField(decimal_places=4, default=0, max_digits=15, verbose_name='متوسط التكلفة')),
+                ('last_movement_at', models.DateTimeField(blank=True, null=True)),
+                ('last_movement_id', models.UUIDField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'حالة تكلفة',
+                'verbose_name_plural': 'حالات التكلفة',
+            },
+        ),
+        migrations.AddField(
+            model_name='inventorymovement',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True, verbose_name='تكلفة الوحدة'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='costing_method',
+            field=models.CharField(choices=[('average', 'المتوسط المرجح'), ('fifo', 'الوارد أولاً صادر أولاً')], default='average', max_length=10, verbose_name='طريقة التكلفة'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['reference_type', 'reference_id'], name='inventory_i_referen_0d8590_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['product', 'branch', 'created_at', 'id'], name='inventory_i_product_08a4e0_idx'),
+        ),
+        migrations.AddField(
+            model_name='costcheckpoint',
+            name='branch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_checkpoints', to='core.branch'),
+        ),
+        migrations.AddField(
+            model_name='costcheckpoint',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_checkpoints', to='inventory.product'),
+        ),
+        migrations.AddField(
+            model_name='costlayer',
+            name='branch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='core.branch'),
+        ),
+        migrations.AddField(
+            model_name='costlayer',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='inventory.product'),
+        ),
+        migrations.AddField(
+            model_name='coststate',
+            name='branch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_states', to='core.branch'),
+        ),
+        migrations.AddField(
+            model_name='coststate',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_states', to='inventory.product'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='costcheckpoint',
+            unique_together={('product', 'branch', 'period')},
+        ),
+        migrations.AddIndex(
+            model_name='costlayer',
+            index=models.Index(fields=['product', 'branch', 'sequence'], name='inventory_c_product_38b014_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='coststate',
+            unique_together={('product', 'branch')},
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:56
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_adjustment_lines(apps, schema_editor):
+    """دمج أسطر المنتج المكررة في جلسة واحدة قبل قيد التفرد؛ تُجمع فروقاتها في سطر واحد"""
+    AdjustmentLine = apps.get_model('inventory', 'AdjustmentLine')
+    duplicates = (
+        AdjustmentLine.objects.values('adjustment_id', 'product_id')
+        .annotate(count=Count('id')).filter(count__gt=1).order_by()
+    )
+    for group in list(duplicates):
+        lines = list(AdjustmentLine.objects.filter(
+            adjustment_id=group['adjustment_id'], product_id=group['product_id'],
+        ).order_by('pk'))
+        keep = lines[0]
+        keep.difference = sum(line.difference for line in lines)
+        keep.actual_quantity = keep.system_quantity + keep.difference
+        keep.notes = '\n'.join(line.notes for line in lines if line.notes)
+        keep.save(update_fields=['difference', 'actual_quantity', 'notes'])
+        AdjustmentLine.objects.filter(pk__in=[line.pk for line in lines[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_costcheckpoint_costlayer_coststate_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_adjustment_lines, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='adjustmentline',
+            unique_together={('adjustment', 'product')},
+        ),
+        migrations.CreateModel(
+            name='CountBatch',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('device', models.CharField(blank=True, max_length=100, verbose_name='الجهاز')),
+                ('scans', models.PositiveIntegerField(default=0, verbose_name='عدد القراءات')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('adjustment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='count_batches', to='inventory.inventoryadjustment')),
+                ('counted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'دفعة جرد',
+                'verbose_name_plural': 'دفعات الجرد',
+            },
+        ),
+        migrations.CreateModel(
+            name='CountBatchLine',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='الكمية')),
+                ('adjustment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='count_lines', to='inventory.inventoryadjustment')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.countbatch')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+            ],
+            options={
+                'verbose_name': 'سطر دفعة جرد',
+                'verbose_name_plural': 'أسطر دفعات الجرد',
+                'indexes': [models.Index(fields=['adjustment', 'product'], name='inventory_c_adjustm_c38878_idx')],
+            },
+        ),
+    ]
@@ -8,6 +8,12 @@ import uuid
 # نماذج المنتجات والمخزون
 # ============================================
 
+COSTING_METHOD_CHOICES = [
+    ('average', _('المتوسط المرجح')),
+    ('fifo', _('الوارد أولاً صادر أولاً')),
+]
+
+
 class Product(models.Model):
     """نموذج المنتج"""
     
@@ -64,6 +70,11 @@ class Product(models.Model):
         verbose_name=_('كمية إعادة الطلب')
     )
     
+    # طريقة تسعير المخزون (inventory/costing.py)
+    costing_method = models.CharField(
+        max_length=10, choices=COSTING_METHOD_CHOICES, default='average', verbose_name=_('طريقة التكلفة')
+    )
+    
     # الحالة
     is_active = models.BooleanField(default=True)
     track_quantity = models.BooleanField(default=True, verbose_name=_('تتبع الكمية'))
@@ -78,6 +89,7 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=['company', 'code']),
             models.Index(fields=['category']),
+            models.Index(fields=['company', 'updated_at', 'id']),
         ]
     
     def __str__(self):
@@ -97,11 +109,19 @@ class InventoryMovement(models.Model):
         ('damage', _('تلف')),
     ]
     
+    DIRECTION_IN = 1
+    DIRECTION_OUT = -1
+    DIRECTION_CHOICES = [
+        (DIRECTION_IN, _('وارد')),
+        (DIRECTION_OUT, _('صادر')),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='movements')
     branch = models.ForeignKey('core.Branch', on_delete=models.CASCADE, related_name='inventory_movements')
     
     movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPE_CHOICES)
+    direction = models.SmallIntegerField(choices=DIRECTION_CHOICES, default=DIRECTION_IN, verbose_name=_('اتجاه الحركة'))
     quantity = models.DecimalField(
         max_digits=15, decimal_places=2,
         validators=[MinValueValidator(Decimal('0'))],
@@ -111,6 +131,11 @@ class InventoryMovement(models.Model):
         max_digits=15, decimal_places=2, default=0,
         verbose_name=_('سعر الوحدة')
     )
+    # تكلفة الوحدة المحسوبة بطريقة تكلفة المنتج عند تسجيل الحركة
+    unit_cost = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True,
+        verbose_name=_('تكلفة الوحدة')
+    )
     
     # المراجع
     reference_type = models.CharField(max_length=50, blank=True)  # purchase_order, sale_order, etc.
@@ -129,6 +154,10 @@ class InventoryMovement(models.Model):
         indexes = [
             models.Index(fields=['product', 'branch', '-created_at']),
             models.Index(fields=['movement_type', '-created_at']),
+            models.Index(fields=['branch', 'created_at']),
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['reference_type', 'reference_id']),
+            models.Index(fields=['product', 'branch', 'created_at', 'id']),
         ]
     
     def __str__(self):
@@ -147,6 +176,12 @@ class StockLevel(models.Model):
         validators=[MinValueValidator(Decimal('0'))],
         verbose_name=_('الكمية')
     )
+    # نسخة من Product.reorder_level تُحدَّث بالإشارات، ليُفهرس شرط المخزون المنخفض دون ربط
+    reorder_level = models.DecimalField(
+        max_digits=15, decimal_places=2, default=0,
+        validators=[MinValueValidator(Decimal('0'))],
+        verbose_name=_('حد إعادة الطلب')
+    )
     
     last_counted_at = models.DateTimeField(null=True, blank=True, verbose_name=_('آخر جرد'))
     last_counted_by = models.ForeignKey('core.CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
@@ -159,12 +194,84 @@ class StockLevel(models.Model):
         unique_together = ('product', 'branch')
         indexes = [
             models.Index(fields=['branch', 'quantity']),
+            models.Index(fields=['branch', 'updated_at', 'id']),
+            models.Index(
+                fields=['branch', 'product'],
+                condition=models.Q(quantity__lt=models.F('reorder_level')),
+                name='stocklevel_below_reorder_idx',
+            ),
         ]
     
     def __str__(self):
         return f"{self.product.name_ar} - {self.branch.name_ar}"
 
 
+class CostState(models.Model):
+    """حالة تكلفة المنتج في الفرع بعد آخر حركة محسوبة"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cost_states')
+    branch = models.ForeignKey('core.Branch', on_delete=models.CASCADE, related_name='cost_states')
+    
+    quantity = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name=_('الكمية'))
+    value = models.DecimalField(max_digits=18, decimal_places=4, default=0, verbose_name=_('قيمة المخزون'))
+    average_cost = models.DecimalField(max_digits=15, decimal_places=4, default=0, verbose_name=_('متوسط التكلفة'))
+    
+    # موضع آخر حركة محسوبة (created_at, id)
+    last_movement_at = models.DateTimeField(null=True, blank=True)
+    last_movement_id = models.UUIDField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('حالة تكلفة')
+        verbose_name_plural = _('حالات التكلفة')
+        unique_together = ('product', 'branch')
+    
+    def __str__(self):
+        return f"{self.product.name_ar} - {self.branch.name_ar}: {self.average_cost}"
+
+
+class CostLayer(models.Model):
+    """طبقة تكلفة FIFO متبقية (الطبقات المستهلكة بالكامل تُحذف)"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cost_layers')
+    branch = models.ForeignKey('core.Branch', on_delete=models.CASCADE, related_name='cost_layers')
+    
+    # ترتيب الطبقة بين طبقات المنتج في الفرع، الأقدم أولاً
+    sequence = models.PositiveIntegerField(default=0)
+    quantity = models.DecimalField(max_digits=15, decimal_places=2, verbose_name=_('الكمية المتبقية'))
+    unit_cost = models.DecimalField(max_digits=15, decimal_places=4, verbose_name=_('تكلفة الوحدة'))
+    
+    class Meta:
+        verbose_name = _('طبقة تكلفة')
+        verbose_name_plural = _('طبقات التكلفة')
+        ordering = ['sequence']
+        indexes = [
+            models.Index(fields=['product', 'branch', 'sequence']),
+        ]
+
+
+class CostCheckpoint(models.Model):
+    """حالة التكلفة في بداية شهر، نقطة بدء لإعادة الحساب بدل إعادة كل التاريخ"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cost_checkpoints')
+    branch = models.ForeignKey('core.Branch', on_delete=models.CASCADE, related_name='cost_checkpoints')
+    
+    # أول يوم في الشهر؛ الحالة قبل أول حركة فيه
+    period = models.DateField()
+    quantity = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    value = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    average_cost = models.DecimalField(max_digits=15, decimal_places=4, default=0)
+    # طبقات FIFO: [[الكمية، التكلفة]، ...]
+    layers = models.JSONField(default=list, blank=True)
+    
+    class Meta:
+        verbose_name = _('نقطة تكلفة')
+        verbose_name_plural = _('نقاط التكلفة')
+        unique_together = ('product', 'branch', 'period')
+
+
 class InventoryAdjustment(models.Model):
     """نموذج تعديل المخزون (جرد فعلي)"""
     
@@ -219,6 +326,7 @@ class AdjustmentLine(models.Model):
     class Meta:
         verbose_name = _('سطر تعديل')
         verbose_name_plural = _('أسطر التعديل')
+        unique_together = ('adjustment', 'product')
     
     def save(self, *args, **kwargs):
         self.difference = self.actual_quantity - self.system_quantity
@@ -228,6 +336,43 @@ class AdjustmentLine(models.Model):
         return f"{self.product.name_ar} - {self.difference}"
 
 
+class CountBatch(models.Model):
+    """دفعة قراءات من جهاز الجرد؛ المعرف يُنشأ على الجهاز فلا تُحتسب الدفعة المعادة مرتين"""
+    
+    id = models.UUIDField(primary_key=True, editable=False)
+    adjustment = models.ForeignKey(InventoryAdjustment, on_delete=models.CASCADE, related_name='count_batches')
+    device = models.CharField(max_length=100, blank=True, verbose_name=_('الجهاز'))
+    
+    scans = models.PositiveIntegerField(default=0, verbose_name=_('عدد القراءات'))
+    counted_by = models.ForeignKey('core.CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('دفعة جرد')
+        verbose_name_plural = _('دفعات الجرد')
+    
+    def __str__(self):
+        return f"{self.adjustment_id} - {self.device}"
+
+
+class CountBatchLine(models.Model):
+    """كمية منتج في دفعة جرد بعد تجميع قراءاتها؛ تُجمع لكل منتج عند الاعتماد"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    adjustment = models.ForeignKey(InventoryAdjustment, on_delete=models.CASCADE, related_name='count_lines')
+    batch = models.ForeignKey(CountBatch, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=15, decimal_places=2, verbose_name=_('الكمية'))
+    
+    class Meta:
+        verbose_name = _('سطر دفعة جرد')
+        verbose_name_plural = _('أسطر دفعات الجرد')
+        indexes = [
+            models.Index(fields=['adjustment', 'product']),
+        ]
+
+
 class WarehouseLocation(models.Model):
     """نموذج موقع المخزن"""
     
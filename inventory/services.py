@@ -0,0 +1,174 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Sum, Count, DecimalField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .costing import apply_movements
+from .models import CostState, Product, InventoryMovement, StockLevel
+
+
+class InsufficientStockError(Exception):
+    """خطأ عدم كفاية المخزون في الفرع"""
+
+    def __init__(self, shortages):
+        # shortages: {product_id: {'requested': ..., 'available': ...}}
+        self.shortages = shortages
+        super().__init__(f"المخزون غير كافٍ لعدد {len(shortages)} منتج")
+
+
+def _quantity_case(quantities, key='product_id'):
+    """تعبير CASE يعيد الكمية الخاصة بكل منتج داخل استعلام واحد"""
+    return Case(
+        *[When(**{key: product_id}, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        default=Value(Decimal('0')),
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    )
+
+
+def decrease_stock(branch, quantities):
+    """
+    خصم الكميات من مخزون الفرع بتحديث شرطي واحد
+
+    quantities: {product_id: الكمية}. يتم رفض العملية بالكامل إذا كان
+    رصيد أي منتج أقل من الكمية المطلوبة.
+    """
+    quantities = {pid: qty for pid, qty in quantities.items() if qty}
+    if not quantities:
+        return
+
+    with transaction.atomic():
+        updated = StockLevel.objects.filter(
+            branch=branch,
+            product_id__in=quantities.keys(),
+            quantity__gte=_quantity_case(quantities),
+        ).update(quantity=F('quantity') - _quantity_case(quantities), updated_at=timezone.now())
+
+        if updated == len(quantities):
+            Product.objects.filter(pk__in=quantities.keys()).update(
+                quantity_on_hand=F('quantity_on_hand') - _quantity_case(quantities, key='pk')
+            )
+            return
+
+        # تراجع عن الخصم الجزئي قبل قراءة الأرصدة الفعلية
+        transaction.set_rollback(True)
+
+    available = dict(
+        StockLevel.objects.filter(branch=branch, product_id__in=quantities.keys())
+        .values_list('product_id', 'quantity')
+    )
+    raise InsufficientStockError({
+        product_id: {'requested': requested, 'available': available.get(product_id, Decimal('0'))}
+        for product_id, requested in quantities.items()
+        if available.get(product_id, Decimal('0')) < requested
+    })
+
+
+def increase_stock(branch, quantities):
+    """إضافة الكميات إلى مخزون الفرع مع إنشاء مستويات المخزون الناقصة دفعة واحدة"""
+    quantities = {pid: qty for pid, qty in quantities.items() if qty}
+    if not quantities:
+        return
+
+    with transaction.atomic():
+        existing = set(
+            StockLevel.objects.filter(branch=branch, product_id__in=quantities.keys())
+            .values_list('product_id', flat=True)
+        )
+        if existing:
+            StockLevel.objects.filter(branch=branch, product_id__in=existing).update(
+                quantity=F('quantity') + _quantity_case({pid: quantities[pid] for pid in existing}),
+                updated_at=timezone.now(),
+            )
+        missing = [product_id for product_id in quantities if product_id not in existing]
+        if missing:
+            # الإدخال الجماعي لا يطلق pre_save، فننسخ حد إعادة الطلب هنا
+            reorder_levels = dict(Product.objects.filter(pk__in=missing).values_list('pk', 'reorder_level'))
+            StockLevel.objects.bulk_create([
+                StockLevel(
+                    branch=branch, product_id=product_id, quantity=quantities[product_id],
+                    reorder_level=reorder_levels.get(product_id, Decimal('0')),
+                )
+                for product_id in missing
+            ])
+
+        Product.objects.filter(pk__in=quantities.keys()).update(
+            quantity_on_hand=F('quantity_on_hand') + _quantity_case(quantities, key='pk')
+        )
+
+
+def below_reorder_levels(branch):
+    """مستويات مخزون الفرع التي نزلت عن حد إعادة الطلب (يغطيها الفهرس الجزئي stocklevel_below_reorder_idx)"""
+    return StockLevel.objects.filter(branch=branch, quantity__lt=F('reorder_level'))
+
+
+def post_movements(movements):
+    """تسجيل حركات المخزون دفعة واحدة مع حساب تكلفة كل حركة (inventory/costing.py)"""
+    with transaction.atomic():
+        apply_movements(movements)
+        return InventoryMovement.objects.bulk_create(movements)
+
+
+def inventory_valuation(company, branch=None, as_of=None):
+    """
+    تقييم المخزون لكل فرع وفئة (الكمية × التكلفة والكمية × سعر البيع)
+
+    يُحسب باستعلام تجميع واحد على StockLevel مع Product، والتكلفة من CostState للفرع
+    (متوسط التكلفة أو تكلفة طبقات FIFO المتبقية) أو سعر تكلفة المنتج إذا لم تُحسب بعد.
+    عند تمرير as_of تُطرح حركات المخزون المسجلة بعد نهاية ذلك اليوم باستعلام تجميع
+    ثانٍ، بتكلفة كل حركة وسعر البيع الحالي.
+    يعيد قائمة من {'branch_id', 'category_id', 'items', 'quantity', 'cost_value', 'retail_value'}.
+    """
+    amount = DecimalField(max_digits=15, decimal_places=2)
+    levels = StockLevel.objects.filter(branch__company=company)
+    if branch is not None:
+        levels = levels.filter(branch=branch)
+
+    unit_cost = Coalesce(
+        Subquery(
+            CostState.objects.filter(product_id=OuterRef('product_id'), branch_id=OuterRef('branch_id'))
+            .values('average_cost')[:1]
+        ),
+        F('product__cost_price'),
+        output_field=amount,
+    )
+    rows = {}
+    for row in levels.order_by().values('branch_id', 'product__category_id').annotate(
+        items=Count('id'),
+        total_quantity=Sum('quantity'),
+        cost_value=Sum(F('quantity') * unit_cost, output_field=amount),
+        retail_value=Sum(F('quantity') * F('product__selling_price'), output_field=amount),
+    ):
+        rows[row['branch_id'], row['product__category_id']] = {
+            'branch_id': row['branch_id'],
+            'category_id': row['product__category_id'],
+            'items': row['items'],
+            'quantity': row['total_quantity'],
+            'cost_value': row['cost_value'],
+            'retail_value': row['retail_value'],
+        }
+
+    if as_of is not None:
+        cutoff = timezone.make_aware(datetime.combine(as_of + timedelta(days=1), time.min))
+        movements = InventoryMovement.objects.filter(branch__company=company, created_at__gte=cutoff)
+        if branch is not None:
+            movements = movements.filter(branch=branch)
+        signed = F('direction') * F('quantity')
+        for row in movements.order_by().values('branch_id', 'product__category_id').annotate(
+            total_quantity=Sum(signed, output_field=amount),
+            cost_value=Sum(signed * Coalesce('unit_cost', 'product__cost_price'), output_field=amount),
+            retail_value=Sum(signed * F('product__selling_price'), output_field=amount),
+        ):
+            current = rows.setdefault((row['branch_id'], row['product__category_id']), {
+                'branch_id': row['branch_id'],
+                'category_id': row['product__category_id'],
+                'items': 0,
+                'quantity': Decimal('0'),
+                'cost_value': Decimal('0'),
+                'retail_value': Decimal('0'),
+            })
+            current['quantity'] -= row['total_quantity']
+            current['cost_value'] -= row['cost_value']
+            current['retail_value'] -= row['retail_value']
+
+    return list(rows.values())
@@ -0,0 +1,20 @@
+from django.db.models.signals import pre_save, post_save
+from django.dispatch import receiver
+from .models import Product, StockLevel
+
+
+@receiver(post_save, sender=Product)
+def sync_reorder_level(sender, instance, raw=False, **kwargs):
+    """نسخ حد إعادة الطلب الجديد إلى مستويات المخزون في جميع الفروع"""
+    if raw:
+        return
+    StockLevel.objects.filter(product=instance).exclude(reorder_level=instance.reorder_level).update(
+        reorder_level=instance.reorder_level
+    )
+
+
+@receiver(pre_save, sender=StockLevel)
+def set_initial_reorder_level(sender, instance, raw=False, **kwargs):
+    """مستوى المخزون الجديد يأخذ حد إعادة الطلب من المنتج"""
+    if not raw and instance._state.adding:
+        instance.reorder_level = instance.product.reorder_level
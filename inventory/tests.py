@@ -1,3 +1,210 @@
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
 from django.test import TestCase
+from django.utils import timezone
+from core.models import Company, Branch, Category, Unit
+from .costing import _replay_movements, rebuild_costs
+from .counting import StockCountError, approve_count, record_scans, start_count
+from .models import AdjustmentLine, CostCheckpoint, CostLayer, CostState, InventoryMovement, Product, StockLevel
+from .services import decrease_stock, increase_stock, inventory_valuation, post_movements
 
-# Create your tests here.
+
+class CostingTests(TestCase):
+    """تكلفة الحركات بالمتوسط المرجح و FIFO، وإعادة الحساب من نقطة شهرية"""
+
+    def setUp(self):
+        company = Company.objects.create(name='Cost Co', name_ar='شركة', tax_id='CST-1', commercial_register='CST-1')
+        self.branch = Branch.objects.create(company=company, name='Main', name_ar='الرئيسي', code='CST')
+        unit = Unit.objects.create(company=company, name='Piece', name_ar='قطعة', code='PC-CST')
+        self.product = Product.objects.create(
+            company=company, name='P', name_ar='منتج', code='CST-P', barcode='CST-B', unit=unit,
+            cost_price=Decimal('1'),
+        )
+
+    def move(self, quantity, unit_price=0, at=None):
+        direction = InventoryMovement.DIRECTION_IN if quantity > 0 else InventoryMovement.DIRECTION_OUT
+        movement, = post_movements([InventoryMovement(
+            product=self.product, branch=self.branch, movement_type='purchase' if quantity > 0 else 'sale',
+            direction=direction, quantity=Decimal(abs(quantity)), unit_price=Decimal(unit_price),
+        )])
+        if at is not None:
+            InventoryMovement.objects.filter(pk=movement.pk).update(
+                created_at=timezone.make_aware(datetime.combine(at, datetime.min.time()))
+            )
+        return movement
+
+    def cost(self, movement):
+        return InventoryMovement.objects.get(pk=movement.pk).unit_cost
+
+    def test_moving_average(self):
+        self.move(10, 5)
+        self.move(10, 7)
+        sale = self.move(-5, 20)
+        self.assertEqual(sale.unit_cost, Decimal('6'))
+        state = CostState.objects.get(product=self.product, branch=self.branch)
+        self.assertEqual((state.quantity, state.value), (Decimal('15'), Decimal('90')))
+
+    def test_fifo_consumes_oldest_layers(self):
+        self.product.costing_method = 'fifo'
+        self.product.save()
+        self.move(10, 5)
+        self.move(10, 7)
+        sale = self.move(-15, 20)
+        self.assertEqual(sale.unit_cost, Decimal('5.6667'))
+        self.assertEqual(
+            list(CostLayer.objects.filter(product=self.product).values_list('quantity', 'unit_cost')),
+            [(Decimal('5'), Decimal('7'))],
+        )
+
+    def test_rebuild_from_date_replays_only_after_checkpoint(self):
+        first = self.move(10, 5, at=date(2026, 1, 10))
+        early_sale = self.move(-4, 20, at=date(2026, 2, 10))
+        correction = self.move(10, 8, at=date(2026, 3, 10))
+        late_sale = self.move(-6, 20, at=date(2026, 4, 10))
+
+        rebuild_costs(date(2026, 1, 1))
+        self.assertEqual(self.cost(late_sale), Decimal('6.875'))
+        self.assertEqual(
+            list(CostCheckpoint.objects.filter(product=self.product).values_list('period', flat=True)),
+            [date(2026, 2, 1), date(2026, 3, 1), date(2026, 4, 1)],
+        )
+
+        # تصحيح سعر شراء مارس: تبدأ إعادة الحساب من نقطة مارس ولا تمس ما قبلها
+        InventoryMovement.objects.filter(pk=correction.pk).update(unit_price=Decimal('10'))
+        InventoryMovement.objects.filter(pk__in=[first.pk, early_sale.pk]).update(unit_cost=Decimal('99'))
+        self.assertEqual(rebuild_costs(date(2026, 3, 15)), 2)
+        self.assertEqual(self.cost(correction), Decimal('10'))
+        self.assertEqual(self.cost(late_sale), Decimal('8.125'))
+        self.assertEqual(self.cost(early_sale), Decimal('99'))
+
+    def test_pair_without_checkpoint_keeps_other_pairs_bounded(self):
+        self.move(10, 5, at=date(2026, 1, 10))
+        march = self.move(-4, 20, at=date(2026, 3, 10))
+        bounded = (self.product.pk, self.branch.pk)
+        self.product = Product.objects.create(
+            company=self.branch.company, name='New', name_ar='جديد', code='CST-N', barcode='CST-N',
+            unit=self.product.unit, cost_price=Decimal('1'),
+        )
+        old_purchase = self.move(5, 3, at=date(2026, 1, 12))
+
+        begin = {
+            bounded: timezone.make_aware(datetime(2026, 3, 1)),
+            (self.product.pk, self.branch.pk): None,
+        }
+        self.assertEqual(set(_replay_movements(begin).values_list('pk', flat=True)), {march.pk, old_purchase.pk})
+
+
+class InventoryValuationTests(TestCase):
+    """تقييم المخزون الحالي وفي تاريخ سابق، بتكلفة CostState أو سعر تكلفة المنتج"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Val Co', name_ar='شركة', tax_id='VAL-1', commercial_register='VAL-1')
+        self.branch = Branch.objects.create(company=self.company, name='Main', name_ar='الرئيسي', code='VAL')
+        unit = Unit.objects.create(company=self.company, name='Piece', name_ar='قطعة', code='PC-VAL')
+        self.category = Category.objects.create(company=self.company, name='Drinks', name_ar='مشروبات', code='VAL-C')
+        self.tea = Product.objects.create(
+            company=self.company, name='Tea', name_ar='شاي', code='VAL-T', barcode='VAL-T', unit=unit,
+            category=self.category, cost_price=Decimal('1'), selling_price=Decimal('10'),
+        )
+        # بلا حركات ولا CostState: يُقيّم بسعر تكلفة المنتج
+        self.cups = Product.objects.create(
+            company=self.company, name='Cups', name_ar='أكواب', code='VAL-U', barcode='VAL-U', unit=unit,
+            cost_price=Decimal('3'), selling_price=Decimal('5'),
+        )
+        increase_stock(self.branch, {self.tea.pk: Decimal('20'), self.cups.pk: Decimal('4')})
+        self.purchase(Decimal('5'), date(2026, 1, 10))
+        self.purchase(Decimal('7'), date(2026, 2, 10))
+
+    def purchase(self, unit_price, at):
+        movement, = post_movements([InventoryMovement(
+            product=self.tea, branch=self.branch, movement_type='purchase',
+            direction=InventoryMovement.DIRECTION_IN, quantity=Decimal('10'), unit_price=unit_price,
+        )])
+        InventoryMovement.objects.filter(pk=movement.pk).update(
+            created_at=timezone.make_aware(datetime.combine(at, datetime.min.time()))
+        )
+
+    def valuation(self, **kwargs):
+        return {
+            row['category_id']: (row['items'], row['quantity'], row['cost_value'], row['retail_value'])
+            for row in inventory_valuation(self.company, **kwargs)
+        }
+
+    def test_current_valuation(self):
+        self.assertFalse(CostState.objects.filter(product=self.cups).exists())
+        with self.assertNumQueries(1):
+            result = self.valuation(branch=self.branch)
+        self.assertEqual(result, {
+            self.category.pk: (1, Decimal('20'), Decimal('120'), Decimal('200')),
+            None: (1, Decimal('4'), Decimal('12'), Decimal('20')),
+        })
+
+    def test_as_of_removes_later_movements(self):
+        with self.assertNumQueries(2):
+            result = self.valuation(as_of=date(2026, 1, 31))
+        self.assertEqual(result, {
+            self.category.pk: (1, Decimal('10'), Decimal('50'), Decimal('100')),
+            None: (1, Decimal('4'), Decimal('12'), Decimal('20')),
+        })
+
+
+class StockCountTests(TestCase):
+    """جلسات الجرد: لقطة الأرصدة وتجميع القراءات وترحيل الفروقات"""
+
+    def setUp(self):
+        company = Company.objects.create(name='Count Co', name_ar='شركة', tax_id='CNT-1', commercial_register='CNT-1')
+        self.branch = Branch.objects.create(company=company, name='Main', name_ar='الرئيسي', code='CNT')
+        unit = Unit.objects.create(company=company, name='Piece', name_ar='قطعة', code='PC-CNT')
+        self.products = [
+            Product.objects.create(
+                company=company, name=f'P{index}', name_ar='منتج', code=f'CNT-P{index}', barcode=f'CNT-B{index}',
+                unit=unit,
+            )
+            for index in range(3)
+        ]
+        increase_stock(self.branch, {self.products[0].pk: Decimal('10'), self.products[1].pk: Decimal('5')})
+
+    def levels(self):
+        return dict(StockLevel.objects.filter(branch=self.branch).values_list('product__code', 'quantity'))
+
+    def test_count_posts_variances_on_top_of_sales_during_count(self):
+        count = start_count(self.branch)
+        self.assertEqual(AdjustmentLine.objects.filter(adjustment=count).count(), 2)
+
+        batch = uuid.uuid4()
+        scans = [{'barcode': 'CNT-B0'}] * 7 + [{'product': self.products[2].pk, 'quantity': Decimal('3')}, {'barcode': 'NOPE'}]
+        result = record_scans(count, batch, scans)
+        self.assertEqual((result['products'], result['unknown']), (2, ['NOPE']))
+        self.assertEqual(record_scans(count, batch, scans)['status'], 'duplicate')
+        record_scans(count, uuid.uuid4(), [{'barcode': 'CNT-B0', 'quantity': Decimal('1')}])
+
+        # بيع قطعتين أثناء الجرد بعد عدّهما
+        decrease_stock(self.branch, {self.products[0].pk: Decimal('2')})
+        self.assertEqual(approve_count(count), 3)
+        self.assertEqual(self.levels(), {'CNT-P0': Decimal('6'), 'CNT-P1': Decimal('0'), 'CNT-P2': Decimal('3')})
+        self.assertEqual(
+            sorted(InventoryMovement.objects.filter(reference_id=str(count.pk)).values_list('direction', 'quantity')),
+            [(-1, Decimal('2')), (-1, Decimal('5')), (1, Decimal('3'))],
+        )
+        with self.assertRaises(StockCountError):
+            record_scans(count, uuid.uuid4(), [{'barcode': 'CNT-B1'}])
+
+    def test_movement_records_only_what_the_floor_allowed(self):
+        count = start_count(self.branch, product_ids=[self.products[0].pk])
+        record_scans(count, uuid.uuid4(), [{'barcode': 'CNT-B0', 'quantity': Decimal('2')}])
+        # بيع 6 أثناء الجرد: الفرق -8 لكن الرصيد 4 فقط
+        decrease_stock(self.branch, {self.products[0].pk: Decimal('6')})
+        self.assertEqual(approve_count(count), 1)
+        self.assertEqual(self.levels()['CNT-P0'], Decimal('0'))
+        self.assertEqual(
+            list(InventoryMovement.objects.filter(reference_id=str(count.pk)).values_list('direction', 'quantity')),
+            [(-1, Decimal('4'))],
+        )
+
+    def test_partial_count_only_touches_listed_products(self):
+        count = start_count(self.branch, product_ids=[self.products[1].pk])
+        record_scans(count, uuid.uuid4(), [{'barcode': 'CNT-B1', 'quantity': Decimal('5')}])
+        self.assertEqual(approve_count(count), 0)
+        self.assertEqual(self.levels(), {'CNT-P0': Decimal('10'), 'CNT-P1': Decimal('5')})
+        self.assertIsNotNone(StockLevel.objects.get(branch=self.branch, product=self.products[1]).last_counted_at)
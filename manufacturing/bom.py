@@ -0,0 +1,244 @@
+import threading
+from collections import defaultdict, deque
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from inventory.models import Product
+from .models import Recipe, RecipeIngredient
+
+# ============================================
+# شجرة المكونات (BOM) في الذاكرة
+# ============================================
+
+ZERO = Decimal('0')
+COST_PLACES = Decimal('0.0001')
+
+
+class BOMCycleError(Exception):
+    """حلقة في الوصفات: منتج يدخل في مكوناته بشكل مباشر أو غير مباشر"""
+
+    def __init__(self, cycle):
+        # cycle: معرفات المنتجات على الحلقة بالترتيب، والأول يتكرر في آخرها
+        self.cycle = cycle
+        super().__init__(f"حلقة في الوصفات تمر بعدد {len(cycle) - 1} منتج")
+
+
+class BOMGraph:
+    """
+    وصفات شركة ومكوناتها محمّلة باستعلامين
+
+    by_id: كل وصفات الشركة {'id', 'product_id', 'output_quantity', 'production_time_minutes', 'is_active',
+    'standard_cost', 'unit_cost'}.
+    recipes: معرف المنتج -> وصفته الفعالة من by_id (إذا كان للمنتج أكثر من وصفة فعالة تُعتمد الأولى بالكود).
+    components: معرف الوصفة -> [(معرف المكون، الكمية لكل تشغيلة)].
+    order: المنتجات مرتبة طوبولوجياً، كل منتج قبل مكوناته؛ يُرفع BOMCycleError عند وجود حلقة.
+    """
+
+    def __init__(self, by_id, components):
+        self.by_id = by_id
+        self.recipes = {}
+        for recipe in by_id.values():
+            if recipe['is_active']:
+                self.recipes.setdefault(recipe['product_id'], recipe)
+        self.components = components
+        self.order = self._topological_order()
+
+    @classmethod
+    def load(cls, company):
+        by_id = {
+            recipe['id']: recipe
+            for recipe in Recipe.objects.filter(company=company).order_by('code').values(
+                'id', 'product_id', 'output_quantity', 'production_time_minutes', 'is_active',
+                'standard_cost', 'unit_cost',
+            )
+        }
+        components = defaultdict(list)
+        for recipe_id, product_id, quantity in (
+            RecipeIngredient.objects.filter(recipe__company=company).values_list('recipe_id', 'product_id', 'quantity')
+        ):
+            components[recipe_id].append((product_id, quantity))
+        return cls(by_id, components)
+
+    def children(self, product_id):
+        """مكونات المنتج حسب وصفته الفعالة (فارغة للمنتجات المشتراة)"""
+        recipe = self.recipes.get(product_id)
+        return self.components.get(recipe['id'], ()) if recipe else ()
+
+    def _topological_order(self):
+        edges = {product_id: [child for child, _ in self.children(product_id)] for product_id in self.recipes}
+        parents = defaultdict(int)
+        nodes = set(edges)
+        for children in edges.values():
+            for child in children:
+                parents[child] += 1
+                nodes.add(child)
+
+        queue = deque(node for node in nodes if not parents[node])
+        order = []
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for child in edges.get(node, ()):
+                parents[child] -= 1
+                if not parents[child]:
+                    queue.append(child)
+
+        if len(order) < len(nodes):
+            raise BOMCycleError(self._find_cycle(edges, nodes - set(order)))
+        return order
+
+    @staticmethod
+    def _find_cycle(edges, remaining):
+        """حلقة واحدة بين العقد التي لم يصل إليها الترتيب (بحث عمقي غير تعاودي)"""
+        visited = set()
+        for start in remaining:
+            if start in visited:
+                continue
+            path, on_path = [start], {start: 0}
+            stack = [iter(edges.get(start, ()))]
+            visited.add(start)
+            while stack:
+                child = next((c for c in stack[-1] if c in remaining), None)
+                if child is None:
+                    on_path.pop(path.pop())
+                    stack.pop()
+                elif child in on_path:
+                    return path[on_path[child]:] + [child]
+                elif child not in visited:
+                    visited.add(child)
+                    on_path[child] = len(path)
+                    path.append(child)
+                    stack.append(iter(edges.get(child, ())))
+        return []
+
+
+# ============================================
+# التكلفة المعيارية للوصفات
+# ============================================
+
+
+def _affected_recipes(graph, product_ids, recipe_ids):
+    """الوصفات التي تتغير تكلفتها: المعطاة، والتي تستخدم المنتجات المعطاة، وكل ما فوقها"""
+    used_in = defaultdict(list)
+    for recipe_id, items in graph.components.items():
+        for product_id, _ in items:
+            used_in[product_id].append(recipe_id)
+
+    affected = set()
+    queue = deque(product_ids)
+
+    def mark(recipe_id):
+        if recipe_id in affected or recipe_id not in graph.by_id:
+            return
+        affected.add(recipe_id)
+        product_id = graph.by_id[recipe_id]['product_id']
+        # تكلفة المنتج تتبع وصفته الفعالة فقط
+        if graph.recipes.get(product_id, {}).get('id') == recipe_id:
+            queue.append(product_id)
+
+    for recipe_id in recipe_ids:
+        mark(recipe_id)
+    while queue:
+        for recipe_id in used_in.get(queue.popleft(), ()):
+            mark(recipe_id)
+    return affected
+
+
+def rollup_costs(company, product_ids=None, recipe_ids=None):
+    """
+    حساب التكلفة المعيارية للوصفات من المكونات إلى المنتجات النهائية
+
+    تكلفة التشغيلة = مجموع (كمية المكون × تكلفة وحدته)، وتكلفة وحدة المكون هي unit_cost
+    لوصفته الفعالة إن وُجدت وإلا Product.cost_price. تُحسب الوصفات بالترتيب الطوبولوجي
+    العكسي فتُحسب المكونات قبل ما يستخدمها. بدون معاملات تُحسب كل وصفات الشركة، ومع
+    product_ids (تغير سعر التكلفة) أو recipe_ids (تغيرت المكونات أو الكمية المنتجة)
+    تُحسب الوصفات المتأثرة وما فوقها فقط. تُحفظ الوصفات التي تغيرت تكلفتها بتحديث جماعي.
+    يعيد عدد الوصفات المحدثة.
+    """
+    graph = BOMGraph.load(company)
+    if product_ids is None and recipe_ids is None:
+        affected = set(graph.by_id)
+    else:
+        affected = _affected_recipes(graph, product_ids or (), recipe_ids or ())
+    if not affected:
+        return 0
+
+    products = set(graph.order) | {product_id for items in graph.components.values() for product_id, _ in items}
+    unit_costs = dict(Product.objects.filter(pk__in=products).values_list('pk', 'cost_price'))
+    for product_id, recipe in graph.recipes.items():
+        if recipe['unit_cost'] is not None:
+            unit_costs[product_id] = recipe['unit_cost']
+
+    def compute(recipe):
+        items = graph.components.get(recipe['id'], ())
+        cost = sum((quantity * unit_costs.get(product_id, ZERO) for product_id, quantity in items), ZERO)
+        cost = cost.quantize(COST_PLACES)
+        output = recipe['output_quantity']
+        return cost, (cost / output if output else cost).quantize(COST_PLACES)
+
+    results = {}
+    for product_id in reversed(graph.order):
+        recipe = graph.recipes.get(product_id)
+        if recipe is not None and recipe['id'] in affected:
+            results[recipe['id']] = compute(recipe)
+            unit_costs[product_id] = results[recipe['id']][1]
+    for recipe_id in affected - set(results):
+        results[recipe_id] = compute(graph.by_id[recipe_id])
+
+    now = timezone.now()
+    changed = [
+        Recipe(pk=recipe_id, standard_cost=cost, unit_cost=unit_cost, cost_updated_at=now)
+        for recipe_id, (cost, unit_cost) in results.items()
+        if (graph.by_id[recipe_id]['standard_cost'], graph.by_id[recipe_id]['unit_cost']) != (cost, unit_cost)
+    ]
+    Recipe.objects.bulk_update(changed, ['standard_cost', 'unit_cost', 'cost_updated_at'], batch_size=500)
+    return len(changed)
+
+
+class CostRollupQueue:
+    """
+    تجميع تغييرات أسعار المكونات والوصفات في المعاملة وإعادة حساب المتأثر بعد حفظها
+
+    المنتجات التي لا تدخل في أي وصفة لا تحمّل شجرة المكونات. ما يبقى في الطابور بعد
+    التراجع عن معاملته يُحسب مع الدفعة التالية دون أثر، لأن الحساب من الحالة الفعلية.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @staticmethod
+    def _empty():
+        # company_id -> (معرفات المنتجات، معرفات الوصفات)
+        return defaultdict(lambda: (set(), set()))
+
+    @property
+    def pending(self):
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = self._empty()
+        return self._local.pending
+
+    def add(self, company_id, product_id=None, recipe_id=None):
+        products, recipes = self.pending[company_id]
+        if product_id is not None:
+            products.add(product_id)
+        if recipe_id is not None:
+            recipes.add(recipe_id)
+        transaction.on_commit(self.flush)
+
+    def flush(self):
+        if not self.pending:
+            return 0
+        pending, self._local.pending = self.pending, self._empty()
+        updated = 0
+        for company_id, (products, recipes) in pending.items():
+            if not recipes and not RecipeIngredient.objects.filter(product_id__in=products).exists():
+                continue
+            try:
+                updated += rollup_costs(company_id, product_ids=products, recipe_ids=recipes)
+            except BOMCycleError:
+                # الوصفة التي سببت الحلقة محفوظة؛ تظهر الحلقة في rollup_recipe_costs و run_mrp
+                continue
+        return updated
+
+
+cost_rollup_queue = CostRollupQueue()
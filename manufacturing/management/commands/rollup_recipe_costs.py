@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Company
+from manufacturing.bom import BOMCycleError, rollup_costs
+
+
+class Command(BaseCommand):
+    help = 'حساب التكلفة المعيارية لكل الوصفات من أسعار تكلفة المكونات (بعد الاستيراد الجماعي)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help='معرف الشركة (الافتراضي: جميع الشركات)')
+
+    def handle(self, *args, **options):
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+            if not companies.exists():
+                raise CommandError(f"الشركة غير موجودة: {options['company']}")
+
+        for company in companies:
+            try:
+                updated = rollup_costs(company)
+            except BOMCycleError as e:
+                raise CommandError(f"{company}: {e} ({', '.join(map(str, e.cycle))})")
+            self.stdout.write(f"{company}: تحدثت تكلفة {updated} وصفة")
+        self.stdout.write(self.style.SUCCESS('تم حساب تكلفة الوصفات'))
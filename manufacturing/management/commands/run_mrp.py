@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Branch, Company
+from manufacturing.bom import BOMCycleError
+from manufacturing.mrp import run_mrp
+
+
+class Command(BaseCommand):
+    help = 'تخطيط احتياجات المواد: مسودات أوامر إنتاج وشراء من أوامر البيع والإنتاج المفتوحة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help='معرف الشركة (الافتراضي: جميع الشركات)')
+        parser.add_argument('--branch', help='معرف الفرع (الافتراضي: جميع فروع الشركة)')
+        parser.add_argument('--dry-run', action='store_true', help='حساب المقترحات دون حفظها')
+
+    def handle(self, *args, **options):
+        branch = None
+        if options['branch']:
+            branch = Branch.objects.select_related('company').filter(pk=options['branch']).first()
+            if branch is None:
+                raise CommandError(f"الفرع غير موجود: {options['branch']}")
+            companies = [branch.company]
+        elif options['company']:
+            companies = list(Company.objects.filter(pk=options['company']))
+            if not companies:
+                raise CommandError(f"الشركة غير موجودة: {options['company']}")
+        else:
+            companies = Company.objects.all()
+
+        for company in companies:
+            try:
+                run = run_mrp(company, branch=branch, dry_run=options['dry_run'])
+            except BOMCycleError as e:
+                raise CommandError(f"{company}: {e} ({', '.join(map(str, e.cycle))})")
+            self.stdout.write(
+                f"{company}: {len(run.production)} أمر إنتاج، {len(run.purchases)} سطر شراء"
+                + (f"، {len(run.without_supplier)} منتج بلا مورد" if run.without_supplier else '')
+            )
+        self.stdout.write(self.style.SUCCESS('تم تخطيط الاحتياجات'))
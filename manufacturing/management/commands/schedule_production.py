@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Branch
+from manufacturing.scheduling import schedule_branch
+
+
+class Command(BaseCommand):
+    help = 'جدولة أوامر الإنتاج المفتوحة على خطوط الفروع والعمال بسعة محدودة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help='معرف الشركة (الافتراضي: جميع الشركات)')
+        parser.add_argument('--branch', help='معرف الفرع (الافتراضي: جميع الفروع)')
+
+    def handle(self, *args, **options):
+        branches = Branch.objects.filter(is_active=True)
+        if options['company']:
+            branches = branches.filter(company_id=options['company'])
+        if options['branch']:
+            branches = branches.filter(pk=options['branch'])
+            if not branches.exists():
+                raise CommandError(f"الفرع غير موجود: {options['branch']}")
+
+        for branch in branches:
+            updated = schedule_branch(branch)
+            if updated:
+                self.stdout.write(f"{branch}: تغيرت مواعيد {updated} أمر")
+        self.stdout.write(self.style.SUCCESS('تمت جدولة الإنتاج'))
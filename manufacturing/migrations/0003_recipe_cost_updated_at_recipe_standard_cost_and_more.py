@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manufacturing', '0002_alter_productionorder_order_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cost_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='standard_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=18, null=True, verbose_name='تكلفة التشغيلة'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True, verbose_name='تكلفة الوحدة'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manufacturing', '0003_recipe_cost_updated_at_recipe_standard_cost_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productionorder',
+            name='due_date',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='موعد الاستحقاق'),
+        ),
+    ]
@@ -35,6 +35,15 @@ class Recipe(models.Model):
     # الوقت
     production_time_minutes = models.IntegerField(default=0, verbose_name=_('وقت الإنتاج (دقيقة)'))
     
+    # التكلفة المعيارية من المكونات (manufacturing/bom.py)
+    standard_cost = models.DecimalField(
+        max_digits=18, decimal_places=4, null=True, blank=True, verbose_name=_('تكلفة التشغيلة')
+    )
+    unit_cost = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True, verbose_name=_('تكلفة الوحدة')
+    )
+    cost_updated_at = models.DateTimeField(null=True, blank=True)
+    
     # الحالة
     is_active = models.BooleanField(default=True)
     
@@ -96,7 +105,7 @@ class ProductionOrder(models.Model):
     company = models.ForeignKey('core.Company', on_delete=models.CASCADE, related_name='production_orders')
     branch = models.ForeignKey('core.Branch', on_delete=models.CASCADE, related_name='production_orders')
     
-    order_number = models.CharField(max_length=50, unique=True, verbose_name=_('رقم الأمر'))
+    order_number = models.CharField(max_length=50, unique=True, blank=True, verbose_name=_('رقم الأمر'))
     recipe = models.ForeignKey(Recipe, on_delete=models.PROTECT)
     
     # الكميات
@@ -116,6 +125,8 @@ class ProductionOrder(models.Model):
     planned_end_date = models.DateTimeField(verbose_name=_('تاريخ نهاية مخطط'))
     actual_start_date = models.DateTimeField(null=True, blank=True)
     actual_end_date = models.DateTimeField(null=True, blank=True)
+    # موعد الاستحقاق الذي ترتب به الجدولة (manufacturing/scheduling.py)
+    due_date = models.DateTimeField(null=True, blank=True, verbose_name=_('موعد الاستحقاق'))
     
     # الحالة
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
@@ -0,0 +1,232 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_UP
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from accounting.models import PurchaseOrder, PurchaseOrderLine
+from accounting.services import OPEN_PURCHASE_ORDER_STATUSES
+from core.models import Branch
+from core.services import next_numbers
+from inventory.models import Product, StockLevel
+from pos.models import SalesOrderLine
+from .bom import BOMGraph
+from .models import ProductionOrder
+
+# ============================================
+# تخطيط احتياجات المواد (MRP) متعدد المستويات
+# ============================================
+
+ZERO = Decimal('0')
+QUANTITY_PLACES = Decimal('0.01')
+
+# الطلب المستقل من أوامر البيع، والطلب التابع والإمداد من أوامر الإنتاج المفتوحة
+OPEN_SALES_ORDER_STATUSES = ('submitted', 'confirmed')
+OPEN_PRODUCTION_ORDER_STATUSES = ('draft', 'planned', 'in_progress')
+
+# تمييز المقترحات ليستبدلها التشغيل التالي ما دامت مسودة
+MRP_NOTE = 'مقترح تخطيط الاحتياجات (MRP)'
+
+
+def _quantity(value):
+    return value.quantize(QUANTITY_PLACES, rounding=ROUND_UP)
+
+
+def _at_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class MRPRun:
+    """
+    تشغيل واحد لتخطيط احتياجات شركة
+
+    يُحمَّل كل شيء بعدد ثابت من الاستعلامات: شجرة المكونات (BOMGraph)، الطلب من أوامر
+    البيع وأوامر الإنتاج المفتوحة، أرصدة الفروع، والكميات القادمة من أوامر الشراء وأوامر
+    الإنتاج. ثم يُفجَّر الطلب لكل فرع بالترتيب الطوبولوجي، فلا يُحسب صافي احتياج منتج إلا
+    بعد أن يكتمل طلبه من كل المنتجات التي تستخدمه. الاحتياج الصافي لمنتج له وصفة يصبح
+    أمر إنتاج بعدد تشغيلات كامل ويُضاف طلب مكوناته، وغيره يصبح سطر أمر شراء.
+    مقترحات التشغيلات السابقة (مسودات MRP_NOTE) لا تُحتسب إمداداً وتُستبدل عند الحفظ.
+    """
+
+    def __init__(self, company, branch=None):
+        self.company = company
+        self.branch = branch
+        self.today = timezone.localdate()
+        self.graph = BOMGraph.load(company)
+        self.gross = defaultdict(lambda: ZERO)  # (branch_id, product_id) -> الطلب الإجمالي
+        self.need_dates = {}  # (branch_id, product_id) -> أقرب تاريخ احتياج
+        self.available = defaultdict(lambda: ZERO)  # الرصيد + الكميات القادمة
+        self.production = []  # (branch_id, recipe, عدد التشغيلات، الكمية، البداية، النهاية)
+        self.purchases = []  # (branch_id, product_id, الكمية، تاريخ الاحتياج)
+        # بعد الحفظ: المستندات المنشأة والمنتجات التي ليس لها مورد سابق
+        self.production_orders, self.purchase_orders, self.without_supplier = [], [], []
+
+    def _scoped(self, queryset, branch_field):
+        if self.branch is not None:
+            queryset = queryset.filter(**{branch_field: self.branch})
+        return queryset
+
+    def _demand(self, key, quantity, day):
+        self.gross[key] += quantity
+        day = max(day, self.today)
+        if key not in self.need_dates or day < self.need_dates[key]:
+            self.need_dates[key] = day
+
+    def load(self):
+        sales = self._scoped(SalesOrderLine.objects.filter(
+            sales_order__company=self.company, sales_order__status__in=OPEN_SALES_ORDER_STATUSES,
+        ), 'sales_order__branch')
+        for branch_id, product_id, quantity, day in sales.values_list(
+            'sales_order__branch_id', 'product_id', 'quantity', 'sales_order__expected_delivery_date',
+        ):
+            self._demand((branch_id, product_id), quantity, day)
+
+        orders = self._scoped(ProductionOrder.objects.filter(
+            company=self.company, status__in=OPEN_PRODUCTION_ORDER_STATUSES,
+        ).exclude(status='draft', notes=MRP_NOTE), 'branch').values_list(
+            'branch_id', 'recipe_id', 'recipe__product_id', 'recipe__output_quantity',
+            'planned_quantity', 'produced_quantity', 'planned_start_date',
+        )
+        for branch_id, recipe_id, product_id, output, planned, produced, start in orders:
+            remaining = planned - produced
+            if remaining <= 0 or not output:
+                continue
+            self.available[branch_id, product_id] += remaining
+            day = timezone.localdate(start)
+            for component, quantity in self.graph.components.get(recipe_id, ()):
+                self._demand((branch_id, component), _quantity(quantity * remaining / output), day)
+
+        levels = self._scoped(StockLevel.objects.filter(branch__company=self.company), 'branch')
+        for branch_id, product_id, quantity in levels.values_list('branch_id', 'product_id', 'quantity'):
+            self.available[branch_id, product_id] += quantity
+
+        incoming = self._scoped(PurchaseOrderLine.objects.filter(
+            purchase_order__company=self.company, purchase_order__status__in=OPEN_PURCHASE_ORDER_STATUSES,
+            received_quantity__lt=F('quantity'),
+        ).exclude(purchase_order__status='draft', purchase_order__notes=MRP_NOTE), 'purchase_order__branch')
+        for branch_id, product_id, quantity, received in incoming.values_list(
+            'purchase_order__branch_id', 'product_id', 'quantity', 'received_quantity',
+        ):
+            self.available[branch_id, product_id] += quantity - received
+        return self
+
+    def explode(self):
+        graph = self.graph
+        in_graph = set(graph.order)
+        branches = sorted({branch_id for branch_id, _ in self.gross}, key=str)
+        for branch_id in branches:
+            products = graph.order + [p for b, p in list(self.gross) if b == branch_id and p not in in_graph]
+            for product_id in products:
+                key = (branch_id, product_id)
+                net = self.gross.get(key, ZERO) - self.available[key]
+                if net <= 0:
+                    continue
+                need = self.need_dates.get(key, self.today)
+                recipe = graph.recipes.get(product_id)
+                if recipe is None or not recipe['output_quantity']:
+                    self.purchases.append((branch_id, product_id, _quantity(net), need))
+                    continue
+
+                runs = (net / recipe['output_quantity']).to_integral_value(rounding=ROUND_UP)
+                end = _at_start(need)
+                start = end - timedelta(minutes=int(recipe['production_time_minutes'] * runs))
+                self.production.append((branch_id, recipe, runs, runs * recipe['output_quantity'], start, end))
+                for component, quantity in graph.children(product_id):
+                    self._demand((branch_id, component), _quantity(quantity * runs), timezone.localdate(start))
+        return self
+
+    def _suppliers(self, product_ids):
+        """آخر مورد وسعر لكل منتج من أوامر الشراء السابقة باستعلام واحد"""
+        suppliers = {}
+        history = PurchaseOrderLine.objects.filter(
+            purchase_order__company=self.company, product_id__in=product_ids,
+        ).order_by(
+            'product_id', '-purchase_order__order_date', '-purchase_order__created_at',
+        ).values_list('product_id', 'purchase_order__supplier_id', 'unit_price')
+        for product_id, supplier_id, unit_price in history:
+            suppliers.setdefault(product_id, (supplier_id, unit_price))
+        return suppliers
+
+    @transaction.atomic
+    def save(self, created_by=None):
+        """
+        استبدال مقترحات التشغيل السابق بمسودات أوامر الإنتاج والشراء الجديدة بإدخال جماعي
+
+        المنتجات التي ليس لها مورد سابق لا يُقترح لها أمر شراء وتبقى في without_supplier.
+        """
+        for model in (ProductionOrder, PurchaseOrder):
+            self._scoped(model.objects.filter(company=self.company, status='draft', notes=MRP_NOTE), 'branch').delete()
+
+        branch_ids = {branch_id for branch_id, *_ in self.production} | {branch_id for branch_id, *_ in self.purchases}
+        branches = Branch.objects.in_bulk(branch_ids)
+
+        by_branch = defaultdict(list)
+        for proposal in self.production:
+            by_branch[proposal[0]].append(proposal)
+        production_orders = []
+        for branch_id, proposals in by_branch.items():
+            numbers = next_numbers(branches[branch_id], 'production_order', len(proposals))
+            production_orders.extend(
+                ProductionOrder(
+                    company=self.company, branch_id=branch_id, order_number=number, recipe_id=recipe['id'],
+                    planned_quantity=quantity, planned_start_date=start, planned_end_date=end, due_date=end,
+                    status='draft', created_by=created_by, notes=MRP_NOTE,
+                )
+                for number, (_, recipe, _, quantity, start, end) in zip(numbers, proposals)
+            )
+        ProductionOrder.objects.bulk_create(production_orders, batch_size=500)
+
+        suppliers = self._suppliers({product_id for _, product_id, _, _ in self.purchases})
+        cost_prices = dict(
+            Product.objects.filter(pk__in=[product_id for _, product_id, _, _ in self.purchases])
+            .values_list('pk', 'cost_price')
+        )
+        grouped = defaultdict(list)
+        without_supplier = []
+        for branch_id, product_id, quantity, need in self.purchases:
+            if product_id not in suppliers:
+                without_supplier.append(product_id)
+                continue
+            supplier_id, unit_price = suppliers[product_id]
+            unit_price = unit_price or cost_prices.get(product_id, ZERO)
+            grouped[branch_id, supplier_id].append((product_id, quantity, unit_price, need))
+
+        by_branch = defaultdict(list)
+        for (branch_id, supplier_id), items in grouped.items():
+            by_branch[branch_id].append((supplier_id, items))
+        purchase_orders, lines = [], []
+        for branch_id, orders in by_branch.items():
+            numbers = next_numbers(branches[branch_id], 'purchase_order', len(orders))
+            for order_number, (supplier_id, items) in zip(numbers, orders):
+                subtotal = sum((quantity * unit_price for _, quantity, unit_price, _ in items), ZERO)
+                order = PurchaseOrder(
+                    company=self.company, branch_id=branch_id, order_number=order_number, supplier_id=supplier_id,
+                    order_date=self.today, expected_delivery_date=min(need for *_, need in items),
+                    status='draft', subtotal=subtotal, total_amount=subtotal, created_by=created_by, notes=MRP_NOTE,
+                )
+                purchase_orders.append(order)
+                lines.extend(
+                    PurchaseOrderLine(
+                        purchase_order=order, product_id=product_id, quantity=quantity,
+                        unit_price=unit_price, line_total=quantity * unit_price,
+                    )
+                    for product_id, quantity, unit_price, _ in items
+                )
+        PurchaseOrder.objects.bulk_create(purchase_orders, batch_size=500)
+        PurchaseOrderLine.objects.bulk_create(lines, batch_size=500)
+        self.production_orders, self.purchase_orders, self.without_supplier = (
+            production_orders, purchase_orders, without_supplier
+        )
+        return self
+
+
+def run_mrp(company, branch=None, created_by=None, dry_run=False):
+    """
+    تشغيل تخطيط الاحتياجات لشركة (أو فرع) وحفظ المقترحات
+
+    يعيد MRPRun؛ مع dry_run تُحسب المقترحات (run.production و run.purchases) دون حفظ.
+    """
+    run = MRPRun(company, branch).load().explode()
+    if not dry_run:
+        run.save(created_by=created_by)
+    return run
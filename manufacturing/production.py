@@ -0,0 +1,202 @@
+from collections import defaultdict
+from decimal import Decimal, ROUND_UP
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from accounting.ledger import posting_queue
+from core.models import Branch
+from inventory.models import InventoryMovement, StockLevel
+from inventory.services import decrease_stock, increase_stock, post_movements
+from .models import ProductionOrder, ProductionOrderLine, RecipeIngredient
+from .mrp import OPEN_PRODUCTION_ORDER_STATUSES, QUANTITY_PLACES
+
+# ============================================
+# إكمال أوامر الإنتاج: استهلاك المكونات وإدخال المنتج دفعة واحدة
+# ============================================
+
+ZERO = Decimal('0')
+COST_PLACES = Decimal('0.01')
+
+# حجم دفعات الإدخال الجماعي لأسطر الأوامر
+COMPLETION_BATCH_SIZE = 1000
+
+
+class ProductionError(Exception):
+    """خطأ في إكمال أوامر الإنتاج"""
+
+
+def _requirements(orders):
+    """
+    أسطر كل أمر: الأسطر المحفوظة إن وُجدت، وإلا مكونات الوصفة مضروبة في الكمية المخططة
+
+    يعيد {معرف الأمر: [(معرف سطر محفوظ أو None، معرف المكون، معرف المنتج، الكمية، يتتبع الكمية)]}.
+    """
+    lines = defaultdict(list)
+    for line in ProductionOrderLine.objects.filter(production_order_id__in=orders).values(
+        'id', 'production_order_id', 'ingredient_id', 'ingredient__product_id', 'planned_quantity',
+        'ingredient__product__track_quantity',
+    ):
+        lines[line['production_order_id']].append((
+            line['id'], line['ingredient_id'], line['ingredient__product_id'], line['planned_quantity'],
+            line['ingredient__product__track_quantity'],
+        ))
+
+    ingredients = defaultdict(list)
+    for ingredient in RecipeIngredient.objects.filter(
+        recipe_id__in={order['recipe_id'] for pk, order in orders.items() if pk not in lines},
+    ).values('id', 'recipe_id', 'product_id', 'quantity', 'product__track_quantity'):
+        ingredients[ingredient['recipe_id']].append(ingredient)
+
+    for pk, order in orders.items():
+        if pk in lines:
+            continue
+        scale = order['planned_quantity'] / order['recipe__output_quantity']
+        lines[pk] = [
+            (
+                None, ingredient['id'], ingredient['product_id'],
+                (ingredient['quantity'] * scale).quantize(QUANTITY_PLACES, rounding=ROUND_UP),
+                ingredient['product__track_quantity'],
+            )
+            for ingredient in ingredients[order['recipe_id']]
+        ]
+    return lines
+
+
+def complete_orders(order_ids, completed_by=None):
+    """
+    إكمال دفعة أوامر إنتاج بالكمية المخططة
+
+    يُحجز كل أمر ومكوناته مقابل أرصدة فرعه في الذاكرة بترتيب البداية المخططة، والأمر الذي
+    لا يكفيه الرصيد يُرفض كاملاً ولا يُستهلك شيء من مكوناته. ثم تُخصم مكونات الأوامر
+    المقبولة بـ decrease_stock وتُضاف منتجاتها بـ increase_stock (تحديث واحد لكل جدول لكل
+    فرع)، وتُنشأ الأسطر وحركات الاستهلاك والإنتاج بإدخال جماعي، ويُسعَّر المنتج بتكلفة
+    ما استهلكه. المنتجات التي تنتجها الدفعة لا تُحتسب رصيداً لأوامر أخرى في نفس الدفعة.
+    يعيد (معرفات الأوامر المكتملة، {معرف الأمر المرفوض: shortages كما في InsufficientStockError}).
+    """
+    with transaction.atomic():
+        orders = {
+            order['id']: order
+            for order in ProductionOrder.objects.select_for_update().filter(pk__in=order_ids)
+            .order_by('planned_start_date', 'created_at').values(
+                'id', 'branch_id', 'order_number', 'status', 'recipe_id', 'planned_quantity',
+                'recipe__product_id', 'recipe__product__track_quantity', 'recipe__output_quantity',
+            )
+        }
+        if len(orders) != len(set(order_ids)):
+            raise ProductionError(f"أوامر غير موجودة: {len(set(order_ids)) - len(orders)}")
+        for order in orders.values():
+            if order['status'] not in OPEN_PRODUCTION_ORDER_STATUSES:
+                raise ProductionError(f"لا يمكن إكمال الأمر {order['order_number']} بحالة {order['status']}")
+            if not order['recipe__output_quantity'] or order['planned_quantity'] <= 0:
+                raise ProductionError(f"لا توجد كمية لإنتاجها في الأمر {order['order_number']}")
+
+        lines = _requirements(orders)
+        # قفل الأرصدة قبل حجزها في الذاكرة، فلا يخصمها بيع متزامن قبل decrease_stock
+        available = defaultdict(lambda: ZERO)
+        for branch_id, product_id, quantity in StockLevel.objects.select_for_update().filter(
+            branch_id__in={order['branch_id'] for order in orders.values()},
+            product_id__in={line[2] for order_lines in lines.values() for line in order_lines},
+        ).order_by('branch_id', 'product_id').values_list('branch_id', 'product_id', 'quantity'):
+            available[branch_id, product_id] = quantity
+
+        consumed = defaultdict(lambda: defaultdict(lambda: ZERO))  # branch_id -> product_id -> الكمية
+        completed, rejected = [], {}
+        for pk, order in orders.items():
+            needed = defaultdict(lambda: ZERO)
+            for _, _, product_id, quantity, tracked in lines[pk]:
+                if tracked:
+                    needed[product_id] += quantity
+            branch_id = order['branch_id']
+            shortages = {
+                product_id: {'requested': quantity, 'available': available[branch_id, product_id]}
+                for product_id, quantity in needed.items()
+                if available[branch_id, product_id] < quantity
+            }
+            if shortages:
+                rejected[pk] = shortages
+                continue
+            for product_id, quantity in needed.items():
+                available[branch_id, product_id] -= quantity
+                consumed[branch_id][product_id] += quantity
+            completed.append(pk)
+        if not completed:
+            return completed, rejected
+
+        branches = Branch.objects.in_bulk({orders[pk]['branch_id'] for pk in completed})
+        for branch_id, quantities in consumed.items():
+            decrease_stock(branches[branch_id], quantities)
+
+        ProductionOrderLine.objects.bulk_create(
+            [
+                ProductionOrderLine(
+                    production_order_id=pk, ingredient_id=ingredient_id,
+                    planned_quantity=quantity, consumed_quantity=quantity,
+                )
+                for pk in completed
+                for line_id, ingredient_id, _, quantity, _ in lines[pk]
+                if line_id is None
+            ],
+            batch_size=COMPLETION_BATCH_SIZE,
+        )
+        ProductionOrderLine.objects.filter(
+            production_order_id__in=[pk for pk in completed if any(line[0] for line in lines[pk])],
+        ).update(consumed_quantity=F('planned_quantity'))
+
+        consumption = post_movements([
+            InventoryMovement(
+                product_id=product_id,
+                branch_id=orders[pk]['branch_id'],
+                movement_type='production',
+                direction=InventoryMovement.DIRECTION_OUT,
+                quantity=quantity,
+                reference_type='production_order',
+                reference_id=str(pk),
+                created_by=completed_by,
+            )
+            for pk in completed
+            for _, _, product_id, quantity, tracked in lines[pk]
+            if tracked and quantity
+        ])
+        costs = defaultdict(lambda: ZERO)
+        for movement in consumption:
+            costs[movement.reference_id] += movement.quantity * movement.unit_cost
+
+        produced = defaultdict(lambda: defaultdict(lambda: ZERO))
+        outputs = []
+        for pk in completed:
+            order = orders[pk]
+            if not order['recipe__product__track_quantity']:
+                continue
+            quantity = order['planned_quantity']
+            produced[order['branch_id']][order['recipe__product_id']] += quantity
+            outputs.append(InventoryMovement(
+                product_id=order['recipe__product_id'],
+                branch_id=order['branch_id'],
+                movement_type='production',
+                direction=InventoryMovement.DIRECTION_IN,
+                quantity=quantity,
+                unit_price=(costs[str(pk)] / quantity).quantize(COST_PLACES),
+                reference_type='production_order',
+                reference_id=str(pk),
+                created_by=completed_by,
+            ))
+        for branch_id, quantities in produced.items():
+            increase_stock(branches[branch_id], quantities)
+        post_movements(outputs)
+
+        now = timezone.now()
+        ProductionOrder.objects.filter(pk__in=completed).update(
+            status='completed',
+            produced_quantity=F('planned_quantity'),
+            actual_start_date=Coalesce('actual_start_date', now),
+            actual_end_date=now,
+            updated_at=now,
+        )
+        # التحديث الجماعي لا يطلق post_save الذي يرحّل الأمر إلى دفتر الأستاذ
+        if settings.LEDGER_POST_ON_SAVE:
+            for pk in completed:
+                posting_queue.add('production_order', pk)
+
+    return completed, rejected
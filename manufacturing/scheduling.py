@@ -0,0 +1,173 @@
+import heapq
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import ROUND_UP
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import ProductionOrder
+
+# ============================================
+# جدولة الإنتاج بسعة محدودة
+# ============================================
+
+# الأوامر التي يحرك الجدول تواريخها؛ الأوامر قيد التنفيذ تشغل مواردها حتى نهايتها المخططة
+SCHEDULABLE_STATUSES = ('draft', 'planned')
+ORDER_FIELDS = (
+    'id', 'assigned_to_id', 'status', 'planned_quantity', 'planned_start_date', 'planned_end_date', 'due_date',
+    'recipe__output_quantity', 'recipe__production_time_minutes',
+)
+
+
+class ShiftCalendar:
+    """ساعات العمل اليومية لمورد (خط إنتاج في الفرع أو عامل)؛ العمل يتوقف خارجها ويكمل في الوردية التالية"""
+
+    def __init__(self, start_hour=None, end_hour=None):
+        self.start_hour = settings.PRODUCTION_SHIFT_START_HOUR if start_hour is None else start_hour
+        self.end_hour = settings.PRODUCTION_SHIFT_END_HOUR if end_hour is None else end_hour
+        if not 0 <= self.start_hour < self.end_hour <= 24:
+            raise ValueError(f"ساعات وردية غير صحيحة: {self.start_hour}-{self.end_hour}")
+        # المنطقة الزمنية وحدود كل يوم تُحسب مرة واحدة؛ جدولة آلاف الأوامر تمر على نفس الأيام
+        self.tz = timezone.get_current_timezone()
+        self.shifts = {}
+
+    def shift(self, day):
+        """(بداية، نهاية) وردية اليوم"""
+        if day not in self.shifts:
+            midnight = timezone.make_aware(datetime.combine(day, time.min), self.tz)
+            self.shifts[day] = (midnight + timedelta(hours=self.start_hour), midnight + timedelta(hours=self.end_hour))
+        return self.shifts[day]
+
+    def align(self, moment):
+        """أقرب لحظة عمل في moment أو بعده"""
+        day = moment.astimezone(self.tz).date()
+        opens, closes = self.shift(day)
+        if moment < opens:
+            return opens
+        if moment >= closes:
+            return self.shift(day + timedelta(days=1))[0]
+        return moment
+
+    def add(self, moment, minutes):
+        """نهاية عمل مدته minutes دقيقة يبدأ في moment"""
+        moment = self.align(moment)
+        remaining = timedelta(minutes=minutes)
+        while True:
+            closes = self.shift(moment.astimezone(self.tz).date())[1]
+            if moment + remaining <= closes:
+                return moment + remaining
+            remaining -= closes - moment
+            moment = self.align(closes)
+
+
+def _duration(order):
+    """دقائق الأمر: وقت التشغيلة × عدد التشغيلات الكاملة، كما في MRP"""
+    output = order['recipe__output_quantity']
+    runs = (order['planned_quantity'] / output).to_integral_value(rounding=ROUND_UP) if output else 1
+    return int(order['recipe__production_time_minutes'] * runs)
+
+
+def _priority(order):
+    """ترتيب الموعد الأقرب أولاً (EDD)؛ الأمر الذي لم يُجدول بعد يُعد نهايته المخططة موعداً له"""
+    return (order['due_date'] or order['planned_end_date'], order['planned_start_date'], str(order['id']))
+
+
+class ProductionScheduler:
+    """
+    جدولة أوامر إنتاج فرع على موارده بسعة محدودة
+
+    لكل عامل مورد واحد لأوامره المسندة إليه، والأوامر غير المسندة تتقاسم PRODUCTION_BRANCH_LINES
+    خطاً في الفرع. داخل كل مورد تُسحب الأوامر من طابور أولوية بالموعد الأقرب، ويأخذ كل أمر أول
+    خط يفرغ (طابور أولوية ثانٍ بأوقات فراغ الخطوط) بدءاً من start وضمن ساعات الوردية، ومدته
+    وقت التشغيلة × عدد التشغيلات. تُكتب التواريخ التي تغيرت فقط بتحديث جماعي.
+    """
+
+    def __init__(self, branch, start=None, calendar=None):
+        self.branch = branch
+        self.start = start or timezone.now()
+        self.calendar = calendar or ShiftCalendar()
+
+    def _orders(self, **filters):
+        orders = defaultdict(list)
+        for order in ProductionOrder.objects.filter(
+            branch=self.branch, status__in=SCHEDULABLE_STATUSES + ('in_progress',), **filters,
+        ).values(*ORDER_FIELDS):
+            orders[order['assigned_to_id']].append(order)
+        return orders
+
+    def plan(self, orders, lines, after=None):
+        """
+        مواعيد أوامر مورد واحد {معرف الأمر: (البداية، النهاية)}
+
+        مع after (أولوية أمر أُدرج أو أُلغي) تبقى الأوامر الأسبق منه في مواعيدها المحفوظة وتشغل
+        الخطوط، ويُجدول هو وما بعده فقط.
+        """
+        free = [self.calendar.align(self.start)] * lines
+        fixed, queue = [], []
+        for order in orders:
+            if order['status'] not in SCHEDULABLE_STATUSES or (after is not None and _priority(order) < after):
+                fixed.append(order)
+            else:
+                queue.append((_priority(order), order))
+
+        for order in sorted(fixed, key=lambda order: order['planned_start_date']):
+            heapq.heappush(free, max(heapq.heappop(free), order['planned_end_date']))
+
+        heapq.heapify(queue)
+        planned = {}
+        while queue:
+            _, order = heapq.heappop(queue)
+            start = self.calendar.align(heapq.heappop(free))
+            end = self.calendar.add(start, _duration(order))
+            heapq.heappush(free, end)
+            planned[order['id']] = (start, end)
+        return planned
+
+    def _save(self, orders, planned):
+        # الموعد يُثبَّت من النهاية المخططة قبل أن تتغير، فلا يتغير ترتيب الأمر في الجدولة التالية
+        unset = [order['id'] for order in orders if order['id'] in planned and order['due_date'] is None]
+        if unset:
+            ProductionOrder.objects.filter(pk__in=unset).update(due_date=F('planned_end_date'))
+        changed = [
+            ProductionOrder(pk=order['id'], planned_start_date=planned[order['id']][0], planned_end_date=planned[order['id']][1])
+            for order in orders
+            if order['id'] in planned and (order['planned_start_date'], order['planned_end_date']) != planned[order['id']]
+        ]
+        if not changed:
+            return 0
+        # updated_at المشترك بتحديث واحد، فيبقى تحديث CASE الجماعي للتاريخين فقط
+        ProductionOrder.objects.filter(pk__in=[order.pk for order in changed]).update(updated_at=timezone.now())
+        ProductionOrder.objects.bulk_update(changed, ['planned_start_date', 'planned_end_date'], batch_size=1000)
+        return len(changed)
+
+    @staticmethod
+    def _lines(worker_id):
+        return 1 if worker_id else settings.PRODUCTION_BRANCH_LINES
+
+    @transaction.atomic
+    def schedule(self):
+        """إعادة جدولة كل أوامر الفرع؛ يعيد عدد الأوامر التي تغيرت مواعيدها"""
+        updated = 0
+        for worker_id, orders in self._orders().items():
+            updated += self._save(orders, self.plan(orders, self._lines(worker_id)))
+        return updated
+
+    @transaction.atomic
+    def reschedule_from(self, order):
+        """
+        إعادة جدولة مورد الأمر بعد إدراجه أو إلغائه أو حذفه
+
+        الأوامر الأسبق منه في الترتيب لا تتحرك، فيُجدول هو (إن كان قابلاً للجدولة) وما بعده فقط.
+        """
+        orders = self._orders(assigned_to_id=order.assigned_to_id)[order.assigned_to_id]
+        after = _priority({
+            'id': order.pk, 'due_date': order.due_date,
+            'planned_start_date': order.planned_start_date, 'planned_end_date': order.planned_end_date,
+        })
+        return self._save(orders, self.plan(orders, self._lines(order.assigned_to_id), after=after))
+
+
+def schedule_branch(branch, start=None):
+    """جدولة كل أوامر الفرع المفتوحة بدءاً من start (الافتراضي: الآن)"""
+    return ProductionScheduler(branch, start).schedule()
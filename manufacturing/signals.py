@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from inventory.models import Product
+from .bom import cost_rollup_queue
+from .models import ProductionOrder, Recipe, RecipeIngredient
+from .scheduling import SCHEDULABLE_STATUSES, ProductionScheduler
+
+
+@receiver(post_save, sender=Product)
+def queue_ingredient_cost_rollup(sender, instance, raw=False, update_fields=None, **kwargs):
+    """إعادة حساب تكلفة الوصفات التي تستخدم المنتج بعد تغير سعر تكلفته"""
+    if raw or (update_fields is not None and 'cost_price' not in update_fields):
+        return
+    cost_rollup_queue.add(instance.company_id, product_id=instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def queue_recipe_cost_rollup(sender, instance, raw=False, update_fields=None, **kwargs):
+    """الكمية المنتجة أو تفعيل الوصفة يغيّران تكلفتها وتكلفة ما يستخدم منتجها"""
+    if raw:
+        return
+    cost_rollup_queue.add(instance.company_id, recipe_id=instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def queue_deleted_recipe_rollup(sender, instance, **kwargs):
+    """بعد حذف الوصفة تعود تكلفة منتجها إلى سعر التكلفة"""
+    cost_rollup_queue.add(instance.company_id, product_id=instance.product_id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def queue_ingredient_change_rollup(sender, instance, raw=False, **kwargs):
+    """تغير مكونات الوصفة"""
+    if raw:
+        return
+    company_id = Recipe.objects.filter(pk=instance.recipe_id).values_list('company_id', flat=True).first()
+    if company_id is not None:
+        cost_rollup_queue.add(company_id, recipe_id=instance.recipe_id)
+
+
+
+def _reschedule_after(order):
+    transaction.on_commit(lambda: ProductionScheduler(order.branch_id).reschedule_from(order))
+
+
+@receiver(post_save, sender=ProductionOrder)
+def queue_production_reschedule(sender, instance, created, raw=False, **kwargs):
+    """إدراج أمر أو إلغاؤه يعيد جدولة ما بعده على نفس المورد بعد حفظ المعاملة"""
+    if raw or not settings.PRODUCTION_SCHEDULE_ON_SAVE:
+        return
+    if (created and instance.status in SCHEDULABLE_STATUSES) or instance.status == 'cancelled':
+        _reschedule_after(instance)
+
+
+@receiver(post_delete, sender=ProductionOrder)
+def queue_deleted_order_reschedule(sender, instance, **kwargs):
+    """حذف أمر مجدول يقدّم ما بعده"""
+    if settings.PRODUCTION_SCHEDULE_ON_SAVE and instance.status in SCHEDULABLE_STATUSES:
+        _reschedule_after(instance)
@@ -1,3 +1,257 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 from django.test import TestCase
+from django.utils import timezone
+from accounting.models import JournalLine, PurchaseOrder, PurchaseOrderLine
+from core.models import Company, Branch, Customer, CustomUser, Supplier, Unit
+from inventory.models import InventoryMovement, Product, StockLevel
+from inventory.services import InsufficientStockError, increase_stock
+from pos.models import SalesOrder, SalesOrderLine
+from .bom import BOMCycleError, BOMGraph, rollup_costs
+from .models import ProductionOrder, ProductionOrderLine, Recipe, RecipeIngredient
+from .mrp import MRP_NOTE, run_mrp
+from .production import ProductionError, complete_orders
+from .scheduling import schedule_branch
 
-# Create your tests here.
+
+class ManufacturingTestCase(TestCase):
+    """مخبز صغير: خبز من عجين، والعجين من دقيق وخميرة"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Bakery', name_ar='مخبز', tax_id='MRP-1', commercial_register='MRP-1')
+        self.branch = Branch.objects.create(company=self.company, name='Main', name_ar='الرئيسي', code='MRP')
+        self.unit = Unit.objects.create(company=self.company, name='Piece', name_ar='قطعة', code='PC-MRP')
+        self.bread, self.dough, self.flour, self.yeast = [
+            Product.objects.create(
+                company=self.company, name=code, name_ar=code, code=f'MRP-{code}', barcode=f'MRP-{code}', unit=self.unit,
+                cost_price=cost,
+            )
+            for code, cost in (('bread', 0), ('dough', 0), ('flour', 2), ('yeast', 5))
+        ]
+        self.bread_recipe = self.recipe('R-BREAD', self.bread, 10, 30, [(self.dough, 5)])
+        self.dough_recipe = self.recipe('R-DOUGH', self.dough, 5, 20, [(self.flour, 4), (self.yeast, 1)])
+
+    def recipe(self, code, product, output, minutes, ingredients):
+        recipe = Recipe.objects.create(
+            company=self.company, name=code, name_ar=code, code=code, product=product,
+            output_quantity=Decimal(output), production_time_minutes=minutes,
+        )
+        for ingredient, quantity in ingredients:
+            RecipeIngredient.objects.create(recipe=recipe, product=ingredient, quantity=Decimal(quantity), unit=self.unit)
+        return recipe
+
+
+class MRPTests(ManufacturingTestCase):
+    """تفجير الطلب عبر مستويات الوصفات وصافي الاحتياج مقابل الأرصدة"""
+
+    def setUp(self):
+        super().setUp()
+        today = timezone.localdate()
+        supplier = Supplier.objects.create(company=self.company, name='Mill', name_ar='مطحنة', code='SUP-MRP', phone='1')
+        history = PurchaseOrder.objects.create(
+            company=self.company, branch=self.branch, supplier=supplier, order_date=today - timedelta(days=30),
+            expected_delivery_date=today - timedelta(days=30), status='received',
+        )
+        for product, price in ((self.flour, 3), (self.yeast, 6)):
+            PurchaseOrderLine.objects.create(
+                purchase_order=history, product=product, quantity=Decimal('1'), received_quantity=Decimal('1'),
+                unit_price=Decimal(price),
+            )
+        increase_stock(self.branch, {self.bread.pk: Decimal('5'), self.flour.pk: Decimal('2')})
+        customer = Customer.objects.create(company=self.company, name='Cafe', phone='1')
+        order = SalesOrder.objects.create(
+            company=self.company, branch=self.branch, customer=customer, order_date=today,
+            expected_delivery_date=today + timedelta(days=2), status='confirmed',
+        )
+        SalesOrderLine.objects.create(
+            sales_order=order, product=self.bread, quantity=Decimal('25'), unit_price=Decimal('1'),
+            discount_percent=Decimal('0'),
+        )
+
+    def test_explodes_and_nets_each_level(self):
+        run = run_mrp(self.company)
+        orders = {order.recipe_id: order for order in run.production_orders}
+        self.assertEqual(orders[self.bread_recipe.pk].planned_quantity, Decimal('20'))
+        self.assertEqual(orders[self.dough_recipe.pk].planned_quantity, Decimal('10'))
+        self.assertLessEqual(orders[self.dough_recipe.pk].planned_end_date, orders[self.bread_recipe.pk].planned_start_date)
+
+        purchase_order, = run.purchase_orders
+        self.assertEqual(
+            dict(purchase_order.lines.values_list('product__code', 'quantity')),
+            {'MRP-flour': Decimal('6'), 'MRP-yeast': Decimal('2')},
+        )
+        self.assertEqual(purchase_order.total_amount, Decimal('30'))
+
+        # التشغيل التالي يستبدل المقترحات ولا يعدها إمداداً
+        run_mrp(self.company)
+        self.assertEqual(ProductionOrder.objects.filter(notes=MRP_NOTE).count(), 2)
+        self.assertEqual(PurchaseOrder.objects.filter(notes=MRP_NOTE).count(), 1)
+
+    def test_cycle_is_reported(self):
+        self.recipe('R-FLOUR', self.flour, 1, 0, [(self.bread, 1)])
+        with self.assertRaises(BOMCycleError) as error:
+            BOMGraph.load(self.company)
+        cycle = error.exception.cycle
+        self.assertEqual(cycle[0], cycle[-1])
+        self.assertEqual(set(cycle), {self.bread.pk, self.dough.pk, self.flour.pk})
+
+
+class CostRollupTests(ManufacturingTestCase):
+    """التكلفة المعيارية من المكونات إلى المنتج النهائي وإعادة حساب المتأثر فقط"""
+
+    def costs(self):
+        return {
+            code: (standard_cost, unit_cost)
+            for code, standard_cost, unit_cost in Recipe.objects.values_list('code', 'standard_cost', 'unit_cost')
+        }
+
+    def test_full_rollup(self):
+        self.assertEqual(rollup_costs(self.company), 2)
+        self.assertEqual(self.costs(), {
+            'R-DOUGH': (Decimal('13'), Decimal('2.6')),
+            'R-BREAD': (Decimal('13'), Decimal('1.3')),
+        })
+        self.assertEqual(rollup_costs(self.company), 0)
+
+    def test_cost_price_change_updates_recipes_above(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cake = self.recipe('R-CAKE', Product.objects.create(
+                company=self.company, name='cake', name_ar='cake', code='MRP-cake', barcode='MRP-cake', unit=self.unit,
+            ), 1, 0, [(self.yeast, 1)])
+        self.assertEqual(self.costs()['R-CAKE'], (Decimal('5'), Decimal('5')))
+        Recipe.objects.filter(pk=cake.pk).update(standard_cost=Decimal('99'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flour.cost_price = Decimal('3')
+            self.flour.save()
+        self.assertEqual(self.costs()['R-DOUGH'], (Decimal('17'), Decimal('3.4')))
+        self.assertEqual(self.costs()['R-BREAD'], (Decimal('17'), Decimal('1.7')))
+        # الوصفات التي لا تستخدم الدقيق لا يُعاد حسابها
+        self.assertEqual(self.costs()['R-CAKE'][0], Decimal('99'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.filter(recipe=self.bread_recipe).update(quantity=Decimal('10'))
+            self.bread_recipe.save()
+        self.assertEqual(self.costs()['R-BREAD'], (Decimal('34'), Decimal('3.4')))
+
+
+class ProductionCompletionTests(ManufacturingTestCase):
+    """إكمال أوامر الإنتاج: استهلاك المكونات وإضافة المنتج ورفض الأمر الذي لا يكفيه المخزون"""
+
+    def setUp(self):
+        super().setUp()
+        increase_stock(self.branch, {self.flour.pk: Decimal('100'), self.yeast.pk: Decimal('3')})
+
+    def order(self, recipe, quantity, hours=0):
+        start = timezone.now() + timedelta(hours=hours)
+        return ProductionOrder.objects.create(
+            company=self.company, branch=self.branch, recipe=recipe, planned_quantity=Decimal(quantity),
+            planned_start_date=start, planned_end_date=start,
+        )
+
+    def levels(self):
+        return dict(StockLevel.objects.filter(branch=self.branch).values_list('product__code', 'quantity'))
+
+    def test_batch_rejects_only_short_orders(self):
+        first, second = self.order(self.dough_recipe, 10), self.order(self.dough_recipe, 10, hours=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            completed, rejected = complete_orders([first.pk, second.pk])
+        self.assertEqual(completed, [first.pk])
+        self.assertEqual(rejected[second.pk], {self.yeast.pk: {'requested': Decimal('2'), 'available': Decimal('1')}})
+        self.assertEqual(self.levels(), {'MRP-flour': Decimal('92'), 'MRP-yeast': Decimal('1'), 'MRP-dough': Decimal('10')})
+        self.assertFalse(ProductionOrderLine.objects.filter(production_order=second).exists())
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.produced_quantity), ('completed', Decimal('10')))
+        self.assertEqual(
+            dict(first.lines.values_list('ingredient__product__code', 'consumed_quantity')),
+            {'MRP-flour': Decimal('8'), 'MRP-yeast': Decimal('2')},
+        )
+        output = InventoryMovement.objects.get(reference_id=str(first.pk), direction=InventoryMovement.DIRECTION_IN)
+        self.assertEqual(output.unit_cost, Decimal('2.6'))
+        self.assertEqual(
+            sum(JournalLine.objects.filter(entry__source_id=first.pk).values_list('debit', flat=True)), Decimal('26'),
+        )
+
+        # الأمر التالي يستهلك العجين المنتج بتكلفته
+        bread = self.order(self.bread_recipe, 10)
+        self.assertEqual(complete_orders([bread.pk]), ([bread.pk], {}))
+        self.assertEqual(
+            InventoryMovement.objects.get(reference_id=str(bread.pk), direction=InventoryMovement.DIRECTION_IN).unit_cost,
+            Decimal('1.3'),
+        )
+        with self.assertRaises(ProductionError):
+            complete_orders([bread.pk])
+
+    def test_stock_race_returns_conflict(self):
+        order = self.order(self.dough_recipe, 10)
+        self.client.force_login(CustomUser.objects.create_user(username='prod', password='x', branch=self.branch))
+        shortage = InsufficientStockError({self.yeast.pk: {'requested': Decimal('2'), 'available': Decimal('0')}})
+        with mock.patch('manufacturing.production.decrease_stock', side_effect=shortage):
+            single = self.client.post(f'/api/v1/production-orders/{order.pk}/complete/')
+            batch = self.client.post(
+                '/api/v1/production-orders/complete/', {'orders': [str(order.pk)]}, content_type='application/json'
+            )
+        for response in (single, batch):
+            self.assertEqual(response.status_code, 409, response.content)
+            self.assertEqual(response.json()['shortages'][0]['product_id'], str(self.yeast.pk))
+        order.refresh_from_db()
+        self.assertNotEqual(order.status, 'completed')
+
+
+class SchedulingTests(ManufacturingTestCase):
+    """جدولة بسعة خط واحد بالموعد الأقرب ضمن ساعات الوردية، وإعادة جدولة ما بعد الأمر المدرج أو الملغى"""
+
+    def setUp(self):
+        super().setUp()
+        self.base = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), time(8)))
+        self.bread_order = self.order(self.bread_recipe, 20, hours=1)
+        self.small_dough = self.order(self.dough_recipe, 5, hours=2)
+        self.dough_order = self.order(self.dough_recipe, 10, hours=3)
+        self.long_bread = self.order(self.bread_recipe, 320, hours=10)
+
+    def order(self, recipe, quantity, hours):
+        due = self.base + timedelta(hours=hours)
+        return ProductionOrder.objects.create(
+            company=self.company, branch=self.branch, recipe=recipe, planned_quantity=Decimal(quantity),
+            planned_start_date=due, planned_end_date=due, status='planned',
+        )
+
+    def slots(self):
+        return {
+            order.pk: (order.planned_start_date - self.base, order.planned_end_date - self.base)
+            for order in ProductionOrder.objects.all()
+        }
+
+    def test_orders_are_packed_by_due_date_within_shifts(self):
+        self.assertEqual(schedule_branch(self.branch, start=self.base), 4)
+        slots = self.slots()
+        minute = timedelta(minutes=1)
+        self.assertEqual(slots[self.bread_order.pk], (0 * minute, 60 * minute))
+        self.assertEqual(slots[self.small_dough.pk], (60 * minute, 80 * minute))
+        self.assertEqual(slots[self.dough_order.pk], (80 * minute, 120 * minute))
+        # 16 ساعة تبدأ 10:00 وتتوقف من 22:00 حتى 6:00
+        self.assertEqual(slots[self.long_bread.pk], (120 * minute, timedelta(days=1, hours=2)))
+        self.assertEqual(ProductionOrder.objects.get(pk=self.dough_order.pk).due_date, self.base + timedelta(hours=3))
+        self.assertEqual(schedule_branch(self.branch, start=self.base), 0)
+
+    def test_insert_and_cancel_reschedule_only_later_orders(self):
+        schedule_branch(self.branch, start=self.base)
+        before = self.slots()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            urgent = self.order(self.dough_recipe, 5, hours=1.5)
+        after = self.slots()
+        self.assertEqual(after[self.bread_order.pk], before[self.bread_order.pk])
+        self.assertEqual(after[urgent.pk], (timedelta(minutes=60), timedelta(minutes=80)))
+        self.assertEqual(after[self.small_dough.pk], (timedelta(minutes=80), timedelta(minutes=100)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            urgent.status = 'cancelled'
+            urgent.save()
+        after = self.slots()
+        self.assertEqual(
+            {pk: slot for pk, slot in after.items() if pk != urgent.pk},
+            {pk: slot for pk, slot in before.items()},
+        )
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_inventorymovement_direction'),
+        ('pos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postransaction',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='pos_transactions', to='inventory.product'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0002_postransaction_product'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='salesinvoice',
+            name='invoice_number',
+            field=models.CharField(blank=True, max_length=50, unique=True, verbose_name='رقم الفاتورة'),
+        ),
+        migrations.AlterField(
+            model_name='salesorder',
+            name='order_number',
+            field=models.CharField(blank=True, max_length=50, unique=True, verbose_name='رقم الأمر'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_unit_updated_at_sync_indexes'),
+        ('inventory', '0006_inventorymovement_inventory_i_created_b1a085_idx'),
+        ('pos', '0003_alter_salesinvoice_invoice_number_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postransaction',
+            index=models.Index(fields=['session', '-transaction_date', '-id'], name='pos_postran_session_e2d453_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postransaction',
+            index=models.Index(fields=['-transaction_date', '-id'], name='pos_postran_transac_8547a4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesinvoice',
+            index=models.Index(fields=['branch', '-invoice_date', '-id'], name='pos_salesin_branch__f4e966_idx'),
+        ),
+    ]
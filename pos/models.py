@@ -24,7 +24,7 @@ class SalesOrder(models.Model):
     company = models.ForeignKey('core.Company', on_delete=models.CASCADE, related_name='sales_orders')
     branch = models.ForeignKey('core.Branch', on_delete=models.CASCADE, related_name='sales_orders')
     
-    order_number = models.CharField(max_length=50, unique=True, verbose_name=_('رقم الأمر'))
+    order_number = models.CharField(max_length=50, unique=True, blank=True, verbose_name=_('رقم الأمر'))
     customer = models.ForeignKey('core.Customer', on_delete=models.PROTECT, related_name='sales_orders')
     
     # التواريخ
@@ -147,7 +147,7 @@ class SalesInvoice(models.Model):
     company = models.ForeignKey('core.Company', on_delete=models.CASCADE, related_name='sales_invoices')
     branch = models.ForeignKey('core.Branch', on_delete=models.CASCADE, related_name='sales_invoices')
     
-    invoice_number = models.CharField(max_length=50, unique=True, verbose_name=_('رقم الفاتورة'))
+    invoice_number = models.CharField(max_length=50, unique=True, blank=True, verbose_name=_('رقم الفاتورة'))
     sales_order = models.ForeignKey(SalesOrder, on_delete=models.SET_NULL, null=True, blank=True, related_name='invoices')
     customer = models.ForeignKey('core.Customer', on_delete=models.PROTECT, related_name='sales_invoices')
     
@@ -202,6 +202,7 @@ class SalesInvoice(models.Model):
         indexes = [
             models.Index(fields=['customer', '-invoice_date']),
             models.Index(fields=['status', '-invoice_date']),
+            models.Index(fields=['branch', '-invoice_date', '-id']),
         ]
     
     def __str__(self):
@@ -254,6 +255,7 @@ class POSTransaction(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     session = models.ForeignKey(POSSession, on_delete=models.CASCADE, related_name='transactions')
     invoice = models.ForeignKey(SalesInvoice, on_delete=models.SET_NULL, null=True, blank=True, related_name='pos_transactions')
+    product = models.ForeignKey('inventory.Product', on_delete=models.PROTECT, null=True, blank=True, related_name='pos_transactions')
     
     # الكمية والسعر
     quantity = models.DecimalField(
@@ -279,6 +281,10 @@ class POSTransaction(models.Model):
         verbose_name = _('معاملة نقطة بيع')
         verbose_name_plural = _('معاملات نقاط البيع')
         ordering = ['-transaction_date']
+        indexes = [
+            models.Index(fields=['session', '-transaction_date', '-id']),
+            models.Index(fields=['-transaction_date', '-id']),
+        ]
     
     def __str__(self):
         return f"معاملة - {self.session.branch.name_ar}"
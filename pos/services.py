@@ -0,0 +1,133 @@
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from inventory.models import InventoryMovement
+from inventory.services import decrease_stock, post_movements
+from reports.services import record_items_sold
+from .models import SalesInvoice, POSTransaction
+
+
+class CheckoutError(Exception):
+    """خطأ في عملية الدفع"""
+
+
+class DuplicateInvoiceError(CheckoutError):
+    """رقم الفاتورة أو معرفها مستخدم (رفع متزامن لنفس الفاتورة أو نفس الرقم)"""
+
+    def __init__(self, invoice_number):
+        self.invoice_number = invoice_number
+        super().__init__(f"رقم الفاتورة {invoice_number} مستخدم")
+
+
+def session_open_on(session, day=None):
+    """
+    هل تقبل الجلسة بيعاً بتاريخ day
+
+    الجلسة المفتوحة تقبل دائماً، والمغلقة تقبل فواتير البيع دون اتصال التي تقع أيامها
+    بين فتحها وإغلاقها (رُفعت بعد الإغلاق).
+    """
+    if session.status == 'open':
+        return True
+    if day is None or session.closed_at is None:
+        return False
+    return timezone.localdate(session.opened_at) <= day <= timezone.localdate(session.closed_at)
+
+
+def checkout(session, customer, items, created_by=None, invoice_number='', payment_method='cash',
+             tax_amount=Decimal('0'), discount_amount=Decimal('0'), notes='', invoice_id=None, invoice_date=None):
+    """
+    إتمام عملية بيع كاملة في معاملة واحدة
+
+    items: قائمة من {'product': Product, 'quantity': Decimal, 'unit_price': Decimal اختياري}.
+    تُنشأ الفاتورة ومعاملات نقطة البيع وحركات المخزون بإدخال جماعي، ويُخصم
+    المخزون بتحديث شرطي واحد، فإذا لم يكفِ رصيد أي منتج تُلغى العملية كلها.
+    إذا كان invoice_number فارغاً يُصرف من تسلسل الفرع (core.services).
+    invoice_id و invoice_date للفواتير المرفوعة من التطبيق بعد البيع دون اتصال.
+    """
+    if not session_open_on(session, invoice_date):
+        raise CheckoutError("جلسة نقطة البيع مغلقة")
+    if not items:
+        raise CheckoutError("السلة فارغة")
+
+    branch = session.branch
+    lines = []
+    for item in items:
+        product = item['product']
+        if product.company_id != branch.company_id:
+            raise CheckoutError(f"المنتج {product.code} لا يتبع شركة الفرع")
+        quantity = Decimal(item['quantity'])
+        unit_price = item.get('unit_price')
+        unit_price = product.selling_price if unit_price is None else Decimal(unit_price)
+        lines.append((product, quantity, unit_price, quantity * unit_price))
+
+    subtotal = sum((line_total for _, _, _, line_total in lines), Decimal('0'))
+    total_amount = subtotal + tax_amount - discount_amount
+    if total_amount < 0:
+        raise CheckoutError("الخصم أكبر من قيمة الفاتورة")
+
+    is_credit = payment_method == 'credit'
+    invoice_date = invoice_date or timezone.localdate()
+    extra = {'id': invoice_id} if invoice_id else {}
+
+    with transaction.atomic():
+        try:
+            # التحقق المسبق من الرقم لا يمنع طلباً متزامناً، فالقيد الفريد هو الحكم
+            with transaction.atomic():
+                invoice = SalesInvoice.objects.create(
+                    **extra,
+                    company=branch.company,
+                    branch=branch,
+                    invoice_number=invoice_number,
+                    customer=customer,
+                    invoice_date=invoice_date,
+                    due_date=invoice_date,
+                    subtotal=subtotal,
+                    tax_amount=tax_amount,
+                    discount_amount=discount_amount,
+                    total_amount=total_amount,
+                    paid_amount=Decimal('0') if is_credit else total_amount,
+                    status='submitted' if is_credit else 'paid',
+                    payment_method=payment_method,
+                    created_by=created_by,
+                    notes=notes,
+                )
+        except IntegrityError:
+            raise DuplicateInvoiceError(invoice_number)
+
+        transactions = POSTransaction.objects.bulk_create([
+            POSTransaction(
+                session=session,
+                invoice=invoice,
+                product=product,
+                quantity=quantity,
+                unit_price=unit_price,
+                total_amount=line_total,
+            )
+            for product, quantity, unit_price, line_total in lines
+        ])
+
+        # تجميع الكميات لكل منتج قبل الخصم (قد يتكرر المنتج في السلة)
+        stock_quantities = {}
+        for product, quantity, _, _ in lines:
+            if product.track_quantity:
+                stock_quantities[product.pk] = stock_quantities.get(product.pk, Decimal('0')) + quantity
+        decrease_stock(branch, stock_quantities)
+
+        post_movements([
+            InventoryMovement(
+                product=product,
+                branch=branch,
+                movement_type='sale',
+                direction=InventoryMovement.DIRECTION_OUT,
+                quantity=quantity,
+                unit_price=unit_price,
+                reference_type='sales_invoice',
+                reference_id=str(invoice.pk),
+                created_by=created_by,
+            )
+            for product, quantity, unit_price, _ in lines if product.track_quantity
+        ])
+
+        record_items_sold(branch, invoice_date, sum((quantity for _, quantity, _, _ in lines), Decimal('0')))
+
+    return invoice, transactions
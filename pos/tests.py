@@ -1,3 +1,67 @@
+from decimal import Decimal
 from django.test import TestCase
+from core.models import Company, Branch, Customer, CustomUser, Unit
+from inventory.models import InventoryMovement, Product, StockLevel
+from inventory.services import InsufficientStockError, increase_stock
+from .models import POSSession, POSTransaction, SalesInvoice
+from .services import CheckoutError, checkout
 
-# Create your tests here.
+
+class CheckoutTests(TestCase):
+    """عملية البيع الكاملة: الفاتورة والمعاملات والمخزون والحركات معاً أو لا شيء"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='POS Co', name_ar='شركة', tax_id='POS-1', commercial_register='POS-1')
+        self.branch = Branch.objects.create(company=self.company, name='Main', name_ar='الرئيسي', code='POS')
+        user = CustomUser.objects.create_user(username='cashier', password='x', branch=self.branch)
+        self.customer = Customer.objects.create(company=self.company, name='Customer', phone='1')
+        unit = Unit.objects.create(company=self.company, name='Piece', name_ar='قطعة', code='PC-POS')
+        self.tea, self.sugar = [
+            Product.objects.create(
+                company=self.company, name=code, name_ar=code, code=f'POS-{code}', barcode=f'POS-{code}', unit=unit,
+                selling_price=Decimal('5'), cost_price=Decimal('2'),
+            )
+            for code in ('tea', 'sugar')
+        ]
+        increase_stock(self.branch, {self.tea.pk: Decimal('10'), self.sugar.pk: Decimal('1')})
+        self.session = POSSession.objects.create(branch=self.branch, cashier=user)
+
+    def levels(self):
+        return dict(StockLevel.objects.filter(branch=self.branch).values_list('product__code', 'quantity'))
+
+    def sell(self, *items):
+        return checkout(
+            session=self.session, customer=self.customer,
+            items=[{'product': product, 'quantity': Decimal(quantity)} for product, quantity in items],
+        )
+
+    def test_sale_creates_invoice_transactions_stock_and_movements(self):
+        invoice, transactions = self.sell((self.tea, 3), (self.tea, 1), (self.sugar, 1))
+        self.assertEqual((invoice.total_amount, invoice.paid_amount, invoice.status), (Decimal('25'), Decimal('25'), 'paid'))
+        self.assertTrue(invoice.invoice_number)
+        self.assertEqual(POSTransaction.objects.filter(invoice=invoice).count(), len(transactions))
+        self.assertEqual(self.levels(), {'POS-tea': Decimal('6'), 'POS-sugar': Decimal('0')})
+        self.assertEqual(
+            sorted(InventoryMovement.objects.filter(reference_id=str(invoice.pk)).values_list('product__code', 'quantity')),
+            [('POS-sugar', Decimal('1')), ('POS-tea', Decimal('1')), ('POS-tea', Decimal('3'))],
+        )
+
+    def test_short_line_leaves_database_unchanged(self):
+        with self.assertRaises(InsufficientStockError) as error:
+            self.sell((self.tea, 2), (self.sugar, 2))
+        self.assertEqual(list(error.exception.shortages), [self.sugar.pk])
+        self.assertEqual(self.levels(), {'POS-tea': Decimal('10'), 'POS-sugar': Decimal('1')})
+        self.assertFalse(SalesInvoice.objects.exists())
+        self.assertFalse(POSTransaction.objects.exists())
+        self.assertFalse(InventoryMovement.objects.filter(movement_type='sale').exists())
+
+    def test_product_from_another_company_is_rejected(self):
+        other = Company.objects.create(name='Other', name_ar='أخرى', tax_id='POS-2', commercial_register='POS-2')
+        foreign = Product.objects.create(
+            company=other, name='x', name_ar='x', code='POS-x', barcode='POS-x',
+            unit=Unit.objects.create(company=other, name='Piece', name_ar='قطعة', code='PC-POS2'),
+        )
+        with self.assertRaises(CheckoutError):
+            self.sell((self.tea, 1), (foreign, 1))
+        self.assertFalse(SalesInvoice.objects.exists())
+        self.assertEqual(self.levels()['POS-tea'], Decimal('10'))
@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.models import Company
+from reports.services import financial_report
+
+
+class Command(BaseCommand):
+    help = 'حساب قائمة الدخل لشهر (الافتراضي: الشهر السابق) وتخزينها في FinancialReport'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help='معرف الشركة (الافتراضي: جميع الشركات)')
+        parser.add_argument('--month', help='الشهر YYYY-MM')
+
+    def handle(self, *args, **options):
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+            if not companies.exists():
+                raise CommandError(f"الشركة غير موجودة: {options['company']}")
+
+        if options['month']:
+            try:
+                start = date.fromisoformat(f"{options['month']}-01")
+            except ValueError:
+                raise CommandError(f"شهر غير صالح: {options['month']}")
+        else:
+            start = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+        for company in companies:
+            report = financial_report(company, start, end)
+            self.stdout.write(f'{company}: صافي الربح {report.net_profit}')
+        self.stdout.write(self.style.SUCCESS(f'تم إقفال الفترة {start} - {end}'))
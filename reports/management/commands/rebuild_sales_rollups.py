@@ -0,0 +1,29 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Company
+from reports.services import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء الملخصات اليومية للمبيعات والمشتريات من الفواتير'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help='معرف الشركة (الافتراضي: جميع الشركات)')
+        parser.add_argument('--from', dest='start', help='إعادة البناء ابتداءً من تاريخ YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        company = None
+        if options['company']:
+            company = Company.objects.filter(pk=options['company']).first()
+            if company is None:
+                raise CommandError(f"الشركة غير موجودة: {options['company']}")
+
+        start = None
+        if options['start']:
+            try:
+                start = date.fromisoformat(options['start'])
+            except ValueError:
+                raise CommandError(f"تاريخ غير صالح: {options['start']}")
+
+        rebuild_rollups(company=company, start=start)
+        self.stdout.write(self.style.SUCCESS('تمت إعادة بناء الملخصات اليومية'))
@@ -0,0 +1,31 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Company
+from reports.services import snapshot_inventory_valuation
+
+
+class Command(BaseCommand):
+    help = 'حفظ تقييم المخزون لكل فرع في تقارير المخزون'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help='معرف الشركة (الافتراضي: جميع الشركات النشطة)')
+        parser.add_argument('--date', help='تاريخ التقييم YYYY-MM-DD (الافتراضي: اليوم)')
+
+    def handle(self, *args, **options):
+        companies = Company.objects.filter(is_active=True)
+        if options['company']:
+            companies = Company.objects.filter(pk=options['company'])
+            if not companies.exists():
+                raise CommandError(f"الشركة غير موجودة: {options['company']}")
+
+        report_date = None
+        if options['date']:
+            try:
+                report_date = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"تاريخ غير صالح: {options['date']}")
+
+        for company in companies:
+            reports = snapshot_inventory_valuation(company, report_date)
+            self.stdout.write(f"{company.name_ar}: {len(reports)} فرع")
+        self.stdout.write(self.style.SUCCESS('تم حفظ تقييم المخزون'))
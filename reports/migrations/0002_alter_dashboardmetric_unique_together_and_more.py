@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='dashboardmetric',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='dashboardmetric',
+            name='branch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dashboard_metrics', to='core.branch'),
+        ),
+        migrations.AddField(
+            model_name='dashboardmetric',
+            name='count',
+            field=models.IntegerField(default=0, verbose_name='العدد'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dashboardmetric',
+            unique_together={('company', 'branch', 'metric_type', 'metric_date')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:44
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_unit_updated_at_sync_indexes'),
+        ('reports', '0002_alter_dashboardmetric_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='financialreport',
+            unique_together={('company', 'start_date', 'end_date')},
+        ),
+    ]
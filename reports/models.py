@@ -145,6 +145,8 @@ class FinancialReport(models.Model):
         verbose_name = _('تقرير مالي')
         verbose_name_plural = _('التقارير المالية')
         ordering = ['-start_date']
+        # التقرير المحسوب لكل فترة يُخزَّن مرة واحدة ويُحذف عند ترحيل قيد داخلها
+        unique_together = ['company', 'start_date', 'end_date']
     
     def __str__(self):
         return f"تقرير مالي - {self.start_date} إلى {self.end_date}"
@@ -164,12 +166,14 @@ class DashboardMetric(models.Model):
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     company = models.ForeignKey('core.Company', on_delete=models.CASCADE, related_name='dashboard_metrics')
+    branch = models.ForeignKey('core.Branch', on_delete=models.SET_NULL, null=True, blank=True, related_name='dashboard_metrics')
     
     metric_type = models.CharField(max_length=20, choices=METRIC_TYPE_CHOICES)
     metric_date = models.DateField(verbose_name=_('تاريخ المقياس'))
     
     # القيمة
     value = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    count = models.IntegerField(default=0, verbose_name=_('العدد'))
     
     # المقارنة مع الفترة السابقة
     previous_value = models.DecimalField(max_digits=15, decimal_places=2, default=0)
@@ -181,7 +185,7 @@ class DashboardMetric(models.Model):
         verbose_name = _('مقياس لوحة تحكم')
         verbose_name_plural = _('مقاييس لوحة التحكم')
         ordering = ['-metric_date']
-        unique_together = ('company', 'metric_type', 'metric_date')
+        unique_together = ('company', 'branch', 'metric_type', 'metric_date')
     
     def __str__(self):
         return f"{self.get_metric_type_display()} - {self.metric_date}"
@@ -0,0 +1,361 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, Count, F, Value, DecimalField, IntegerField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from accounting.ledger import month_start
+from accounting.models import AccountBalance, JournalLine, PurchaseInvoice
+from inventory.models import StockLevel
+from inventory.services import inventory_valuation
+from pos.models import SalesInvoice, POSTransaction
+from .models import SalesReport, DashboardMetric, InventoryReport, FinancialReport
+
+# ============================================
+# الملخصات اليومية للمبيعات والمشتريات
+# ============================================
+
+ZERO = Decimal('0')
+
+
+def _upsert(model, lookup, increments):
+    """زيادة حقول صف الملخص بتحديث F()، وإنشاؤه إذا لم يوجد"""
+    updates = {field: F(field) + value for field, value in increments.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **increments)
+    except IntegrityError:
+        # أنشأه طلب متزامن، نعيد التحديث
+        model.objects.filter(**lookup).update(**updates)
+
+
+def _counted(snapshot):
+    """الفواتير الملغاة لا تدخل في الملخصات"""
+    if snapshot is None or snapshot['status'] == 'cancelled':
+        return None
+    return snapshot
+
+
+def apply_sales_invoice_change(old, new):
+    """
+    تحديث SalesReport بفرق الفاتورة قبل التعديل وبعده
+
+    old/new: قاموس بالحقول company_id, branch_id, invoice_date, status,
+    total_amount, tax_amount, discount_amount أو None عند الإنشاء/الحذف.
+    يُنفذ داخل معاملة حفظ الفاتورة نفسها.
+    """
+    for snapshot, sign in ((_counted(old), -1), (_counted(new), 1)):
+        if snapshot is None:
+            continue
+        _upsert(SalesReport, {
+            'company_id': snapshot['company_id'],
+            'branch_id': snapshot['branch_id'],
+            'report_date': snapshot['invoice_date'],
+        }, {
+            'total_sales': sign * snapshot['total_amount'],
+            'total_tax': sign * snapshot['tax_amount'],
+            'total_discount': sign * snapshot['discount_amount'],
+            'invoice_count': sign,
+            'total_items_sold': sign * snapshot.get('items_sold', ZERO),
+        })
+
+
+def invoice_items_sold(invoice_id):
+    """عدد القطع في معاملات نقطة البيع المرتبطة بالفاتورة"""
+    return POSTransaction.objects.filter(invoice_id=invoice_id).aggregate(
+        quantity=Coalesce(Sum('quantity'), Value(ZERO), output_field=DecimalField(max_digits=15, decimal_places=2)),
+    )['quantity']
+
+
+def apply_pos_transaction_change(old, new):
+    """
+    تحديث عدد القطع المباعة بفرق كمية معاملة نقطة البيع
+
+    old/new: قاموس {'invoice_id', 'quantity'} أو None عند الإنشاء/الحذف. معاملات الدفع
+    تُدخل جماعياً دون إشارات وتُحتسب في record_items_sold.
+    """
+    changes = defaultdict(lambda: ZERO)
+    for snapshot, sign in ((old, -1), (new, 1)):
+        if snapshot is not None and snapshot['invoice_id'] is not None:
+            changes[snapshot['invoice_id']] += sign * snapshot['quantity']
+    changes = {invoice_id: quantity for invoice_id, quantity in changes.items() if quantity}
+    if not changes:
+        return
+    for invoice in SalesInvoice.objects.filter(pk__in=changes).exclude(status='cancelled').values(
+        'id', 'company_id', 'branch_id', 'invoice_date',
+    ):
+        _upsert(SalesReport, {
+            'company_id': invoice['company_id'],
+            'branch_id': invoice['branch_id'],
+            'report_date': invoice['invoice_date'],
+        }, {'total_items_sold': changes[invoice['id']]})
+
+
+def apply_purchase_invoice_change(old, new):
+    """تحديث مقياس المشتريات اليومي في DashboardMetric بفرق فاتورة الشراء"""
+    for snapshot, sign in ((_counted(old), -1), (_counted(new), 1)):
+        if snapshot is None:
+            continue
+        _upsert(DashboardMetric, {
+            'company_id': snapshot['company_id'],
+            'branch_id': snapshot['branch_id'],
+            'metric_type': 'purchases',
+            'metric_date': snapshot['invoice_date'],
+        }, {
+            'value': sign * snapshot['total_amount'],
+            'count': sign,
+        })
+
+
+def record_items_sold(branch, report_date, quantity):
+    """إضافة عدد القطع المباعة إلى ملخص اليوم"""
+    if quantity:
+        _upsert(SalesReport, {
+            'company_id': branch.company_id,
+            'branch_id': branch.pk,
+            'report_date': report_date,
+        }, {'total_items_sold': quantity})
+
+
+def sales_summary(branch, start, end=None):
+    """إجمالي وعدد فواتير البيع للفرع خلال فترة من الملخصات اليومية"""
+    rows = SalesReport.objects.filter(company_id=branch.company_id, branch=branch, report_date__gte=start)
+    if end is not None:
+        rows = rows.filter(report_date__lte=end)
+    return rows.aggregate(
+        total=Coalesce(Sum('total_sales'), Value(ZERO), output_field=DecimalField(max_digits=15, decimal_places=2)),
+        count=Coalesce(Sum('invoice_count'), Value(0), output_field=IntegerField()),
+    )
+
+
+def purchases_summary(branch, start, end=None):
+    """إجمالي وعدد فواتير الشراء للفرع خلال فترة من الملخصات اليومية"""
+    rows = DashboardMetric.objects.filter(
+        company_id=branch.company_id, branch=branch, metric_type='purchases', metric_date__gte=start
+    )
+    if end is not None:
+        rows = rows.filter(metric_date__lte=end)
+    return rows.aggregate(
+        total=Coalesce(Sum('value'), Value(ZERO), output_field=DecimalField(max_digits=15, decimal_places=2)),
+        count=Coalesce(Sum('count'), Value(0), output_field=IntegerField()),
+    )
+
+
+@transaction.atomic
+def rebuild_rollups(company=None, start=None):
+    """
+    إعادة بناء الملخصات اليومية من الفواتير (بعد إدخال جماعي أو ترحيل بيانات)
+
+    يُحسب كل جدول باستعلام تجميع واحد ثم يُكتب بإدخال جماعي.
+    """
+    sales = SalesInvoice.objects.exclude(status='cancelled')
+    purchases = PurchaseInvoice.objects.exclude(status='cancelled')
+    sales_reports = SalesReport.objects.filter(branch__isnull=False)
+    metrics = DashboardMetric.objects.filter(metric_type='purchases')
+    if company is not None:
+        sales, purchases = sales.filter(company=company), purchases.filter(company=company)
+        sales_reports, metrics = sales_reports.filter(company=company), metrics.filter(company=company)
+    if start is not None:
+        sales, purchases = sales.filter(invoice_date__gte=start), purchases.filter(invoice_date__gte=start)
+        sales_reports, metrics = sales_reports.filter(report_date__gte=start), metrics.filter(metric_date__gte=start)
+
+    items = POSTransaction.objects.filter(invoice__in=sales)
+    items_sold = {
+        (row['invoice__company_id'], row['invoice__branch_id'], row['invoice__invoice_date']): row['quantity']
+        for row in items.order_by().values(
+            'invoice__company_id', 'invoice__branch_id', 'invoice__invoice_date'
+        ).annotate(quantity=Sum('quantity'))
+    }
+    sales_reports.delete()
+    metrics.delete()
+
+    SalesReport.objects.bulk_create([
+        SalesReport(
+            company_id=row['company_id'],
+            branch_id=row['branch_id'],
+            report_date=row['invoice_date'],
+            total_sales=row['total'],
+            total_tax=row['tax'],
+            total_discount=row['discount'],
+            invoice_count=row['count'],
+            total_items_sold=items_sold.get((row['company_id'], row['branch_id'], row['invoice_date']), ZERO),
+        )
+        for row in sales.order_by().values('company_id', 'branch_id', 'invoice_date').annotate(
+            total=Sum('total_amount'), tax=Sum('tax_amount'), discount=Sum('discount_amount'), count=Count('id')
+        ).iterator()
+    ], batch_size=1000)
+
+    DashboardMetric.objects.bulk_create([
+        DashboardMetric(
+            company_id=row['company_id'],
+            branch_id=row['branch_id'],
+            metric_type='purchases',
+            metric_date=row['invoice_date'],
+            value=row['total'],
+            count=row['count'],
+        )
+        for row in purchases.order_by().values('company_id', 'branch_id', 'invoice_date').annotate(
+            total=Sum('total_amount'), count=Count('id')
+        ).iterator()
+    ], batch_size=1000)
+
+
+# ============================================
+# لقطات تقييم المخزون
+# ============================================
+
+def snapshot_inventory_valuation(company, report_date=None):
+    """
+    حفظ تقييم المخزون لكل فرع في InventoryReport لتاريخ معين
+
+    total_value بسعر التكلفة، وتفصيل الفئات وقيمة البيع في data.
+    عدد المنتجات المنخفضة يُحسب من الأرصدة الحالية فقط.
+    """
+    today = timezone.localdate()
+    report_date = report_date or today
+    rows = inventory_valuation(company, as_of=report_date if report_date < today else None)
+
+    low_stock = {}
+    if report_date >= today:
+        low_stock = dict(
+            StockLevel.objects.filter(branch__company=company, quantity__lt=F('reorder_level'))
+            .order_by().values('branch_id').annotate(count=Count('id')).values_list('branch_id', 'count')
+        )
+
+    reports = {}
+    for row in rows:
+        report = reports.get(row['branch_id'])
+        if report is None:
+            report = reports[row['branch_id']] = InventoryReport(
+                company=company,
+                branch_id=row['branch_id'],
+                report_date=report_date,
+                low_stock_items=low_stock.get(row['branch_id'], 0),
+                data={'retail_value': ZERO, 'categories': []},
+            )
+        report.total_items += row['items']
+        report.total_quantity += row['quantity']
+        report.total_value += row['cost_value']
+        report.data['retail_value'] += row['retail_value']
+        report.data['categories'].append({
+            'category_id': str(row['category_id']) if row['category_id'] else None,
+            'items': row['items'],
+            'quantity': str(row['quantity']),
+            'cost_value': str(row['cost_value']),
+            'retail_value': str(row['retail_value']),
+        })
+    for report in reports.values():
+        report.data['retail_value'] = str(report.data['retail_value'])
+
+    return InventoryReport.objects.bulk_create(
+        reports.values(),
+        update_conflicts=True,
+        unique_fields=['company', 'branch', 'report_date'],
+        update_fields=['total_items', 'total_quantity', 'total_value', 'low_stock_items', 'data'],
+    )
+
+
+# ============================================
+# قائمة الدخل (FinancialReport)
+# ============================================
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _period_parts(start, end):
+    """
+    تقسيم الفترة إلى أشهر كاملة تُقرأ من AccountBalance وأيام طرفية تُقرأ من القيود
+
+    يعيد (أول شهر كامل، آخر شهر كامل أو None، قائمة فترات الأيام الطرفية).
+    """
+    first = start if start.day == 1 else _next_month(start)
+    last = month_start(end + timedelta(days=1)) - timedelta(days=1)
+    if first > last:
+        return None, None, [(start, end)]
+    tails = []
+    if start < first:
+        tails.append((start, first - timedelta(days=1)))
+    if last < end:
+        tails.append((last + timedelta(days=1), end))
+    return first, month_start(last), tails
+
+
+def profit_and_loss(company, start, end):
+    """
+    الإيرادات والمصروفات ومجمل وصافي الربح للشركة بين تاريخين
+
+    الأشهر الكاملة داخل الفترة تُجمع من الأرصدة الشهرية، ولا تُقرأ أسطر القيود إلا
+    لأيام الشهرين الطرفيين غير الكاملين، فإقفال شهر لا يحتاج قراءة القيود إطلاقاً.
+    """
+    first, last, tails = _period_parts(start, end)
+    totals = {}
+
+    def add(rows):
+        for row in rows:
+            key = (row['account__code'], row['account__name_ar'], row['account__account_type'], row['account__role'])
+            debit, credit = totals.get(key, (ZERO, ZERO))
+            totals[key] = (debit + row['debit'], credit + row['credit'])
+
+    fields = ('account__code', 'account__name_ar', 'account__account_type', 'account__role')
+    if first is not None:
+        add(
+            AccountBalance.objects.filter(
+                company=company, period__gte=first, period__lte=last,
+                account__account_type__in=('revenue', 'expense'),
+            ).order_by().values(*fields).annotate(debit=Sum('debit'), credit=Sum('credit'))
+        )
+    for tail_start, tail_end in tails:
+        add(
+            JournalLine.objects.filter(
+                entry__company=company, entry__entry_date__gte=tail_start, entry__entry_date__lte=tail_end,
+                account__account_type__in=('revenue', 'expense'),
+            ).order_by().values(*fields).annotate(debit=Sum('debit'), credit=Sum('credit'))
+        )
+
+    revenue = expenses = cost_of_sales = ZERO
+    accounts = []
+    for (code, name, account_type, role), (debit, credit) in sorted(totals.items()):
+        amount = credit - debit if account_type == 'revenue' else debit - credit
+        if account_type == 'revenue':
+            revenue += amount
+        else:
+            expenses += amount
+            if role == 'cogs':
+                cost_of_sales += amount
+        accounts.append({'code': code, 'name': name, 'account_type': account_type, 'amount': str(amount)})
+
+    return {
+        'total_revenue': revenue,
+        'total_expenses': expenses,
+        'gross_profit': revenue - cost_of_sales,
+        'net_profit': revenue - expenses,
+        'data': {'cost_of_sales': str(cost_of_sales), 'accounts': accounts},
+    }
+
+
+def financial_report(company, start, end):
+    """
+    تقرير الدخل المخزَّن للفترة، أو حسابه وتخزينه إذا لم يوجد
+
+    يُحذف التقرير المخزَّن عند ترحيل أي قيد يقع تاريخه داخل فترته (invalidate_financial_reports).
+    """
+    report = FinancialReport.objects.filter(company=company, start_date=start, end_date=end).first()
+    if report is not None:
+        return report
+    try:
+        with transaction.atomic():
+            return FinancialReport.objects.create(
+                company=company, start_date=start, end_date=end, **profit_and_loss(company, start, end)
+            )
+    except IntegrityError:
+        return FinancialReport.objects.get(company=company, start_date=start, end_date=end)
+
+
+def invalidate_financial_reports(dates):
+    """حذف التقارير المالية التي تتقاطع فتراتها مع تواريخ القيود المرحَّلة {company_id: (من، إلى)}"""
+    for company_id, (first, last) in dates.items():
+        FinancialReport.objects.filter(company_id=company_id, start_date__lte=last, end_date__gte=first).delete()
@@ -0,0 +1,101 @@
+from decimal import Decimal
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from accounting.ledger import entries_posted
+from accounting.models import JournalEntry, PurchaseInvoice
+from pos.models import SalesInvoice, POSTransaction
+from .services import (
+    apply_sales_invoice_change, apply_purchase_invoice_change, apply_pos_transaction_change, invoice_items_sold,
+    invalidate_financial_reports,
+)
+
+SNAPSHOT_FIELDS = ('company_id', 'branch_id', 'invoice_date', 'status', 'total_amount', 'tax_amount', 'discount_amount')
+
+ROLLUP_HANDLERS = {
+    SalesInvoice: apply_sales_invoice_change,
+    PurchaseInvoice: apply_purchase_invoice_change,
+}
+
+
+def _snapshot(instance):
+    snapshot = {field: getattr(instance, field) for field in SNAPSHOT_FIELDS}
+    for field in ('total_amount', 'tax_amount', 'discount_amount'):
+        snapshot[field] = Decimal(str(snapshot[field]))
+    return snapshot
+
+
+@receiver(pre_save, sender=SalesInvoice)
+@receiver(pre_save, sender=PurchaseInvoice)
+def remember_invoice_totals(sender, instance, raw=False, **kwargs):
+    """حفظ قيم الفاتورة قبل التعديل لحساب الفرق في الملخصات"""
+    if raw or instance._state.adding:
+        instance._rollup_previous = None
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*SNAPSHOT_FIELDS).first()
+    if previous is not None and sender is SalesInvoice:
+        # القطع المباعة تنتقل مع الفاتورة عند تغيير تاريخها أو إلغائها
+        previous['items_sold'] = invoice_items_sold(instance.pk)
+    instance._rollup_previous = previous
+
+
+@receiver(post_save, sender=SalesInvoice)
+@receiver(post_save, sender=PurchaseInvoice)
+def update_invoice_rollups(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    current = _snapshot(instance)
+    if previous is not None and 'items_sold' in previous:
+        current['items_sold'] = previous['items_sold']
+    ROLLUP_HANDLERS[sender](previous, current)
+
+
+@receiver(pre_delete, sender=SalesInvoice)
+def remember_invoice_items_sold(sender, instance, **kwargs):
+    """المعاملات تُفصل عن الفاتورة (SET_NULL) قبل post_delete، فتُحسب قطعها هنا"""
+    instance._rollup_items_sold = invoice_items_sold(instance.pk)
+
+
+@receiver(post_delete, sender=SalesInvoice)
+@receiver(post_delete, sender=PurchaseInvoice)
+def remove_invoice_rollups(sender, instance, **kwargs):
+    snapshot = _snapshot(instance)
+    if hasattr(instance, '_rollup_items_sold'):
+        snapshot['items_sold'] = instance._rollup_items_sold
+    ROLLUP_HANDLERS[sender](snapshot, None)
+
+
+def _transaction_snapshot(values):
+    return {'invoice_id': values['invoice_id'], 'quantity': Decimal(str(values['quantity']))}
+
+
+@receiver(pre_save, sender=POSTransaction)
+def remember_transaction_quantity(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._rollup_previous = None
+        return
+    previous = sender.objects.filter(pk=instance.pk).values('invoice_id', 'quantity').first()
+    instance._rollup_previous = previous and _transaction_snapshot(previous)
+
+
+@receiver(post_save, sender=POSTransaction)
+def update_items_sold(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    apply_pos_transaction_change(
+        getattr(instance, '_rollup_previous', None),
+        _transaction_snapshot({'invoice_id': instance.invoice_id, 'quantity': instance.quantity}),
+    )
+
+
+@receiver(post_delete, sender=POSTransaction)
+def remove_items_sold(sender, instance, **kwargs):
+    apply_pos_transaction_change(
+        _transaction_snapshot({'invoice_id': instance.invoice_id, 'quantity': instance.quantity}), None,
+    )
+
+
+@receiver(entries_posted, sender=JournalEntry)
+def expire_financial_reports(sender, dates, **kwargs):
+    """قيد بتاريخ سابق (أو داخل فترة محسوبة) يُبطل التقارير المالية المخزنة لتلك الفترة"""
+    invalidate_financial_reports(dates)
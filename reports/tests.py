@@ -1,3 +1,126 @@
+from datetime import date
+from decimal import Decimal
 from django.test import TestCase
+from core.models import Company, Branch, Customer, CustomUser, Unit
+from inventory.models import Product
+from inventory.services import increase_stock
+from pos.models import POSSession, POSTransaction
+from pos.services import checkout
+from .models import FinancialReport, SalesReport
+from .services import financial_report, profit_and_loss, rebuild_rollups
 
-# Create your tests here.
+
+class FinancialReportTests(TestCase):
+    """قائمة الدخل من الأرصدة الشهرية وأيام الأطراف، وإبطال التقارير المخزنة"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='PL Co', name_ar='شركة', tax_id='PL-1', commercial_register='PL-1')
+        self.branch = Branch.objects.create(company=self.company, name='Main', name_ar='الرئيسي', code='PL')
+        user = CustomUser.objects.create_user(username='pl', password='x', branch=self.branch)
+        self.customer = Customer.objects.create(company=self.company, name='Customer', phone='1')
+        unit = Unit.objects.create(company=self.company, name='Piece', name_ar='قطعة', code='PC-PL')
+        self.product = Product.objects.create(
+            company=self.company, name='P', name_ar='منتج', code='PL-P', barcode='PL-B', unit=unit,
+            selling_price=Decimal('10'), cost_price=Decimal('4'),
+        )
+        increase_stock(self.branch, {self.product.pk: Decimal('100')})
+        self.session = POSSession.objects.create(branch=self.branch, cashier=user)
+
+    def sell(self, invoice_date):
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout(
+                session=self.session, customer=self.customer, invoice_date=invoice_date,
+                items=[{'product': self.product, 'quantity': Decimal('2')}],
+            )
+
+    def test_range_combines_monthly_balances_with_edge_days(self):
+        for day in (date(2026, 1, 5), date(2026, 1, 20), date(2026, 2, 10), date(2026, 3, 5), date(2026, 3, 25)):
+            self.sell(day)
+        with self.assertNumQueries(3):
+            result = profit_and_loss(self.company, date(2026, 1, 10), date(2026, 3, 10))
+        self.assertEqual(result['total_revenue'], Decimal('60'))
+        self.assertEqual(result['gross_profit'], Decimal('36'))
+        self.assertEqual(result['net_profit'], Decimal('36'))
+        with self.assertNumQueries(1):
+            self.assertEqual(profit_and_loss(self.company, date(2026, 2, 1), date(2026, 3, 31))['total_revenue'], Decimal('60'))
+
+    def test_backdated_document_invalidates_cached_report(self):
+        self.sell(date(2026, 1, 5))
+        report = financial_report(self.company, date(2026, 1, 1), date(2026, 1, 31))
+        self.assertEqual(report.total_revenue, Decimal('20'))
+        later = financial_report(self.company, date(2026, 2, 1), date(2026, 2, 28))
+
+        self.sell(date(2026, 1, 15))
+        self.assertFalse(FinancialReport.objects.filter(pk=report.pk).exists())
+        self.assertTrue(FinancialReport.objects.filter(pk=later.pk).exists())
+        self.assertEqual(financial_report(self.company, date(2026, 1, 1), date(2026, 1, 31)).total_revenue, Decimal('40'))
+
+
+class SalesRollupTests(TestCase):
+    """الملخصات اليومية المحدثة مع كل تعديل تطابق إعادة البناء الكاملة من الفواتير"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='RU Co', name_ar='شركة', tax_id='RU-1', commercial_register='RU-1')
+        self.branch = Branch.objects.create(company=self.company, name='Main', name_ar='الرئيسي', code='RU')
+        user = CustomUser.objects.create_user(username='ru', password='x', branch=self.branch)
+        self.customer = Customer.objects.create(company=self.company, name='Customer', phone='1')
+        unit = Unit.objects.create(company=self.company, name='Piece', name_ar='قطعة', code='PC-RU')
+        self.product = Product.objects.create(
+            company=self.company, name='P', name_ar='منتج', code='RU-P', barcode='RU-B', unit=unit,
+            selling_price=Decimal('10'), cost_price=Decimal('4'),
+        )
+        increase_stock(self.branch, {self.product.pk: Decimal('100')})
+        self.session = POSSession.objects.create(branch=self.branch, cashier=user)
+        self.first = self.sell(date(2026, 1, 5), Decimal('2'))
+        self.second = self.sell(date(2026, 1, 5), Decimal('3'))
+
+    def sell(self, invoice_date, quantity):
+        invoice, _ = checkout(
+            session=self.session, customer=self.customer, invoice_date=invoice_date,
+            tax_amount=Decimal('1'), items=[{'product': self.product, 'quantity': quantity}],
+        )
+        return invoice
+
+    def rollups(self):
+        # الأيام التي صفّرها التعديل تبقى صفوفاً صفرية، بينما لا تنشئها إعادة البناء
+        return {
+            (row['report_date'], row['total_sales'], row['total_tax'], row['total_items_sold'], row['invoice_count'])
+            for row in SalesReport.objects.filter(company=self.company).values(
+                'report_date', 'total_sales', 'total_tax', 'total_items_sold', 'invoice_count',
+            )
+            if row['invoice_count'] or row['total_items_sold']
+        }
+
+    def assertMatchesRebuild(self, expected):
+        incremental = self.rollups()
+        self.assertEqual(incremental, expected)
+        rebuild_rollups(self.company)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_create(self):
+        self.assertMatchesRebuild({(date(2026, 1, 5), Decimal('52'), Decimal('2'), Decimal('5'), 2)})
+
+    def test_quantity_edit(self):
+        line = POSTransaction.objects.get(invoice=self.first)
+        line.quantity = Decimal('4')
+        line.save()
+        self.first.total_amount = Decimal('41')
+        self.first.save()
+        self.assertMatchesRebuild({(date(2026, 1, 5), Decimal('72'), Decimal('2'), Decimal('7'), 2)})
+
+    def test_date_change_moves_totals(self):
+        self.first.invoice_date = date(2026, 1, 6)
+        self.first.save()
+        self.assertMatchesRebuild({
+            (date(2026, 1, 5), Decimal('31'), Decimal('1'), Decimal('3'), 1),
+            (date(2026, 1, 6), Decimal('21'), Decimal('1'), Decimal('2'), 1),
+        })
+
+    def test_cancel(self):
+        self.first.status = 'cancelled'
+        self.first.save()
+        self.assertMatchesRebuild({(date(2026, 1, 5), Decimal('31'), Decimal('1'), Decimal('3'), 1)})
+
+    def test_delete(self):
+        self.second.delete()
+        self.assertMatchesRebuild({(date(2026, 1, 5), Decimal('21'), Decimal('1'), Decimal('2'), 1)})
@@ -0,0 +1,351 @@
+import json
+import random
+import time
+from dataclasses import dataclass, asdict
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Company, Branch, Category, Unit, Supplier, Customer, CustomUser
+from inventory.models import Product, InventoryMovement, StockLevel
+from accounting.models import PurchaseInvoice
+from pos.models import SalesInvoice, POSSession, POSTransaction
+from manufacturing.models import Recipe, ProductionOrder
+from reports.services import rebuild_rollups
+
+# ============================================
+# قياس أداء نقاط الـ API والويب مقابل ميزانيات محفوظة
+# ============================================
+
+BUDGETS_PATH = Path(__file__).resolve().parent / 'perf_budgets.json'
+
+BENCHMARK_USERNAME = 'benchmark'
+
+# حجم البيانات في اختبار الميزانيات؛ حجم الاستجابة يتبع حجم البيانات لذلك تُسجل
+# ميزانية bytes عند هذا الحجم، بينما تُسجل queries و time_ms على البيانات الكاملة
+TEST_SCALE = 0.002
+
+# أحجام البيانات عند scale=1 (مضاعفة لبيانات populate_data.py)
+BASE_SIZES = {
+    'products': 5000,
+    'customers': 2000,
+    'suppliers': 100,
+    'sales_invoices': 200000,
+    'purchase_invoices': 20000,
+    'pos_transactions': 100000,
+    'inventory_movements': 300000,
+    'recipes': 500,
+    'production_orders': 5000,
+}
+
+BATCH_SIZE = 5000
+
+CATEGORIES = [
+    ("Cakes", "كعك", "CAKES"),
+    ("Pastries", "معجنات", "PASTRIES"),
+    ("Cookies", "بسكويت", "COOKIES"),
+    ("Bread", "خبز", "BREAD"),
+]
+
+
+@dataclass
+class EndpointResult:
+    """نتيجة قياس نقطة واحدة"""
+    name: str
+    url: str
+    status_code: int
+    queries: int
+    time_ms: float
+    bytes: int
+
+
+def _bulk(model, objects):
+    model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def seed_dataset(scale=1.0, seed=42, log=None):
+    """
+    إنشاء بيانات اصطناعية كبيرة لشركة قياس مستقلة
+
+    تُنشأ البيانات بالإدخال الجماعي لذلك لا تُستدعى إشارات الحفظ.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    sizes = {key: max(1, int(value * scale)) for key, value in BASE_SIZES.items()}
+    today = timezone.localdate()
+    now = timezone.now()
+
+    company, _ = Company.objects.get_or_create(
+        name="Benchmark Bakery",
+        defaults={
+            "name_ar": "مخبز القياس",
+            "tax_id": "BENCH-TAX",
+            "commercial_register": "BENCH-CR",
+            "phone": "+966500000000",
+            "email": "bench@example.com",
+            "address": "الرياض",
+            "city": "الرياض",
+            "country": "السعودية",
+        }
+    )
+    if Product.objects.filter(company=company).exists():
+        log("بيانات القياس موجودة مسبقاً")
+        return company
+
+    branch = Branch.objects.create(
+        company=company, name="Bench Branch", name_ar="فرع القياس", code="BENCH-BR",
+        address="الرياض", city="الرياض", phone="+966500000000", is_main_branch=True
+    )
+    user = CustomUser.objects.filter(username=BENCHMARK_USERNAME).first()
+    if user is None:
+        user = CustomUser.objects.create_user(username=BENCHMARK_USERNAME, password=BENCHMARK_USERNAME, role='manager')
+    user.branch = branch
+    user.save(update_fields=['branch'])
+
+    categories = [
+        Category.objects.create(company=company, name=name_en, name_ar=name_ar, code=f"BENCH-{code}")
+        for name_en, name_ar, code in CATEGORIES
+    ]
+    unit = Unit.objects.create(company=company, name="Piece", name_ar="قطعة", code="BENCH-PIECE")
+
+    products = []
+    for n in range(sizes['products']):
+        price = Decimal(rng.randint(3, 120))
+        products.append(Product(
+            company=company, name=f"Product {n}", name_ar=f"منتج {n}", code=f"BENCH-P-{n}",
+            barcode=f"BENCH-{n:08d}", category=categories[n % len(categories)], unit=unit,
+            cost_price=price / 2, selling_price=price, quantity_on_hand=Decimal(rng.randint(0, 500)),
+            reorder_level=Decimal('50'), reorder_quantity=Decimal('100'),
+        ))
+    _bulk(Product, products)
+    _bulk(StockLevel, [StockLevel(product=p, branch=branch, quantity=p.quantity_on_hand, reorder_level=p.reorder_level) for p in products])
+    log(f"منتجات: {len(products)}")
+
+    customers = [Customer(company=company, name=f"Customer {n}", phone=f"+9665{n:08d}") for n in range(sizes['customers'])]
+    _bulk(Customer, customers)
+    suppliers = [
+        Supplier(company=company, name=f"Supplier {n}", name_ar=f"مورد {n}", code=f"BENCH-S-{n}",
+                 phone=f"+9664{n:08d}", address="جدة")
+        for n in range(sizes['suppliers'])
+    ]
+    _bulk(Supplier, suppliers)
+
+    def random_day():
+        return today - timedelta(days=rng.randint(0, 364))
+
+    for start in range(0, sizes['sales_invoices'], BATCH_SIZE):
+        batch = []
+        for n in range(start, min(start + BATCH_SIZE, sizes['sales_invoices'])):
+            day = random_day()
+            subtotal = Decimal(rng.randint(10, 2000))
+            batch.append(SalesInvoice(
+                company=company, branch=branch, invoice_number=f"BENCH-INV-{n}",
+                customer=customers[n % len(customers)], invoice_date=day, due_date=day,
+                subtotal=subtotal, tax_amount=subtotal / 10, total_amount=subtotal + subtotal / 10,
+                paid_amount=subtotal + subtotal / 10, status='paid', created_by=user,
+            ))
+        SalesInvoice.objects.bulk_create(batch)
+    log(f"فواتير بيع: {sizes['sales_invoices']}")
+
+    for start in range(0, sizes['purchase_invoices'], BATCH_SIZE):
+        batch = []
+        for n in range(start, min(start + BATCH_SIZE, sizes['purchase_invoices'])):
+            day = random_day()
+            total = Decimal(rng.randint(100, 20000))
+            batch.append(PurchaseInvoice(
+                company=company, branch=branch, invoice_number=f"BENCH-PINV-{n}",
+                supplier=suppliers[n % len(suppliers)], invoice_date=day, due_date=day,
+                subtotal=total, total_amount=total, status='approved', created_by=user,
+            ))
+        PurchaseInvoice.objects.bulk_create(batch)
+    log(f"فواتير شراء: {sizes['purchase_invoices']}")
+
+    session = POSSession.objects.create(branch=branch, cashier=user)
+    invoice_ids = list(SalesInvoice.objects.filter(company=company).values_list('id', flat=True)[:sizes['pos_transactions']])
+    for start in range(0, sizes['pos_transactions'], BATCH_SIZE):
+        batch = []
+        for n in range(start, min(start + BATCH_SIZE, sizes['pos_transactions'])):
+            product = products[rng.randrange(len(products))]
+            quantity = Decimal(rng.randint(1, 5))
+            batch.append(POSTransaction(
+                session=session, invoice_id=invoice_ids[n % len(invoice_ids)], product=product,
+                quantity=quantity, unit_price=product.selling_price, total_amount=quantity * product.selling_price,
+            ))
+        POSTransaction.objects.bulk_create(batch)
+    log(f"معاملات نقطة البيع: {sizes['pos_transactions']}")
+
+    movement_types = [choice for choice, _ in InventoryMovement.MOVEMENT_TYPE_CHOICES]
+    for start in range(0, sizes['inventory_movements'], BATCH_SIZE):
+        batch = []
+        for n in range(start, min(start + BATCH_SIZE, sizes['inventory_movements'])):
+            product = products[rng.randrange(len(products))]
+            movement_type = movement_types[n % len(movement_types)]
+            batch.append(InventoryMovement(
+                product=product, branch=branch, movement_type=movement_type,
+                direction=InventoryMovement.DIRECTION_OUT if movement_type in ('sale', 'damage') else InventoryMovement.DIRECTION_IN,
+                quantity=Decimal(rng.randint(1, 50)), unit_price=product.cost_price, created_by=user,
+            ))
+        InventoryMovement.objects.bulk_create(batch)
+    log(f"حركات مخزون: {sizes['inventory_movements']}")
+
+    recipes = [
+        Recipe(company=company, name=f"Recipe {n}", name_ar=f"وصفة {n}", code=f"BENCH-R-{n}",
+               product=products[n % len(products)], production_time_minutes=rng.randint(10, 120))
+        for n in range(sizes['recipes'])
+    ]
+    _bulk(Recipe, recipes)
+    _bulk(ProductionOrder, [
+        ProductionOrder(
+            company=company, branch=branch, order_number=f"BENCH-PRD-{n}", recipe=recipes[n % len(recipes)],
+            planned_quantity=Decimal(rng.randint(1, 100)), planned_start_date=now, planned_end_date=now,
+            status='planned', created_by=user,
+        )
+        for n in range(sizes['production_orders'])
+    ])
+    log(f"أوامر إنتاج: {sizes['production_orders']}")
+
+    # الإدخال الجماعي لا يطلق الإشارات، فنبني الملخصات اليومية مرة واحدة
+    rebuild_rollups(company)
+    log("تم بناء الملخصات اليومية")
+
+    return company
+
+
+def benchmark_user():
+    return CustomUser.objects.select_related('branch__company').get(username=BENCHMARK_USERNAME)
+
+
+def endpoints(user):
+    """
+    جميع نقاط GET في api/urls.py و web/urls.py مع المعاملات اللازمة لكل نقطة
+
+    تُعاد قائمة من (الاسم, الرابط, المعاملات, اسم نقطة التفاصيل أو None).
+    """
+    from api.urls import router
+    from web.urls import urlpatterns as web_urlpatterns
+
+    company = user.branch.company
+    today = timezone.localdate()
+    sample_barcode = (
+        Product.objects.filter(company=company).exclude(barcode='').values_list('barcode', flat=True).first() or ''
+    )
+    params = {
+        'api:product-by-barcode': {'barcode': sample_barcode},
+        'web:sales_report': {'from_date': today.replace(day=1).isoformat(), 'to_date': today.isoformat()},
+    }
+
+    result = []
+    for prefix, viewset, basename in router.registry:
+        if hasattr(viewset, 'list'):
+            result.append((f'api:{basename}-list', reverse(f'api:{basename}-list'), {}, f'api:{basename}-detail'))
+        for extra_action in viewset.get_extra_actions():
+            if extra_action.detail or 'get' not in extra_action.mapping:
+                continue
+            name = f'api:{basename}-{extra_action.url_name}'
+            result.append((name, reverse(name), params.get(name, {}), None))
+    for pattern in web_urlpatterns:
+        name = f'web:{pattern.name}'
+        result.append((name, reverse(name), params.get(name, {}), None))
+    return result
+
+
+def measure(client, name, url, params=None):
+    """قياس عدد الاستعلامات والزمن وحجم الاستجابة لطلب GET واحد، مع إرجاع الاستجابة"""
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        response = client.get(url, params or {})
+        if getattr(response, 'streaming', False):
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        elapsed = (time.perf_counter() - start) * 1000
+    return EndpointResult(
+        name=name, url=url, status_code=response.status_code,
+        queries=len(context.captured_queries), time_ms=round(elapsed, 1), bytes=size,
+    ), response
+
+
+def run(user=None, client=None):
+    """قياس جميع النقاط، مع نقطة التفاصيل لأول عنصر في كل قائمة API"""
+    user = user or benchmark_user()
+    if client is None:
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        # أول طلب يسخّن الجلسة والذاكرة المؤقتة
+        client.get(reverse('web:dashboard'))
+
+    results = []
+    for name, url, params, detail_name in endpoints(user):
+        result, response = measure(client, name, url, params)
+        results.append(result)
+        if detail_name and result.status_code == 200:
+            rows = response.json()
+            rows = rows.get('results', []) if isinstance(rows, dict) else rows
+            if rows:
+                detail, _ = measure(client, detail_name, reverse(detail_name, kwargs={'pk': rows[0]['id']}))
+                results.append(detail)
+    return results
+
+
+def run_at_scale(scale=TEST_SCALE):
+    """قياس جميع النقاط على قاعدة اختبار مؤقتة مزروعة بالحجم المعطى"""
+    old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+    try:
+        seed_dataset(scale=scale)
+        return run()
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_budgets(results, scaled_results, path=BUDGETS_PATH, time_headroom=2.0, bytes_headroom=1.25):
+    """
+    حفظ الميزانيات مع هامش للزمن وحجم الاستجابة
+
+    queries و time_ms من results (البيانات الكاملة)، و bytes من scaled_results
+    (البيانات عند TEST_SCALE) لأنها الحجم الذي يقارن به الاختبار.
+    """
+    sizes = {result.name: result.bytes for result in scaled_results}
+    budgets = {
+        result.name: {
+            'queries': result.queries,
+            'time_ms': max(50, int(result.time_ms * time_headroom)),
+            'bytes': int(sizes.get(result.name, result.bytes) * bytes_headroom),
+        }
+        for result in sorted(results, key=lambda r: r.name)
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(budgets, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    return budgets
+
+
+def compare(results, budgets, metrics=('queries', 'time_ms')):
+    """إرجاع قائمة التجاوزات: (الاسم, المقياس, القيمة, الميزانية)"""
+    violations = []
+    for result in results:
+        budget = budgets.get(result.name)
+        if budget is None:
+            violations.append((result.name, 'missing budget', None, None))
+            continue
+        if result.status_code != 200:
+            violations.append((result.name, 'status_code', result.status_code, 200))
+        for metric in metrics:
+            value = getattr(result, metric)
+            if value > budget[metric]:
+                violations.append((result.name, metric, value, budget[metric]))
+    return violations
+
+
+def as_dicts(results):
+    return [asdict(result) for result in results]
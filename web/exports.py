@@ -0,0 +1,71 @@
+import csv
+import tempfile
+from django.http import StreamingHttpResponse, FileResponse, HttpResponseBadRequest
+from openpyxl import Workbook
+
+# ============================================
+# تصدير التقارير بذاكرة ثابتة
+# ============================================
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """كائن يعيد ما يُكتب إليه، ليُرسل csv.writer كل صف مباشرة"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_rows(header, rows):
+    writer = csv.writer(_Echo())
+    # BOM حتى يعرض Excel النصوص العربية بشكل صحيح
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_csv(filename, header, rows):
+    """استجابة CSV تُكتب صفاً بصف أثناء قراءة rows"""
+    response = StreamingHttpResponse(_csv_rows(header, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(filename, header, rows):
+    """
+    استجابة XLSX بمصنف write-only من openpyxl
+
+    ليست بثاً: ملف XLSX أرشيف zip لا يكتمل إلا بعد آخر صف، لذلك يُكتب المصنف كاملاً
+    إلى ملف مؤقت على القرص قبل إرسال أول بايت، ثم يُرسل الملف على أجزاء.
+    الذاكرة تبقى ثابتة لكن زمن أول بايت يتبع حجم التقرير.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+def export_response(export_format, filename, header, rows):
+    """
+    تصدير rows بالصيغة المطلوبة
+
+    rows: مُكرِّر صفوف، يُفضّل queryset.values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE).
+    """
+    if export_format == 'csv':
+        return stream_csv(filename, header, rows)
+    if export_format == 'xlsx':
+        return xlsx_response(filename, header, rows)
+    return HttpResponseBadRequest(f"صيغة تصدير غير مدعومة: {export_format}")
@@ -0,0 +1,43 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from web import benchmark
+
+
+class Command(BaseCommand):
+    help = 'قياس عدد الاستعلامات والزمن وحجم الاستجابة لكل نقطة ومقارنتها بالميزانيات المحفوظة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budgets', default=str(benchmark.BUDGETS_PATH), help='ملف الميزانيات (JSON)')
+        parser.add_argument('--update-budgets', action='store_true', help='كتابة الميزانيات من القياس الحالي')
+        parser.add_argument('--json', action='store_true', help='طباعة النتائج بصيغة JSON')
+
+    def handle(self, *args, **options):
+        try:
+            user = benchmark.benchmark_user()
+        except benchmark.CustomUser.DoesNotExist:
+            raise CommandError('لا توجد بيانات قياس، شغّل seed_benchmark_data أولاً')
+
+        results = benchmark.run(user)
+
+        if options['json']:
+            self.stdout.write(json.dumps(benchmark.as_dicts(results), indent=2, ensure_ascii=False))
+        else:
+            for result in results:
+                self.stdout.write(
+                    f"{result.name:45} {result.status_code:4} {result.queries:5} q "
+                    f"{result.time_ms:9.1f} ms {result.bytes:10} B"
+                )
+
+        if options['update_budgets']:
+            # حجم الاستجابة يُسجل عند حجم بيانات الاختبار على قاعدة مؤقتة
+            scaled_results = benchmark.run_at_scale(benchmark.TEST_SCALE)
+            benchmark.save_budgets(results, scaled_results, options['budgets'])
+            self.stdout.write(self.style.SUCCESS(f"تم تحديث الميزانيات: {options['budgets']}"))
+            return
+
+        violations = benchmark.compare(results, benchmark.load_budgets(options['budgets']))
+        for name, metric, value, budget in violations:
+            self.stderr.write(f"{name}: {metric} = {value} (الميزانية {budget})")
+        if violations:
+            raise CommandError(f"{len(violations)} تجاوز للميزانيات")
+        self.stdout.write(self.style.SUCCESS('جميع النقاط ضمن الميزانيات'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from web.benchmark import seed_dataset, BASE_SIZES
+
+
+class Command(BaseCommand):
+    help = 'إنشاء بيانات اصطناعية كبيرة لقياس أداء نقاط الـ API والويب'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help=f"مضاعف أحجام البيانات (عند 1: {BASE_SIZES['sales_invoices']} فاتورة بيع و{BASE_SIZES['inventory_movements']} حركة مخزون)"
+        )
+        parser.add_argument('--seed', type=int, default=42, help='بذرة التوليد العشوائي')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seed_dataset(scale=options['scale'], seed=options['seed'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS('تم إنشاء بيانات القياس'))
@@ -1,3 +1,124 @@
+import csv
+import io
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from openpyxl import load_workbook
 from django.test import TestCase
+from django.urls import reverse
+from core.models import Company, Branch, Customer, CustomUser, Unit
+from inventory.models import Product, StockLevel
+from pos.models import SalesInvoice
+from web import benchmark
 
-# Create your tests here.
+
+class EndpointBudgetTests(TestCase):
+    """
+    كل نقطة في api/urls.py و web/urls.py يجب أن تبقى ضمن ميزانيتها في perf_budgets.json
+
+    تُقارن هنا عدد الاستعلامات وحجم الاستجابة على بيانات بحجم TEST_SCALE (الحجم الذي
+    سُجلت عنده ميزانية bytes)، أما الزمن فيُقاس على البيانات الكاملة عبر:
+    seed_benchmark_data ثم benchmark_endpoints.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        benchmark.seed_dataset(scale=benchmark.TEST_SCALE)
+
+    def setUp(self):
+        self.user = benchmark.benchmark_user()
+        self.client.force_login(self.user)
+        self.budgets = benchmark.load_budgets()
+
+    def test_every_endpoint_has_a_budget(self):
+        names = {name for name, _, _, _ in benchmark.endpoints(self.user)}
+        self.assertEqual(names - set(self.budgets), set())
+
+    def test_endpoints_within_budget(self):
+        results = benchmark.run(self.user, self.client)
+        self.assertTrue(results)
+        for result in results:
+            with self.subTest(endpoint=result.name):
+                self.assertEqual(result.status_code, 200)
+        violations = benchmark.compare(results, self.budgets, metrics=('queries', 'bytes'))
+        self.assertEqual(violations, [])
+
+
+class ReportExportTests(TestCase):
+    """تصدير CSV يُرسل صفاً بصف بترميز UTF-8 مع BOM عبر أكثر من دفعة قراءة"""
+
+    def setUp(self):
+        company = Company.objects.create(name='Ex Co', name_ar='شركة', tax_id='EX-1', commercial_register='EX-1')
+        branch = Branch.objects.create(company=company, name='Main', name_ar='الرئيسي', code='EX')
+        customer = Customer.objects.create(company=company, name='عميل نقدي', phone='1')
+        SalesInvoice.objects.bulk_create([
+            SalesInvoice(
+                company=company, branch=branch, customer=customer, invoice_number=f'EX-{n}',
+                invoice_date=date(2026, 1, n), due_date=date(2026, 1, n), status='paid',
+                total_amount=Decimal(n * 10),
+            )
+            for n in range(1, 6)
+        ])
+        self.client.force_login(CustomUser.objects.create_user(username='ex', password='x', branch=branch))
+
+    def test_sales_csv_streams_every_row(self):
+        with mock.patch('web.views.EXPORT_CHUNK_SIZE', 2):
+            response = self.client.get(reverse('web:sales_report'), {'export': 'csv'})
+            self.assertTrue(response.streaming)
+            chunks = list(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="sales_report.csv"')
+        # سطر لكل جزء: الرأس ثم خمس فواتير قُرئت على ثلاث دفعات
+        self.assertEqual(len(chunks), 6)
+
+        content = b''.join(chunks)
+        self.assertTrue(content.startswith('\ufeff'.encode('utf-8')))
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0], ['رقم الفاتورة', 'العميل', 'التاريخ', 'الحالة', 'الإجمالي'])
+        self.assertEqual(rows[1], ['EX-5', 'عميل نقدي', '2026-01-05', 'paid', '50.00'])
+        self.assertEqual([row[0] for row in rows[1:]], ['EX-5', 'EX-4', 'EX-3', 'EX-2', 'EX-1'])
+
+    def test_sales_xlsx_contains_every_row(self):
+        with mock.patch('web.views.EXPORT_CHUNK_SIZE', 2):
+            response = self.client.get(reverse('web:sales_report'), {'export': 'xlsx'})
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        self.assertIn('sales_report.xlsx', response['Content-Disposition'])
+
+        rows = list(load_workbook(io.BytesIO(content), read_only=True).active.iter_rows(values_only=True))
+        self.assertEqual(rows[0], ('رقم الفاتورة', 'العميل', 'التاريخ', 'الحالة', 'الإجمالي'))
+        self.assertEqual([row[0] for row in rows[1:]], ['EX-5', 'EX-4', 'EX-3', 'EX-2', 'EX-1'])
+        self.assertEqual(rows[1][4], 50)
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get(reverse('web:sales_report'), {'export': 'pdf'}).status_code, 400)
+
+
+class InventoryReportTests(TestCase):
+    """صفوف تقرير المخزون وإجماليه وعدد المنخفض كلها من أرصدة الفروع (StockLevel)"""
+
+    def setUp(self):
+        company = Company.objects.create(name='Inv Co', name_ar='شركة', tax_id='INV-1', commercial_register='INV-1')
+        main = Branch.objects.create(company=company, name='Main', name_ar='الرئيسي', code='INV')
+        other = Branch.objects.create(company=company, name='Other', name_ar='الفرعي', code='INV-2')
+        unit = Unit.objects.create(company=company, name='Piece', name_ar='قطعة', code='PC-INV')
+        # quantity_on_hand لا يطابق الأرصدة عمداً
+        product = Product.objects.create(
+            company=company, name='Tea', name_ar='شاي', code='INV-T', barcode='INV-T', unit=unit,
+            selling_price=Decimal('10'), quantity_on_hand=Decimal('999'), reorder_level=Decimal('5'),
+        )
+        StockLevel.objects.create(product=product, branch=main, quantity=Decimal('20'))
+        StockLevel.objects.create(product=product, branch=other, quantity=Decimal('2'))
+        self.client.force_login(CustomUser.objects.create_user(username='inv', password='x', branch=main))
+
+    def test_rows_and_totals_share_stock_levels(self):
+        response = self.client.get(reverse('web:inventory_report'))
+        rows = list(response.context['levels'])
+        self.assertEqual(
+            [(row.branch.code, row.stock_value) for row in rows], [('INV', Decimal('200')), ('INV-2', Decimal('20'))]
+        )
+        self.assertEqual(response.context['total_value'], sum(row.stock_value for row in rows))
+        self.assertEqual(response.context['low_stock_count'], 1)
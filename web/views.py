@@ -1,15 +1,21 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, Q
+from django.core.paginator import Paginator
+from django.db.models import Sum, Count, Q, F
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 
 from core.models import Company, Branch, Customer, Supplier
-from inventory.models import Product
+from inventory.models import Product, StockLevel
+from inventory.services import below_reorder_levels
 from accounting.models import PurchaseInvoice
 from pos.models import SalesInvoice
 from manufacturing.models import ProductionOrder
+from reports.services import sales_summary, purchases_summary
+from .exports import export_response, EXPORT_CHUNK_SIZE
+
+REPORT_PAGE_SIZE = 50
 
 def index(request):
     """الصفحة الرئيسية - بدون تسجيل دخول وبدون متطلبات"""
@@ -33,30 +39,17 @@ def index(request):
     if company and branch:
         today = timezone.now().date()
         
-        today_sales = SalesInvoice.objects.filter(
-            branch=branch,
-            invoice_date=today
-        ).aggregate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        )
-        
-        today_purchases = PurchaseInvoice.objects.filter(
-            branch=branch,
-            invoice_date=today
-        ).aggregate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        )
+        today_sales = sales_summary(branch, today, today)
+        today_purchases = purchases_summary(branch, today, today)
         
         total_products = Product.objects.filter(company=company).count()
         total_customers = Customer.objects.filter(company=company).count()
         total_suppliers = Supplier.objects.filter(company=company).count()
         
-        today_sales_total = today_sales['total'] or 0
-        today_sales_count = today_sales['count'] or 0
-        today_purchases_total = today_purchases['total'] or 0
-        today_purchases_count = today_purchases['count'] or 0
+        today_sales_total = today_sales['total']
+        today_sales_count = today_sales['count']
+        today_purchases_total = today_purchases['total']
+        today_purchases_count = today_purchases['count']
     
     context = {
         'company': company,
@@ -87,55 +80,30 @@ def dashboard(request):
     # إحصائيات اليوم
     today = timezone.now().date()
     
-    # المبيعات
-    today_sales = SalesInvoice.objects.filter(
-        company=company,
-        branch=branch,
-        invoice_date=today
-    ).aggregate(
-        total=Sum('total_amount'),
-        count=Count('id')
-    )
-    
-    # الشراء
-    today_purchases = PurchaseInvoice.objects.filter(
-        company=company,
-        branch=branch,
-        invoice_date=today
-    ).aggregate(
-        total=Sum('total_amount'),
-        count=Count('id')
-    )
+    # المبيعات والشراء من الملخصات اليومية
+    today_sales = sales_summary(branch, today, today)
+    today_purchases = purchases_summary(branch, today, today)
     
     # المخزون
     products = Product.objects.filter(company=company)
     total_products = products.count()
-    low_stock = products.filter(quantity_on_hand__lt=50).count()
+    low_stock = below_reorder_levels(branch).count()
     
     # أحدث الفواتير
     recent_sales = SalesInvoice.objects.filter(
         company=company,
         branch=branch
-    ).order_by('-invoice_date')[:5]
+    ).select_related('customer').order_by('-invoice_date')[:5]
     
     recent_purchases = PurchaseInvoice.objects.filter(
         company=company,
         branch=branch
-    ).order_by('-invoice_date')[:5]
+    ).select_related('supplier').order_by('-invoice_date')[:5]
     
     # الإحصائيات الشهرية
     month_start = today.replace(day=1)
-    month_sales = SalesInvoice.objects.filter(
-        company=company,
-        branch=branch,
-        invoice_date__gte=month_start
-    ).aggregate(total=Sum('total_amount'))
-    
-    month_purchases = PurchaseInvoice.objects.filter(
-        company=company,
-        branch=branch,
-        invoice_date__gte=month_start
-    ).aggregate(total=Sum('total_amount'))
+    month_sales = sales_summary(branch, month_start)
+    month_purchases = purchases_summary(branch, month_start)
     
     context = {
         'company': company,
@@ -146,8 +114,8 @@ def dashboard(request):
         'low_stock': low_stock,
         'recent_sales': recent_sales,
         'recent_purchases': recent_purchases,
-        'month_sales': month_sales['total'] or Decimal('0'),
-        'month_purchases': month_purchases['total'] or Decimal('0'),
+        'month_sales': month_sales['total'],
+        'month_purchases': month_purchases['total'],
     }
     
     return render(request, 'web/dashboard.html', context)
@@ -162,10 +130,12 @@ def products_list(request):
     if not company:
         return render(request, 'web/no_access.html')
     
-    products = Product.objects.filter(company=company).order_by('name_ar')
+    products = Product.objects.filter(company=company).select_related('category').order_by('name_ar')
+    page = Paginator(products, REPORT_PAGE_SIZE).get_page(request.GET.get('page'))
     
     context = {
-        'products': products,
+        'products': page,
+        'page': page,
         'company': company,
     }
     
@@ -185,20 +155,37 @@ def sales_report(request):
     from_date = request.GET.get('from_date')
     to_date = request.GET.get('to_date')
     
-    sales = SalesInvoice.objects.filter(company=company)
+    sales = SalesInvoice.objects.filter(company=company).select_related('customer')
     
     if from_date:
         sales = sales.filter(invoice_date__gte=from_date)
     if to_date:
         sales = sales.filter(invoice_date__lte=to_date)
     
-    sales = sales.order_by('-invoice_date')
+    sales = sales.order_by('-invoice_date', '-created_at')
+    
+    # التصدير يُكتب صفاً بصف دون تحميل الفواتير في الذاكرة
+    export_format = request.GET.get('export')
+    if export_format:
+        rows = sales.values_list(
+            'invoice_number', 'customer__name', 'invoice_date', 'status', 'total_amount'
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        return export_response(
+            export_format, 'sales_report',
+            ['رقم الفاتورة', 'العميل', 'التاريخ', 'الحالة', 'الإجمالي'], rows
+        )
+    
+    # الإجمالي وعدد الفواتير في استعلام واحد، ويُمرر العدد للـ Paginator بدلاً من COUNT منفصل
+    stats = sales.aggregate(total=Sum('total_amount'), count=Count('id'))
+    total = stats['total'] or Decimal('0')
     
-    # الإجمالي
-    total = sales.aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
+    paginator = Paginator(sales, REPORT_PAGE_SIZE)
+    paginator.count = stats['count']
+    page = paginator.get_page(request.GET.get('page'))
     
     context = {
-        'sales': sales,
+        'sales': page,
+        'page': page,
         'company': company,
         'total': total,
         'from_date': from_date,
@@ -217,17 +204,41 @@ def inventory_report(request):
     if not company:
         return render(request, 'web/no_access.html')
     
-    products = Product.objects.filter(company=company).order_by('name_ar')
+    # الصفوف والإجمالي وعدد المنخفض من أرصدة الفروع (StockLevel) بسعر البيع، كما في inventory_valuation
+    levels = StockLevel.objects.filter(branch__company=company).select_related(
+        'product__category', 'branch'
+    ).annotate(
+        stock_value=F('quantity') * F('product__selling_price')
+    ).order_by('product__name_ar', 'product__code', 'branch__name_ar')
+    
+    export_format = request.GET.get('export')
+    if export_format:
+        rows = levels.values_list(
+            'product__code', 'product__name_ar', 'product__category__name_ar', 'branch__name_ar',
+            'quantity', 'product__selling_price', 'stock_value'
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        return export_response(
+            export_format, 'inventory_report',
+            ['الكود', 'اسم المنتج', 'الفئة', 'الفرع', 'الكمية المتاحة', 'سعر البيع', 'القيمة الإجمالية'], rows
+        )
+    
+    # إحصائيات في استعلام واحد على نفس الأرصدة
+    stats = levels.aggregate(
+        total_value=Sum('stock_value'),
+        low_stock=Count('id', filter=Q(quantity__lt=F('reorder_level'))),
+        count=Count('id'),
+    )
     
-    # إحصائيات
-    total_value = sum(p.quantity_on_hand * p.selling_price for p in products)
-    low_stock = products.filter(quantity_on_hand__lt=50)
+    paginator = Paginator(levels, REPORT_PAGE_SIZE)
+    paginator.count = stats['count']
+    page = paginator.get_page(request.GET.get('page'))
     
     context = {
-        'products': products,
+        'levels': page,
+        'page': page,
         'company': company,
-        'total_value': total_value,
-        'low_stock': low_stock,
+        'total_value': stats['total_value'] or Decimal('0'),
+        'low_stock_count': stats['low_stock'],
     }
     
     return render(request, 'web/inventory_report.html', context)